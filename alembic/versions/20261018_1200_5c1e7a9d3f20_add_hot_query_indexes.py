@@ -0,0 +1,52 @@
+"""add_hot_query_indexes
+
+Revision ID: 5c1e7a9d3f20
+Revises: 83243f5ed087
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d3f20'
+down_revision: Union[str, None] = '83243f5ed087'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Newest-first listings (ORDER BY created_at DESC [LIMIT n]) - seq scan + sort without these
+    op.create_index('ix_clients_created_at', 'clients', ['created_at'], unique=False)
+    op.create_index('ix_projects_created_at', 'projects', ['created_at'], unique=False)
+    op.create_index('ix_permits_created_at', 'permits', ['created_at'], unique=False)
+
+    # Active qualifier assignments: qualifier_id = ? AND end_date IS NULL ORDER BY start_date DESC
+    op.create_index(
+        'ix_lbq_qualifier_active',
+        'licensed_business_qualifiers',
+        ['qualifier_id', 'start_date'],
+        unique=False,
+        postgresql_where=sa.text('end_date IS NULL'),
+    )
+
+    # Posted payment total per invoice during promotion (index-only SUM(amount))
+    op.create_index(
+        'ix_payments_invoice_posted',
+        'payments',
+        ['invoice_id'],
+        unique=False,
+        postgresql_include=['amount'],
+        postgresql_where=sa.text("status = 'POSTED'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payments_invoice_posted', table_name='payments')
+    op.drop_index('ix_lbq_qualifier_active', table_name='licensed_business_qualifiers')
+    op.drop_index('ix_permits_created_at', table_name='permits')
+    op.drop_index('ix_projects_created_at', table_name='projects')
+    op.drop_index('ix_clients_created_at', table_name='clients')
@@ -0,0 +1,31 @@
+"""add_qb_cache_content_hash
+
+Revision ID: a4d2c8e61b57
+Revises: 5c1e7a9d3f20
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d2c8e61b57'
+down_revision: Union[str, None] = '5c1e7a9d3f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Change detection for the bulk cache loader - unchanged rows are not rewritten
+    op.add_column('quickbooks_customers_cache', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.add_column('quickbooks_invoices_cache', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.add_column('quickbooks_payments_cache', sa.Column('content_hash', sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('quickbooks_payments_cache', 'content_hash')
+    op.drop_column('quickbooks_invoices_cache', 'content_hash')
+    op.drop_column('quickbooks_customers_cache', 'content_hash')
@@ -0,0 +1,47 @@
+"""add_sync_runs_journal
+
+Revision ID: b7e3f1a90c42
+Revises: a4d2c8e61b57
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3f1a90c42'
+down_revision: Union[str, None] = 'a4d2c8e61b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One row per entity sync run; page checkpoints let an interrupted run resume
+    op.create_table(
+        'sync_runs',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('entity_type', sa.String(50), nullable=False),
+        sa.Column('query', sa.Text(), nullable=False),
+        sa.Column('since', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('page_size', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(20), server_default='running', nullable=False),  # running, completed, failed
+        sa.Column('pages_committed', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('next_start_position', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('records_fetched', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('records_synced', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('errors', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('resume_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('started_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('finished_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index('ix_sync_runs_entity_started', 'sync_runs', ['entity_type', 'started_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_runs_entity_started', 'sync_runs')
+    op.drop_table('sync_runs')
@@ -0,0 +1,51 @@
+"""add_invoice_number_allocator
+
+Revision ID: c81f4d2e6a17
+Revises: b7e3f1a90c42
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f4d2e6a17'
+down_revision: Union[str, None] = 'b7e3f1a90c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Last DocNumber suffix issued per base invoice number (1 = the bare base)
+    op.create_table(
+        'invoice_number_counters',
+        sa.Column('prefix', sa.String(50), primary_key=True),
+        sa.Column('last_suffix', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+    # DocNumber prefix lookups (doc_number LIKE 'base-%') - the default btree
+    # only serves LIKE under the C collation
+    op.create_index(
+        'ix_qb_invoices_doc_number_prefix',
+        'quickbooks_invoices_cache',
+        ['doc_number'],
+        unique=False,
+        postgresql_ops={'doc_number': 'text_pattern_ops'},
+    )
+    op.create_index(
+        'ix_invoices_invoice_number_prefix',
+        'invoices',
+        ['invoice_number'],
+        unique=False,
+        postgresql_ops={'invoice_number': 'text_pattern_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invoices_invoice_number_prefix', table_name='invoices')
+    op.drop_index('ix_qb_invoices_doc_number_prefix', table_name='quickbooks_invoices_cache')
+    op.drop_table('invoice_number_counters')
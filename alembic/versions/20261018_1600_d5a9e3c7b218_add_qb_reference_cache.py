@@ -0,0 +1,46 @@
+"""add_qb_reference_cache
+
+Revision ID: d5a9e3c7b218
+Revises: c81f4d2e6a17
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a9e3c7b218'
+down_revision: Union[str, None] = 'c81f4d2e6a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # QuickBooks reference lists (items, terms, customer_types, vendors, tax_codes)
+    op.create_table(
+        'qb_reference_data',
+        sa.Column('entity_type', sa.String(30), nullable=False),
+        sa.Column('qb_id', sa.String(50), nullable=False),
+        sa.Column('name', sa.String(255), nullable=True),
+        sa.Column('active', sa.Boolean(), server_default='true', nullable=False),
+        sa.Column('qb_data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('cached_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('entity_type', 'qb_id'),
+    )
+
+    # Per type: the point up to which the cached list is known complete
+    op.create_table(
+        'qb_reference_status',
+        sa.Column('entity_type', sa.String(30), primary_key=True),
+        sa.Column('refreshed_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('record_count', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('qb_reference_status')
+    op.drop_table('qb_reference_data')
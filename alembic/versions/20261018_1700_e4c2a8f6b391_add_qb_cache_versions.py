@@ -0,0 +1,54 @@
+"""add_qb_cache_versions
+
+Revision ID: e4c2a8f6b391
+Revises: d5a9e3c7b218
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c2a8f6b391'
+down_revision: Union[str, None] = 'd5a9e3c7b218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# cache table -> sync_status.entity_type
+CACHE_TABLES = {
+    'quickbooks_customers_cache': 'customers',
+    'quickbooks_invoices_cache': 'invoices',
+    'quickbooks_payments_cache': 'payments',
+}
+
+
+def upgrade() -> None:
+    # Bumped by every statement that writes a cache table (full sync, CDC,
+    # webhooks, app-side writes), so in-memory snapshots can tell they are stale
+    op.add_column('sync_status', sa.Column('cache_version', sa.BigInteger(), server_default='0', nullable=False))
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_qb_cache_version()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE sync_status SET cache_version = cache_version + 1 WHERE entity_type = TG_ARGV[0];
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table, entity_type in CACHE_TABLES.items():
+        op.execute(f"""
+            CREATE TRIGGER {table}_version
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_qb_cache_version('{entity_type}')
+        """)
+
+
+def downgrade() -> None:
+    for table in CACHE_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_qb_cache_version()")
+    op.drop_column('sync_status', 'cache_version')
@@ -0,0 +1,75 @@
+"""add_qb_context_cache
+
+Revision ID: f6a1b3d5c702
+Revises: e4c2a8f6b391
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a1b3d5c702'
+down_revision: Union[str, None] = 'e4c2a8f6b391'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# context table -> sync_status.entity_type
+CONTEXT_TABLES = {
+    'quickbooks_context_customers': 'context_customers',
+    'quickbooks_context_invoices': 'context_invoices',
+}
+
+
+def upgrade() -> None:
+    # Every QuickBooks customer and invoice ("context" fields only) for the
+    # chat context - the quickbooks_*_cache tables hold GC Compliance only
+    op.create_table(
+        'quickbooks_context_customers',
+        sa.Column('qb_customer_id', sa.String(50), primary_key=True),
+        sa.Column('display_name', sa.String(255), nullable=True),
+        sa.Column('qb_data', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('content_hash', sa.String(64), nullable=True),
+        sa.Column('qb_last_modified', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('is_active', sa.Boolean(), server_default='true', nullable=False),
+        sa.Column('sync_error', sa.Text(), nullable=True),
+        sa.Column('cached_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_table(
+        'quickbooks_context_invoices',
+        sa.Column('qb_invoice_id', sa.String(50), primary_key=True),
+        sa.Column('customer_id', sa.String(50), nullable=True),
+        sa.Column('qb_data', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('content_hash', sa.String(64), nullable=True),
+        sa.Column('qb_last_modified', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('is_active', sa.Boolean(), server_default='true', nullable=False),
+        sa.Column('sync_error', sa.Text(), nullable=True),
+        sa.Column('cached_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_qb_context_invoices_customer_id', 'quickbooks_context_invoices', ['customer_id'])
+
+    # Versioned like the sync cache tables (bump_qb_cache_version from e4c2a8f6b391);
+    # last_sync_at records the last complete refresh
+    op.execute("""
+        INSERT INTO sync_status (entity_type, records_synced, sync_errors)
+        VALUES ('context_customers', 0, 0), ('context_invoices', 0, 0)
+    """)
+    for table, entity_type in CONTEXT_TABLES.items():
+        op.execute(f"""
+            CREATE TRIGGER {table}_version
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_qb_cache_version('{entity_type}')
+        """)
+
+
+def downgrade() -> None:
+    for table in CONTEXT_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_version ON {table}")
+    op.execute("DELETE FROM sync_status WHERE entity_type IN ('context_customers', 'context_invoices')")
+    op.drop_index('ix_qb_context_invoices_customer_id', 'quickbooks_context_invoices')
+    op.drop_table('quickbooks_context_invoices')
+    op.drop_table('quickbooks_context_customers')
@@ -120,8 +120,15 @@ class ActionType(str, enum.Enum):
 
 
 class Base(DeclarativeBase):
-    """Base class for all models."""
-    pass
+    """
+    Base class for all models.
+
+    eager_defaults: server-generated columns (trigger-assigned business_id,
+    gen_random_uuid() PKs, CURRENT_TIMESTAMP defaults) are fetched with
+    INSERT/UPDATE ... RETURNING during flush, so services never need a
+    follow-up refresh() round trip to read them back.
+    """
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class Client(Base):
@@ -181,6 +188,8 @@ class Client(Base):
         Index('ix_clients_extra_gin', 'extra', postgresql_using='gin'),
         # Case-insensitive search on name
         Index('ix_clients_full_name_lower', text('lower(full_name)')),
+        # Newest-first listings (get_clients_data)
+        Index('ix_clients_created_at', 'created_at'),
     )
 
 
@@ -253,6 +262,8 @@ class Project(Base):
     __table_args__ = (
         Index('ix_projects_extra_gin', 'extra', postgresql_using='gin'),
         Index('ix_projects_dates', 'start_date', 'end_date'),
+        # Newest-first listings (get_projects_data)
+        Index('ix_projects_created_at', 'created_at'),
     )
 
 
@@ -320,6 +331,8 @@ class Permit(Base):
     
     __table_args__ = (
         Index('ix_permits_extra_gin', 'extra', postgresql_using='gin'),
+        # Newest-first listings (get_permits_data)
+        Index('ix_permits_created_at', 'created_at'),
     )
 
 
@@ -530,6 +543,12 @@ class Payment(Base):
     
     __table_args__ = (
         Index('ix_payments_extra_gin', 'extra', postgresql_using='gin'),
+        # Posted total per invoice during payment promotion (index-only SUM)
+        Index(
+            'ix_payments_invoice_posted', 'invoice_id',
+            postgresql_include=['amount'],
+            postgresql_where=text("status = 'POSTED'"),
+        ),
     )
 
 
@@ -665,6 +684,7 @@ class QuickBooksCustomerCache(Base):
     
     # Full QB response
     qb_data: Mapped[Dict[str, Any] | None] = mapped_column(JSONB)
+    content_hash: Mapped[str | None] = mapped_column(String(64))  # SHA-256 of qb_data minus MetaData
     
     # Cache metadata
     cached_at: Mapped[datetime] = mapped_column(
@@ -771,6 +791,7 @@ class QuickBooksInvoiceCache(Base):
     
     # Full QB response
     qb_data: Mapped[Dict[str, Any] | None] = mapped_column(JSONB)
+    content_hash: Mapped[str | None] = mapped_column(String(64))  # SHA-256 of qb_data minus MetaData
     
     # Cache metadata
     cached_at: Mapped[datetime] = mapped_column(
@@ -800,6 +821,7 @@ class QuickBooksPaymentCache(Base):
     
     # Full QB response (includes linked invoices)
     qb_data: Mapped[Dict[str, Any] | None] = mapped_column(JSONB)
+    content_hash: Mapped[str | None] = mapped_column(String(64))  # SHA-256 of qb_data minus MetaData
     
     # Cache metadata
     cached_at: Mapped[datetime] = mapped_column(
@@ -969,6 +991,8 @@ class LicensedBusinessQualifier(Base):
         Index('ix_lbq_qualifier_id', 'qualifier_id'),
         Index('ix_lbq_licensed_business_id', 'licensed_business_id'),
         Index('ix_lbq_dates', 'start_date', 'end_date'),
+        # Active assignments per qualifier, newest first (capacity checks)
+        Index('ix_lbq_qualifier_active', 'qualifier_id', 'start_date', postgresql_where=text("end_date IS NULL")),
     )
 
 
@@ -1024,7 +1048,6 @@ class OversightAction(Base):
     
     __table_args__ = (
         Index('ix_oversight_actions_project_date', 'project_id', 'action_date'),
-        Index('ix_oversight_actions_action_type', 'action_type'),
     )
 
 
@@ -1075,7 +1098,6 @@ class ComplianceJustification(Base):
     
     __table_args__ = (
         Index('ix_compliance_justifications_entity', 'entity_type', 'entity_id'),
-        Index('ix_compliance_justifications_rule_type', 'rule_type'),
         Index('ix_compliance_justifications_approval_status', 'approval_status'),
     )
 
@@ -0,0 +1,281 @@
+"""
+Read-replica routing for async SQLAlchemy sessions.
+
+Purpose: Send read-only traffic (GET routes, chat context loads) to an
+optional replica while keeping writes - and reads that must see them -
+on the primary that the QuickBooks sync writes to.
+
+Routing policy (ReplicaRouter + RoutingSession.get_bind):
+- INSERT/UPDATE/DELETE, flushes, SELECT ... FOR UPDATE/SHARE,
+  session.connection() and raw text() that isn't a plain SELECT -> primary.
+  SELECTs that call side-effecting functions (pg_advisory_*, nextval,
+  setval, pg_notify, set_config ...) count as writes, so an advisory lock
+  and the reads it guards always run on the primary
+- A session picks its read bind once, at its first read, and keeps it;
+  after a write, or when it opts out (info["use_replica"] = False), it reads
+  from the primary for the rest of its life
+- Reads go to the replica only when the session opted in (GET request via
+  get_db, or inside replica_reads()) AND the replica is reachable AND its
+  measured lag is under REPLICA_MAX_LAG_SECONDS AND it has replayed the WAL
+  position (pg_current_wal_lsn) recorded after this process's last commit
+  that wrote (read-your-writes). The position is read on the committing
+  session's own primary connection, so a write costs no extra connect. If
+  it could not be read, reads stay on the primary until
+  REPLICA_MAX_LAG_SECONDS after the write
+
+RoutingSession is only installed when a replica is configured
+(app/db/session.py); without one, commits do no routing work at all.
+
+Local testing: run two Postgres instances, point DATABASE_URL at one and
+DATABASE_REPLICA_URL at the other (an unreplicated copy reports lag 0 and
+counts as caught up).
+"""
+
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import Select, CompoundSelect, TextClause, event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.functions import FunctionElement
+
+logger = logging.getLogger(__name__)
+
+# Opt-in for sessions created without an explicit preference (e.g. db_service)
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+
+# NULL on a server that is not replaying WAL (an unreplicated copy)
+REPLICA_REPLAY_LSN_SQL = text("SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()::text END")
+
+# SELECTs with side effects (locks, sequences, notifications, settings) - primary only
+_SIDE_EFFECT_NAMES = r"pg_(?:try_)?advisory_\w*|nextval|next_value|setval|pg_notify|set_config|txid_current|pg_current_xact_id|lo_\w+"
+_SIDE_EFFECT_FUNCTIONS = re.compile(rf"\b(?:{_SIDE_EFFECT_NAMES})\s*\(", re.IGNORECASE)
+_SIDE_EFFECT_FUNCTION_NAME = re.compile(_SIDE_EFFECT_NAMES, re.IGNORECASE)
+_LOCKING_CLAUSE = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b", re.IGNORECASE)
+
+
+def lsn_to_int(lsn: Optional[str]) -> Optional[int]:
+    """'16/B374D848' -> comparable integer WAL position (None stays None)."""
+    if not lsn:
+        return None
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+@contextmanager
+def replica_reads() -> Iterator[None]:
+    """Route reads from sessions used inside this block to the replica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _has_side_effects(clause) -> bool:
+    """A Select that calls a side-effecting function (func.pg_advisory_lock, Sequence.next_value ...)."""
+    for element in visitors.iterate(clause):
+        if isinstance(element, FunctionElement) and _SIDE_EFFECT_FUNCTION_NAME.fullmatch(getattr(element, "name", "")):
+            return True
+        if isinstance(element, TextClause) and _SIDE_EFFECT_FUNCTIONS.search(element.text):
+            return True
+    return False
+
+
+def is_read_statement(clause) -> bool:
+    """True for statements that are safe to run on a replica."""
+    if isinstance(clause, (Select, CompoundSelect)):
+        return clause._for_update_arg is None and not _has_side_effects(clause)
+    if isinstance(clause, TextClause):
+        sql = clause.text.lstrip()
+        return (
+            sql[:6].upper() == "SELECT"
+            and not _LOCKING_CLAUSE.search(sql)
+            and not _SIDE_EFFECT_FUNCTIONS.search(sql)
+        )
+    return False
+
+
+class ReplicaRouter:
+    """Holds primary/replica engines and decides where reads may go."""
+
+    def __init__(
+        self,
+        primary: Engine,
+        replica: Engine,
+        max_lag_seconds: float = 5.0,
+        lag_check_seconds: float = 5.0,
+    ):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_seconds = lag_check_seconds
+        self.last_write_at = 0.0
+        self.write_lsn = 0  # Primary WAL position after this process's last commit that wrote
+        self.replayed_lsn = 0  # Highest replica replay position seen so far
+        self._lsn_unknown_at = 0.0  # Last commit whose WAL position could not be read
+        self._lag: Optional[float] = None  # None = replica unavailable
+        self._lag_checked_at = 0.0
+
+    def mark_write(self):
+        """Record that this process just wrote to the primary."""
+        self.last_write_at = time.time()
+
+    def _primary_lsn(self, conn: Connection) -> Optional[int]:
+        """Current primary WAL position, read on the given primary connection."""
+        return lsn_to_int(conn.execute(PRIMARY_LSN_SQL).scalar())
+
+    def _replay_lsn(self) -> Optional[int]:
+        """Replica replay position; None when the replica is not replaying WAL."""
+        with self.replica.connect() as conn:
+            return lsn_to_int(conn.execute(REPLICA_REPLAY_LSN_SQL).scalar())
+
+    def _probe_lag(self) -> float:
+        """Query replica replay lag in seconds (runs inside the session's greenlet)."""
+        with self.replica.connect() as conn:
+            return float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+
+    def record_commit(self, conn: Connection):
+        """Remember the primary WAL position a committed write reached (conn: the connection that committed it)."""
+        try:
+            lsn = self._primary_lsn(conn)
+        except Exception as e:
+            logger.warning(f"[DB ROUTING] Could not read primary WAL position, reads stay on primary: {e}")
+            self._lsn_unknown_at = time.time()
+            return
+        if lsn is not None and lsn > self.write_lsn:
+            self.write_lsn = lsn
+
+    def replica_lag(self) -> Optional[float]:
+        """Cached replica lag; None when the replica could not be reached."""
+        now = time.monotonic()
+        if now - self._lag_checked_at >= self.lag_check_seconds:
+            self._lag_checked_at = now
+            try:
+                self._lag = self._probe_lag()
+            except Exception as e:
+                logger.warning(f"[DB ROUTING] Replica lag check failed, using primary: {e}")
+                self._lag = None
+        return self._lag
+
+    def replica_caught_up(self) -> bool:
+        """Replica has replayed this process's last committed write."""
+        if time.time() - self._lsn_unknown_at <= self.max_lag_seconds:
+            return False
+        if self.write_lsn <= self.replayed_lsn:
+            return True
+        try:
+            replayed = self._replay_lsn()
+        except Exception as e:
+            logger.warning(f"[DB ROUTING] Replica replay position check failed, using primary: {e}")
+            return False
+        # Not replaying WAL (unreplicated copy): nothing to wait for
+        self.replayed_lsn = max(self.replayed_lsn, self.write_lsn if replayed is None else replayed)
+        return self.write_lsn <= self.replayed_lsn
+
+    def replica_available(self) -> bool:
+        """Replica is reachable, within lag budget and has replayed our last write."""
+        lag = self.replica_lag()
+        if lag is None or lag > self.max_lag_seconds:
+            return False
+        return self.replica_caught_up()
+
+    def status(self) -> dict:
+        """Routing diagnostics."""
+        return {
+            "replica_configured": True,
+            "replica_lag_seconds": self._lag,
+            "max_lag_seconds": self.max_lag_seconds,
+            "seconds_since_last_write": round(time.time() - self.last_write_at, 3) if self.last_write_at else None,
+            "replica_behind_last_write": self.write_lsn > self.replayed_lsn,
+        }
+
+
+class RoutingSession(Session):
+    """
+    Sync Session (behind AsyncSession) that routes each statement via ReplicaRouter.
+
+    session.info["use_replica"] opts a session in or out; when unset the
+    replica_reads() context decides. The read bind is chosen at the first
+    read and kept, so one request never mixes primary and replica reads.
+    """
+
+    def __init__(self, *args, router: ReplicaRouter, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self._read_bind: Optional[Engine] = None
+        self._uncommitted_write = False
+        self._commit_connection: Optional[Connection] = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        router = self.router
+
+        if self._flushing or not is_read_statement(clause):
+            self._uncommitted_write = True
+            self._read_bind = router.primary  # Read-after-write for the rest of the session
+            router.mark_write()
+            return router.primary
+
+        if self._read_bind is None:
+            self._read_bind = self._choose_read_bind()
+        elif self._read_bind is router.replica and self.info.get("use_replica") is False:
+            # Opted out mid-session (e.g. before a get-or-create)
+            self._read_bind = router.primary
+        return self._read_bind
+
+    def _choose_read_bind(self) -> Engine:
+        use_replica = self.info.get("use_replica")
+        if use_replica is None:
+            use_replica = _replica_reads.get()
+        if use_replica and self.router.replica_available():
+            return self.router.replica
+        return self.router.primary
+
+    def close(self):
+        super().close()
+        self._read_bind = None
+        self._uncommitted_write = False
+        self._commit_connection = None
+
+
+@event.listens_for(RoutingSession, "before_commit")
+def _hold_write_connection(session: RoutingSession):
+    """Keep the primary connection a write is committed on, to read its WAL position afterwards."""
+    # Pending ORM changes are flushed after this hook, on the same connection
+    if session._uncommitted_write or not session._is_clean():
+        session._commit_connection = session.connection(bind_arguments={"bind": session.router.primary})
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_committed_write(session: RoutingSession):
+    """
+    Commits that wrote record the primary WAL position replicas must reach
+    (also covers session.begin() blocks). The position is read on the
+    connection that committed - it is still checked out here, so no new
+    connection is opened.
+    """
+    conn, session._commit_connection = session._commit_connection, None
+    if session._uncommitted_write:
+        session._uncommitted_write = False
+        session.router.record_commit(conn)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_rolled_back_write(session: RoutingSession):
+    session._uncommitted_write = False
+    session._commit_connection = None
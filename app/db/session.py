@@ -5,12 +5,15 @@ Purpose: Configure async PostgreSQL connection pool and session factory.
 Validation: Import this module and call engine.connect() to verify connectivity.
 """
 
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
+from fastapi import Request
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import NullPool
 import logging
 
 from app.config import settings
+from app.db.routing import ReplicaRouter, RoutingSession
+from app.utils.query_stats import install_query_instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -24,20 +27,55 @@ engine = create_async_engine(
     pool_recycle=3600,   # Recycle connections after 1 hour
 )
 
+# Optional read replica (GET routes + chat context loads, see app/db/routing.py)
+# default_transaction_read_only makes any mis-routed write fail loudly
+replica_engine = create_async_engine(
+    settings.DATABASE_REPLICA_URL,
+    echo=settings.DEBUG,
+    poolclass=NullPool if settings.ENVIRONMENT == "production" else None,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    connect_args={"server_settings": {"default_transaction_read_only": "on"}},
+) if settings.DATABASE_REPLICA_URL else None
+
+# Per-request query counts / DB time / N+1 detection (no-op outside a tracker)
+if settings.ENABLE_QUERY_STATS:
+    install_query_instrumentation(engine)
+    if replica_engine is not None:
+        install_query_instrumentation(replica_engine)
+
+replica_router: Optional[ReplicaRouter] = ReplicaRouter(
+    engine.sync_engine,
+    replica_engine.sync_engine,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    lag_check_seconds=settings.REPLICA_LAG_CHECK_SECONDS,
+) if replica_engine is not None else None
+
 # Create async session factory
+# With a replica configured, RoutingSession.get_bind routes writes to the primary
+# and pins each session's reads to one engine
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
+    **({"sync_session_class": RoutingSession, "router": replica_router} if replica_router else {}),
 )
 
+# HTTP methods whose sessions may read from the replica
+READ_ONLY_METHODS = ("GET", "HEAD")
+
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+async def get_db(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency for FastAPI routes to get database session.
     
+    GET/HEAD requests read from the replica when one is configured;
+    writes (and reads after a write) still go to the primary. A GET that
+    writes (OAuth callback, user get-or-create) sets
+    session.info["use_replica"] = False before its first lookup.
+    
     Usage in routes:
         @router.get("/items")
         async def get_items(db: AsyncSession = Depends(get_db)):
@@ -45,6 +83,8 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             return result.scalars().all()
     """
     async with AsyncSessionLocal() as session:
+        if request is not None:
+            session.info["use_replica"] = request.method in READ_ONLY_METHODS
         try:
             yield session
             await session.commit()
@@ -72,4 +112,6 @@ async def init_db():
 async def close_db():
     """Dispose of database engine and close connections."""
     await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
     logger.info("Database connections closed")
@@ -12,6 +12,10 @@ from typing import Dict, Any
 from datetime import datetime, timedelta
 from fastapi import HTTPException
 
+from app.services.invoice_number_allocator import invoice_number_allocator
+from app.services.qb_reference_cache import qb_reference_cache
+from app.utils.qb_query_builder import QBQuery
+
 logger = logging.getLogger(__name__)
 
 
@@ -185,7 +189,7 @@ async def handle_create_quickbooks_invoice(
     
     Invoice Number Convention:
     - Uses short property address format with city (e.g., "1105-Sandy-Bottom-Concord" from "1105 Sandy Bottom Dr, Concord, NC")
-    - Appends sequential number if duplicate addresses exist
+    - Appends sequential number if duplicate addresses exist (see InvoiceNumberAllocator)
     - Falls back to customer name if no address available
     
     Description Enhancement:
@@ -264,40 +268,17 @@ async def handle_create_quickbooks_invoice(
         
         base_invoice_number = generate_invoice_number(property_address, city, customer_name)
         
-        # Check for existing invoices with same base number and append counter if needed
-        existing_invoices = await qb_service.get_invoices()
-        matching_numbers = [
-            inv.get('DocNumber', '') 
-            for inv in existing_invoices 
-            if inv.get('DocNumber', '').startswith(base_invoice_number)
-        ]
-        
-        if matching_numbers:
-            # Find highest counter (e.g., "1105-Sandy-Bottom-2" → extract 2)
-            max_counter = 0
-            for doc_num in matching_numbers:
-                if doc_num == base_invoice_number:
-                    max_counter = max(max_counter, 1)
-                elif doc_num.startswith(base_invoice_number + '-'):
-                    suffix = doc_num[len(base_invoice_number)+1:]
-                    if suffix.isdigit():
-                        max_counter = max(max_counter, int(suffix))
-            
-            if max_counter > 0:
-                invoice_number = f"{base_invoice_number}-{max_counter + 1}"
-            else:
-                invoice_number = base_invoice_number
-        else:
-            invoice_number = base_invoice_number
-        
         city_suffix = f" in {city}" if city else ""
-        logger.info(f"[INVOICE] Generated invoice number: {invoice_number} (from address: '{property_address}'{city_suffix} or name: '{customer_name}')")
+        logger.info(f"[INVOICE] Base invoice number: {base_invoice_number} (from address: '{property_address}'{city_suffix} or name: '{customer_name}')")
         
         # Use specific "GC Permit Oversight" service item (itemId=108)
         GC_PERMIT_OVERSIGHT_ITEM_ID = "108"
         
-        # Verify the item exists in QuickBooks
-        items = await qb_service.get_items()
+        # Verify the item exists (reference-data cache; live query without a DB session)
+        if getattr(qb_service, "db", None) is not None:
+            items = await qb_reference_cache.get(qb_service.db, "items", active_only=True, qb_service=qb_service)
+        else:
+            items = await qb_service.get_items()
         gc_permit_item = next((item for item in items if item.get('Id') == GC_PERMIT_OVERSIGHT_ITEM_ID), None)
         
         if not gc_permit_item:
@@ -319,9 +300,8 @@ async def handle_create_quickbooks_invoice(
             # Append scope of work details
             detailed_description = f"{description}\n\nScope: {scope_of_work.strip()}"
         
-        # Build invoice data with custom DocNumber
+        # Build invoice data (DocNumber is allocated at create time)
         invoice_data = {
-            "DocNumber": invoice_number,  # Custom invoice number based on property + city
             "CustomerRef": {"value": customer_id},
             "TxnDate": invoice_date,
             "CustomerMemo": {
@@ -350,8 +330,9 @@ async def handle_create_quickbooks_invoice(
         if client_email and client_email.strip():
             invoice_data["BillEmail"] = {"Address": client_email.strip()}
         
-        # Create the invoice
-        invoice = await qb_service.create_invoice(invoice_data)
+        # Create the invoice under the next free number for this property
+        # (base, base-2, base-3, ...)
+        invoice = await invoice_number_allocator.create_invoice(qb_service, base_invoice_number, invoice_data)
         
         # Construct QuickBooks invoice link
         invoice_id = invoice.get('Id')
@@ -634,7 +615,7 @@ async def handle_sync_quickbooks_clients(
             }
         
         # Get all QB customers
-        qb_customers = await quickbooks_service.get_customers()
+        qb_customers = await quickbooks_service.get_customers(use_case="matching")
         if not qb_customers:
             return {
                 "status": "failed",
@@ -780,6 +761,55 @@ async def handle_sync_quickbooks_clients(
         }
 
 
+def _sheet_client_customer_data(client: Dict[str, Any], gc_type_id: str) -> Dict[str, Any]:
+    """QuickBooks Customer create body (GC Compliance type) for a Sheets client row."""
+    client_name = (client.get('Full Name') or client.get('Client Name', '')).strip()
+    client_email = client.get('Email', '').strip()
+    client_phone = client.get('Phone', '').strip()
+    client_address = client.get('Address', '').strip()
+    client_city = client.get('City', '').strip()
+    client_state = client.get('State', '').strip()
+    client_zip = client.get('Zip', '').strip()
+    client_company = client.get('Company Name', '').strip()
+    
+    customer_data = {
+        "DisplayName": client_name,
+        "CustomerTypeRef": {
+            "value": gc_type_id
+        }
+    }
+    
+    # Split name into GivenName and FamilyName
+    name_parts = client_name.split()
+    if len(name_parts) >= 2:
+        customer_data["GivenName"] = name_parts[0]  # First name
+        customer_data["FamilyName"] = " ".join(name_parts[1:])  # Last name (handles middle names)
+    elif len(name_parts) == 1:
+        # If only one name, use it as FamilyName
+        customer_data["FamilyName"] = name_parts[0]
+    
+    if client_company:
+        customer_data["CompanyName"] = client_company
+    if client_email:
+        customer_data["PrimaryEmailAddr"] = {"Address": client_email}
+    if client_phone:
+        customer_data["PrimaryPhone"] = {"FreeFormNumber": client_phone}
+    
+    bill_addr = {}
+    if client_address:
+        bill_addr["Line1"] = client_address
+    if client_city:
+        bill_addr["City"] = client_city
+    if client_state:
+        bill_addr["CountrySubDivisionCode"] = client_state
+    if client_zip:
+        bill_addr["PostalCode"] = client_zip
+    if bill_addr:
+        customer_data["BillAddr"] = bill_addr
+    
+    return customer_data
+
+
 async def handle_create_quickbooks_customer_from_sheet(
     args: Dict[str, Any],
     google_service,
@@ -864,7 +894,7 @@ async def handle_create_quickbooks_customer_from_sheet(
         logger.info(f"[CREATE QB CUSTOMER] Client details - Email: {client_email}, Phone: {client_phone}, Company: {client_company}, Role: {client_role}")
         
         # Check if customer already exists in QB
-        qb_customers = await quickbooks_service.get_customers()
+        qb_customers = await quickbooks_service.get_customers(use_case="matching")
         for customer in qb_customers:
             qb_name = customer.get('DisplayName', '').strip().lower()
             if qb_name == client_name.lower():
@@ -878,56 +908,9 @@ async def handle_create_quickbooks_customer_from_sheet(
                     }
                 }
         
-        # Build customer data for QuickBooks
-        # Get GC Compliance CustomerType ID
+        # Build customer data for QuickBooks (typed GC Compliance)
         gc_type_id = await quickbooks_service._get_customer_type_id("GC Compliance")
-        
-        customer_data = {
-            "DisplayName": client_name,
-            "CustomerTypeRef": {
-                "value": gc_type_id
-            }
-        }
-        
-        # Split name into GivenName and FamilyName
-        name_parts = client_name.split()
-        if len(name_parts) >= 2:
-            customer_data["GivenName"] = name_parts[0]  # First name
-            customer_data["FamilyName"] = " ".join(name_parts[1:])  # Last name (handles middle names)
-        elif len(name_parts) == 1:
-            # If only one name, use it as FamilyName
-            customer_data["FamilyName"] = name_parts[0]
-        
-        # Add company name if available
-        if client_company:
-            customer_data["CompanyName"] = client_company
-        
-        # Add email if available
-        if client_email:
-            customer_data["PrimaryEmailAddr"] = {
-                "Address": client_email
-            }
-        
-        # Add phone if available
-        if client_phone:
-            customer_data["PrimaryPhone"] = {
-                "FreeFormNumber": client_phone
-            }
-        
-        # Add address if available
-        if client_address or client_city or client_state or client_zip:
-            bill_addr = {}
-            if client_address:
-                bill_addr["Line1"] = client_address
-            if client_city:
-                bill_addr["City"] = client_city
-            if client_state:
-                bill_addr["CountrySubDivisionCode"] = client_state
-            if client_zip:
-                bill_addr["PostalCode"] = client_zip
-            
-            if bill_addr:
-                customer_data["BillAddr"] = bill_addr
+        customer_data = _sheet_client_customer_data(target_client, gc_type_id)
         
         # Log the data we're sending (for debugging)
         logger.info(f"[CREATE QB CUSTOMER] Customer data to send: {json.dumps(customer_data, indent=2)}")
@@ -1335,18 +1318,27 @@ async def handle_update_quickbooks_customer(
     session_id: str
 ) -> Dict[str, Any]:
     """
-    Update an existing QuickBooks customer with new information.
+    Update one or more existing QuickBooks customers with new information.
     Supports sparse updates - only specified fields are updated.
     
+    The current records (for SyncToken and name fields) come from one
+    Id IN (...) query and the updates go out through /batch, so updating
+    N customers costs 1 + ceil(N / 30) API calls.
+    
     Args:
         customer_id: QuickBooks customer ID to update
+        customer_ids: Several QuickBooks customer IDs to apply the same updates to
         updates: Dictionary of fields to update (e.g., {"CompanyName": "New Company", "PrimaryPhone": {"FreeFormNumber": "555-1234"}})
     """
     try:
-        customer_id = args.get("customer_id")
+        customer_ids = [str(c) for c in (args.get("customer_ids") or [])]
+        if args.get("customer_id"):
+            customer_ids.insert(0, str(args["customer_id"]))
+        # One update per customer - a repeated Id would reuse its SyncToken and fail as a Stale Object Error
+        customer_ids = list(dict.fromkeys(customer_ids))
         updates = args.get("updates", {})
         
-        if not customer_id:
+        if not customer_ids:
             return {
                 "status": "failed",
                 "error": "customer_id is required"
@@ -1358,43 +1350,65 @@ async def handle_update_quickbooks_customer(
                 "error": "No updates provided. Specify fields to update."
             }
         
-        logger.info(f"[UPDATE QB CUSTOMER] Updating customer ID {customer_id} with: {updates}")
+        logger.info(f"[UPDATE QB CUSTOMER] Updating customer IDs {customer_ids} with: {updates}")
         
-        # Get current customer to retrieve SyncToken
-        qb_customers = await quickbooks_service.get_customers()
-        target_customer = None
+        # Get current customers to retrieve SyncTokens
+        qb_customers = await quickbooks_service.query_all(QBQuery("Customer", "matching").where_in("Id", customer_ids))
+        by_id = {str(customer.get('Id')): customer for customer in qb_customers}
         
-        for customer in qb_customers:
-            if str(customer.get('Id')) == str(customer_id):
-                target_customer = customer
-                break
-        
-        if not target_customer:
+        missing = [customer_id for customer_id in customer_ids if customer_id not in by_id]
+        found = [customer_id for customer_id in customer_ids if customer_id in by_id]
+        if not found:
             return {
                 "status": "failed",
-                "error": f"Customer ID {customer_id} not found in QuickBooks"
+                "error": f"Customer ID {', '.join(missing)} not found in QuickBooks"
             }
         
-        sync_token = target_customer.get('SyncToken')
-        customer_name = target_customer.get('DisplayName', 'Unknown')
-        
-        logger.info(f"[UPDATE QB CUSTOMER] Found customer: {customer_name} (SyncToken: {sync_token})")
+        # Pass existing customers to preserve required name fields
+        results = await quickbooks_service.update_customers([
+            {
+                "customer_id": customer_id,
+                "customer_data": updates,
+                "sync_token": by_id[customer_id].get('SyncToken'),
+                "existing_customer": by_id[customer_id]
+            }
+            for customer_id in found
+        ])
+        
+        updated = []
+        errors = [{"customer_id": customer_id, "error": "Not found in QuickBooks"} for customer_id in missing]
+        for customer_id, result in zip(found, results):
+            if result["ok"]:
+                updated.append({"customer_id": customer_id, "customer_name": result["entity"].get('DisplayName')})
+            else:
+                errors.append({
+                    "customer_id": customer_id,
+                    "customer_name": by_id[customer_id].get('DisplayName'),
+                    "error": result["error"]
+                })
+                logger.error(f"[UPDATE QB CUSTOMER] Failed to update customer ID {customer_id}: {result['error']}")
         
-        # Update customer via QuickBooks service (pass existing customer for name field preservation)
-        updated_customer = await quickbooks_service.update_customer(
-            customer_id=customer_id,
-            customer_data=updates,
-            sync_token=sync_token,
-            existing_customer=target_customer  # Pass existing data to preserve required fields
-        )
+        logger.info(f"[UPDATE QB CUSTOMER] Updated {len(updated)} customers, {len(errors)} failed")
         
-        logger.info(f"[UPDATE QB CUSTOMER] Successfully updated customer ID {customer_id}: {customer_name}")
+        if len(customer_ids) == 1:
+            if errors:
+                return {
+                    "status": "failed",
+                    "error": f"Failed to update customer: {errors[0]['error']}"
+                }
+            return {
+                "status": "success",
+                "message": f"Successfully updated QuickBooks customer: {by_id[found[0]].get('DisplayName', 'Unknown')}",
+                "customer_id": found[0],
+                "customer_name": updated[0]["customer_name"],
+                "updated_fields": list(updates.keys())
+            }
         
         return {
-            "status": "success",
-            "message": f"Successfully updated QuickBooks customer: {customer_name}",
-            "customer_id": customer_id,
-            "customer_name": updated_customer.get('DisplayName'),
+            "status": "success" if updated else "failed",
+            "message": f"Updated {len(updated)} of {len(customer_ids)} QuickBooks customers",
+            "updated": updated,
+            "errors": errors,
             "updated_fields": list(updates.keys())
         }
         
@@ -1439,7 +1453,7 @@ async def handle_map_clients_to_customers(
         logger.info(f"[CLIENT MAPPING] Found {len(clients_data)} clients in Google Sheets")
         
         # Get all QB customers
-        qb_customers = await quickbooks_service.get_customers()
+        qb_customers = await quickbooks_service.get_customers(use_case="matching")
         logger.info(f"[CLIENT MAPPING] Found {len(qb_customers)} customers in QuickBooks")
         
         # DEBUG: Log sample client data
@@ -1481,6 +1495,7 @@ async def handle_map_clients_to_customers(
         already_mapped = []
         unmapped_clients = []
         name_conflicts = []
+        unmapped_rows = []  # Sheet rows behind unmapped_clients (auto_create)
         updates_made = 0
         
         # Process each Sheet client
@@ -1567,6 +1582,36 @@ async def handle_map_clients_to_customers(
                     "client_email": client_email or 'N/A',
                     "reason": "No matching QB customer found by name or email"
                 })
+                unmapped_rows.append(client)
+        
+        # Create QB customers for unmapped clients in /batch requests of 30
+        created = []
+        if auto_create and unmapped_rows and not dry_run:
+            gc_type_id = await quickbooks_service._get_customer_type_id("GC Compliance")
+            results = await quickbooks_service.create_customers(
+                [_sheet_client_customer_data(client, gc_type_id) for client in unmapped_rows]
+            )
+            still_unmapped = []
+            for unmapped, client, result in zip(unmapped_clients, unmapped_rows, results):
+                if not result["ok"]:
+                    still_unmapped.append({**unmapped, "reason": f"QuickBooks create failed: {result['error']}"})
+                    logger.error(f"[CLIENT MAPPING] Failed to create {unmapped['client_name']}: {result['error']}")
+                    continue
+                qbo_id = str(result["entity"].get('Id'))
+                created.append({**unmapped, "qbo_id": qbo_id, "qbo_name": result["entity"].get('DisplayName')})
+                if unmapped["client_id"]:
+                    try:
+                        await google_service.update_record_by_id(
+                            sheet_name='Clients',
+                            id_field='Client ID',
+                            record_id=unmapped["client_id"],
+                            updates={'QBO Client ID': qbo_id}
+                        )
+                        updates_made += 1
+                    except Exception as e:
+                        logger.error(f"[CLIENT MAPPING] Failed to update {unmapped['client_name']}: {e}")
+            unmapped_clients = still_unmapped
+            logger.info(f"[CLIENT MAPPING] Created {len(created)} QB customers, {len(still_unmapped)} failed")
         
         # Find orphaned QB customers (not in Sheets)
         sheet_qbo_ids = set(str(c.get('QBO Client ID', '')).strip() for c in clients_data if c.get('QBO Client ID'))
@@ -1603,13 +1648,15 @@ async def handle_map_clients_to_customers(
                 "total_customers_in_qb": len(qb_customers),
                 "already_mapped": len(already_mapped),
                 "newly_matched": len(matched),
+                "created_in_qb": len(created),
                 "updates_made": updates_made,
                 "unmapped_clients": len(unmapped_clients),
                 "orphaned_qb_customers": len(orphaned_customers),
-                "mapping_complete": len(already_mapped) + len(matched) == len(clients_data)
+                "mapping_complete": len(already_mapped) + len(matched) + len(created) == len(clients_data)
             },
             "already_mapped": already_mapped[:20] if len(already_mapped) > 0 else [],  # Show first 20
             "newly_matched": matched[:20] if len(matched) > 0 else [],  # Show first 20
+            "created_in_qb": created[:20],  # Show first 20
             "unmapped_clients": unmapped_clients[:10] if len(unmapped_clients) > 0 else [],  # Show first 10
             "orphaned_customers": orphaned_customers[:10] if len(orphaned_customers) > 0 else []  # Show first 10
         }
@@ -1618,6 +1665,7 @@ async def handle_map_clients_to_customers(
         memory_manager.set(session_id, "last_client_mapping", {
             "already_mapped": len(already_mapped),
             "newly_matched": len(matched),
+            "created": len(created),
             "unmapped": len(unmapped_clients),
             "orphaned": len(orphaned_customers),
             "updates_made": updates_made
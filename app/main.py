@@ -31,6 +31,7 @@ from app.routes.oversight_actions import router as oversight_actions_router
 from app.routes.subcontractors import router as subcontractors_router
 from app.routes.intake import router as intake_router
 from app.middleware.auth_middleware import JWTAuthMiddleware as LegacyJWTAuthMiddleware
+from app.middleware.https_redirect_fix_middleware import HTTPSRedirectFixMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -54,48 +55,42 @@ async def startup_event():
     try:
         logger.info("Application starting up (database-only mode)...")
         
-        # Load QuickBooks tokens from database
+        # Load QuickBooks tokens once and keep them fresh in the background
         try:
-            from app.services.quickbooks_service import get_quickbooks_service
-            from app.db.session import get_db
-            from datetime import datetime, timedelta, timezone
+            from app.services.qb_token_manager import qb_token_manager
             
-            logger.info("Loading QuickBooks tokens from database...")
-            
-            # Get database session
-            db = None
-            try:
-                db_gen = get_db()
-                db = await anext(db_gen)
-                qb_service = get_quickbooks_service(db)
-                
-                # Load tokens from database
-                await qb_service.load_tokens_from_db()
-                
-                if qb_service.is_authenticated():
-                    # Check if token expires soon (within 10 minutes)
-                    # Use timezone-aware datetime for comparison
-                    if qb_service.token_expires_at and datetime.now(timezone.utc) >= qb_service.token_expires_at - timedelta(minutes=10):
-                        logger.info("QuickBooks token expiring soon, refreshing on startup...")
-                        await qb_service.refresh_access_token()
-                        logger.info("QuickBooks token refreshed successfully")
-                    else:
-                        logger.info(f"QuickBooks token valid until {qb_service.token_expires_at}")
-                else:
-                    logger.info("QuickBooks not authenticated - connect at /v1/quickbooks/auth")
-            finally:
-                if db:
-                    await db.close()
+            await qb_token_manager.start()
+            if qb_token_manager.has_token():
+                logger.info(f"QuickBooks token valid until {qb_token_manager.expires_at}")
+            else:
+                logger.info("QuickBooks not authenticated - connect at /v1/quickbooks/auth")
                     
         except Exception as qb_error:
             logger.warning(f"QuickBooks token load from database failed: {qb_error}")
             logger.info("QuickBooks will use database storage once OAuth flow is completed")
         
+        # Apply QuickBooks webhook events as targeted syncs within seconds
+        if settings.QB_WEBHOOK_WORKER_ENABLED:
+            try:
+                from app.services.qb_webhook_worker import qb_webhook_worker
+                await qb_webhook_worker.start()
+            except Exception as worker_error:
+                logger.error(f"Failed to start QuickBooks webhook worker: {worker_error}")
+        
+        # Write users.last_activity_at in batches instead of per request
+        from app.services.principal_cache import principal_cache
+        await principal_cache.start()
+        
+        # Prefetch Supabase signing keys so no request waits on the JWKS endpoint
+        from app.services.supabase_auth_service import supabase_auth_service
+        if supabase_auth_service.jwks and not supabase_auth_service.jwt_secret:
+            await supabase_auth_service.jwks.start()
+        
         # Initialize scheduled sync jobs
         try:
             from app.services.scheduler_service import scheduler_service
             await scheduler_service.start()
-            logger.info("QuickBooks sync scheduler started (3x daily: 8 AM, 1 PM, 6 PM EST)")
+            logger.info("QuickBooks sync scheduler started (adaptive interval, leader-elected)")
         except Exception as sched_error:
             logger.error(f"Failed to start scheduler: {sched_error}")
             
@@ -104,6 +99,27 @@ async def startup_event():
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background QuickBooks tasks and the sync scheduler, flush user activity, close pooled QuickBooks and JWKS HTTP clients and database engines"""
+    from app.services.principal_cache import principal_cache
+    from app.services.qb_client import close_qb_clients
+    from app.services.qb_token_manager import qb_token_manager
+    from app.services.qb_webhook_worker import qb_webhook_worker
+    from app.services.scheduler_service import scheduler_service
+    from app.services.supabase_auth_service import supabase_auth_service
+    from app.db.session import close_db
+    
+    if scheduler_service.is_running:
+        await scheduler_service.stop()  # Releases the scheduler leader lock
+    await qb_webhook_worker.stop()
+    await qb_token_manager.stop()
+    await principal_cache.stop()  # Final last_activity_at flush
+    if supabase_auth_service.jwks:
+        await supabase_auth_service.jwks.stop()
+    await close_qb_clients()
+    await close_db()
+
 # Add CORS middleware with permissive settings for Cloudflare Pages
 app.add_middleware(
     CORSMiddleware,
@@ -123,19 +139,13 @@ app.add_middleware(
 )
 
 # Add middleware to fix redirect scheme behind proxy
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.datastructures import URL
-
-class HTTPSRedirectFixMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        # If request came via HTTPS proxy (Fly.io), ensure redirects use HTTPS
-        if request.headers.get("x-forwarded-proto") == "https":
-            request.scope["scheme"] = "https"
-        response = await call_next(request)
-        return response
-
 app.add_middleware(HTTPSRedirectFixMiddleware)
 
+# Per-request SQL query counts, DB time, N+1 warnings (+ optional Server-Timing header)
+if settings.ENABLE_QUERY_STATS:
+    from app.middleware.query_stats_middleware import QueryStatsMiddleware
+    app.add_middleware(QueryStatsMiddleware)
+
 # Include routers
 app.include_router(auth_supabase_router, prefix=f"/{settings.API_VERSION}/auth/supabase", tags=["auth-supabase"])  # Supabase integration
 # app.include_router(auth_router, prefix=f"/{settings.API_VERSION}/auth/legacy", tags=["auth-legacy"])  # Legacy auth (disabled)
@@ -2,17 +2,18 @@
 JWT Authentication Middleware for House Renovators AI Portal
 Protects routes by verifying JWT tokens in Authorization header
 """
-from fastapi import Request, HTTPException, status
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.middleware.route_matcher import PublicRouteMatcher, bearer_token
 from app.services.auth_service import auth_service
 import logging
 
 logger = logging.getLogger(__name__)
 
-class JWTAuthMiddleware(BaseHTTPMiddleware):
-    """Middleware to verify JWT tokens on protected routes"""
-    
+class JWTAuthMiddleware:
+    """Pure ASGI middleware to verify JWT tokens on protected routes"""
+
     # Routes that don't require authentication
     PUBLIC_ROUTES = [
         "/",
@@ -28,48 +29,53 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
         "/privacy",
         "/terms",
     ]
-    
-    async def dispatch(self, request: Request, call_next):
+    is_public = PublicRouteMatcher(PUBLIC_ROUTES)
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Check JWT token for protected routes"""
-        
-        # Check if route is public
-        path = request.url.path
-        
-        # Allow public routes
-        if any(path.startswith(route) for route in self.PUBLIC_ROUTES):
-            return await call_next(request)
-        
+
+        # Allow lifespan/websocket traffic and public routes
+        if scope["type"] != "http" or self.is_public(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
         # Extract token from Authorization header
-        auth_header = request.headers.get("Authorization")
-        
-        if not auth_header:
-            return JSONResponse(
+        token = bearer_token(scope)
+
+        if token is None:
+            response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={"detail": "Authorization header missing"}
             )
-        
+            await response(scope, receive, send)
+            return
+
         # Check Bearer token format
-        parts = auth_header.split()
-        if len(parts) != 2 or parts[0].lower() != "bearer":
-            return JSONResponse(
+        if not token:
+            response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={"detail": "Invalid authorization header format. Use: Bearer <token>"}
             )
-        
-        token = parts[1]
-        
+            await response(scope, receive, send)
+            return
+
         # Verify token
         payload = auth_service.verify_token(token)
         if not payload:
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={"detail": "Invalid or expired token"}
             )
-        
+            await response(scope, receive, send)
+            return
+
         # Add user info to request state
-        request.state.user_email = payload.get("sub")
-        request.state.user_role = payload.get("role", "user")
-        
+        state = scope.setdefault("state", {})
+        state["user_email"] = payload.get("sub")
+        state["user_role"] = payload.get("role", "user")
+
         # Continue to route handler
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
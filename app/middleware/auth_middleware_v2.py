@@ -16,19 +16,20 @@ Public routes (no authentication required):
 - Public pages (privacy, terms)
 """
 
-from fastapi import Request, HTTPException, status
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.middleware.route_matcher import PublicRouteMatcher, bearer_token
 from app.services.auth_service_v2 import get_token_service, get_auth_service
-from app.db.session import get_db
+from app.db.session import AsyncSessionLocal
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class JWTAuthMiddleware(BaseHTTPMiddleware):
+class JWTAuthMiddleware:
     """
-    Middleware to verify JWT tokens on protected routes.
+    Pure ASGI middleware to verify JWT tokens on protected routes.
     
     Flow:
     1. Check if route is public (skip authentication)
@@ -60,20 +61,34 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
         "/terms",
         "/favicon.ico",
     ]
+    is_public = PublicRouteMatcher(PUBLIC_ROUTES)
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Check JWT token for protected routes"""
         
-        path = request.url.path
+        # Allow lifespan/websocket traffic and public routes
+        if scope["type"] != "http" or self.is_public(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        
+        response = await self.authenticate(scope)
+        if response is not None:
+            await response(scope, receive, send)
+            return
         
-        # Allow public routes
-        if any(path.startswith(route) for route in self.PUBLIC_ROUTES):
-            return await call_next(request)
+        # Continue to route handler
+        await self.app(scope, receive, send)
+    
+    async def authenticate(self, scope: Scope):
+        """Populate scope["state"] with the user, or return the error response."""
         
         # Extract token from Authorization header
-        auth_header = request.headers.get("Authorization")
+        token = bearer_token(scope)
         
-        if not auth_header:
+        if token is None:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={
@@ -83,8 +98,7 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
             )
         
         # Check Bearer token format
-        parts = auth_header.split()
-        if len(parts) != 2 or parts[0].lower() != "bearer":
+        if not token:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={
@@ -93,8 +107,6 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
                 }
             )
         
-        token = parts[1]
-        
         try:
             # Get token service
             token_service = get_token_service()
@@ -110,58 +122,51 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
                     }
                 )
             
-            # Get database session
-            async for db in get_db():
-                try:
-                    auth_service = get_auth_service(db)
-                    
-                    # Check if token is blacklisted
-                    jti = payload.get("jti")
-                    if jti and await auth_service.is_token_blacklisted(jti):
-                        return JSONResponse(
-                            status_code=status.HTTP_401_UNAUTHORIZED,
-                            content={
-                                "detail": "Token has been revoked",
-                                "error_code": "TOKEN_REVOKED"
-                            }
-                        )
-                    
-                    # Get user from database
-                    user_id = payload.get("sub")
-                    user = await auth_service.get_user_by_id(user_id)
-                    
-                    if not user:
-                        return JSONResponse(
-                            status_code=status.HTTP_401_UNAUTHORIZED,
-                            content={
-                                "detail": "User not found",
-                                "error_code": "USER_NOT_FOUND"
-                            }
-                        )
-                    
-                    # Check if user is active
-                    if not user.is_active:
-                        return JSONResponse(
-                            status_code=status.HTTP_401_UNAUTHORIZED,
-                            content={
-                                "detail": "User account is inactive",
-                                "error_code": "USER_INACTIVE"
-                            }
-                        )
-                    
-                    # Add user info to request state
-                    request.state.user_id = user.id
-                    request.state.user_email = user.email
-                    request.state.user_role = user.role
-                    request.state.user = user
-                    
-                    # Continue to route handler
-                    response = await call_next(request)
-                    return response
-                    
-                finally:
-                    # Database session cleanup handled by context manager
-                    pass
+            # Database session for the lookups only (closed before the route runs)
+            async with AsyncSessionLocal() as db:
+                auth_service = get_auth_service(db)
+                
+                # Check if token is blacklisted
+                jti = payload.get("jti")
+                if jti and await auth_service.is_token_blacklisted(jti):
+                    return JSONResponse(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        content={
+                            "detail": "Token has been revoked",
+                            "error_code": "TOKEN_REVOKED"
+                        }
+                    )
+                
+                # Get user from database
+                user_id = payload.get("sub")
+                user = await auth_service.get_user_by_id(user_id)
+                
+                if not user:
+                    return JSONResponse(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        content={
+                            "detail": "User not found",
+                            "error_code": "USER_NOT_FOUND"
+                        }
+                    )
+                
+                # Check if user is active
+                if not user.is_active:
+                    return JSONResponse(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        content={
+                            "detail": "User account is inactive",
+                            "error_code": "USER_INACTIVE"
+                        }
+                    )
+                
+                # Add user info to request state
+                state = scope.setdefault("state", {})
+                state["user_id"] = user.id
+                state["user_email"] = user.email
+                state["user_role"] = user.role
+                state["user"] = user
+                return None
             
         except Exception as e:
             logger.error(f"Authentication middleware error: {e}", exc_info=True)
@@ -0,0 +1,21 @@
+"""
+Proxy Scheme Middleware
+
+Fly.io terminates TLS and forwards plain HTTP with X-Forwarded-Proto: https.
+Rewriting the scope scheme makes URLs Starlette builds from the request
+(trailing-slash redirects, url_for) use https.
+"""
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class HTTPSRedirectFixMiddleware:
+    """Pure ASGI middleware to fix redirect scheme behind an HTTPS proxy"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # If request came via HTTPS proxy (Fly.io), ensure redirects use HTTPS
+        if scope["type"] == "http" and (b"x-forwarded-proto", b"https") in scope["headers"]:
+            scope["scheme"] = "https"
+        await self.app(scope, receive, send)
@@ -0,0 +1,44 @@
+"""
+SQL Instrumentation Middleware
+
+Opens a QueryStats tracker for every HTTP request so the engine event
+hooks (app/utils/query_stats.py) can count statements, DB time and
+repeated statement patterns. Logs N+1 offenders and optionally adds a
+Server-Timing header.
+"""
+import time
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.utils.query_stats import track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware to track per-request SQL query counts and DB time"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        # The tracker stays open until the body is sent so the session COMMIT is included
+        with track_queries(f"{scope['method']} {scope['path']}") as stats:
+            async def send_with_timing(message: Message):
+                if message["type"] == "http.response.start" and settings.ENABLE_SERVER_TIMING:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", stats.server_timing(time.perf_counter() - start))
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        stats.log_summary(settings.QUERY_STATS_N_PLUS_ONE_THRESHOLD)
@@ -0,0 +1,55 @@
+"""
+Public-route matching for the auth middlewares.
+
+The middlewares used to test every request path with
+`any(path.startswith(route) for route in PUBLIC_ROUTES)` - a Python-level
+loop per request, and because "/" is in every list, a prefix test that
+matched every path. PublicRouteMatcher compiles the list once into a
+single anchored regex:
+- "/" matches the root only
+- any other route matches itself and the paths below it
+  ("/docs" matches "/docs" and "/docs/oauth2-redirect", not "/docsearch")
+"""
+
+import re
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import Scope
+
+
+class PublicRouteMatcher:
+    """Precompiled `path is public` test for a fixed list of routes."""
+
+    def __init__(self, routes: Iterable[str]):
+        self.routes = tuple(routes)
+        prefixes = sorted({route.rstrip("/") for route in self.routes if route.rstrip("/")}, key=len, reverse=True)
+        root = "/" if any(route == "/" for route in self.routes) else None
+        alternatives = []
+        if prefixes:
+            alternatives.append(f"(?:{'|'.join(re.escape(prefix) for prefix in prefixes)})(?:/.*)?")
+        if root:
+            alternatives.append("/")
+        self._pattern = re.compile(f"(?:{'|'.join(alternatives)})" if alternatives else r"(?!)", re.DOTALL)
+
+    def __call__(self, path: str) -> bool:
+        return self._pattern.fullmatch(path) is not None
+
+    def __repr__(self) -> str:
+        return f"PublicRouteMatcher({list(self.routes)!r})"
+
+
+def bearer_token(scope: Scope) -> Optional[str]:
+    """
+    Token from the Authorization header of an ASGI scope.
+
+    Returns None when the header is missing and "" when it is not in
+    "Bearer <token>" form, so callers can answer each case differently.
+    """
+    auth_header = Headers(scope=scope).get("authorization")
+    if not auth_header:
+        return None
+    parts = auth_header.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        return ""
+    return parts[1]
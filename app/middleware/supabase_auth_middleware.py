@@ -4,11 +4,11 @@ JWT Authentication Middleware for Supabase Auth
 Protects routes by verifying Supabase JWT tokens in Authorization header.
 Maps Supabase auth users to app users automatically.
 """
-from fastapi import Request, HTTPException, status
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from app.middleware.route_matcher import PublicRouteMatcher, bearer_token
 from app.services.supabase_auth_service import supabase_auth_service
 from app.db.session import AsyncSessionLocal
 import logging
@@ -16,8 +16,8 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class SupabaseJWTMiddleware(BaseHTTPMiddleware):
-    """Middleware to verify Supabase JWT tokens on protected routes"""
+class SupabaseJWTMiddleware:
+    """Pure ASGI middleware to verify Supabase JWT tokens on protected routes"""
     
     # Routes that don't require authentication
     PUBLIC_ROUTES = [
@@ -32,38 +32,48 @@ class SupabaseJWTMiddleware(BaseHTTPMiddleware):
         "/privacy",
         "/terms",
     ]
+    is_public = PublicRouteMatcher(PUBLIC_ROUTES)
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Check JWT token for protected routes"""
         
-        # Check if route is public
-        path = request.url.path
+        # Allow lifespan/websocket traffic and public routes
+        if scope["type"] != "http" or self.is_public(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        
+        response = await self.authenticate(scope)
+        if response is not None:
+            await response(scope, receive, send)
+            return
         
-        # Allow public routes
-        if any(path.startswith(route) for route in self.PUBLIC_ROUTES):
-            return await call_next(request)
+        # Continue to route handler
+        await self.app(scope, receive, send)
+    
+    async def authenticate(self, scope: Scope):
+        """Populate scope["state"] with the app user, or return the error response."""
         
         # Extract token from Authorization header
-        auth_header = request.headers.get("Authorization")
+        token = bearer_token(scope)
         
-        if not auth_header:
+        if token is None:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={"detail": "Authorization header missing"}
             )
         
         # Check Bearer token format
-        parts = auth_header.split()
-        if len(parts) != 2 or parts[0].lower() != "bearer":
+        if not token:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={"detail": "Invalid authorization header format. Use: Bearer <token>"}
             )
         
-        token = parts[1]
-        
         # Verify JWT using Supabase
-        payload = supabase_auth_service.verify_jwt(token)
+        payload = await supabase_auth_service.verify_jwt(token)
         if not payload:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -84,11 +94,12 @@ class SupabaseJWTMiddleware(BaseHTTPMiddleware):
         # Get or create user in app database
         async with AsyncSessionLocal() as db:
             try:
-                user = await supabase_auth_service.get_or_create_user(
+                user = await supabase_auth_service.get_principal(
                     db=db,
                     supabase_user_id=supabase_user_id,
                     email=email,
-                    user_metadata=user_metadata
+                    user_metadata=user_metadata,
+                    token_expires_at=payload.get("exp")
                 )
                 
                 if not user or not user.is_active:
@@ -98,10 +109,12 @@ class SupabaseJWTMiddleware(BaseHTTPMiddleware):
                     )
                 
                 # Add user info to request state
-                request.state.user_id = user.id
-                request.state.user_email = user.email
-                request.state.user_role = user.role
-                request.state.supabase_user_id = supabase_user_id
+                state = scope.setdefault("state", {})
+                state["user_id"] = user.id
+                state["user_email"] = user.email
+                state["user_role"] = user.role
+                state["supabase_user_id"] = supabase_user_id
+                return None
                 
             except Exception as e:
                 logger.error(f"Error getting/creating user in middleware: {e}", exc_info=True)
@@ -109,7 +122,3 @@ class SupabaseJWTMiddleware(BaseHTTPMiddleware):
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     content={"detail": "Internal server error during authentication"}
                 )
-        
-        # Continue to route handler
-        response = await call_next(request)
-        return response
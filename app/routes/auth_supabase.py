@@ -69,13 +69,14 @@ async def get_current_user(
     Flow:
     1. Extract JWT from Authorization header
     2. Verify JWT using Supabase JWT secret or JWKS
-    3. Get or create user in app database
+    3. Get or create user in app database (cached per Supabase user id,
+       see app/services/principal_cache.py)
     4. Return User model
     """
     token = credentials.credentials
     
     # Verify JWT
-    payload = supabase_auth_service.verify_jwt(token)
+    payload = await supabase_auth_service.verify_jwt(token)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -94,12 +95,13 @@ async def get_current_user(
             detail="Invalid token payload"
         )
     
-    # Get or create app user
-    user = await supabase_auth_service.get_or_create_user(
+    # Get or create app user (in-memory principal cache after the first request)
+    user = await supabase_auth_service.get_principal(
         db=db,
         supabase_user_id=supabase_user_id,
         email=email,
-        user_metadata=user_metadata
+        user_metadata=user_metadata,
+        token_expires_at=payload.get("exp")
     )
     
     if not user:
@@ -228,10 +228,10 @@ async def process_chat_message(chat_data: Dict[str, Any], db: AsyncSession = Dep
                         # Route to appropriate service based on function name
                         if func_name in ['sync_quickbooks_customer_types', 'create_quickbooks_customer_from_sheet', 'map_clients_to_customers']:
                             # These functions need both services
-                            result = await handler(func_args, google_service, quickbooks_service, memory_manager, session_id)
+                            result = await handler(func_args, google_service, qb_service, memory_manager, session_id)
                         elif 'quickbooks' in func_name:
                             # Pass google_service to all QB functions for consistency (even if unused)
-                            result = await handler(func_args, google_service, quickbooks_service, memory_manager, session_id)
+                            result = await handler(func_args, google_service, qb_service, memory_manager, session_id)
                         else:
                             result = await handler(func_args, google_service, memory_manager, session_id)
                         
@@ -367,6 +367,7 @@ async def process_chat_message(chat_data: Dict[str, Any], db: AsyncSession = Dep
             f"Context: {timing_summary.get('context_build', 0):.2f}s | "
             f"OpenAI: {timing_summary.get('openai_call', 0):.2f}s | "
             f"Functions: {timing_summary.get('function_execution', 0):.2f}s | "
+            f"DB: {timing_summary.get('db_queries', 0)} queries/{timing_summary.get('db_time', 0):.2f}s | "
             f"Action: {action_taken or 'none'}"
         )
         
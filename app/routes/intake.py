@@ -19,7 +19,7 @@ import logging
 
 from app.db.session import get_db
 from app.db.models import Client, Project, ClientStatus, ProjectStatus
-from app.services.supabase_auth_service import SupabaseAuthService
+from app.services.supabase_auth_service import supabase_auth_service
 
 logger = logging.getLogger(__name__)
 
@@ -47,8 +47,7 @@ async def intake_client(
     # Optional identity capture via Supabase Auth
     if authorization and authorization.lower().startswith("bearer "):
         token = authorization.split(" ", 1)[1]
-        auth = SupabaseAuthService()
-        payload = auth.verify_jwt(token)
+        payload = await supabase_auth_service.verify_jwt(token)
         if payload:
             extra.update({
                 "submitted_by_email": payload.get("email"),
@@ -114,8 +113,7 @@ async def intake_project(
     extra = {}
     if authorization and authorization.lower().startswith("bearer "):
         token = authorization.split(" ", 1)[1]
-        auth = SupabaseAuthService()
-        payload = auth.verify_jwt(token)
+        payload = await supabase_auth_service.verify_jwt(token)
         if payload:
             extra.update({
                 "submitted_by_email": payload.get("email"),
@@ -5,12 +5,15 @@ Handles OAuth2 flow and QuickBooks operations.
 Uses database-backed token storage (PostgreSQL) instead of Google Sheets.
 """
 import logging
+from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
 from fastapi import APIRouter, HTTPException, Query, Depends
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
+from app.services.qb_reference_cache import REFERENCE_ENTITIES, qb_reference_cache
+from app.services.qb_token_manager import qb_token_manager
 from app.services.quickbooks_service import get_quickbooks_service, quickbooks_service
 
 logger = logging.getLogger(__name__)
@@ -85,6 +88,8 @@ async def oauth_callback(
     try:
         logger.info(f"Received OAuth callback for realm: {realmId}")
         
+        # GET that writes: the token lookup before the upsert must see the primary
+        db.info["use_replica"] = False
         qb_service = get_quickbooks_service(db)
         success = await qb_service.handle_callback(code, realmId, state)
         
@@ -104,22 +109,27 @@ async def oauth_callback(
 
 
 @router.post("/disconnect")
-async def disconnect():
+async def disconnect(db: AsyncSession = Depends(get_db)):
     """
     Disconnect from QuickBooks (clear tokens).
     
-    Note: This only clears local tokens. User must revoke app access
-    in QuickBooks settings for full disconnection.
+    Marks the stored tokens inactive, so every app instance drops them on
+    its next token reload (QB_TOKEN_RELOAD_SECONDS).
+    
+    Note: This only clears tokens held by this app. User must revoke app
+    access in QuickBooks settings for full disconnection.
     
     Returns:
         Success status
     """
     try:
+        await get_quickbooks_service(db).revoke_tokens()
         qb_service = get_legacy_qb_service()
         qb_service.access_token = None
         qb_service.refresh_token = None
         qb_service.realm_id = None
         qb_service.token_expires_at = None
+        qb_token_manager.clear()
         
         logger.info("Disconnected from QuickBooks")
         return {"success": True, "message": "Disconnected from QuickBooks"}
@@ -167,19 +177,20 @@ async def manual_refresh():
     """
     try:
         qb_service = get_legacy_qb_service()
-        if not qb_service.refresh_token:
+        if not qb_service.refresh_token and not await qb_token_manager.load():
             raise HTTPException(
                 status_code=400, 
                 detail="No refresh token available. Please authenticate first at /v1/quickbooks/auth"
             )
         
-        # Attempt to refresh
-        result = await qb_service.refresh_access_token()
+        # Attempt to refresh (shares any refresh already in flight)
+        if not await qb_service.refresh_access_token(force=True):
+            raise Exception("QuickBooks rejected the refresh token")
         
         return {
             "success": True,
             "message": "Token refreshed successfully",
-            "token_expires_in": result.get("expires_in"),
+            "token_expires_in": int((qb_service.token_expires_at - datetime.now(timezone.utc)).total_seconds()) if qb_service.token_expires_at else None,
             "token_expires_at": qb_service.token_expires_at.isoformat() if qb_service.token_expires_at else None
         }
         
@@ -549,9 +560,9 @@ async def create_estimate(estimate_data: Dict[str, Any]):
 # ==================== VENDOR & BILL OPERATIONS ====================
 
 @router.get("/vendors")
-async def get_vendors(active_only: bool = Query(default=True)):
+async def get_vendors(active_only: bool = Query(default=True), db: AsyncSession = Depends(get_db)):
     """
-    Get all vendors from QuickBooks.
+    Get all vendors (reference-data cache - no QuickBooks call while fresh).
     
     Query Parameters:
         active_only: Only return active vendors (default: true)
@@ -560,11 +571,7 @@ async def get_vendors(active_only: bool = Query(default=True)):
         List of vendor records
     """
     try:
-        qb_service = get_legacy_qb_service()
-        if not qb_service.is_authenticated():
-            raise HTTPException(status_code=401, detail="Not authenticated with QuickBooks")
-        
-        vendors = await qb_service.get_vendors(active_only=active_only)
+        vendors = await qb_reference_cache.get(db, "vendors", active_only=active_only)
         
         return {
             "success": True,
@@ -572,8 +579,6 @@ async def get_vendors(active_only: bool = Query(default=True)):
             "vendors": vendors
         }
         
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Failed to get vendors: {e}")
         raise HTTPException(status_code=500, detail=f"Vendor retrieval failed: {str(e)}")
@@ -632,9 +637,9 @@ async def create_bill(bill_data: Dict[str, Any]):
 # ==================== ITEMS/SERVICES ====================
 
 @router.get("/items")
-async def get_items(item_type: Optional[str] = Query(default=None)):
+async def get_items(item_type: Optional[str] = Query(default=None), db: AsyncSession = Depends(get_db)):
     """
-    Get items/services from QuickBooks.
+    Get items/services (reference-data cache - no QuickBooks call while fresh).
     
     Query Parameters:
         item_type: Filter by type (Service, Inventory, NonInventory, etc.)
@@ -647,11 +652,9 @@ async def get_items(item_type: Optional[str] = Query(default=None)):
         GET /v1/quickbooks/items?item_type=Service
     """
     try:
-        qb_service = get_legacy_qb_service()
-        if not qb_service.is_authenticated():
-            raise HTTPException(status_code=401, detail="Not authenticated with QuickBooks")
-        
-        items = await qb_service.get_items(item_type=item_type)
+        items = await qb_reference_cache.get(db, "items", active_only=True)
+        if item_type:
+            items = [item for item in items if item.get("Type") == item_type]
         
         return {
             "success": True,
@@ -659,19 +662,49 @@ async def get_items(item_type: Optional[str] = Query(default=None)):
             "items": items
         }
         
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Failed to get items: {e}")
         raise HTTPException(status_code=500, detail=f"Item retrieval failed: {str(e)}")
 
 
+@router.get("/terms")
+async def get_terms(db: AsyncSession = Depends(get_db)):
+    """
+    Get payment terms (reference-data cache).
+    
+    Example:
+        GET /v1/quickbooks/terms
+    """
+    try:
+        terms = await qb_reference_cache.get(db, "terms", active_only=True)
+        return {"success": True, "count": len(terms), "terms": terms}
+    except Exception as e:
+        logger.error(f"Failed to get terms: {e}")
+        raise HTTPException(status_code=500, detail=f"Term retrieval failed: {str(e)}")
+
+
+@router.get("/tax-codes")
+async def get_tax_codes(db: AsyncSession = Depends(get_db)):
+    """
+    Get tax codes (reference-data cache).
+    
+    Example:
+        GET /v1/quickbooks/tax-codes
+    """
+    try:
+        tax_codes = await qb_reference_cache.get(db, "tax_codes", active_only=True)
+        return {"success": True, "count": len(tax_codes), "tax_codes": tax_codes}
+    except Exception as e:
+        logger.error(f"Failed to get tax codes: {e}")
+        raise HTTPException(status_code=500, detail=f"Tax code retrieval failed: {str(e)}")
+
+
 # ==================== CUSTOMER TYPE OPERATIONS ====================
 
 @router.get("/customer-types")
-async def get_customer_types():
+async def get_customer_types(db: AsyncSession = Depends(get_db)):
     """
-    Get all CustomerType entities from QuickBooks.
+    Get all CustomerType entities (reference-data cache).
     
     Returns:
         List of CustomerType records with ID and Name
@@ -680,13 +713,7 @@ async def get_customer_types():
         GET /v1/quickbooks/customer-types
     """
     try:
-        qb_service = get_legacy_qb_service()
-        if not qb_service.is_authenticated():
-            raise HTTPException(status_code=401, detail="Not authenticated with QuickBooks")
-        
-        query = "SELECT * FROM CustomerType"
-        response = await qb_service._make_request("GET", "query", params={"query": query})
-        types = response.get("QueryResponse", {}).get("CustomerType", [])
+        types = await qb_reference_cache.get(db, "customer_types", active_only=True)
         
         return {
             "success": True,
@@ -694,13 +721,33 @@ async def get_customer_types():
             "customer_types": types
         }
         
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Failed to get customer types: {e}")
         raise HTTPException(status_code=500, detail=f"Customer type retrieval failed: {str(e)}")
 
 
+@router.post("/reference/refresh")
+async def refresh_reference_data(
+    entity_type: Optional[str] = Query(default=None, description="items, terms, customer_types, vendors or tax_codes (default: all)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Reload reference data from QuickBooks now (one query per type).
+    
+    Example:
+        POST /v1/quickbooks/reference/refresh?entity_type=items
+    """
+    entity_types = [entity_type] if entity_type else list(REFERENCE_ENTITIES)
+    if any(t not in REFERENCE_ENTITIES for t in entity_types):
+        raise HTTPException(status_code=400, detail=f"entity_type must be one of {', '.join(REFERENCE_ENTITIES)}")
+    try:
+        counts = {t: await qb_reference_cache.refresh(db, t) for t in entity_types}
+        return {"success": True, "refreshed": counts}
+    except Exception as e:
+        logger.error(f"Failed to refresh reference data: {e}")
+        raise HTTPException(status_code=500, detail=f"Reference data refresh failed: {str(e)}")
+
+
 # ==================== SYNC OPERATIONS ====================
 
 @router.post("/sync-types")
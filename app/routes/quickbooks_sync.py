@@ -15,8 +15,12 @@ from app.db.models import User
 from app.db.session import get_db
 from app.routes.auth_supabase import get_current_user
 from app.services.quickbooks_sync_service import qb_sync_service
+from app.services.qb_read_cache import qb_read_cache
+from app.services.qb_sync_journal import qb_sync_journal
 from app.utils.circuit_breaker import qb_circuit_breaker
+from app.utils.qb_rate_governor import background_priority, qb_rate_governor
 from app.services.scheduler_service import scheduler_service
+from app.services.qb_webhook_worker import qb_webhook_worker
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +43,8 @@ async def sync_customers(
         logger.info(f"[API] Manual customer sync triggered by {current_user.email} (force_full={force_full})")
         
         since = None if force_full else await qb_sync_service._get_last_sync(db, 'customers')
-        result = await qb_sync_service.sync_customers(db, since=since)
+        with background_priority():
+            result = await qb_sync_service.sync_customers(db, since=since)
         
         return {
             "success": True,
@@ -66,7 +71,8 @@ async def sync_invoices(
         logger.info(f"[API] Manual invoice sync triggered by {current_user.email} (force_full={force_full})")
         
         since = None if force_full else await qb_sync_service._get_last_sync(db, 'invoices')
-        result = await qb_sync_service.sync_invoices(db, since=since)
+        with background_priority():
+            result = await qb_sync_service.sync_invoices(db, since=since)
         
         return {
             "success": True,
@@ -93,7 +99,8 @@ async def sync_payments(
         logger.info(f"[API] Manual payment sync triggered by {current_user.email} (force_full={force_full})")
         
         since = None if force_full else await qb_sync_service._get_last_sync(db, 'payments')
-        result = await qb_sync_service.sync_payments(db, since=since)
+        with background_priority():
+            result = await qb_sync_service.sync_payments(db, since=since)
         
         return {
             "success": True,
@@ -110,18 +117,22 @@ async def sync_payments(
 @router.post("/all")
 async def sync_all(
     force_full: bool = Query(False, description="Force full sync for all entities"),
+    mode: Optional[str] = Query(None, pattern="^(query|cdc)$", description="Sync mode (default: QB_SYNC_MODE)"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Manually trigger sync for all entity types (customers, invoices, payments).
     
-    Syncs are performed in order: customers → invoices → payments
+    Syncs are performed in order: customers → invoices → payments.
+    mode=cdc fetches all changes in one ChangeDataCapture call (falls back to
+    query mode when the last sync is older than 30 days).
     """
     try:
-        logger.info(f"[API] Manual full sync triggered by {current_user.email} (force_full={force_full})")
+        logger.info(f"[API] Manual full sync triggered by {current_user.email} (force_full={force_full}, mode={mode})")
         
-        result = await qb_sync_service.sync_all(db, force_full_sync=force_full)
+        with background_priority():
+            result = await qb_sync_service.sync_all(db, force_full_sync=force_full, mode=mode)
         
         return {
             "success": True,
@@ -134,6 +145,35 @@ async def sync_all(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/context")
+async def refresh_context(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Reload the chat-context cache from QuickBooks.
+    
+    Every customer and invoice (not just GC Compliance ones), "context"
+    fields only. Run once after deploying the quickbooks_context_* tables and
+    whenever they need a full reload - syncs, CDC and webhooks keep them
+    current in between. The chat never calls QuickBooks itself.
+    """
+    try:
+        logger.info(f"[API] Chat context refresh triggered by {current_user.email}")
+        
+        with background_priority():
+            result = await qb_sync_service.refresh_context(db)
+        
+        return {
+            "success": True,
+            **result
+        }
+        
+    except Exception as e:
+        logger.error(f"Context refresh failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/invoices/promote")
 async def promote_invoices(
     qb_invoice_ids: Optional[List[str]] = Query(None, description="Specific QB invoice IDs to promote (if empty, promotes all cached)"),
@@ -202,13 +242,18 @@ async def promote_payments(
 
 @router.get("/status")
 async def get_sync_status(
+    runs: int = Query(20, ge=0, le=200, description="Number of recent sync runs to include"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get sync status for all entity types.
     
-    Returns last sync time, record counts, errors, and next scheduled sync.
+    Returns last sync time, record counts, errors, and next scheduled sync,
+    plus the most recent sync runs from the journal (page checkpoints,
+    counts, errors, resume count). A "failed" run resumes from its
+    checkpoint on the next sync of the same query. read_cache shows the
+    in-memory snapshots the /cache/* reads and chat context are served from.
     """
     try:
         result = await db.execute(
@@ -264,6 +309,8 @@ async def get_sync_status(
         
         return {
             "sync_status": status,
+            "runs": await qb_sync_journal.history(db, runs) if runs else [],
+            "read_cache": qb_read_cache.get_status(),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -283,30 +330,14 @@ async def get_cached_customers(
     """
     Get customers from local cache.
     
-    Fast response (<200ms) - no QuickBooks API calls.
+    Served from the in-memory snapshot (qb_read_cache) - no QuickBooks API calls.
     """
     try:
-        # Build query
-        query = """
-            SELECT 
-                qb_customer_id, display_name, company_name, given_name, family_name,
-                email, phone, qb_last_modified, is_active, cached_at
-            FROM quickbooks_customers_cache
-        """
-        
-        if active_only:
-            query += " WHERE is_active = true"
-        
-        query += " ORDER BY display_name LIMIT :limit OFFSET :offset"
-        
-        # Execute
-        result = await db.execute(
-            text(query),
-            {"limit": limit, "offset": offset}
-        )
+        snapshot = await qb_read_cache.snapshot(db, "customers")
+        rows = snapshot.active() if active_only else snapshot.rows
         
         customers = []
-        for row in result.fetchall():
+        for row in rows[offset:offset + limit]:
             customers.append({
                 "qb_customer_id": row.qb_customer_id,
                 "display_name": row.display_name,
@@ -320,16 +351,9 @@ async def get_cached_customers(
                 "cached_at": row.cached_at.isoformat() if row.cached_at else None
             })
         
-        # Get total count
-        count_result = await db.execute(
-            text("SELECT COUNT(*) as total FROM quickbooks_customers_cache" + 
-                 (" WHERE is_active = true" if active_only else ""))
-        )
-        total = count_result.fetchone().total
-        
         return {
             "customers": customers,
-            "total": total,
+            "total": len(rows),
             "limit": limit,
             "offset": offset,
             "source": "cache"
@@ -349,19 +373,10 @@ async def get_cached_invoice_by_id(
     """
     Get a specific invoice from local cache by QB invoice ID.
     
-    Fast response - no QuickBooks API calls.
+    Served from the in-memory snapshot (qb_read_cache) - no QuickBooks API calls.
     """
     try:
-        query = """
-            SELECT 
-                qb_invoice_id, customer_id, doc_number, total_amount, balance,
-                due_date, qb_last_modified, cached_at, qb_data
-            FROM quickbooks_invoices_cache
-            WHERE qb_invoice_id = :invoice_id
-        """
-        
-        result = await db.execute(text(query), {"invoice_id": invoice_id})
-        row = result.fetchone()
+        row = await qb_read_cache.get_by_id(db, "invoices", invoice_id)
         
         if not row:
             raise HTTPException(status_code=404, detail=f"Invoice {invoice_id} not found in cache")
@@ -438,30 +453,15 @@ async def get_cached_invoices(
     """
     Get invoices from local cache.
     
-    Fast response - no QuickBooks API calls.
+    Served from the in-memory snapshot (qb_read_cache) - no QuickBooks API calls.
     """
     try:
-        # Build query - include qb_data to extract customer names
-        query = """
-            SELECT 
-                qb_invoice_id, customer_id, doc_number, total_amount, balance,
-                due_date, qb_last_modified, cached_at, qb_data
-            FROM quickbooks_invoices_cache
-        """
-        
-        params = {"limit": limit, "offset": offset}
-        
+        rows = (await qb_read_cache.snapshot(db, "invoices")).rows
         if customer_id:
-            query += " WHERE customer_id = :customer_id"
-            params["customer_id"] = customer_id
-        
-        query += " ORDER BY due_date DESC LIMIT :limit OFFSET :offset"
-        
-        # Execute
-        result = await db.execute(text(query), params)
+            rows = [row for row in rows if row.customer_id == customer_id]
         
         invoices = []
-        for row in result.fetchall():
+        for row in rows[offset:offset + limit]:
             qb_data = row.qb_data or {}
             customer_name = qb_data.get("CustomerRef", {}).get("name", "Unknown")
             
@@ -480,17 +480,9 @@ async def get_cached_invoices(
                 "cached_at": row.cached_at.isoformat() if row.cached_at else None
             })
         
-        # Get total count
-        count_query = "SELECT COUNT(*) as total FROM quickbooks_invoices_cache"
-        if customer_id:
-            count_query += " WHERE customer_id = :customer_id"
-        
-        count_result = await db.execute(text(count_query), {"customer_id": customer_id} if customer_id else {})
-        total = count_result.fetchone().total
-        
         return {
             "invoices": invoices,
-            "total": total,
+            "total": len(rows),
             "limit": limit,
             "offset": offset,
             "customer_id": customer_id,
@@ -514,38 +506,17 @@ async def get_cached_payments(
     """
     Get payments from local cache.
     
-    Fast response - no QuickBooks API calls.
+    Served from the in-memory snapshot (qb_read_cache) - no QuickBooks API calls.
     """
     try:
-        # Build query
-        query = """
-            SELECT 
-                qb_payment_id, customer_id, invoice_id, amount, payment_date,
-                payment_method, reference_number, qb_last_modified, cached_at
-            FROM quickbooks_payments_cache
-        """
-        
-        params = {"limit": limit, "offset": offset}
-        where_clauses = []
-        
+        rows = (await qb_read_cache.snapshot(db, "payments")).rows
         if customer_id:
-            where_clauses.append("customer_id = :customer_id")
-            params["customer_id"] = customer_id
-        
+            rows = [row for row in rows if row.customer_id == customer_id]
         if invoice_id:
-            where_clauses.append("invoice_id = :invoice_id")
-            params["invoice_id"] = invoice_id
-        
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
-        
-        query += " ORDER BY payment_date DESC LIMIT :limit OFFSET :offset"
-        
-        # Execute
-        result = await db.execute(text(query), params)
+            rows = [row for row in rows if row.invoice_id == invoice_id]
         
         payments = []
-        for row in result.fetchall():
+        for row in rows[offset:offset + limit]:
             payments.append({
                 "qb_payment_id": row.qb_payment_id,
                 "customer_id": row.customer_id,
@@ -558,18 +529,9 @@ async def get_cached_payments(
                 "cached_at": row.cached_at.isoformat() if row.cached_at else None
             })
         
-        # Get total count
-        count_query = "SELECT COUNT(*) as total FROM quickbooks_payments_cache"
-        if where_clauses:
-            count_query += " WHERE " + " AND ".join(where_clauses)
-        
-        count_result = await db.execute(text(count_query), 
-            {k: v for k, v in params.items() if k not in ['limit', 'offset']})
-        total = count_result.fetchone().total
-        
         return {
             "payments": payments,
-            "total": total,
+            "total": len(rows),
             "limit": limit,
             "offset": offset,
             "customer_id": customer_id,
@@ -587,19 +549,21 @@ async def get_circuit_breaker_status(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get current circuit breaker status.
+    Get current circuit breaker and rate governor status.
     
-    Shows circuit state, failure count, and time until retry.
+    Shows circuit state, failure count, time until retry, HALF_OPEN probe
+    counts and per-realm throttle waits (interactive vs background).
     Useful for monitoring and debugging sync issues.
     """
     try:
         status = qb_circuit_breaker.get_status()
         return {
             "circuit_breaker": status,
+            "rate_governor": qb_rate_governor.get_status(),
             "explanation": {
                 "closed": "Normal operation - requests pass through",
                 "open": "Failing fast - no API calls attempted (cooling down)",
-                "half_open": "Testing recovery - limited requests allowed"
+                "half_open": "Testing recovery - one probe request at a time"
             }
         }
     except Exception as e:
@@ -635,6 +599,22 @@ async def reset_circuit_breaker(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/webhook-worker")
+async def get_webhook_worker_status(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get webhook worker status.
+    
+    Shows whether the worker is running, events/entities applied and the last error.
+    """
+    try:
+        return qb_webhook_worker.get_status()
+    except Exception as e:
+        logger.error(f"Failed to get webhook worker status: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/scheduler")
 async def get_scheduler_status(
     current_user: User = Depends(get_current_user)
@@ -642,7 +622,10 @@ async def get_scheduler_status(
     """
     Get current scheduler status.
     
-    Shows whether scheduler is running, next sync time, and schedule.
+    Shows whether scheduler is running, whether this instance is the
+    scheduler leader, the next sync check and why it was picked (interval,
+    jitter, activity signals), and the outcome of the last check
+    (synced / skipped / standby / failed).
     """
     try:
         status = scheduler_service.get_status()
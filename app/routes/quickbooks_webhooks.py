@@ -4,32 +4,46 @@ QuickBooks Webhook Routes
 Handles incoming webhook events from QuickBooks Online for real-time data sync.
 """
 
+import base64
 import hashlib
 import hmac
 import json
 import logging
-from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from fastapi import APIRouter, Request, HTTPException, Depends, Header
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
 from app.config import settings
 from app.services.db_service import db_service
+from app.services.qb_webhook_worker import qb_webhook_worker
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/v1/quickbooks", tags=["QuickBooks Webhooks"])
 
 
-def verify_webhook_signature(payload: str, signature: str, webhook_token: str) -> bool:
+# One multi-row insert per notification batch: the events travel as a single
+# JSON parameter, duplicates (Intuit retries) are dropped by the unique event_id
+INSERT_EVENTS_SQL = text("""
+    INSERT INTO webhook_events (event_id, realm_id, event_type, entity_type, entity_ids, payload)
+    SELECT e.event_id, e.realm_id, e.event_type, e.entity_type, e.entity_ids, e.payload
+    FROM json_to_recordset(CAST(:events AS json))
+        AS e(event_id text, realm_id text, event_type text, entity_type text, entity_ids json, payload json)
+    ON CONFLICT (event_id) DO NOTHING
+    RETURNING id
+""")
+
+
+def verify_webhook_signature(payload: bytes, signature: str, webhook_token: str) -> bool:
     """
     Verify QuickBooks webhook signature using HMAC-SHA256.
     
     Args:
-        payload: Raw request body as string
-        signature: Signature from Intuit-Signature header
+        payload: Raw request body
+        signature: Signature from intuit-signature header (base64 HMAC-SHA256)
         webhook_token: Webhook verifier token from QuickBooks app settings
         
     Returns:
@@ -39,17 +53,64 @@ def verify_webhook_signature(payload: str, signature: str, webhook_token: str) -
         logger.error("QUICKBOOKS_WEBHOOK_TOKEN not configured")
         return False
     
-    # Compute HMAC-SHA256
-    expected_signature = hmac.new(
-        webhook_token.encode('utf-8'),
-        payload.encode('utf-8'),
-        hashlib.sha256
-    ).digest().hex()
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    
+    # Intuit signs the raw body with the verifier token and base64-encodes the digest
+    expected_signature = base64.b64encode(
+        hmac.new(webhook_token.encode('utf-8'), payload, hashlib.sha256).digest()
+    ).decode('ascii')
     
     # Compare signatures (constant-time comparison to prevent timing attacks)
     return hmac.compare_digest(expected_signature, signature)
 
 
+def webhook_event_key(realm_id: str, entity: Dict[str, Any]) -> str:
+    """
+    Deterministic event key: the same change redelivered by Intuit maps to the same key.
+    
+    Built from realm, entity name, entity id, operation and lastUpdated, hashed
+    to fit webhook_events.event_id.
+    """
+    parts = [
+        realm_id,
+        entity.get("name"),
+        entity.get("id"),
+        entity.get("operation"),
+        entity.get("lastUpdated") or entity.get("deletedId"),
+    ]
+    return hashlib.sha256("|".join(str(part or "") for part in parts).encode("utf-8")).hexdigest()
+
+
+def build_event_rows(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Flatten a webhook payload into webhook_events rows (one per changed entity).
+    
+    QuickBooks webhook structure:
+    {"eventNotifications": [{"realmId": "123", "dataChangeEvent": {"entities": [
+        {"name": "Customer", "id": "123", "operation": "Update", "lastUpdated": "2025-12-14T10:30:00-08:00"}
+    ]}}]}
+    """
+    rows = {}
+    for notification in payload.get("eventNotifications", []):
+        realm_id = notification.get("realmId")
+        for entity in (notification.get("dataChangeEvent") or {}).get("entities", []):
+            entity_name = entity.get("name")  # Customer, Invoice, Payment
+            if not (realm_id and entity_name and entity.get("id")):
+                logger.warning(f"[WEBHOOK] Ignoring malformed entity in realm {realm_id}: {entity}")
+                continue
+            event_id = webhook_event_key(realm_id, entity)
+            rows[event_id] = {
+                "event_id": event_id,
+                "realm_id": realm_id,
+                "event_type": f"{entity_name}.{entity.get('operation')}",
+                "entity_type": entity_name.lower(),
+                "entity_ids": [entity.get("id")],
+                "payload": entity,
+            }
+    return list(rows.values())
+
+
 @router.post("/webhook")
 async def receive_webhook(
     request: Request,
@@ -57,10 +118,12 @@ async def receive_webhook(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Receive and process QuickBooks webhook events.
+    Receive QuickBooks webhook events.
     
     QuickBooks sends webhook events when entities are created, updated, or deleted.
-    This endpoint verifies the signature, stores the event, and triggers sync.
+    This endpoint only verifies the signature and stores the events (one
+    statement, deduplicated by a deterministic event key), then acknowledges
+    immediately; the webhook worker applies them as targeted syncs.
     
     Event types:
     - Customer.Create, Customer.Update, Customer.Delete
@@ -70,120 +133,52 @@ async def receive_webhook(
     Webhook documentation:
     https://developer.intuit.com/app/developer/qbo/docs/develop/webhooks
     """
+    body_bytes = await request.body()
+    
+    # Verify webhook signature
+    webhook_token = settings.QUICKBOOKS_WEBHOOK_TOKEN
+    if not webhook_token:
+        logger.warning("QuickBooks webhook received but QUICKBOOKS_WEBHOOK_TOKEN not configured - accepting anyway for testing")
+    elif not intuit_signature:
+        logger.error("Webhook received without Intuit-Signature header")
+        raise HTTPException(status_code=401, detail="Missing webhook signature")
+    elif not verify_webhook_signature(body_bytes, intuit_signature, webhook_token):
+        logger.error("Invalid webhook signature")
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    
     try:
-        # Get raw request body for signature verification
-        body_bytes = await request.body()
-        body_str = body_bytes.decode('utf-8')
-        
-        # Verify webhook signature
-        webhook_token = settings.QUICKBOOKS_WEBHOOK_TOKEN
-        if not webhook_token:
-            logger.warning("QuickBooks webhook received but QUICKBOOKS_WEBHOOK_TOKEN not configured - accepting anyway for testing")
-        elif not intuit_signature:
-            logger.error("Webhook received without Intuit-Signature header")
-            raise HTTPException(status_code=401, detail="Missing webhook signature")
-        elif not verify_webhook_signature(body_str, intuit_signature, webhook_token):
-            logger.error("Invalid webhook signature")
-            raise HTTPException(status_code=401, detail="Invalid webhook signature")
-        
-        # Parse webhook payload
-        try:
-            payload = json.loads(body_str)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse webhook payload: {e}")
-            raise HTTPException(status_code=400, detail="Invalid JSON payload")
-        
-        # QuickBooks webhook structure:
-        # {
-        #   "eventNotifications": [
-        #     {
-        #       "realmId": "123456789",
-        #       "dataChangeEvent": {
-        #         "entities": [
-        #           {
-        #             "name": "Customer",
-        #             "id": "123",
-        #             "operation": "Update",
-        #             "lastUpdated": "2025-12-14T10:30:00-08:00"
-        #           }
-        #         ]
-        #       }
-        #     }
-        #   ]
-        # }
-        
-        event_notifications = payload.get("eventNotifications", [])
-        if not event_notifications:
-            logger.warning("Webhook received with no event notifications")
-            return {"status": "ok", "message": "No events to process"}
-        
-        events_processed = 0
-        events_stored = 0
-        
-        for notification in event_notifications:
-            realm_id = notification.get("realmId")
-            data_change_event = notification.get("dataChangeEvent", {})
-            entities = data_change_event.get("entities", [])
-            
-            for entity in entities:
-                entity_name = entity.get("name")  # Customer, Invoice, Payment
-                entity_id = entity.get("id")
-                operation = entity.get("operation")  # Create, Update, Delete
-                last_updated = entity.get("lastUpdated")
-                
-                # Create event record
-                event_data = {
-                    "event_id": f"{realm_id}_{entity_name}_{entity_id}_{operation}_{datetime.utcnow().timestamp()}",
-                    "realm_id": realm_id,
-                    "event_type": f"{entity_name}.{operation}",
-                    "entity_type": entity_name.lower(),
-                    "entity_ids": [entity_id],
-                    "payload": notification,
-                    "processed": False,
-                    "created_at": datetime.utcnow()
-                }
-                
-                # Store webhook event in database
-                try:
-                    result = await db.execute(
-                        """
-                        INSERT INTO webhook_events 
-                        (event_id, realm_id, event_type, entity_type, entity_ids, payload, processed, created_at)
-                        VALUES (:event_id, :realm_id, :event_type, :entity_type, :entity_ids, :payload, :processed, :created_at)
-                        ON CONFLICT (event_id) DO NOTHING
-                        RETURNING id
-                        """,
-                        event_data
-                    )
-                    await db.commit()
-                    
-                    if result.rowcount > 0:
-                        events_stored += 1
-                        logger.info(f"[WEBHOOK] Stored event: {entity_name}.{operation} (ID: {entity_id})")
-                    
-                    events_processed += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to store webhook event: {e}", exc_info=True)
-                    await db.rollback()
-        
-        logger.info(f"[WEBHOOK] Processed {events_processed} events, stored {events_stored} new events")
-        
-        # TODO: Trigger immediate sync for affected entity types (will implement in sync service)
-        # For now, just log and let scheduled sync handle it
-        
-        return {
-            "status": "ok",
-            "events_processed": events_processed,
-            "events_stored": events_stored,
-            "message": "Webhook events received and queued for processing"
-        }
-        
-    except HTTPException:
-        raise
+        payload = json.loads(body_bytes)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        logger.error(f"Failed to parse webhook payload: {e}")
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    
+    events = build_event_rows(payload)
+    if not events:
+        logger.warning("Webhook received with no event notifications")
+        return {"status": "ok", "message": "No events to process"}
+    
+    try:
+        result = await db.execute(INSERT_EVENTS_SQL, {"events": json.dumps(events)})
+        events_stored = len(result.fetchall())
+        await db.commit()
     except Exception as e:
-        logger.error(f"Webhook processing error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error processing webhook")
+        # Non-2xx makes Intuit retry the delivery; the event key keeps retries idempotent
+        logger.error(f"Failed to store webhook events: {e}", exc_info=True)
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Internal server error storing webhook events")
+    
+    # Targeted sync of the changed entities happens in the webhook worker
+    if events_stored:
+        qb_webhook_worker.notify()
+    
+    logger.info(f"[WEBHOOK] Received {len(events)} events, stored {events_stored} new events")
+    
+    return {
+        "status": "ok",
+        "events_processed": len(events),
+        "events_stored": events_stored,
+        "message": "Webhook events received and queued for processing"
+    }
 
 
 @router.get("/webhook/events")
@@ -216,7 +211,7 @@ async def list_webhook_events(
         
         query += " ORDER BY created_at DESC LIMIT :limit"
         
-        result = await db.execute(query, params)
+        result = await db.execute(text(query), params)
         events = result.fetchall()
         
         return {
@@ -256,14 +251,14 @@ async def reprocess_webhook_event(
     try:
         # Mark event as unprocessed
         result = await db.execute(
-            """
+            text("""
             UPDATE webhook_events
             SET processed = false,
                 processed_at = NULL,
                 processing_error = NULL
             WHERE id = :event_id
             RETURNING event_id, event_type
-            """,
+            """),
             {"event_id": event_id}
         )
         await db.commit()
@@ -274,7 +269,7 @@ async def reprocess_webhook_event(
         
         logger.info(f"[WEBHOOK] Marked event {event.event_id} for reprocessing")
         
-        # TODO: Trigger immediate sync (will implement in sync service)
+        qb_webhook_worker.notify()
         
         return {
             "status": "ok",
@@ -23,7 +23,7 @@ import logging
 
 from app.db.session import get_db
 from app.db.models import Subcontractor, Project, Permit, User
-from app.services.supabase_auth_service import SupabaseAuthService
+from app.services.supabase_auth_service import supabase_auth_service
 from app.routes.auth_supabase import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -119,8 +119,7 @@ async def submit_subcontractor_form(
     extra = {}
     if authorization and authorization.lower().startswith("bearer "):
         token = authorization.split(" ", 1)[1]
-        auth = SupabaseAuthService()
-        payload = auth.verify_jwt(token)
+        payload = await supabase_auth_service.verify_jwt(token)
         if payload:
             extra.update({
                 "submitted_by_email": payload.get("email"),
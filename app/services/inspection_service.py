@@ -7,6 +7,7 @@ Handles inspection CRUD, photo uploads, deficiency tracking, and precheck integr
 from typing import List, Optional, Dict, Any
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime, timezone
 import logging
 
@@ -130,7 +131,6 @@ class InspectionService:
         
         db.add(inspection)
         await db.flush()
-        await db.refresh(inspection)
         
         logger.info(f"Created inspection {inspection.business_id} for permit {permit.business_id}")
         return inspection
@@ -172,7 +172,6 @@ class InspectionService:
             inspection.deficiencies = deficiencies
         
         await db.flush()
-        await db.refresh(inspection)
         
         logger.info(f"Completed inspection {inspection.business_id} with result: {result}")
         return inspection
@@ -211,10 +210,10 @@ class InspectionService:
                 photo["timestamp"] = datetime.now(timezone.utc).isoformat()
         
         inspection.photos.extend(photos)
+        flag_modified(inspection, "photos")
         inspection.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(inspection)
         
         logger.info(f"Added {len(photos)} photos to inspection {inspection.business_id}")
         return inspection
@@ -248,7 +247,6 @@ class InspectionService:
         inspection.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(inspection)
         
         logger.info(f"Updated inspection {inspection.business_id}")
         return inspection
@@ -299,10 +297,10 @@ class InspectionService:
             inspection.photos["items"] = []
         
         inspection.photos["items"].append(photo_data)
+        flag_modified(inspection, "photos")
         inspection.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(inspection)
         
         logger.info(f"Added photo to inspection {inspection.business_id}")
         return inspection
@@ -352,10 +350,10 @@ class InspectionService:
             inspection.deficiencies["items"] = []
         
         inspection.deficiencies["items"].append(deficiency_data)
+        flag_modified(inspection, "deficiencies")
         inspection.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(inspection)
         
         logger.info(f"Added deficiency to inspection {inspection.business_id}")
         return inspection
@@ -383,7 +381,6 @@ class InspectionService:
         inspection.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(inspection)
         
         logger.info(f"Cancelled inspection {inspection.business_id}")
         return inspection
@@ -0,0 +1,159 @@
+"""
+Invoice Number Allocator
+
+Hands out property-based invoice DocNumbers ("1105-Sandy-Bottom-Concord",
+then "...-Concord-2", "...-Concord-3") without downloading QuickBooks'
+invoice history:
+- invoice_number_counters holds the last suffix issued per base number and
+  is advanced with one atomic upsert, so concurrent creations for the same
+  property never get the same number
+- the counter is seeded from (and never falls behind) the highest suffix in
+  quickbooks_invoices_cache.doc_number / invoices.invoice_number, read via
+  text_pattern_ops prefix indexes - cost depends on invoices for that
+  property, not on total history
+- QuickBooks is only asked (one DocNumber LIKE query) when it rejects a
+  number as a duplicate (invoice created elsewhere since the last sync);
+  the counter jumps past what it reports and the create is retried
+
+The bare base number counts as suffix 1. Numbers of failed creates are not
+reused (gaps are fine - QuickBooks does not require contiguous DocNumbers).
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.services.qb_client import QuickBooksAPIError
+from app.utils.qb_query_builder import QBQuery, quote
+
+logger = logging.getLogger(__name__)
+
+# QuickBooks ValidationFault code for "Duplicate Document Number Error"
+DUPLICATE_DOC_NUMBER_CODE = "6140"
+
+
+def suffix_of(doc_number: Optional[str], base: str) -> int:
+    """Suffix a DocNumber carries for base: 1 for base itself, N for "base-N", else 0."""
+    if doc_number == base:
+        return 1
+    if doc_number and doc_number.startswith(base + "-"):
+        suffix = doc_number[len(base) + 1:]
+        if suffix.isdigit():
+            return int(suffix)
+    return 0
+
+
+def number_for(base: str, suffix: int) -> str:
+    return base if suffix <= 1 else f"{base}-{suffix}"
+
+
+def is_duplicate_doc_number(error: Exception) -> bool:
+    fault = getattr(error, "fault", None) or {}
+    if any(str(e.get("code")) == DUPLICATE_DOC_NUMBER_CODE for e in fault.get("Error") or []):
+        return True
+    return "Duplicate Document Number" in str(error)
+
+
+def _like_prefix(base: str) -> str:
+    """LIKE pattern for "base-..." with base's own wildcards escaped."""
+    escaped = base.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}-%"
+
+
+class InvoiceNumberAllocator:
+    """Per-base-number DocNumber counter backed by invoice_number_counters."""
+
+    async def highest_known_suffix(self, db: AsyncSession, base: str) -> int:
+        """Highest suffix already used for base in the QuickBooks cache or local invoices."""
+        result = await db.execute(
+            text("""
+                SELECT doc_number FROM quickbooks_invoices_cache
+                WHERE doc_number = :base OR doc_number LIKE :pattern ESCAPE '\\'
+                UNION
+                SELECT invoice_number FROM invoices
+                WHERE invoice_number = :base OR invoice_number LIKE :pattern ESCAPE '\\'
+            """),
+            {"base": base, "pattern": _like_prefix(base)}
+        )
+        return max((suffix_of(row[0], base) for row in result.fetchall()), default=0)
+
+    async def allocate(self, db: AsyncSession, base: str, at_least: int = 0) -> str:
+        """
+        Reserve the next DocNumber for base (committed immediately).
+
+        Args:
+            db: Database session
+            base: Property/customer-derived base number
+            at_least: Known used suffix to skip past (from a QuickBooks conflict)
+
+        Returns:
+            The reserved DocNumber
+        """
+        seed = max(await self.highest_known_suffix(db, base), at_least) + 1
+        # The row lock taken by the upsert serialises concurrent allocations
+        result = await db.execute(
+            text("""
+                INSERT INTO invoice_number_counters (prefix, last_suffix, updated_at)
+                VALUES (:prefix, :seed, :now)
+                ON CONFLICT (prefix) DO UPDATE SET
+                    last_suffix = CASE
+                        WHEN invoice_number_counters.last_suffix + 1 > excluded.last_suffix
+                        THEN invoice_number_counters.last_suffix + 1
+                        ELSE excluded.last_suffix
+                    END,
+                    updated_at = excluded.updated_at
+                RETURNING last_suffix
+            """),
+            {"prefix": base, "seed": seed, "now": datetime.now(timezone.utc)}
+        )
+        suffix = result.scalar()
+        await db.commit()
+        return number_for(base, suffix)
+
+    async def quickbooks_suffix(self, qb_service, base: str) -> int:
+        """Highest suffix QuickBooks itself has for base (one prefix query, every page)."""
+        invoices = await qb_service.query_all(
+            QBQuery("Invoice", fields=("DocNumber",)).where(f"DocNumber LIKE {quote(base + '%')}")
+        )
+        return max((suffix_of(inv.get("DocNumber"), base) for inv in invoices), default=0)
+
+    async def create_invoice(
+        self,
+        qb_service,
+        base: str,
+        invoice_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Create a QuickBooks invoice under the next free DocNumber for base.
+
+        On a duplicate-number fault, reconciles the counter with QuickBooks
+        and retries (QB_INVOICE_NUMBER_MAX_ATTEMPTS creates in total).
+        Without a database session the number comes from QuickBooks directly.
+        """
+        db = getattr(qb_service, "db", None)
+        at_least = 0
+        for attempt in range(1, settings.QB_INVOICE_NUMBER_MAX_ATTEMPTS + 1):
+            if db is not None:
+                doc_number = await self.allocate(db, base, at_least)
+            else:
+                at_least = max(at_least, await self.quickbooks_suffix(qb_service, base))
+                doc_number = number_for(base, at_least + 1)
+            logger.info(f"[INVOICE] Allocated invoice number {doc_number} (attempt {attempt})")
+
+            try:
+                return await qb_service.create_invoice({**invoice_data, "DocNumber": doc_number})
+            except QuickBooksAPIError as e:
+                if not is_duplicate_doc_number(e) or attempt == settings.QB_INVOICE_NUMBER_MAX_ATTEMPTS:
+                    raise
+                at_least = max(suffix_of(doc_number, base), await self.quickbooks_suffix(qb_service, base))
+                logger.warning(
+                    f"[INVOICE] QuickBooks already has {doc_number}; reconciled {base} to suffix {at_least}"
+                )
+
+
+# Global instance
+invoice_number_allocator = InvoiceNumberAllocator()
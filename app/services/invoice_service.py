@@ -128,7 +128,6 @@ class InvoiceService:
         
         db.add(invoice)
         await db.flush()
-        await db.refresh(invoice)
         
         logger.info(f"Created invoice {invoice.business_id} for project {project.business_id}")
         return invoice
@@ -159,7 +158,6 @@ class InvoiceService:
         invoice.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(invoice)
         
         logger.info(f"Updated invoice {invoice.business_id} status: {old_status} → {new_status}")
         return invoice
@@ -197,7 +195,6 @@ class InvoiceService:
         invoice.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(invoice)
         
         logger.info(f"Recorded ${payment_amount} payment on invoice {invoice.business_id}")
         return invoice
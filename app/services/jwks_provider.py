@@ -0,0 +1,122 @@
+"""
+Async Supabase JWKS provider.
+
+PyJWKClient fetches the key set with blocking urllib on a cache miss, so an
+unknown `kid` stalled the event loop for a full HTTP round trip (and every
+SupabaseAuthService() built per request started with an empty cache).
+
+JWKSProvider keeps the signing keys in memory:
+- start(): prefetch at startup, then refresh every
+  SUPABASE_JWKS_REFRESH_SECONDS in the background (key rotation)
+- get_signing_key(): in-memory lookup by the token's `kid`; an unknown kid
+  triggers one refetch - single-flight, concurrent misses await the same
+  request - at most once per UNKNOWN_KID_REFETCH_SECONDS, so tokens with
+  made-up kids cannot hammer the JWKS endpoint
+- a failed fetch keeps the previous keys
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import jwt
+from jwt import PyJWK, PyJWKSet
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_KID_REFETCH_SECONDS = 30
+
+
+class JWKSProvider:
+    """Signing keys from one JWKS URL, fetched with httpx off the request path."""
+
+    def __init__(self, jwks_url: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.jwks_url = jwks_url
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._keys: Dict[Optional[str], PyJWK] = {}
+        self._fetched_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self.fetch_count = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0, transport=self._transport)
+        return self._client
+
+    # ==================== Keys ====================
+
+    async def get_signing_key(self, token: str) -> PyJWK:
+        """Key for the token's `kid` (refetching once for an unknown kid); raises jwt.PyJWKClientError."""
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._lookup(kid)
+        if key is None and time.monotonic() - self._fetched_at >= UNKNOWN_KID_REFETCH_SECONDS:
+            await self.refresh()
+            key = self._lookup(kid)
+        if key is None:
+            raise jwt.PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+        return key
+
+    def _lookup(self, kid: Optional[str]) -> Optional[PyJWK]:
+        if kid is None and len(self._keys) == 1:
+            return next(iter(self._keys.values()))
+        return self._keys.get(kid)
+
+    async def refresh(self) -> bool:
+        """Refetch the key set; concurrent callers share one request."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+        return await asyncio.shield(self._inflight)
+
+    async def _fetch(self) -> bool:
+        self._fetched_at = time.monotonic()
+        try:
+            response = await self.client.get(self.jwks_url)
+            response.raise_for_status()
+            key_set = PyJWKSet.from_dict(response.json())
+        except Exception as e:
+            logger.warning(f"[JWKS] Fetch from {self.jwks_url} failed, keeping {len(self._keys)} keys: {e}")
+            return False
+        self._keys = {key.key_id: key for key in key_set.keys}
+        self.fetch_count += 1
+        logger.info(f"[JWKS] Loaded {len(self._keys)} signing keys")
+        return True
+
+    # ==================== Background refresher ====================
+
+    async def start(self):
+        """Prefetch the keys and start the background refresher."""
+        await self.refresh()
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(settings.SUPABASE_JWKS_REFRESH_SECONDS)
+            await self.refresh()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "jwks_url": self.jwks_url,
+            "keys": len(self._keys),
+            "fetch_count": self.fetch_count,
+            "background_refresh": self._refresher is not None and not self._refresher.done(),
+        }
@@ -660,6 +660,11 @@ class OpenAIService:
                                         "type": "string",
                                         "description": "The QuickBooks customer ID to update (required)"
                                     },
+                                    "customer_ids": {
+                                        "type": "array",
+                                        "items": {"type": "string"},
+                                        "description": "Optional: additional QuickBooks customer IDs to apply the same updates to (bulk update)"
+                                    },
                                     "updates": {
                                         "type": "object",
                                         "description": "Fields to update. Can include: CompanyName (string), GivenName (string), FamilyName (string), DisplayName (string), PrimaryPhone (object with FreeFormNumber), PrimaryEmailAddr (object with Address), Mobile (object with FreeFormNumber), BillAddr (object with Line1, City, CountrySubDivisionCode, PostalCode), Notes (string), Taxable (boolean), Active (boolean), etc.",
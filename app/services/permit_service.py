@@ -7,6 +7,7 @@ Handles permit CRUD operations, status tracking, and relationship management.
 from typing import List, Optional, Dict, Any
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime, timezone
 import logging
 
@@ -145,8 +146,7 @@ class PermitService:
         )
         
         db.add(permit)
-        await db.flush()  # Get business_id from trigger
-        await db.refresh(permit)
+        await db.flush()  # INSERT ... RETURNING loads trigger-generated business_id
         
         logger.info(f"Created permit {permit.business_id} for project {project.business_id}")
         return permit
@@ -188,9 +188,9 @@ class PermitService:
             "new_status": new_status,
             "notes": notes
         })
+        flag_modified(permit, "status_history")
         
         await db.flush()
-        await db.refresh(permit)
         
         logger.info(f"Updated permit {permit.business_id} status: {old_status} → {new_status}")
         return permit
@@ -226,9 +226,9 @@ class PermitService:
             if not permit.extra:
                 permit.extra = {}
             permit.extra["approved_by"] = approved_by
+            flag_modified(permit, "extra")
         
         await db.flush()
-        await db.refresh(permit)
         
         logger.info(f"Approved permit {permit.business_id} on {approval_date}")
         return permit
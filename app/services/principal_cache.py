@@ -0,0 +1,165 @@
+"""
+Authenticated Principal Cache
+
+get_current_user runs on every protected request. Without a cache each call
+SELECTs the users row and COMMITs an activity timestamp, so every API call
+costs a database round trip and a write.
+
+PrincipalCache keeps the app user per Supabase user id in memory:
+- get(): the cached user, merged into the request's session without a
+  query (load=False), so routes can still refresh / relate to it
+- put(): caches a user until the token that loaded it expires, capped at
+  PRINCIPAL_CACHE_TTL_SECONDS - role changes and deactivations made by
+  another app instance show up within that window
+- invalidate(): role, metadata, deactivation and login updates drop the
+  entry in this process immediately
+
+last_activity_at is write-behind: record_activity() only stores the latest
+timestamp per user in memory, and a background task writes all of them in
+one batched UPDATE every USER_ACTIVITY_FLUSH_SECONDS (plus a final flush on
+shutdown). A failed flush is dropped, not retried - activity is best-effort.
+"""
+
+import asyncio
+import copy
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import inspect as sa_inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.config import settings
+from app.db.models import User
+
+logger = logging.getLogger(__name__)
+
+# users.last_activity_at exists in the table (migration) but is not mapped on User
+ACTIVITY_UPDATE_SQL = text("""
+    UPDATE users SET last_activity_at = :seen_at
+    WHERE id = :user_id AND (last_activity_at IS NULL OR last_activity_at < :seen_at)
+""")
+
+_USER_COLUMNS = tuple(attr.key for attr in sa_inspect(User).column_attrs)
+
+
+class PrincipalCache:
+    """Process-wide app users by Supabase user id, with write-behind activity tracking."""
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        # supabase_user_id -> (column values, expires at epoch seconds)
+        self._entries: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        # users.id -> latest activity not yet written
+        self._activity: Dict[str, datetime] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.activity_flushes = 0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.db.session import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    # ==================== Principals ====================
+
+    async def get(self, db: AsyncSession, supabase_user_id: str) -> Optional[User]:
+        """The cached user attached to db (no SQL), or None when absent or expired."""
+        entry = self._entries.get(supabase_user_id)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[supabase_user_id]
+            self.misses += 1
+            return None
+        self.hits += 1
+        user = User(**copy.deepcopy(entry[0]))
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    def put(self, user: User, token_expires_at: Optional[float] = None):
+        """Cache a loaded user until token_expires_at (JWT exp), at most PRINCIPAL_CACHE_TTL_SECONDS."""
+        if not user.supabase_user_id:
+            return
+        expires_at = time.time() + settings.PRINCIPAL_CACHE_TTL_SECONDS
+        if token_expires_at:
+            expires_at = min(expires_at, float(token_expires_at))
+        self._entries.pop(user.supabase_user_id, None)
+        while len(self._entries) >= settings.PRINCIPAL_CACHE_MAX_ENTRIES:
+            del self._entries[next(iter(self._entries))]
+        self._entries[user.supabase_user_id] = (
+            copy.deepcopy({column: getattr(user, column) for column in _USER_COLUMNS}),
+            expires_at,
+        )
+
+    def invalidate(self, supabase_user_id: Optional[str]):
+        """Drop one principal (after its role, metadata or active flag changed)."""
+        if supabase_user_id:
+            self._entries.pop(supabase_user_id, None)
+
+    # ==================== Activity (write-behind) ====================
+
+    def record_activity(self, user_id: str):
+        self._activity[user_id] = datetime.now(timezone.utc)
+
+    async def flush_activity(self) -> int:
+        """Write every pending last_activity_at in one batched UPDATE; returns the users written."""
+        if not self._activity:
+            return 0
+        pending, self._activity = self._activity, {}
+        try:
+            async with self.session_factory() as db:
+                await db.execute(
+                    ACTIVITY_UPDATE_SQL,
+                    [{"user_id": user_id, "seen_at": seen_at} for user_id, seen_at in pending.items()]
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"[PRINCIPALS] Dropped activity for {len(pending)} users: {e}")
+            return 0
+        self.activity_flushes += 1
+        logger.debug(f"[PRINCIPALS] Flushed activity for {len(pending)} users")
+        return len(pending)
+
+    async def start(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flusher and write whatever activity is still pending."""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush_activity()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.USER_ACTIVITY_FLUSH_SECONDS)
+            await self.flush_activity()
+
+    def reset(self):
+        """Forget principals, pending activity and counters (tests)."""
+        self._entries.clear()
+        self._activity.clear()
+        self.hits = self.misses = self.activity_flushes = 0
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "principals": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "pending_activity": len(self._activity),
+            "activity_flushes": self.activity_flushes,
+        }
+
+
+# Global instance
+principal_cache = PrincipalCache()
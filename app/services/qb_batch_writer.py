@@ -0,0 +1,125 @@
+"""
+QuickBooks Batch Writer
+
+Packs create / update / query operations into QuickBooks /batch requests
+(at most 30 BatchItemRequest entries each) so bulk flows cost one API call
+per 30 records instead of one per record.
+
+Operations are plain dicts built with create_op / update_op / query_op.
+run() returns one result per operation, in input order:
+- {"ok": True, "entity": {...}}                  create / update
+- {"ok": True, "entities": [...]}                query
+- {"ok": False, "error": "...", "fault": {...}}  per-item Fault (e.g. Stale
+                                                 Object Error, duplicate name)
+
+A /batch request that fails as a whole (HTTP error, open circuit) fails only
+its own items - the other chunks still run. QuickBooks applies each item
+independently, so a fault never rolls back the rest of its chunk.
+Chunks are sent QB_BATCH_CONCURRENCY at a time.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.qb_client import BATCH_MAX_ITEMS
+
+logger = logging.getLogger(__name__)
+
+# BatchItemResponse keys that are not the entity payload
+_RESPONSE_METADATA_KEYS = ("bId", "Fault", "QueryResponse")
+
+
+def create_op(entity: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {"operation": "create", "entity": entity, "payload": payload}
+
+
+def update_op(entity: str, payload: Dict[str, Any], sparse: bool = True) -> Dict[str, Any]:
+    """payload must carry Id and the current SyncToken."""
+    return {"operation": "update", "entity": entity, "payload": {**payload, "sparse": True} if sparse else payload}
+
+
+def query_op(query_string: str) -> Dict[str, Any]:
+    return {"operation": "query", "query": query_string}
+
+
+def batch_item_request(bid: str, op: Dict[str, Any]) -> Dict[str, Any]:
+    """BatchItemRequest entry for one operation."""
+    if op["operation"] == "query":
+        return {"bId": bid, "Query": op["query"]}
+    return {"bId": bid, "operation": op["operation"], op["entity"]: op["payload"]}
+
+
+def fault_message(fault: Dict[str, Any]) -> str:
+    """Human-readable summary of a QuickBooks Fault."""
+    errors = fault.get("Error") or []
+    if not errors:
+        return f"QuickBooks {fault.get('type', 'Fault')}"
+    return "; ".join(
+        " - ".join(part for part in (error.get("Message"), error.get("Detail")) if part) or f"code {error.get('code')}"
+        for error in errors
+    )
+
+
+def batch_item_result(op: Dict[str, Any], response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Map one BatchItemResponse entry back to its operation's result."""
+    if response is None:
+        return {"ok": False, "error": "No BatchItemResponse for this item", "fault": None}
+    if "Fault" in response:
+        return {"ok": False, "error": fault_message(response["Fault"]), "fault": response["Fault"]}
+    if op["operation"] == "query":
+        query_response = response.get("QueryResponse", {})
+        entities = next(
+            (value for key, value in query_response.items() if key not in ("startPosition", "maxResults", "totalCount")),
+            []
+        )
+        return {"ok": True, "entities": entities if isinstance(entities, list) else [entities]}
+    entity = response.get(op["entity"])
+    if entity is None:
+        entity = next((value for key, value in response.items() if key not in _RESPONSE_METADATA_KEYS), {})
+    return {"ok": True, "entity": entity}
+
+
+class QuickBooksBatchWriter:
+    """Runs any number of operations through /batch, 30 per request."""
+
+    def __init__(self, qb_service, breaker=None, concurrency: Optional[int] = None):
+        self.qb_service = qb_service
+        self.breaker = breaker
+        self.concurrency = concurrency or settings.QB_BATCH_CONCURRENCY
+        self.api_calls = 0  # /batch requests sent by this writer
+
+    async def run(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Execute the operations; return one result per operation, in input order.
+
+        Never raises for per-item or per-chunk failures - check result["ok"].
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(start: int):
+            chunk = operations[start:start + BATCH_MAX_ITEMS]
+            items = [batch_item_request(str(start + i), op) for i, op in enumerate(chunk)]
+            async with semaphore:
+                self.api_calls += 1
+                try:
+                    responses = await self.qb_service.batch(items, breaker=self.breaker)
+                except Exception as e:
+                    logger.error(f"[QB BATCH] Batch of {len(chunk)} operations failed: {e}")
+                    for i in range(len(chunk)):
+                        results[start + i] = {"ok": False, "error": str(e), "fault": None}
+                    return
+            for i, op in enumerate(chunk):
+                results[start + i] = batch_item_result(op, responses.get(str(start + i)))
+
+        starts = range(0, len(operations), BATCH_MAX_ITEMS)
+        await asyncio.gather(*(send(start) for start in starts))
+
+        failed = sum(1 for result in results if not result["ok"])
+        logger.info(
+            f"[QB BATCH] {len(operations)} operations in {len(starts)} requests "
+            f"({len(operations) - failed} ok, {failed} failed)"
+        )
+        return results
@@ -0,0 +1,295 @@
+"""
+QuickBooks Cache Bulk Loader
+
+Set-based upsert of QuickBooks entities into the quickbooks_*_cache tables.
+
+Per batch of rows:
+1. One SELECT fetches the stored content_hash / qb_last_modified / sync_error
+   for every key in the batch
+2. Rows are classified in Python:
+   - inserted:  key not cached yet
+   - updated:   content changed (or the row carries a sync_error to clear)
+   - unchanged: same content hash (or, for rows cached before content_hash
+                existed, same qb_last_modified) - never written
+3. One INSERT ... ON CONFLICT DO UPDATE writes the inserted + updated rows
+   (ON CONFLICT covers rows another sync inserted between steps 1 and 3):
+   - PostgreSQL: the whole batch is sent as ONE json parameter and expanded
+     with json_populate_recordset (column types come from the table, the
+     statement text never changes, so asyncpg prepares it once)
+   - Other dialects (SQLite in tests): multi-row VALUES
+
+A full re-sync of an unchanged company therefore costs one SELECT per
+batch and no writes; qb_data/cached_at only move when content changes.
+
+content_hash ignores MetaData, so a LastUpdatedTime bump with no field
+changes is treated as unchanged. Rows keep only the "sync" field set of
+app/utils/qb_query_builder.py, so an entity hashes the same whether it came
+from a projected query, ChangeDataCapture or a webhook fetch.
+
+The quickbooks_context_* tables (chat context) hold every customer and
+invoice, not just GC Compliance ones, trimmed to the "context" field set.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.utils.qb_query_builder import compact_record, fields_for
+
+logger = logging.getLogger(__name__)
+
+# entity_type -> (cache table, primary key column)
+CACHE_TABLES = {
+    "customers": ("quickbooks_customers_cache", "qb_customer_id"),
+    "invoices": ("quickbooks_invoices_cache", "qb_invoice_id"),
+    "payments": ("quickbooks_payments_cache", "qb_payment_id"),
+    "context_customers": ("quickbooks_context_customers", "qb_customer_id"),
+    "context_invoices": ("quickbooks_context_invoices", "qb_invoice_id"),
+}
+
+# Keys excluded from the content hash (change on every touch, not content)
+_HASH_IGNORED_KEYS = ("MetaData",)
+
+
+def content_hash(entity: Dict[str, Any]) -> str:
+    """Stable SHA-256 of a QuickBooks entity's content."""
+    content = {k: v for k, v in entity.items() if k not in _HASH_IGNORED_KEYS}
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+# ==================== Cache Row Transforms ====================
+
+def _parse_qb_timestamp(entity: Dict[str, Any]) -> Optional[datetime]:
+    """Parse MetaData.LastUpdatedTime to a datetime."""
+    qb_last_modified_str = entity.get('MetaData', {}).get('LastUpdatedTime')
+    return datetime.fromisoformat(qb_last_modified_str.replace('Z', '+00:00')) if qb_last_modified_str else None
+
+
+def _parse_qb_date(value: Optional[str]):
+    """Parse a QuickBooks YYYY-MM-DD date string."""
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def customer_cache_row(customer: Dict[str, Any]) -> Dict[str, Any]:
+    """QB Customer -> quickbooks_customers_cache row."""
+    customer = compact_record(customer, fields_for("sync", "Customer"))
+    return {
+        'qb_customer_id': customer.get('Id'),
+        'display_name': customer.get('DisplayName'),
+        'company_name': customer.get('CompanyName'),
+        'given_name': customer.get('GivenName'),
+        'family_name': customer.get('FamilyName'),
+        'email': customer.get('PrimaryEmailAddr', {}).get('Address') if customer.get('PrimaryEmailAddr') else None,
+        'phone': customer.get('PrimaryPhone', {}).get('FreeFormNumber') if customer.get('PrimaryPhone') else None,
+        'qb_data': json.dumps(customer),  # JSON-encode for JSONB column
+        'content_hash': content_hash(customer),
+        'qb_last_modified': _parse_qb_timestamp(customer),
+        'is_active': customer.get('Active', True),
+        'sync_error': None,
+        'cached_at': datetime.now(timezone.utc)
+    }
+
+
+def invoice_cache_row(invoice: Dict[str, Any]) -> Dict[str, Any]:
+    """QB Invoice -> quickbooks_invoices_cache row."""
+    invoice = compact_record(invoice, fields_for("sync", "Invoice"))
+    return {
+        'qb_invoice_id': invoice.get('Id'),
+        'customer_id': invoice.get('CustomerRef', {}).get('value'),
+        'doc_number': invoice.get('DocNumber'),
+        'total_amount': invoice.get('TotalAmt'),
+        'balance': invoice.get('Balance'),
+        'due_date': _parse_qb_date(invoice.get('DueDate')),
+        'qb_data': json.dumps(invoice),  # JSON-encode for JSONB column
+        'content_hash': content_hash(invoice),
+        'qb_last_modified': _parse_qb_timestamp(invoice),
+        'is_active': True,  # Invoices don't have Active field
+        'sync_error': None,
+        'cached_at': datetime.now(timezone.utc)
+    }
+
+
+def payment_cache_row(payment: Dict[str, Any], invoice_id: Optional[str]) -> Dict[str, Any]:
+    """QB Payment -> quickbooks_payments_cache row (invoice_id = first linked invoice)."""
+    payment = compact_record(payment, fields_for("sync", "Payment"))
+    return {
+        'qb_payment_id': payment.get('Id'),
+        'customer_id': payment.get('CustomerRef', {}).get('value'),
+        'invoice_id': invoice_id,
+        'amount': payment.get('TotalAmt'),
+        'payment_date': _parse_qb_date(payment.get('TxnDate')),
+        'payment_method': payment.get('PaymentMethodRef', {}).get('name'),
+        'reference_number': payment.get('PaymentRefNum'),
+        'qb_data': json.dumps(payment),  # JSON-encode for JSONB column
+        'content_hash': content_hash(payment),
+        'qb_last_modified': _parse_qb_timestamp(payment),
+        'is_active': True,
+        'sync_error': None,
+        'cached_at': datetime.now(timezone.utc)
+    }
+
+
+def context_customer_row(customer: Dict[str, Any]) -> Dict[str, Any]:
+    """QB Customer (any type) -> quickbooks_context_customers row."""
+    customer = compact_record(customer, fields_for("context", "Customer"))
+    return {
+        'qb_customer_id': customer.get('Id'),
+        'display_name': customer.get('DisplayName'),
+        'qb_data': json.dumps(customer),  # JSON-encode for JSONB column
+        'content_hash': content_hash(customer),
+        'qb_last_modified': _parse_qb_timestamp(customer),
+        'is_active': customer.get('Active', True),
+        'sync_error': None,
+        'cached_at': datetime.now(timezone.utc)
+    }
+
+
+def context_invoice_row(invoice: Dict[str, Any]) -> Dict[str, Any]:
+    """QB Invoice (any customer) -> quickbooks_context_invoices row."""
+    invoice = compact_record(invoice, fields_for("context", "Invoice"))
+    return {
+        'qb_invoice_id': invoice.get('Id'),
+        'customer_id': invoice.get('CustomerRef', {}).get('value'),
+        'qb_data': json.dumps(invoice),  # JSON-encode for JSONB column
+        'content_hash': content_hash(invoice),
+        'qb_last_modified': _parse_qb_timestamp(invoice),
+        'is_active': True,  # Invoices don't have Active field
+        'sync_error': None,
+        'cached_at': datetime.now(timezone.utc)
+    }
+
+
+def first_linked_invoice_id(payment: Dict[str, Any]) -> Optional[str]:
+    """TxnId of the first Invoice a payment is applied to."""
+    for line in payment.get('Line', []):
+        for linked_txn in line.get('LinkedTxn', []):
+            if linked_txn.get('TxnType') == 'Invoice':
+                return linked_txn.get('TxnId')
+    return None
+
+
+class QuickBooksCacheLoader:
+    """Bulk upsert with change detection for the QuickBooks cache tables."""
+
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or settings.QB_CACHE_UPSERT_BATCH_SIZE
+
+    async def upsert(self, db: AsyncSession, entity_type: str, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Upsert cache rows (dicts keyed by column name, each with content_hash).
+
+        Does not commit - callers commit per page.
+
+        Returns:
+            Dict with inserted, updated and unchanged counts
+        """
+        table, key = CACHE_TABLES[entity_type]
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+        # Last occurrence wins - ON CONFLICT cannot touch one row twice per statement
+        deduped = list({row[key]: row for row in rows}.values())
+
+        for start in range(0, len(deduped), self.batch_size):
+            batch = deduped[start:start + self.batch_size]
+            existing = await self._fetch_existing(db, table, key, [row[key] for row in batch])
+
+            to_write = []
+            for row in batch:
+                current = existing.get(row[key])
+                if current is None:
+                    counts["inserted"] += 1
+                    to_write.append(row)
+                elif self._is_unchanged(current, row):
+                    counts["unchanged"] += 1
+                else:
+                    counts["updated"] += 1
+                    to_write.append(row)
+
+            if to_write:
+                if self._is_postgresql(db):
+                    statement, params = self._build_recordset_upsert(table, key, to_write)
+                else:
+                    statement, params = self._build_values_upsert(table, key, to_write)
+                await db.execute(statement, params)
+
+        logger.info(
+            f"[CACHE LOADER] {table}: {counts['inserted']} inserted, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged"
+        )
+        return counts
+
+    async def _fetch_existing(self, db: AsyncSession, table: str, key: str, keys: List[str]) -> Dict[str, Any]:
+        result = await db.execute(
+            text(
+                f"SELECT {key} AS cache_key, content_hash, qb_last_modified, sync_error, is_active "
+                f"FROM {table} WHERE {key} IN :keys"
+            ).bindparams(bindparam("keys", expanding=True)),
+            {"keys": keys},
+        )
+        return {row.cache_key: row for row in result.fetchall()}
+
+    @staticmethod
+    def _is_unchanged(current, row: Dict[str, Any]) -> bool:
+        # Deactivated rows (deleted / soft-deleted) keep their hash - QB returning them again reactivates them
+        if current.sync_error or not current.is_active:
+            return False
+        if current.content_hash:
+            return current.content_hash == row["content_hash"]
+        # Cached before content_hash existed - fall back to the QB timestamp
+        return current.qb_last_modified is not None and current.qb_last_modified == row.get("qb_last_modified")
+
+    @staticmethod
+    def _is_postgresql(db: AsyncSession) -> bool:
+        dialect = getattr(getattr(db, "bind", None), "dialect", None)
+        return getattr(dialect, "name", None) == "postgresql"
+
+    @staticmethod
+    def _on_conflict(key: str, columns: List[str]) -> str:
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column != key)
+        return f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+
+    def _build_recordset_upsert(self, table: str, key: str, rows: List[Dict[str, Any]]):
+        """PostgreSQL: INSERT ... SELECT FROM json_populate_recordset(:rows) for one batch."""
+        columns = list(rows[0].keys())
+        encoded = []
+        for row in rows:
+            # qb_data is already JSON text - splice it in as an object rather than re-encoding
+            fields = {column: value for column, value in row.items() if column != "qb_data"}
+            body = json.dumps(fields, default=str)
+            if "qb_data" in row:
+                body = f'{body[:-1]}, "qb_data": {row["qb_data"] or "null"}}}'
+            encoded.append(body)
+
+        column_list = ", ".join(columns)
+        statement = text(
+            f"INSERT INTO {table} ({column_list}) "
+            f"SELECT {column_list} FROM json_populate_recordset(NULL::{table}, CAST(:rows AS json)) "
+            + self._on_conflict(key, columns)
+        )
+        return statement, {"rows": "[" + ",".join(encoded) + "]"}
+
+    def _build_values_upsert(self, table: str, key: str, rows: List[Dict[str, Any]]):
+        """Multi-row INSERT ... VALUES ... ON CONFLICT DO UPDATE for one batch."""
+        columns = list(rows[0].keys())
+        params = {}
+        values = []
+        for i, row in enumerate(rows):
+            values.append("(" + ", ".join(f":{column}_{i}" for column in columns) + ")")
+            params.update({f"{column}_{i}": row[column] for column in columns})
+
+        statement = text(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join(values)} "
+            + self._on_conflict(key, columns)
+        )
+        return statement, params
+
+
+# Global instance
+qb_cache_loader = QuickBooksCacheLoader()
@@ -16,6 +16,13 @@ from app.db.models import (
     QuickBooksInvoiceCache,
     QuickBooksPaymentCache
 )
+from app.services.qb_cache_loader import (
+    customer_cache_row,
+    first_linked_invoice_id,
+    invoice_cache_row,
+    payment_cache_row,
+    qb_cache_loader,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +33,7 @@ class QuickBooksCacheService:
     
     Features:
     - TTL-based caching (default: 5 minutes)
-    - Bulk upsert operations
+    - Bulk upsert operations (set-based, unchanged rows skipped)
     - Cache invalidation (full or selective)
     - Cache hit rate tracking
     
@@ -55,63 +62,16 @@ class QuickBooksCacheService:
         """
         Cache QuickBooks customers in PostgreSQL.
         
+        Set-based upsert; rows whose content is unchanged are not rewritten.
+        
         Args:
             customers: List of customer data from QB API
         
         Returns:
-            Number of customers cached
+            Number of customers cached (new, changed or unchanged)
         """
-        try:
-            cached_count = 0
-            
-            for customer in customers:
-                qb_id = customer.get('Id')
-                if not qb_id:
-                    continue
-                
-                # Check if exists
-                result = await self.db.execute(
-                    select(QuickBooksCustomerCache).where(
-                        QuickBooksCustomerCache.qb_customer_id == qb_id
-                    )
-                )
-                existing = result.scalar_one_or_none()
-                
-                if existing:
-                    # Update existing
-                    existing.display_name = customer.get('DisplayName')
-                    existing.company_name = customer.get('CompanyName')
-                    existing.given_name = customer.get('GivenName')
-                    existing.family_name = customer.get('FamilyName')
-                    existing.email = customer.get('PrimaryEmailAddr', {}).get('Address')
-                    existing.phone = customer.get('PrimaryPhone', {}).get('FreeFormNumber')
-                    existing.qb_data = customer
-                    existing.cached_at = datetime.utcnow()
-                else:
-                    # Create new
-                    new_customer = QuickBooksCustomerCache(
-                        qb_customer_id=qb_id,
-                        display_name=customer.get('DisplayName'),
-                        company_name=customer.get('CompanyName'),
-                        given_name=customer.get('GivenName'),
-                        family_name=customer.get('FamilyName'),
-                        email=customer.get('PrimaryEmailAddr', {}).get('Address'),
-                        phone=customer.get('PrimaryPhone', {}).get('FreeFormNumber'),
-                        qb_data=customer,
-                        cached_at=datetime.utcnow()
-                    )
-                    self.db.add(new_customer)
-                
-                cached_count += 1
-            
-            await self.db.commit()
-            logger.info(f"[CACHE] Cached {cached_count} QuickBooks customers")
-            return cached_count
-            
-        except Exception as e:
-            await self.db.rollback()
-            logger.error(f"[CACHE] Failed to cache customers: {e}")
-            raise
+        rows = [customer_cache_row(customer) for customer in customers if customer.get('Id')]
+        return await self._bulk_cache('customers', rows)
     
     async def get_cached_customers(
         self, 
@@ -199,59 +159,8 @@ class QuickBooksCacheService:
         Returns:
             Number of invoices cached
         """
-        try:
-            cached_count = 0
-            
-            for invoice in invoices:
-                qb_id = invoice.get('Id')
-                if not qb_id:
-                    continue
-                
-                # Check if exists
-                result = await self.db.execute(
-                    select(QuickBooksInvoiceCache).where(
-                        QuickBooksInvoiceCache.qb_invoice_id == qb_id
-                    )
-                )
-                existing = result.scalar_one_or_none()
-                
-                customer_ref = invoice.get('CustomerRef', {})
-                due_date_str = invoice.get('DueDate')
-                due_date = datetime.fromisoformat(due_date_str) if due_date_str else None
-                
-                if existing:
-                    # Update existing
-                    existing.customer_id = customer_ref.get('value')
-                    existing.doc_number = invoice.get('DocNumber')
-                    existing.total_amount = float(invoice.get('TotalAmt', 0))
-                    existing.balance = float(invoice.get('Balance', 0))
-                    existing.due_date = due_date
-                    existing.qb_data = invoice
-                    existing.cached_at = datetime.utcnow()
-                else:
-                    # Create new
-                    new_invoice = QuickBooksInvoiceCache(
-                        qb_invoice_id=qb_id,
-                        customer_id=customer_ref.get('value'),
-                        doc_number=invoice.get('DocNumber'),
-                        total_amount=float(invoice.get('TotalAmt', 0)),
-                        balance=float(invoice.get('Balance', 0)),
-                        due_date=due_date,
-                        qb_data=invoice,
-                        cached_at=datetime.utcnow()
-                    )
-                    self.db.add(new_invoice)
-                
-                cached_count += 1
-            
-            await self.db.commit()
-            logger.info(f"[CACHE] Cached {cached_count} QuickBooks invoices")
-            return cached_count
-            
-        except Exception as e:
-            await self.db.rollback()
-            logger.error(f"[CACHE] Failed to cache invoices: {e}")
-            raise
+        rows = [invoice_cache_row(invoice) for invoice in invoices if invoice.get('Id')]
+        return await self._bulk_cache('invoices', rows)
     
     async def get_cached_invoices(
         self,
@@ -325,61 +234,27 @@ class QuickBooksCacheService:
         Returns:
             Number of payments cached
         """
+        rows = [
+            payment_cache_row(payment, first_linked_invoice_id(payment))
+            for payment in payments if payment.get('Id')
+        ]
+        return await self._bulk_cache('payments', rows)
+    
+    async def _bulk_cache(self, entity_type: str, rows: List[Dict[str, Any]]) -> int:
+        """Upsert cache rows via the bulk loader and commit."""
+        if not rows:
+            return 0
+        
         try:
-            cached_count = 0
-            
-            for payment in payments:
-                qb_id = payment.get('Id')
-                if not qb_id:
-                    continue
-                
-                # Check if exists
-                result = await self.db.execute(
-                    select(QuickBooksPaymentCache).where(
-                        QuickBooksPaymentCache.qb_payment_id == qb_id
-                    )
-                )
-                existing = result.scalar_one_or_none()
-                
-                customer_ref = payment.get('CustomerRef', {})
-                txn_date_str = payment.get('TxnDate')
-                payment_date = datetime.fromisoformat(txn_date_str) if txn_date_str else None
-                
-                payment_method_ref = payment.get('PaymentMethodRef', {})
-                payment_method = payment_method_ref.get('name') if payment_method_ref else None
-                
-                if existing:
-                    # Update existing
-                    existing.customer_id = customer_ref.get('value')
-                    existing.total_amount = float(payment.get('TotalAmt', 0))
-                    existing.payment_date = payment_date
-                    existing.payment_method = payment_method
-                    existing.payment_ref_num = payment.get('PaymentRefNum')
-                    existing.qb_data = payment
-                    existing.cached_at = datetime.utcnow()
-                else:
-                    # Create new
-                    new_payment = QuickBooksPaymentCache(
-                        qb_payment_id=qb_id,
-                        customer_id=customer_ref.get('value'),
-                        total_amount=float(payment.get('TotalAmt', 0)),
-                        payment_date=payment_date,
-                        payment_method=payment_method,
-                        payment_ref_num=payment.get('PaymentRefNum'),
-                        qb_data=payment,
-                        cached_at=datetime.utcnow()
-                    )
-                    self.db.add(new_payment)
-                
-                cached_count += 1
-            
+            counts = await qb_cache_loader.upsert(self.db, entity_type, rows)
             await self.db.commit()
-            logger.info(f"[CACHE] Cached {cached_count} QuickBooks payments")
+            cached_count = sum(counts.values())
+            logger.info(f"[CACHE] Cached {cached_count} QuickBooks {entity_type}")
             return cached_count
             
         except Exception as e:
             await self.db.rollback()
-            logger.error(f"[CACHE] Failed to cache payments: {e}")
+            logger.error(f"[CACHE] Failed to cache {entity_type}: {e}")
             raise
     
     async def get_cached_payments(
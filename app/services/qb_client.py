@@ -0,0 +1,240 @@
+"""
+Async QuickBooks Online API client.
+
+One long-lived httpx.AsyncClient per realm (keep-alive connection pool,
+no TLS handshake per call) covering the v3 operations we use:
+- query:  GET  /query?query=...           -> list of entity dicts (or {"totalCount": n})
+- read:   GET  /{entity}/{id}             -> entity dict
+- create: POST /{entity}                  -> entity dict
+- update: POST /{entity}?operation=update -> entity dict (sparse by default)
+- cdc:    GET  /cdc?entities=...&changedSince=... -> {entity: [changed entity dicts]}
+- batch:  POST /batch (<= 30 create/update/query items) -> {bId: BatchItemResponse}
+
+Responses are plain JSON dicts - no python-quickbooks object round trips -
+and nothing here blocks the event loop (the SDK does blocking `requests`
+I/O, so it must not be used on request paths).
+
+Access tokens are passed per call so a token refresh never requires
+rebuilding the client or its pool.
+
+Every request takes a slot from the realm's rate governor
+(app/utils/qb_rate_governor.py). A 429 pauses the realm for Retry-After
+and the request is retried up to QB_THROTTLE_MAX_RETRIES times before
+QuickBooksRateLimitError is raised.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import httpx
+
+from app.config import settings
+from app.utils.qb_rate_governor import RateLimitedError, qb_rate_governor
+from app.utils.sanitizer import sanitize_log_message
+
+logger = logging.getLogger(__name__)
+
+QB_MINOR_VERSION = "75"
+
+# Max BatchItemRequest entries per /batch call (QuickBooks limit)
+BATCH_MAX_ITEMS = 30
+
+# QueryResponse keys that are metadata, not entity arrays
+_QUERY_METADATA_KEYS = ("startPosition", "maxResults", "totalCount")
+
+
+class QuickBooksAPIError(Exception):
+    """QuickBooks returned a non-2xx status or a Fault body."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, fault: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.fault = fault
+
+
+class QuickBooksRateLimitError(QuickBooksAPIError, RateLimitedError):
+    """QuickBooks kept answering 429 after every retry (not counted as a circuit failure)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        QuickBooksAPIError.__init__(self, message, status_code=429)
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Retry-After header in seconds (QuickBooks sends delta-seconds), if present."""
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+
+def response_fault(response: httpx.Response) -> Optional[Dict[str, Any]]:
+    """Fault body of an error response (ValidationFault etc.), if it has one."""
+    try:
+        return response.json().get("Fault")
+    except (ValueError, AttributeError):
+        return None
+
+
+class QuickBooksClient:
+    """Pooled async client for one QuickBooks company (realm)."""
+
+    def __init__(
+        self,
+        realm_id: str,
+        base_url: str,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.realm_id = realm_id
+        self.base_url = base_url
+        self._http = httpx.AsyncClient(
+            base_url=f"{base_url}/v3/company/{realm_id}",
+            params={"minorversion": QB_MINOR_VERSION},
+            headers={"Accept": "application/json"},
+            timeout=settings.QB_HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.QB_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.QB_HTTP_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        access_token: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Send one authenticated request; return the JSON body or raise QuickBooksAPIError."""
+        for _ in range(settings.QB_THROTTLE_MAX_RETRIES + 1):
+            async with qb_rate_governor.slot(self.realm_id) as governor:
+                response = await self._http.request(
+                    method,
+                    path,
+                    params=params,
+                    json=json,
+                    headers={"Authorization": f"Bearer {access_token}"},
+                )
+            if response.status_code != 429:
+                break
+            retry_after = retry_after_seconds(response)
+            governor.record_throttle(retry_after)
+        else:
+            message = f"QuickBooks {method} {path} throttled: HTTP 429 after {settings.QB_THROTTLE_MAX_RETRIES} retries"
+            logger.error(sanitize_log_message(message))
+            raise QuickBooksRateLimitError(message, retry_after=retry_after)
+
+        if response.status_code >= 400:
+            message = f"QuickBooks {method} {path} failed: HTTP {response.status_code} - {response.text[:200]}"
+            logger.error(sanitize_log_message(message))
+            raise QuickBooksAPIError(message, status_code=response.status_code, fault=response_fault(response))
+        governor.record_success()
+
+        data = response.json()
+        if "Fault" in data:
+            message = f"QB Fault on {method} {path}: {data['Fault']}"
+            logger.error(sanitize_log_message(message))
+            raise QuickBooksAPIError(message, status_code=response.status_code, fault=data["Fault"])
+        return data
+
+    async def query(self, query_string: str, access_token: str) -> Union[List[Dict[str, Any]], Dict[str, int]]:
+        """Run a QBO SQL query; COUNT queries return {"totalCount": n}."""
+        data = await self.request("GET", "/query", access_token, params={"query": query_string})
+        query_response = data.get("QueryResponse", {})
+
+        if "totalCount" in query_response:
+            return {"totalCount": query_response["totalCount"]}
+
+        # QB returns Customer, Invoice, Payment, etc. as the key
+        for key, entities in query_response.items():
+            if key not in _QUERY_METADATA_KEYS:
+                return entities if isinstance(entities, list) else [entities]
+        return []
+
+    async def read(self, entity: str, entity_id: str, access_token: str) -> Dict[str, Any]:
+        """GET one entity by Id (authoritative - prefer over query when the Id is known)."""
+        data = await self.request("GET", f"/{entity.lower()}/{entity_id}", access_token)
+        return data.get(entity, {})
+
+    async def create(self, entity: str, payload: Dict[str, Any], access_token: str) -> Dict[str, Any]:
+        """Create an entity; returns the stored entity (with Id/SyncToken)."""
+        data = await self.request("POST", f"/{entity.lower()}", access_token, json=payload)
+        return data.get(entity, {})
+
+    async def update(
+        self,
+        entity: str,
+        payload: Dict[str, Any],
+        access_token: str,
+        sparse: bool = True,
+    ) -> Dict[str, Any]:
+        """Update an entity; payload must carry Id and the current SyncToken."""
+        body = {**payload, "sparse": True} if sparse else payload
+        data = await self.request(
+            "POST", f"/{entity.lower()}", access_token, params={"operation": "update"}, json=body
+        )
+        return data.get(entity, {})
+
+    async def cdc(
+        self,
+        entities: List[str],
+        changed_since: str,
+        access_token: str,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        ChangeDataCapture: every entity of the given types changed since
+        changed_since (ISO 8601, at most 30 days back), in one request.
+
+        Deleted entities come back as {"Id": ..., "status": "Deleted", "MetaData": ...}.
+        """
+        data = await self.request(
+            "GET", "/cdc", access_token,
+            params={"entities": ",".join(entities), "changedSince": changed_since}
+        )
+        changes: Dict[str, List[Dict[str, Any]]] = {entity: [] for entity in entities}
+        for cdc_response in data.get("CDCResponse", []):
+            for query_response in cdc_response.get("QueryResponse", []):
+                for key, value in query_response.items():
+                    if key not in _QUERY_METADATA_KEYS:
+                        changes.setdefault(key, []).extend(value if isinstance(value, list) else [value])
+        return changes
+
+    async def batch(self, items: List[Dict[str, Any]], access_token: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Send up to BATCH_MAX_ITEMS BatchItemRequest entries in one request.
+
+        Returns the BatchItemResponse entries keyed by bId (QuickBooks does not
+        guarantee response order). Per-item faults come back as {"Fault": ...}
+        entries, not as a raised error.
+        """
+        if len(items) > BATCH_MAX_ITEMS:
+            raise ValueError(f"QuickBooks /batch accepts at most {BATCH_MAX_ITEMS} items, got {len(items)}")
+        data = await self.request("POST", "/batch", access_token, json={"BatchItemRequest": items})
+        return {item.get("bId"): item for item in data.get("BatchItemResponse", [])}
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+# One client (and connection pool) per realm + environment
+_clients: Dict[Tuple[str, str], QuickBooksClient] = {}
+
+
+def get_qb_client(realm_id: str, base_url: str) -> QuickBooksClient:
+    """Shared QuickBooksClient for a realm, created on first use."""
+    key = (realm_id, base_url)
+    client = _clients.get(key)
+    if client is None:
+        client = QuickBooksClient(realm_id, base_url)
+        _clients[key] = client
+        logger.info(f"[QB CLIENT] Created pooled client for realm {realm_id}")
+    return client
+
+
+async def close_qb_clients():
+    """Close every pooled client (application shutdown)."""
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
@@ -0,0 +1,392 @@
+"""
+QuickBooks Promotion Service
+
+Promotes cached QuickBooks invoices/payments (quickbooks_*_cache) into the
+core invoices/payments tables, set-based:
+
+- One statement per entity type resolves the client (clients.qb_customer_id)
+  and project mapping for the whole batch in a join, classifies rows that
+  cannot be promoted, and upserts every promotable row with
+  INSERT ... SELECT ... ON CONFLICT ... RETURNING
+- Payment promotion recomputes amount_paid / balance_due for every touched
+  invoice with one UPDATE ... FROM in the same transaction
+- The whole promotion is one transaction. If the batch statement fails on
+  an unexpected row-level error (constraint, bad value), it is retried row
+  by row inside savepoints so one bad row cannot block the rest
+
+Every call returns a report: promoted / skipped / errors counts plus
+skipped_rows (QB id + reason) and error_rows (QB id + error).
+
+Project resolution uses a single-project fallback: every invoice of a
+client goes to that client's oldest project (created_at, then project_id).
+Payments take their invoice's project, and unlinked payments take the same
+fallback. Rows whose client has no project are skipped as no_project.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Reasons a row is reported in error_rows rather than skipped_rows
+ERROR_REASONS = ("duplicate_invoice_number",)
+
+# qb_data may hold a JSON object or (older rows) a JSON-encoded string
+_QB_JSON = """
+    CASE WHEN jsonb_typeof(qb_data::jsonb) = 'string'
+         THEN (qb_data::jsonb #>> '{}')::jsonb
+         ELSE qb_data::jsonb END
+"""
+
+# Oldest project of a client - the single-project fallback
+_CLIENT_PROJECT = """
+    LEFT JOIN LATERAL (
+        SELECT project_id FROM projects
+        WHERE projects.client_id = c.client_id
+        ORDER BY created_at, project_id
+        LIMIT 1
+    ) p ON true
+"""
+
+PROMOTE_INVOICES_SQL = text(f"""
+    WITH cached AS (
+        SELECT qb_invoice_id, customer_id, total_amount, balance, {_QB_JSON} AS qb
+        FROM quickbooks_invoices_cache
+        WHERE CASE WHEN CAST(:ids AS varchar[]) IS NULL THEN is_active
+                   ELSE qb_invoice_id = ANY(CAST(:ids AS varchar[])) END
+    ),
+    resolved AS (
+        SELECT cached.*, c.client_id, p.project_id,
+               COALESCE(cached.total_amount, 0) AS total,
+               COALESCE(cached.balance, 0) AS open_balance
+        FROM cached
+        LEFT JOIN clients c ON c.qb_customer_id = cached.customer_id
+        {_CLIENT_PROJECT}
+    ),
+    classified AS (
+        SELECT r.*,
+            CASE
+                WHEN r.client_id IS NULL THEN 'client_not_found'
+                WHEN r.project_id IS NULL THEN 'no_project'
+                WHEN r.qb->>'DocNumber' IS NOT NULL AND (
+                    -- Same DocNumber twice in the batch: the lowest QB id wins
+                    row_number() OVER (PARTITION BY r.qb->>'DocNumber' ORDER BY r.qb_invoice_id) > 1
+                    OR EXISTS (
+                        SELECT 1 FROM invoices i
+                        WHERE i.invoice_number = r.qb->>'DocNumber'
+                          AND i.qb_invoice_id IS DISTINCT FROM r.qb_invoice_id
+                    )
+                ) THEN 'duplicate_invoice_number'
+            END AS skip_reason
+        FROM resolved r
+    ),
+    promoted AS (
+        INSERT INTO invoices
+        (qb_invoice_id, project_id, client_id, invoice_number, invoice_date, due_date,
+         subtotal, total_amount, amount_paid, balance_due, status, sync_status, notes,
+         email_status, print_status, bill_email, bill_address, ship_address,
+         currency_code, payment_terms, qb_metadata, private_note, customer_memo)
+        SELECT
+            qb_invoice_id, project_id, client_id,
+            qb->>'DocNumber',
+            (qb->>'TxnDate')::timestamp AT TIME ZONE 'UTC',
+            (qb->>'DueDate')::timestamp AT TIME ZONE 'UTC',
+            total,  -- QB API doesn't separate subtotal from total consistently
+            total,
+            total - open_balance,
+            open_balance,
+            (CASE WHEN open_balance = 0 THEN 'PAID'
+                  WHEN open_balance < total THEN 'PARTIALLY_PAID'
+                  ELSE 'SENT' END)::invoice_status_enum,
+            'synced',
+            'Imported from QuickBooks (QB ID: ' || qb_invoice_id || ')',
+            qb->>'EmailStatus',
+            qb->>'PrintStatus',
+            qb->'BillEmail'->>'Address',
+            qb->'BillAddr',
+            qb->'ShipAddr',
+            qb->'CurrencyRef'->>'value',
+            qb->'SalesTermRef'->>'name',
+            qb->'MetaData',
+            qb->>'PrivateNote',
+            qb->'CustomerMemo'->>'value'
+        FROM classified
+        WHERE skip_reason IS NULL
+        ON CONFLICT (qb_invoice_id) DO UPDATE SET
+            invoice_number = EXCLUDED.invoice_number,
+            invoice_date = EXCLUDED.invoice_date,
+            due_date = EXCLUDED.due_date,
+            subtotal = EXCLUDED.subtotal,
+            total_amount = EXCLUDED.total_amount,
+            amount_paid = EXCLUDED.amount_paid,
+            balance_due = EXCLUDED.balance_due,
+            status = EXCLUDED.status,
+            email_status = EXCLUDED.email_status,
+            print_status = EXCLUDED.print_status,
+            bill_email = EXCLUDED.bill_email,
+            bill_address = EXCLUDED.bill_address,
+            ship_address = EXCLUDED.ship_address,
+            currency_code = EXCLUDED.currency_code,
+            payment_terms = EXCLUDED.payment_terms,
+            qb_metadata = EXCLUDED.qb_metadata,
+            private_note = EXCLUDED.private_note,
+            customer_memo = EXCLUDED.customer_memo,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING qb_invoice_id
+    )
+    SELECT qb_invoice_id AS qb_id, NULL AS skip_reason, NULL AS detail, NULL AS invoice_id FROM promoted
+    UNION ALL
+    SELECT qb_invoice_id, skip_reason,
+           CASE skip_reason
+               WHEN 'client_not_found' THEN 'QB customer ' || COALESCE(customer_id, '?') || ' not in clients'
+               WHEN 'no_project' THEN 'No project for client ' || client_id::text
+               ELSE 'Invoice number ' || (qb->>'DocNumber') || ' already used'
+           END,
+           NULL
+    FROM classified
+    WHERE skip_reason IS NOT NULL
+""")
+
+PROMOTE_PAYMENTS_SQL = text(f"""
+    WITH cached AS (
+        SELECT qb_payment_id, customer_id, invoice_id AS qb_invoice_id, amount, payment_date,
+               payment_method, reference_number, {_QB_JSON} AS qb
+        FROM quickbooks_payments_cache
+        WHERE CASE WHEN CAST(:ids AS varchar[]) IS NULL THEN is_active
+                   ELSE qb_payment_id = ANY(CAST(:ids AS varchar[])) END
+    ),
+    resolved AS (
+        SELECT cached.*, c.client_id,
+               i.invoice_id, COALESCE(i.project_id, p.project_id) AS project_id
+        FROM cached
+        LEFT JOIN clients c ON c.qb_customer_id = cached.customer_id
+        LEFT JOIN invoices i ON i.qb_invoice_id = cached.qb_invoice_id
+        -- Payments without an invoice link (prepayments/credits) fall back to the client's project
+        LEFT JOIN LATERAL (
+            SELECT project_id FROM projects
+            WHERE cached.qb_invoice_id IS NULL AND projects.client_id = c.client_id
+            ORDER BY created_at, project_id
+            LIMIT 1
+        ) p ON true
+    ),
+    classified AS (
+        SELECT r.*,
+            CASE
+                WHEN r.client_id IS NULL THEN 'client_not_found'
+                -- Orphan payment: skip to keep invoice-level accounting intact
+                WHEN r.qb_invoice_id IS NOT NULL AND r.invoice_id IS NULL THEN 'invoice_not_promoted'
+                WHEN r.project_id IS NULL THEN 'no_project'
+            END AS skip_reason
+        FROM resolved r
+    ),
+    promoted AS (
+        INSERT INTO payments
+        (qb_payment_id, invoice_id, client_id, project_id, amount, payment_date,
+         payment_method, status, reference_number, check_number, sync_status, notes,
+         deposit_account, currency_code, total_amount, unapplied_amount, process_payment,
+         linked_transactions, qb_metadata, private_note)
+        SELECT
+            qb_payment_id, invoice_id, client_id, project_id,
+            COALESCE(amount, 0),
+            payment_date,
+            COALESCE(payment_method, 'Check'),
+            'POSTED'::payment_status_enum,
+            reference_number,
+            reference_number,  -- QB PaymentRefNum doubles as the check number
+            'synced',
+            'Imported from QuickBooks (QB ID: ' || qb_payment_id || ')',
+            qb->'DepositToAccountRef'->>'value',
+            qb->'CurrencyRef'->>'value',
+            (qb->>'TotalAmt')::numeric,
+            (qb->>'UnappliedAmt')::numeric,
+            (qb->>'ProcessPayment')::boolean,
+            NULLIF(qb->'Line', '[]'::jsonb),
+            qb->'MetaData',
+            qb->>'PrivateNote'
+        FROM classified
+        WHERE skip_reason IS NULL
+        ON CONFLICT (qb_payment_id) DO UPDATE SET
+            amount = EXCLUDED.amount,
+            payment_date = EXCLUDED.payment_date,
+            payment_method = EXCLUDED.payment_method,
+            reference_number = EXCLUDED.reference_number,
+            deposit_account = EXCLUDED.deposit_account,
+            currency_code = EXCLUDED.currency_code,
+            total_amount = EXCLUDED.total_amount,
+            unapplied_amount = EXCLUDED.unapplied_amount,
+            process_payment = EXCLUDED.process_payment,
+            linked_transactions = EXCLUDED.linked_transactions,
+            qb_metadata = EXCLUDED.qb_metadata,
+            private_note = EXCLUDED.private_note,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING qb_payment_id, invoice_id
+    )
+    SELECT qb_payment_id AS qb_id, NULL AS skip_reason, NULL AS detail, invoice_id::text AS invoice_id FROM promoted
+    UNION ALL
+    SELECT qb_payment_id, skip_reason,
+           CASE skip_reason
+               WHEN 'client_not_found' THEN 'QB customer ' || COALESCE(customer_id, '?') || ' not in clients'
+               WHEN 'invoice_not_promoted' THEN 'QB invoice ' || qb_invoice_id || ' not in invoices (promote invoices first)'
+               ELSE 'No project for client ' || client_id::text
+           END,
+           NULL
+    FROM classified
+    WHERE skip_reason IS NOT NULL
+""")
+
+# amount_paid / balance_due from POSTED payments, for every touched invoice at once
+RECOMPUTE_INVOICE_AMOUNTS_SQL = text("""
+    UPDATE invoices i
+    SET amount_paid = totals.paid,
+        balance_due = i.total_amount - totals.paid,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT touched.invoice_id, COALESCE(SUM(p.amount), 0) AS paid
+        FROM unnest(CAST(:invoice_ids AS uuid[])) AS touched(invoice_id)
+        LEFT JOIN payments p ON p.invoice_id = touched.invoice_id AND p.status = 'POSTED'
+        GROUP BY touched.invoice_id
+    ) totals
+    WHERE i.invoice_id = totals.invoice_id
+""")
+
+CANDIDATE_IDS_SQL = {
+    "invoices": text("SELECT qb_invoice_id FROM quickbooks_invoices_cache WHERE is_active = true"),
+    "payments": text("SELECT qb_payment_id FROM quickbooks_payments_cache WHERE is_active = true"),
+}
+
+
+class QuickBooksPromotionService:
+    """Set-based promotion of cached QuickBooks invoices and payments."""
+
+    async def promote_invoices(
+        self,
+        db: AsyncSession,
+        qb_invoice_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Promote cached invoices into the invoices table (one transaction).
+
+        Args:
+            db: Database session
+            qb_invoice_ids: Specific QB invoice IDs; None promotes all active cached invoices
+
+        Returns:
+            Promotion report
+        """
+        start_time = datetime.now(timezone.utc)
+        logger.info(f"[PROMOTE] Starting set-based invoice promotion (selective={bool(qb_invoice_ids)})")
+
+        report = self._new_report()
+        try:
+            await self._promote(db, "invoices", PROMOTE_INVOICES_SQL, qb_invoice_ids, report)
+            await db.commit()
+        except Exception as e:
+            logger.error(f"[PROMOTE] Invoice promotion failed: {e}", exc_info=True)
+            await db.rollback()
+            raise
+
+        return self._finish(report, "Invoice", start_time)
+
+    async def promote_payments(
+        self,
+        db: AsyncSession,
+        qb_payment_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Promote cached payments into the payments table and recompute
+        amount_paid / balance_due of every touched invoice (one transaction).
+
+        Args:
+            db: Database session
+            qb_payment_ids: Specific QB payment IDs; None promotes all active cached payments
+
+        Returns:
+            Promotion report (plus invoices_recomputed)
+        """
+        start_time = datetime.now(timezone.utc)
+        logger.info(f"[PROMOTE] Starting set-based payment promotion (selective={bool(qb_payment_ids)})")
+
+        report = self._new_report()
+        try:
+            invoice_ids = await self._promote(db, "payments", PROMOTE_PAYMENTS_SQL, qb_payment_ids, report)
+            report["invoices_recomputed"] = 0
+            if invoice_ids:
+                result = await db.execute(RECOMPUTE_INVOICE_AMOUNTS_SQL, {"invoice_ids": sorted(invoice_ids)})
+                report["invoices_recomputed"] = result.rowcount
+            await db.commit()
+        except Exception as e:
+            logger.error(f"[PROMOTE] Payment promotion failed: {e}", exc_info=True)
+            await db.rollback()
+            raise
+
+        return self._finish(report, "Payment", start_time)
+
+    async def _promote(
+        self,
+        db: AsyncSession,
+        entity_type: str,
+        statement,
+        qb_ids: Optional[List[str]],
+        report: Dict[str, Any]
+    ) -> set:
+        """Run the batch statement; fall back to row-by-row savepoints if it fails."""
+        try:
+            async with db.begin_nested():
+                rows = (await db.execute(statement, {"ids": qb_ids or None})).fetchall()
+            return self._collect(rows, report)
+        except Exception as batch_error:
+            logger.warning(
+                f"[PROMOTE] Batch {entity_type} promotion failed ({batch_error}); retrying row by row"
+            )
+
+        if qb_ids is None:
+            qb_ids = list((await db.execute(CANDIDATE_IDS_SQL[entity_type])).scalars().all())
+
+        touched = set()
+        for qb_id in qb_ids:
+            try:
+                async with db.begin_nested():
+                    rows = (await db.execute(statement, {"ids": [qb_id]})).fetchall()
+                touched |= self._collect(rows, report)
+            except Exception as e:
+                logger.error(f"[PROMOTE] Failed to promote {entity_type} {qb_id}: {e}")
+                report["error_rows"].append({"qb_id": qb_id, "error": str(e)})
+        return touched
+
+    @staticmethod
+    def _collect(rows, report: Dict[str, Any]) -> set:
+        """Fold statement result rows into the report; return touched invoice_ids."""
+        touched = set()
+        for row in rows:
+            if row.skip_reason is None:
+                report["promoted"] += 1
+                if row.invoice_id:
+                    touched.add(row.invoice_id)
+            elif row.skip_reason in ERROR_REASONS:
+                report["error_rows"].append({"qb_id": row.qb_id, "error": row.detail, "reason": row.skip_reason})
+            else:
+                report["skipped_rows"].append({"qb_id": row.qb_id, "reason": row.skip_reason, "detail": row.detail})
+        return touched
+
+    @staticmethod
+    def _new_report() -> Dict[str, Any]:
+        return {"promoted": 0, "skipped_rows": [], "error_rows": []}
+
+    @staticmethod
+    def _finish(report: Dict[str, Any], label: str, start_time: datetime) -> Dict[str, Any]:
+        report["skipped"] = len(report["skipped_rows"])
+        report["errors"] = len(report["error_rows"])
+        report["duration_ms"] = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
+        logger.info(
+            f"[PROMOTE] {label} promotion complete: {report['promoted']} promoted, "
+            f"{report['skipped']} skipped, {report['errors']} errors, {report['duration_ms']}ms"
+        )
+        return report
+
+
+# Singleton instance
+qb_promotion_service = QuickBooksPromotionService()
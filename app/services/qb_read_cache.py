@@ -0,0 +1,187 @@
+"""
+QuickBooks Read Cache
+
+Two-tier read path for synced QuickBooks customers, invoices and payments,
+and for the chat-context tier (every customer and invoice, not just GC
+Compliance ones):
+
+- L1: an in-memory snapshot per entity type (every cached row, loaded once)
+- L2: the quickbooks_*_cache and quickbooks_context_* tables the sync / CDC /
+  webhook paths maintain
+
+Each snapshot is versioned by its sync_status row: the sync watermark
+(last_sync_at) plus cache_version, which a statement trigger on each cache
+table bumps on every write. A read costs one primary-key query on
+sync_status; only when the version moved is the table re-read. Values
+derived from snapshots (e.g. the chat context summary) are memoized per
+version too.
+
+Nothing here calls QuickBooks - the live API is only touched by an explicit
+sync (POST /v1/quickbooks/sync/...), whose writes move the version.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import JSON, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.qb_cache_loader import CACHE_TABLES
+
+logger = logging.getLogger(__name__)
+
+# entity_type -> columns held in memory and the order rows are served in
+SNAPSHOT_QUERIES = {
+    "customers": (
+        "qb_customer_id, display_name, company_name, given_name, family_name, email, phone, "
+        "qb_data, qb_last_modified, is_active, cached_at",
+        "display_name, qb_customer_id"
+    ),
+    "invoices": (
+        "qb_invoice_id, customer_id, doc_number, total_amount, balance, due_date, "
+        "qb_data, qb_last_modified, is_active, cached_at",
+        "due_date DESC, qb_invoice_id"
+    ),
+    "payments": (
+        "qb_payment_id, customer_id, invoice_id, amount, payment_date, payment_method, reference_number, "
+        "qb_data, qb_last_modified, is_active, cached_at",
+        "payment_date DESC, qb_payment_id"
+    ),
+    "context_customers": (
+        "qb_customer_id, display_name, qb_data, qb_last_modified, is_active, cached_at",
+        "display_name, qb_customer_id"
+    ),
+    "context_invoices": (
+        "qb_invoice_id, customer_id, qb_data, qb_last_modified, is_active, cached_at",
+        "qb_invoice_id"
+    ),
+}
+
+VERSION_SQL = text("""
+    SELECT entity_type, last_sync_at, cache_version FROM sync_status
+    WHERE entity_type IN ('customers', 'invoices', 'payments', 'context_customers', 'context_invoices')
+""")
+
+
+class CacheSnapshot:
+    """Every cached row of one entity type as of one version."""
+
+    def __init__(self, entity_type: str, version: Tuple, rows: List[Any]):
+        key = CACHE_TABLES[entity_type][1]
+        self.entity_type = entity_type
+        self.version = version
+        self.rows = rows
+        self.by_id = {getattr(row, key): row for row in rows}
+        self.loaded_at = time.monotonic()
+
+    def active(self) -> List[Any]:
+        return [row for row in self.rows if row.is_active]
+
+
+class QuickBooksReadCache:
+    """L1 snapshots over the QuickBooks cache tables, reloaded when the sync version moves."""
+
+    def __init__(self):
+        self._snapshots: Dict[str, CacheSnapshot] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # name -> (versions it was built from, value)
+        self._derived: Dict[str, Tuple[Tuple, Any]] = {}
+        self.memory_hits = 0
+        self.db_loads = 0
+
+    async def versions(self, db: AsyncSession) -> Dict[str, Tuple]:
+        """Current (last_sync_at, cache_version) of each entity type - one indexed query."""
+        result = await db.execute(VERSION_SQL)
+        return {row.entity_type: (row.last_sync_at, row.cache_version) for row in result.fetchall()}
+
+    async def snapshot(
+        self,
+        db: AsyncSession,
+        entity_type: str,
+        versions: Optional[Dict[str, Tuple]] = None
+    ) -> CacheSnapshot:
+        """
+        The snapshot of one entity type, re-read from its cache table only if
+        the version moved since it was loaded (single-flight per type).
+
+        Args:
+            db: Database session
+            entity_type: customers, invoices, payments, context_customers or context_invoices
+            versions: Result of versions() when reading several types at once
+        """
+        if entity_type not in SNAPSHOT_QUERIES:
+            raise ValueError(f"Unknown QuickBooks cache entity type: {entity_type}")
+        if versions is None:
+            versions = await self.versions(db)
+        version = versions.get(entity_type)
+
+        current = self._snapshots.get(entity_type)
+        if current is not None and current.version == version:
+            self.memory_hits += 1
+            return current
+
+        lock = self._locks.setdefault(entity_type, asyncio.Lock())
+        async with lock:
+            current = self._snapshots.get(entity_type)
+            if current is not None and current.version == version:
+                self.memory_hits += 1
+                return current
+
+            table = CACHE_TABLES[entity_type][0]
+            columns, order_by = SNAPSHOT_QUERIES[entity_type]
+            result = await db.execute(
+                text(f"SELECT {columns} FROM {table} ORDER BY {order_by}").columns(qb_data=JSON)
+            )
+            current = CacheSnapshot(entity_type, version, result.fetchall())
+            self._snapshots[entity_type] = current
+            self.db_loads += 1
+            logger.info(f"[QB READ CACHE] Loaded {len(current.rows)} {entity_type} (version {version})")
+            return current
+
+    async def get_by_id(self, db: AsyncSession, entity_type: str, qb_id: str):
+        """One cached row by QuickBooks ID (None if not cached)."""
+        return (await self.snapshot(db, entity_type)).by_id.get(str(qb_id))
+
+    async def derive(self, db: AsyncSession, name: str, entity_types: Tuple[str, ...], build: Callable[..., Any]) -> Any:
+        """
+        build(*snapshots) for the given entity types, memoized until any of
+        their versions moves. The result is shared - callers must not mutate it.
+        """
+        versions = await self.versions(db)
+        snapshots = [await self.snapshot(db, entity_type, versions) for entity_type in entity_types]
+        built_from = tuple(snapshot.version for snapshot in snapshots)
+
+        cached = self._derived.get(name)
+        if cached is not None and cached[0] == built_from:
+            return cached[1]
+        value = build(*snapshots)
+        self._derived[name] = (built_from, value)
+        return value
+
+    def reset(self):
+        """Forget snapshots, derived values, locks and counters (tests; locks are bound to an event loop)."""
+        self._snapshots.clear()
+        self._derived.clear()
+        self._locks.clear()
+        self.memory_hits = self.db_loads = 0
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "snapshots": {
+                entity_type: {
+                    "rows": len(snapshot.rows),
+                    "last_sync_at": snapshot.version[0].isoformat() if snapshot.version and snapshot.version[0] else None,
+                    "cache_version": snapshot.version[1] if snapshot.version else None,
+                    "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1),
+                }
+                for entity_type, snapshot in self._snapshots.items()
+            },
+            "memory_hits": self.memory_hits,
+            "db_loads": self.db_loads,
+        }
+
+
+# Global instance
+qb_read_cache = QuickBooksReadCache()
@@ -0,0 +1,285 @@
+"""
+QuickBooks Reference-Data Cache
+
+Items, terms, customer types, vendors and tax codes change maybe monthly but
+were fetched from QuickBooks on every invoice and every /items, /vendors or
+/customer-types request. They now live in qb_reference_data (one row per
+entity, full QB payload) and in process memory:
+
+- get() serves the in-memory copy; after QB_REFERENCE_MEMORY_TTL_MINUTES it
+  re-reads Postgres (picking up refreshes made by other instances)
+- a Postgres copy older than QB_REFERENCE_CACHE_TTL_HOURS (or never loaded)
+  is reloaded from QuickBooks - one query per entity type
+- webhooks (Item / Term / Vendor / TaxCode / CustomerType events) apply the
+  changed records by Id, and CDC syncs carry Item, Term and Vendor changes
+  in the same ChangeDataCapture call as customers/invoices/payments
+  (CustomerType and TaxCode are not CDC entities - the TTL covers them)
+
+qb_reference_status.refreshed_at is the point up to which a type is known to
+be complete; CDC changes are only applied to types whose refreshed_at covers
+the CDC window, so a gap is never mistaken for "no changes".
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import JSON, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.services.quickbooks_service import get_quickbooks_service
+from app.utils.qb_query_builder import QBQuery
+
+logger = logging.getLogger(__name__)
+
+# Reference entity type -> QB entity name
+REFERENCE_ENTITIES = {
+    "items": "Item",
+    "terms": "Term",
+    "customer_types": "CustomerType",
+    "vendors": "Vendor",
+    "tax_codes": "TaxCode",
+}
+
+# Reference entities ChangeDataCapture supports
+CDC_REFERENCE_ENTITIES = ("items", "terms", "vendors")
+
+UPSERT_SQL = text("""
+    INSERT INTO qb_reference_data (entity_type, qb_id, name, active, qb_data, cached_at)
+    VALUES (:entity_type, :qb_id, :name, :active, :qb_data, :cached_at)
+    ON CONFLICT (entity_type, qb_id) DO UPDATE SET
+        name = excluded.name,
+        active = excluded.active,
+        qb_data = excluded.qb_data,
+        cached_at = excluded.cached_at
+""").bindparams(bindparam("qb_data", type_=JSON))
+
+SELECT_SQL = text("""
+    SELECT qb_data FROM qb_reference_data
+    WHERE entity_type = :entity_type
+    ORDER BY name, qb_id
+""").columns(qb_data=JSON)
+
+
+def reference_row(entity_type: str, record: Dict[str, Any], cached_at: datetime) -> Dict[str, Any]:
+    """QB reference entity -> qb_reference_data row."""
+    return {
+        "entity_type": entity_type,
+        "qb_id": str(record["Id"]),
+        "name": record.get("Name") or record.get("DisplayName"),
+        "active": record.get("Active", True) is not False,
+        "qb_data": record,
+        "cached_at": cached_at,
+    }
+
+
+class QuickBooksReferenceCache:
+    """Postgres-backed, memory-held cache of QuickBooks reference lists."""
+
+    def __init__(self):
+        # entity_type -> (monotonic load time, records)
+        self._memory: Dict[str, tuple] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.memory_hits = 0
+        self.db_loads = 0
+        self.qb_refreshes = 0
+        self.last_error: Optional[str] = None
+
+    # ==================== Reads ====================
+
+    async def get(
+        self,
+        db: AsyncSession,
+        entity_type: str,
+        active_only: bool = False,
+        qb_service=None
+    ) -> List[Dict[str, Any]]:
+        """
+        Every cached record of a reference type (QB payloads, ordered by name).
+
+        Args:
+            db: Database session
+            entity_type: One of REFERENCE_ENTITIES
+            active_only: Drop records with Active = false
+            qb_service: QuickBooksService for a reload (default: one on db)
+        """
+        records = self._fresh_memory(entity_type)
+        if records is None:
+            records = await self._load(db, entity_type, qb_service)
+        else:
+            self.memory_hits += 1
+        if active_only:
+            return [record for record in records if record.get("Active", True) is not False]
+        return records
+
+    async def get_by_id(self, db: AsyncSession, entity_type: str, qb_id: str) -> Optional[Dict[str, Any]]:
+        return next((record for record in await self.get(db, entity_type) if str(record.get("Id")) == str(qb_id)), None)
+
+    def _fresh_memory(self, entity_type: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._memory.get(entity_type)
+        if entry and time.monotonic() - entry[0] < settings.QB_REFERENCE_MEMORY_TTL_MINUTES * 60:
+            return entry[1]
+        return None
+
+    async def _load(self, db: AsyncSession, entity_type: str, qb_service=None) -> List[Dict[str, Any]]:
+        """Fill memory from Postgres, refreshing from QuickBooks when Postgres is stale (single-flight)."""
+        if entity_type not in REFERENCE_ENTITIES:
+            raise ValueError(f"Unknown reference entity type: {entity_type}")
+        lock = self._locks.setdefault(entity_type, asyncio.Lock())
+        async with lock:
+            records = self._fresh_memory(entity_type)
+            if records is not None:
+                return records
+
+            refreshed_at = (await self.refreshed_at(db, [entity_type])).get(entity_type)
+            max_age = timedelta(hours=settings.QB_REFERENCE_CACHE_TTL_HOURS)
+            if refreshed_at is None or datetime.now(timezone.utc) - refreshed_at > max_age:
+                try:
+                    await self.refresh(db, entity_type, qb_service)
+                except Exception as e:
+                    if refreshed_at is None:
+                        raise
+                    # Serve the stale copy rather than fail the request
+                    logger.warning(f"[QB REFERENCE] {entity_type} refresh failed, serving copy from {refreshed_at}: {e}")
+                    self.last_error = str(e)
+                    await db.rollback()
+
+            records = [row.qb_data for row in (await db.execute(SELECT_SQL, {"entity_type": entity_type})).fetchall()]
+            self._memory[entity_type] = (time.monotonic(), records)
+            self.db_loads += 1
+            return records
+
+    async def refreshed_at(self, db: AsyncSession, entity_types: Iterable[str]) -> Dict[str, datetime]:
+        """When each type was last known complete (types never loaded are absent)."""
+        result = await db.execute(
+            text(
+                "SELECT entity_type, refreshed_at FROM qb_reference_status WHERE entity_type IN :entity_types"
+            ).bindparams(bindparam("entity_types", expanding=True)),
+            {"entity_types": list(entity_types)}
+        )
+        return {
+            row.entity_type: row.refreshed_at if row.refreshed_at.tzinfo else row.refreshed_at.replace(tzinfo=timezone.utc)
+            for row in result.fetchall()
+        }
+
+    # ==================== Writes ====================
+
+    async def refresh(self, db: AsyncSession, entity_type: str, qb_service=None) -> int:
+        """Reload one reference type from QuickBooks (inactive records included); returns the record count."""
+        qb_entity = REFERENCE_ENTITIES[entity_type]
+        started_at = datetime.now(timezone.utc)
+        qb_service = qb_service or get_quickbooks_service(db)
+        records = await qb_service.query_all(f"SELECT * FROM {qb_entity} WHERE Active IN (true, false)")
+        self.qb_refreshes += 1
+
+        qb_ids = [str(record["Id"]) for record in records if record.get("Id")]
+        await self._upsert(db, entity_type, [r for r in records if r.get("Id")], started_at)
+        await db.execute(
+            text(
+                "DELETE FROM qb_reference_data WHERE entity_type = :entity_type AND qb_id NOT IN :qb_ids"
+            ).bindparams(bindparam("qb_ids", expanding=True)),
+            {"entity_type": entity_type, "qb_ids": qb_ids or [""]}
+        )
+        await self._mark_refreshed(db, entity_type, started_at)
+        await db.commit()
+        self.invalidate(entity_type)
+        logger.info(f"[QB REFERENCE] Refreshed {len(qb_ids)} {entity_type} from QuickBooks")
+        return len(qb_ids)
+
+    async def apply_changes(
+        self,
+        db: AsyncSession,
+        entity_type: str,
+        changed: List[Dict[str, Any]],
+        deleted_ids: List[str],
+        refreshed_at: Optional[datetime] = None
+    ) -> int:
+        """
+        Apply changed / deleted records of one type (CDC or webhook). With
+        refreshed_at (a CDC window end), the type is marked complete up to it.
+        Commits.
+        """
+        now = datetime.now(timezone.utc)
+        await self._upsert(db, entity_type, changed, now)
+        if deleted_ids:
+            await db.execute(
+                text(
+                    "DELETE FROM qb_reference_data WHERE entity_type = :entity_type AND qb_id IN :qb_ids"
+                ).bindparams(bindparam("qb_ids", expanding=True)),
+                {"entity_type": entity_type, "qb_ids": [str(qb_id) for qb_id in deleted_ids]}
+            )
+        if refreshed_at is not None:
+            await self._mark_refreshed(db, entity_type, refreshed_at)
+        await db.commit()
+        self.invalidate(entity_type)
+        if changed or deleted_ids:
+            logger.info(f"[QB REFERENCE] Applied {len(changed)} changed / {len(deleted_ids)} deleted {entity_type}")
+        return len(changed) + len(deleted_ids)
+
+    async def apply_webhook(self, db: AsyncSession, entity_type: str, upsert_ids: List[str], deleted_ids: List[str]) -> Dict[str, Any]:
+        """
+        Fetch the notified records by Id and apply them (one QB query,
+        inactive records included). Requested Ids QuickBooks no longer
+        returns are treated as deleted.
+        """
+        changed = []
+        deleted_ids = [str(qb_id) for qb_id in deleted_ids]
+        if upsert_ids:
+            qb_service = get_quickbooks_service(db)
+            changed = await qb_service.query_all(
+                QBQuery(REFERENCE_ENTITIES[entity_type]).where_in("Id", upsert_ids).where("Active IN (true, false)")
+            )
+            returned = {str(record.get("Id")) for record in changed}
+            deleted_ids += [str(qb_id) for qb_id in upsert_ids if str(qb_id) not in returned]
+        await self.apply_changes(db, entity_type, changed, deleted_ids)
+        return {"records_synced": len(changed), "deactivated": len(deleted_ids)}
+
+    async def _upsert(self, db: AsyncSession, entity_type: str, records: List[Dict[str, Any]], cached_at: datetime):
+        if records:
+            await db.execute(UPSERT_SQL, [reference_row(entity_type, record, cached_at) for record in records])
+
+    async def _mark_refreshed(self, db: AsyncSession, entity_type: str, refreshed_at: datetime):
+        record_count = (await db.execute(
+            text("SELECT count(*) FROM qb_reference_data WHERE entity_type = :entity_type"),
+            {"entity_type": entity_type}
+        )).scalar()
+        await db.execute(
+            text("""
+                INSERT INTO qb_reference_status (entity_type, refreshed_at, record_count)
+                VALUES (:entity_type, :refreshed_at, :record_count)
+                ON CONFLICT (entity_type) DO UPDATE SET
+                    refreshed_at = excluded.refreshed_at,
+                    record_count = excluded.record_count
+            """),
+            {"entity_type": entity_type, "refreshed_at": refreshed_at, "record_count": record_count}
+        )
+
+    def invalidate(self, entity_type: Optional[str] = None):
+        """Drop the in-memory copy (one type or all); the next get() re-reads Postgres."""
+        if entity_type is None:
+            self._memory.clear()
+        else:
+            self._memory.pop(entity_type, None)
+
+    def reset(self):
+        """Forget memory, locks and counters (tests; locks are bound to an event loop)."""
+        self._memory.clear()
+        self._locks.clear()
+        self.memory_hits = self.db_loads = self.qb_refreshes = 0
+        self.last_error = None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "in_memory": sorted(self._memory),
+            "memory_hits": self.memory_hits,
+            "db_loads": self.db_loads,
+            "qb_refreshes": self.qb_refreshes,
+            "last_error": self.last_error,
+        }
+
+
+# Global instance
+qb_reference_cache = QuickBooksReferenceCache()
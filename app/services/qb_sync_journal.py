@@ -0,0 +1,195 @@
+"""
+QuickBooks Sync Run Journal
+
+One sync_runs row per entity sync run (query mode). Each committed page
+advances the row's checkpoint in the same transaction as the page's cache
+upserts:
+- pages_committed / next_start_position: where the STARTPOSITION walk resumes
+- records_fetched / records_synced / errors: running totals across resumes
+- started_at: the run's delta watermark - a resumed run keeps the original
+  start, so changes made while it was interrupted are caught by the next delta
+
+open_run() resumes the newest run for the same query and page size that
+failed, or was left "running" with no checkpoint for QB_SYNC_RUN_STALE_MINUTES
+(process died / redeploy), if it started within QB_SYNC_RESUME_MAX_AGE_HOURS.
+Otherwise it starts a new run. A delta run's query embeds its since
+watermark, which only moves on success, so the retry of a failed delta run
+resumes too.
+
+Resuming by STARTPOSITION needs the query in a fixed order, so sync queries
+are ORDERBY Id: records created during the interruption land after the
+checkpoint and edits don't move a record. Records deleted during the
+interruption can still shift later ones back by a few positions (they are
+caught the next time they change).
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_RUN_COLUMNS = """
+    id, entity_type, since, page_size, status, pages_committed, next_start_position,
+    records_fetched, records_synced, errors, last_error, resume_count, started_at, updated_at, finished_at
+"""
+
+
+class QuickBooksSyncJournal:
+    """Checkpointed sync_runs rows - resumable query-mode syncs and run history."""
+
+    async def open_run(
+        self,
+        db: AsyncSession,
+        entity_type: str,
+        query: str,
+        since: Optional[datetime],
+        page_size: int
+    ) -> Dict[str, Any]:
+        """
+        Resume the latest interrupted run of this query, or start a new one.
+
+        Returns:
+            Dict with id, query, page_size, started_at (watermark),
+            start_position and resumed
+        """
+        now = datetime.now(timezone.utc)
+        # Two processes resuming at once: the second one starts a fresh run
+        lock = "FOR UPDATE SKIP LOCKED" if self._is_postgresql(db) else ""
+        result = await db.execute(
+            text(f"""
+                UPDATE sync_runs SET
+                    status = 'running',
+                    resume_count = resume_count + 1,
+                    updated_at = :now
+                WHERE id = (
+                    SELECT id FROM sync_runs
+                    WHERE entity_type = :entity_type
+                      AND query = :query
+                      AND page_size = :page_size
+                      AND started_at > :oldest
+                      AND (status = 'failed' OR (status = 'running' AND updated_at < :stale_before))
+                    ORDER BY started_at DESC
+                    LIMIT 1
+                    {lock}
+                )
+                RETURNING id, started_at, next_start_position, pages_committed
+            """),
+            {
+                "entity_type": entity_type,
+                "query": query,
+                "page_size": page_size,
+                "now": now,
+                "oldest": now - timedelta(hours=settings.QB_SYNC_RESUME_MAX_AGE_HOURS),
+                "stale_before": now - timedelta(minutes=settings.QB_SYNC_RUN_STALE_MINUTES),
+            }
+        )
+        row = result.fetchone()
+        resumed = row is not None
+
+        if resumed:
+            logger.info(
+                f"[SYNC JOURNAL] Resuming {entity_type} run {row.id} at STARTPOSITION "
+                f"{row.next_start_position} ({row.pages_committed} pages already committed)"
+            )
+        else:
+            result = await db.execute(
+                text("""
+                    INSERT INTO sync_runs (entity_type, query, since, page_size, started_at, updated_at)
+                    VALUES (:entity_type, :query, :since, :page_size, :now, :now)
+                    RETURNING id, started_at, next_start_position, pages_committed
+                """),
+                {"entity_type": entity_type, "query": query, "since": since, "page_size": page_size, "now": now}
+            )
+            row = result.fetchone()
+        await db.commit()
+
+        return {
+            "id": row.id,
+            "entity_type": entity_type,
+            "query": query,
+            "page_size": page_size,
+            "started_at": row.started_at,
+            "start_position": row.next_start_position,
+            "resumed": resumed,
+        }
+
+    async def checkpoint(self, db: AsyncSession, run: Dict[str, Any], fetched: int, synced: int, errors: int):
+        """Advance the run past one page. Not committed - commit with the page's upserts."""
+        await db.execute(
+            text("""
+                UPDATE sync_runs SET
+                    pages_committed = pages_committed + 1,
+                    next_start_position = next_start_position + page_size,
+                    records_fetched = records_fetched + :fetched,
+                    records_synced = records_synced + :synced,
+                    errors = errors + :errors,
+                    updated_at = :now
+                WHERE id = :id
+            """),
+            {"id": run["id"], "fetched": fetched, "synced": synced, "errors": errors, "now": datetime.now(timezone.utc)}
+        )
+
+    async def complete(self, db: AsyncSession, run: Dict[str, Any]):
+        await self._finish(db, run, "completed", None)
+
+    async def fail(self, db: AsyncSession, run: Dict[str, Any], error: str):
+        """Mark the run resumable. Call after rolling back the failed page."""
+        await self._finish(db, run, "failed", error)
+
+    async def _finish(self, db: AsyncSession, run: Dict[str, Any], status: str, error: Optional[str]):
+        now = datetime.now(timezone.utc)
+        try:
+            await db.execute(
+                text("""
+                    UPDATE sync_runs SET
+                        status = :status,
+                        last_error = COALESCE(:error, last_error),
+                        updated_at = :now,
+                        finished_at = :finished_at
+                    WHERE id = :id
+                """),
+                {
+                    "id": run["id"],
+                    "status": status,
+                    "error": error,
+                    "now": now,
+                    "finished_at": now if status == "completed" else None,
+                }
+            )
+            await db.commit()
+            run["status"] = status
+        except Exception as e:
+            logger.error(f"[SYNC JOURNAL] Failed to mark run {run['id']} {status}: {e}")
+            await db.rollback()
+
+    @staticmethod
+    def _is_postgresql(db: AsyncSession) -> bool:
+        dialect = getattr(getattr(db, "bind", None), "dialect", None)
+        return getattr(dialect, "name", None) == "postgresql"
+
+    async def history(self, db: AsyncSession, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent runs, newest first."""
+        result = await db.execute(
+            text(f"SELECT {_RUN_COLUMNS} FROM sync_runs ORDER BY started_at DESC, id DESC LIMIT :limit"),
+            {"limit": limit}
+        )
+        return [
+            {
+                **row._asdict(),
+                "since": row.since.isoformat() if row.since else None,
+                "started_at": row.started_at.isoformat(),
+                "updated_at": row.updated_at.isoformat(),
+                "finished_at": row.finished_at.isoformat() if row.finished_at else None,
+            }
+            for row in result.fetchall()
+        ]
+
+
+# Global instance
+qb_sync_journal = QuickBooksSyncJournal()
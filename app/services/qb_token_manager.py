@@ -0,0 +1,292 @@
+"""
+Process-wide QuickBooks token manager.
+
+Every chat/QuickBooks request builds a QuickBooksService; without a shared
+cache each one re-reads quickbooks_tokens and, near expiry, several of
+them would refresh the same token at once (QuickBooks rotates refresh
+tokens, so the losers end up holding a revoked one).
+
+QuickBooksTokenManager keeps the active token in memory:
+- load(): first caller reads the DB, everyone after uses the cache
+- refresh(): single-flight - one coroutine refreshes under a lock, the
+  others wait and receive its result; persisted via save_tokens_to_db.
+  Across app instances the refresh runs under a PostgreSQL advisory
+  transaction lock and re-reads quickbooks_tokens first: if another
+  instance already rotated the token, its token is adopted instead of
+  calling Intuit with a refresh token that is no longer valid
+- reload(): re-read quickbooks_tokens - after a failed refresh, and every
+  QB_TOKEN_RELOAD_SECONDS from the background task, so reconnects and
+  disconnects made on another instance reach this one
+- start(): background task that refreshes QB_TOKEN_REFRESH_LEAD_SECONDS
+  before expiry so request paths never pay for a refresh
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from intuitlib.client import AuthClient
+from sqlalchemy import select, text
+
+from app.config import settings
+from app.db.models import QuickBooksToken
+from app.utils.leader_election import advisory_lock_key
+
+logger = logging.getLogger(__name__)
+
+REFRESH_LOCK_KEY = advisory_lock_key("quickbooks_token_refresh")
+
+
+class QuickBooksTokenManager:
+    """In-memory active QuickBooks token with single-flight refresh."""
+
+    def __init__(self):
+        self.realm_id: Optional[str] = None
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.expires_at: Optional[datetime] = None
+        self.environment: str = settings.QB_ENVIRONMENT
+        self.loaded = False
+        self.refresh_count = 0
+        self.adopted_count = 0
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+
+    # ==================== Cache ====================
+
+    def set_tokens(
+        self,
+        realm_id: str,
+        access_token: str,
+        refresh_token: str,
+        expires_at: datetime,
+        environment: Optional[str] = None
+    ):
+        """Replace the cached token (after DB load, refresh or OAuth callback)."""
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self.realm_id = realm_id
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.environment = environment or self.environment
+        self.loaded = True
+        self._loaded_at = time.monotonic()
+
+    def clear(self):
+        """Forget the cached token (revoked/disconnected)."""
+        self.realm_id = None
+        self.access_token = None
+        self.refresh_token = None
+        self.expires_at = None
+        self.loaded = True
+        self._loaded_at = time.monotonic()
+
+    def has_token(self) -> bool:
+        return bool(self.realm_id and self.access_token and self.refresh_token)
+
+    def expires_within(self, seconds: float) -> bool:
+        """True when the access token expires within `seconds` (or is unknown)."""
+        if not self.expires_at:
+            return True
+        return datetime.now(timezone.utc) >= self.expires_at - timedelta(seconds=seconds)
+
+    async def load(self, db=None) -> bool:
+        """Populate the cache from quickbooks_tokens once per process."""
+        if self.loaded:
+            return self.has_token()
+
+        async with self._lock:
+            if not self.loaded:
+                await self._load_from_db(db)
+        return self.has_token()
+
+    async def reload(self) -> bool:
+        """
+        Re-read the active token from quickbooks_tokens (another instance
+        may have refreshed, reconnected or disconnected). A failed read
+        keeps the token in memory.
+        """
+        async with self._lock:
+            try:
+                await self._load_from_db()
+            except Exception as e:
+                logger.warning(f"[QB TOKENS] Reload from database failed, keeping cached token: {e}")
+        return self.has_token()
+
+    async def _read_active_token(self, db) -> Optional[QuickBooksToken]:
+        result = await db.execute(
+            select(QuickBooksToken)
+            .where(QuickBooksToken.is_active == True)
+            .order_by(QuickBooksToken.updated_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    def _adopt_record(self, token_record: QuickBooksToken):
+        self.set_tokens(
+            token_record.realm_id,
+            token_record.access_token,
+            token_record.refresh_token,
+            token_record.access_token_expires_at,
+            token_record.environment
+        )
+
+    async def _load_from_db(self, db=None):
+        if db is None:
+            from app.db.session import AsyncSessionLocal
+            async with AsyncSessionLocal() as session:
+                return await self._load_from_db(session)
+
+        token_record = await self._read_active_token(db)
+        if token_record:
+            changed = token_record.access_token != self.access_token
+            self._adopt_record(token_record)
+            if changed:
+                logger.info(f"[QB TOKENS] Loaded token for realm {self.realm_id} (expires {self.expires_at})")
+        else:
+            if self.has_token():
+                logger.info("[QB TOKENS] No active QuickBooks token in database - cleared cached token")
+            self.clear()
+
+    # ==================== Refresh ====================
+
+    async def refresh(self, min_validity_seconds: float = 300, force: bool = False) -> bool:
+        """
+        Refresh the access token unless it is valid for min_validity_seconds.
+
+        Single-flight: concurrent callers queue on the lock; whoever gets it
+        first refreshes, the rest see the new token and return immediately.
+        """
+        token_before = self.access_token
+        async with self._lock:
+            if not self.has_token():
+                return False
+            if self.access_token != token_before:
+                return True  # Another coroutine refreshed while we waited
+            if not force and not self.expires_within(min_validity_seconds):
+                return True
+
+            try:
+                await self._refresh_and_persist()
+                self.refresh_count += 1
+                logger.info(f"[QB TOKENS] Access token refreshed (valid until {self.expires_at})")
+                return True
+            except Exception as e:
+                logger.error(f"[QB TOKENS] Token refresh failed: {e}", exc_info=True)
+
+            # Another instance may have rotated the refresh token under us
+            try:
+                await self._load_from_db()
+            except Exception as e:
+                logger.warning(f"[QB TOKENS] Reload after failed refresh failed: {e}")
+                return False
+            return (
+                self.has_token()
+                and self.access_token != token_before
+                and not self.expires_within(min_validity_seconds)
+            )
+
+    async def _request_refresh(self) -> AuthClient:
+        """Call Intuit's token endpoint (intuitlib is blocking - run it off the event loop)."""
+        auth_client = AuthClient(
+            client_id=settings.QB_CLIENT_ID,
+            client_secret=settings.QB_CLIENT_SECRET,
+            redirect_uri=settings.QB_REDIRECT_URI,
+            environment=self.environment
+        )
+        await asyncio.to_thread(auth_client.refresh, refresh_token=self.refresh_token)
+        return auth_client
+
+    async def _lock_refresh(self, db):
+        """Serialize refreshes across app instances until db's transaction ends (no-op off PostgreSQL)."""
+        db.info["use_replica"] = False  # The lock and the token read it guards belong on the primary
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": REFRESH_LOCK_KEY})
+
+    async def _refresh_and_persist(self):
+        # Persist through the service so DB and cache stay in one code path
+        from app.db.session import AsyncSessionLocal
+        from app.services.quickbooks_service import QuickBooksService
+        async with AsyncSessionLocal() as db:
+            await self._lock_refresh(db)
+
+            # Another instance may have refreshed while we waited for the lock
+            token_record = await self._read_active_token(db)
+            if token_record is not None and token_record.access_token != self.access_token:
+                self._adopt_record(token_record)
+                await db.rollback()  # Releases the lock
+                self.adopted_count += 1
+                logger.info(f"[QB TOKENS] Adopted token refreshed by another instance (valid until {self.expires_at})")
+                return
+
+            auth_client = await self._request_refresh()
+            # Commits (and releases the lock) once the rotated token is stored
+            saved = await QuickBooksService(db=db).save_tokens_to_db(
+                realm_id=self.realm_id,
+                access_token=auth_client.access_token,
+                refresh_token=auth_client.refresh_token,
+                expires_in=auth_client.expires_in
+            )
+        if not saved:
+            # Refresh token already rotated at Intuit - keep using it in memory
+            self.set_tokens(
+                self.realm_id,
+                auth_client.access_token,
+                auth_client.refresh_token,
+                datetime.now(timezone.utc) + timedelta(seconds=auth_client.expires_in)
+            )
+
+    # ==================== Background refresher ====================
+
+    async def start(self):
+        """Load the token and start the proactive background refresher."""
+        await self.load()
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    def _seconds_until_refresh(self) -> float:
+        if not self.has_token() or not self.expires_at:
+            return settings.QB_TOKEN_REFRESH_LEAD_SECONDS
+        due = self.expires_at - timedelta(seconds=settings.QB_TOKEN_REFRESH_LEAD_SECONDS)
+        return max((due - datetime.now(timezone.utc)).total_seconds(), 0)
+
+    def _seconds_until_reload(self) -> float:
+        return max(self._loaded_at + settings.QB_TOKEN_RELOAD_SECONDS - time.monotonic(), 0)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(min(self._seconds_until_refresh(), self._seconds_until_reload()))
+            if self._seconds_until_reload() == 0:
+                await self.reload()
+            if not self.has_token() or not self.expires_within(settings.QB_TOKEN_REFRESH_LEAD_SECONDS):
+                continue
+            if not await self.refresh(min_validity_seconds=settings.QB_TOKEN_REFRESH_LEAD_SECONDS):
+                # Back off before retrying a failed refresh
+                await asyncio.sleep(min(60, settings.QB_TOKEN_REFRESH_LEAD_SECONDS))
+
+    def get_status(self):
+        return {
+            "loaded": self.loaded,
+            "realm_id": self.realm_id,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "refresh_count": self.refresh_count,
+            "adopted_count": self.adopted_count,
+            "background_refresh": self._refresher is not None and not self._refresher.done()
+        }
+
+
+# Global instance
+qb_token_manager = QuickBooksTokenManager()
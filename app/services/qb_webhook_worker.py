@@ -0,0 +1,271 @@
+"""
+QuickBooks Webhook Worker
+
+Applies stored webhook_events in the background so QuickBooks changes land
+in the cache and core tables within seconds instead of waiting for the
+next scheduled sync.
+
+Each pass:
+1. Waits for a quiet period (QB_WEBHOOK_DEBOUNCE_SECONDS, capped at
+   QB_WEBHOOK_MAX_DELAY_SECONDS) after the webhook route calls notify(), so
+   a burst of notifications is handled in one pass; falls back to polling
+   every QB_WEBHOOK_POLL_SECONDS for events stored by other processes
+2. Claims unprocessed events with FOR UPDATE SKIP LOCKED - several app
+   instances can run the worker without double-processing
+3. Coalesces the claimed events per entity (last operation wins) and runs
+   one targeted sync per entity type in dependency order
+   (customers -> invoices -> payments): WHERE Id IN (...) fetch, cache
+   upsert, promotion of just those rows; reference data (items, terms,
+   vendors, ...) is re-read by Id into the reference-data cache
+4. Marks the events processed (with processing_error when the targeted sync
+   failed - POST /webhook/events/{id}/reprocess re-queues them)
+
+While the QuickBooks circuit breaker is open the claim is rolled back and
+the events stay queued.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.services.qb_reference_cache import REFERENCE_ENTITIES, qb_reference_cache
+from app.services.quickbooks_sync_service import qb_sync_service
+from app.utils.circuit_breaker import CircuitBreakerError
+from app.utils.qb_rate_governor import background_priority
+
+logger = logging.getLogger(__name__)
+
+# webhook_events.entity_type -> cache entity type, in dependency order
+# (reference-data types last - they go to qb_reference_cache)
+ENTITY_TYPES = {
+    "customer": "customers",
+    "invoice": "invoices",
+    "payment": "payments",
+    "item": "items",
+    "term": "terms",
+    "customertype": "customer_types",
+    "vendor": "vendors",
+    "taxcode": "tax_codes",
+}
+
+CLAIM_EVENTS_SQL = text("""
+    SELECT id, event_type, entity_type, entity_ids
+    FROM webhook_events
+    WHERE processed = false
+    ORDER BY id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+MARK_PROCESSED_SQL = text("""
+    UPDATE webhook_events
+    SET processed = true,
+        processed_at = CURRENT_TIMESTAMP,
+        processing_error = :error
+    WHERE id = ANY(CAST(:ids AS integer[]))
+""")
+
+
+def coalesce_events(events) -> Dict[str, Dict[str, Any]]:
+    """
+    Collapse claimed events to the latest operation per entity.
+
+    Returns:
+        {entity_type: {"event_ids": [...], "upsert": [qb ids], "delete": [qb ids]}}
+        for every cache entity type in dependency order, plus "ignored"
+        event ids for entity types the cache does not track
+    """
+    latest: Dict[str, Dict[str, str]] = {entity_type: {} for entity_type in ENTITY_TYPES.values()}
+    event_ids: Dict[str, List[int]] = {entity_type: [] for entity_type in ENTITY_TYPES.values()}
+    ignored = []
+
+    for event in events:
+        entity_type = ENTITY_TYPES.get((event.entity_type or "").lower())
+        if entity_type is None:
+            ignored.append(event.id)
+            continue
+        event_ids[entity_type].append(event.id)
+        operation = event.event_type.rsplit(".", 1)[-1]
+        qb_ids = json.loads(event.entity_ids) if isinstance(event.entity_ids, str) else (event.entity_ids or [])
+        for qb_id in qb_ids:
+            latest[entity_type][str(qb_id)] = operation  # Events are claimed in id order
+
+    batches = {
+        entity_type: {
+            "event_ids": event_ids[entity_type],
+            "upsert": [qb_id for qb_id, op in operations.items() if op != "Delete"],
+            "delete": [qb_id for qb_id, op in operations.items() if op == "Delete"],
+        }
+        for entity_type, operations in latest.items()
+        if event_ids[entity_type]
+    }
+    batches["ignored"] = ignored
+    return batches
+
+
+class QuickBooksWebhookWorker:
+    """Background worker that applies webhook events as targeted syncs."""
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.events_processed = 0
+        self.entities_synced = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.db.session import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    def notify(self):
+        """Wake the worker (called after new events are stored)."""
+        self._wakeup.set()
+
+    # ==================== Processing ====================
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Claim and apply one batch of unprocessed events.
+
+        Returns:
+            Dict with claimed count and per-entity-type results
+        """
+        with background_priority():
+            return await self._run_once()
+
+    async def _run_once(self) -> Dict[str, Any]:
+        summary = {"claimed": 0, "results": {}}
+
+        # The claim session holds the row locks until the events are marked;
+        # the work session commits cache upserts/promotion independently.
+        async with self.session_factory() as claim_db, self.session_factory() as work_db:
+            events = (await claim_db.execute(CLAIM_EVENTS_SQL, {"limit": settings.QB_WEBHOOK_BATCH_SIZE})).fetchall()
+            summary["claimed"] = len(events)
+            if not events:
+                await claim_db.rollback()
+                return summary
+
+            batches = coalesce_events(events)
+            marks = []
+            ignored = batches.pop("ignored")
+            if ignored:
+                marks.append({"ids": ignored, "error": None})
+
+            for entity_type, batch in batches.items():
+                try:
+                    if entity_type in REFERENCE_ENTITIES:
+                        result = await qb_reference_cache.apply_webhook(
+                            work_db, entity_type, batch["upsert"], batch["delete"]
+                        )
+                    else:
+                        result = await qb_sync_service.sync_by_ids(
+                            work_db, entity_type, batch["upsert"], deleted_ids=batch["delete"]
+                        )
+                    summary["results"][entity_type] = result
+                    self.entities_synced += len(batch["upsert"]) + len(batch["delete"])
+                    marks.append({"ids": batch["event_ids"], "error": None})
+                except CircuitBreakerError as e:
+                    # QuickBooks unavailable - leave everything queued
+                    logger.warning(f"[WEBHOOK WORKER] Circuit breaker open, leaving {len(events)} events queued: {e}")
+                    await work_db.rollback()
+                    await claim_db.rollback()
+                    self.last_error = str(e)
+                    raise
+                except Exception as e:
+                    logger.error(f"[WEBHOOK WORKER] Targeted {entity_type} sync failed: {e}", exc_info=True)
+                    await work_db.rollback()
+                    summary["results"][entity_type] = {"error": str(e)}
+                    self.last_error = str(e)
+                    marks.append({"ids": batch["event_ids"], "error": str(e)})
+
+            await claim_db.execute(MARK_PROCESSED_SQL, marks)
+            await claim_db.commit()
+
+        self.events_processed += len(events)
+        logger.info(
+            f"[WEBHOOK WORKER] Applied {len(events)} events: "
+            + ", ".join(
+                f"{entity_type}={result.get('records_synced', 0)} synced/{result.get('deactivated', 0)} deleted"
+                if "error" not in result else f"{entity_type}=error"
+                for entity_type, result in summary["results"].items()
+            )
+        )
+        return summary
+
+    async def drain(self) -> int:
+        """Run passes until the queue is empty; return events processed."""
+        total = 0
+        while True:
+            claimed = (await self.run_once())["claimed"]
+            total += claimed
+            if claimed < settings.QB_WEBHOOK_BATCH_SIZE:
+                return total
+
+    # ==================== Background loop ====================
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+            logger.info("[WEBHOOK WORKER] Started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _debounce(self):
+        """Wait for a quiet period after the first wakeup, capped at the max delay."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.QB_WEBHOOK_MAX_DELAY_SECONDS
+        while True:
+            self._wakeup.clear()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=min(settings.QB_WEBHOOK_DEBOUNCE_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                return
+
+    async def _run_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.QB_WEBHOOK_POLL_SECONDS)
+                await self._debounce()
+            except asyncio.TimeoutError:
+                pass  # Poll for events stored by other instances
+
+            try:
+                await self.drain()
+            except CircuitBreakerError:
+                await asyncio.sleep(settings.QB_WEBHOOK_POLL_SECONDS)
+            except Exception as e:
+                logger.error(f"[WEBHOOK WORKER] Pass failed: {e}", exc_info=True)
+                self.last_error = str(e)
+                await asyncio.sleep(settings.QB_WEBHOOK_POLL_SECONDS)
+
+    def get_status(self):
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "events_processed": self.events_processed,
+            "entities_synced": self.entities_synced,
+            "last_error": self.last_error
+        }
+
+
+# Global instance
+qb_webhook_worker = QuickBooksWebhookWorker()
@@ -13,23 +13,51 @@ To: Database table quickbooks_tokens with encryption support
 
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any, List
-import urllib.parse
-import httpx
+from typing import Optional, Dict, Any, List, AsyncIterator, Union
 from intuitlib.client import AuthClient
 from intuitlib.enums import Scopes
 from quickbooks import QuickBooks
-from quickbooks.objects.customer import Customer
-from quickbooks.objects.invoice import Invoice
-from quickbooks.objects.estimate import Estimate
-from quickbooks.objects.bill import Bill
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.db.models import QuickBooksToken
+from app.services.qb_batch_writer import QuickBooksBatchWriter, create_op, update_op
+from app.services.qb_client import QuickBooksClient, get_qb_client
+from app.services.qb_token_manager import qb_token_manager
+from app.utils.circuit_breaker import qb_circuit_breaker
+from app.utils.qb_pagination import iter_query_pages
+from app.utils.qb_query_builder import QBQuery, filters_on
 
 logger = logging.getLogger(__name__)
 
+# CustomerType name -> QB ID (types are never renumbered, so cached per process)
+_customer_type_ids: Dict[str, str] = {}
+
+# QuickBooks rejects customer updates that carry no name field
+_CUSTOMER_NAME_FIELDS = ('GivenName', 'FamilyName', 'MiddleName', 'DisplayName', 'Title', 'Suffix')
+
+
+def customer_update_payload(
+    customer_id: str,
+    customer_data: Dict[str, Any],
+    sync_token: str,
+    existing_customer: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Sparse Customer update body.
+    
+    QuickBooks requires a name field (GivenName, FamilyName or DisplayName) in
+    EVERY update, so the existing record's name fields are carried over unless
+    customer_data changes them.
+    """
+    update_data = {"Id": customer_id, "SyncToken": sync_token}
+    if existing_customer:
+        for field in _CUSTOMER_NAME_FIELDS:
+            if existing_customer.get(field):
+                update_data[field] = existing_customer[field]
+    update_data.update(customer_data)
+    return update_data
+
 
 class QuickBooksService:
     """
@@ -79,61 +107,54 @@ class QuickBooksService:
         self.token_expires_at: Optional[datetime] = None
         self.company_name: Optional[str] = None
         
-        # QuickBooks client (created after token load)
-        self.qb_client: Optional[QuickBooks] = None
+        # Pooled async API client for the realm (set after token load)
+        self.api: Optional[QuickBooksClient] = None
+        self._sdk_client: Optional[QuickBooks] = None
+        
+        # Reuse the process-wide cached token (no DB read per request)
+        if qb_token_manager.has_token():
+            self._adopt_tokens()
         
-        logger.info(f"QuickBooks service initialized (environment: {self.environment})")
+        logger.debug(f"QuickBooks service initialized (environment: {self.environment})")
     
     # ==================== Database Token Operations ====================
     
     async def load_tokens_from_db(self) -> bool:
         """
-        Load QuickBooks tokens from database.
+        Load QuickBooks tokens via the process-wide token manager.
+        
+        Only the first call per process reads quickbooks_tokens; later
+        calls use the in-memory token.
         
         Returns:
             True if tokens loaded successfully, False otherwise
         """
-        if not self.db:
-            logger.warning("No database session provided for token loading")
-            return False
-        
         try:
-            # Get the most recent active token
-            result = await self.db.execute(
-                select(QuickBooksToken)
-                .where(QuickBooksToken.is_active == True)
-                .order_by(QuickBooksToken.updated_at.desc())
-                .limit(1)
-            )
-            token_record = result.scalar_one_or_none()
-            
-            if not token_record:
+            if not await qb_token_manager.load(self.db):
                 logger.info("No QuickBooks tokens found in database")
                 return False
             
-            # Load token data
-            self.realm_id = token_record.realm_id
-            self.access_token = token_record.access_token
-            self.refresh_token = token_record.refresh_token
-            self.token_expires_at = token_record.access_token_expires_at
-            self.company_name = None  # TODO: Add company_name field to model
-            
-            # Create QuickBooks client
-            self._create_qb_client()
-            
-            logger.info(f"Loaded tokens from database for realm: {self.realm_id}")
-            
-            # Auto-refresh if expired
-            if self.is_token_expired():
+            # Auto-refresh if expired (single-flight across requests)
+            if qb_token_manager.expires_within(300):
                 logger.info("Token expired, refreshing...")
-                await self.refresh_access_token()
+                await qb_token_manager.refresh()
             
+            self._adopt_tokens()
             return True
             
         except Exception as e:
             logger.error(f"Error loading tokens from database: {e}", exc_info=True)
             return False
     
+    def _adopt_tokens(self):
+        """Copy the token manager's current token onto this instance."""
+        self.realm_id = qb_token_manager.realm_id
+        self.access_token = qb_token_manager.access_token
+        self.refresh_token = qb_token_manager.refresh_token
+        self.token_expires_at = qb_token_manager.expires_at
+        self.company_name = None  # TODO: Add company_name field to model
+        self._create_qb_client()
+    
     async def save_tokens_to_db(
         self,
         realm_id: str,
@@ -194,15 +215,9 @@ class QuickBooksService:
             
             await self.db.commit()
             
-            # Update instance state
-            self.realm_id = realm_id
-            self.access_token = access_token
-            self.refresh_token = refresh_token
-            self.token_expires_at = access_expires_at
-            self.company_name = None  # TODO: Add company_name field
-            
-            # Create QuickBooks client
-            self._create_qb_client()
+            # Update process-wide cache and instance state
+            qb_token_manager.set_tokens(realm_id, access_token, refresh_token, access_expires_at, self.environment)
+            self._adopt_tokens()
             
             logger.info(f"Saved tokens to database for realm: {realm_id}")
             return True
@@ -234,6 +249,7 @@ class QuickBooksService:
                 token.is_active = False
             
             await self.db.commit()
+            qb_token_manager.clear()
             
             # Clear instance state
             self.realm_id = None
@@ -241,7 +257,8 @@ class QuickBooksService:
             self.refresh_token = None
             self.token_expires_at = None
             self.company_name = None
-            self.qb_client = None
+            self.api = None
+            self._sdk_client = None
             
             logger.info("QuickBooks tokens revoked")
             return True
@@ -291,63 +308,55 @@ class QuickBooksService:
         }
     
     def _create_qb_client(self):
-        """Create QuickBooks API client with current tokens"""
+        """Attach the shared pooled API client for the current realm"""
         if self.realm_id and self.access_token:
-            # Create AuthClient for environment detection
-            from intuitlib.enums import Scopes
+            self.api = get_qb_client(self.realm_id, self.base_url)
+            self._sdk_client = None
+    
+    @property
+    def qb_client(self) -> Optional[QuickBooks]:
+        """python-quickbooks SDK client for diagnostic scripts only.
+        
+        The SDK does blocking `requests` I/O - never use it on request paths
+        (use self.api instead).
+        """
+        if self._sdk_client is None and self.realm_id and self.access_token:
             auth_client = AuthClient(
                 client_id=self.client_id,
                 client_secret=self.client_secret,
                 redirect_uri=self.redirect_uri,
                 environment='sandbox' if self.environment == 'sandbox' else 'production'
             )
-            
-            self.qb_client = QuickBooks(
+            self._sdk_client = QuickBooks(
                 auth_client=auth_client,
                 refresh_token=self.refresh_token,
                 company_id=self.realm_id,
                 minorversion=65
             )
-            if self.qb_client:
-                self.qb_client.access_token = self.access_token
+            self._sdk_client.access_token = self.access_token
+        return self._sdk_client
     
-    async def refresh_access_token(self) -> bool:
+    async def refresh_access_token(self, force: bool = False) -> bool:
         """
         Refresh QuickBooks access token using refresh token.
         
+        Goes through the token manager, so concurrent callers share one
+        refresh instead of each rotating the refresh token.
+        
+        Args:
+            force: Refresh even if the current token is still valid
+        
         Returns:
             True if refreshed successfully, False otherwise
         """
-        if not self.refresh_token or not self.db:
-            logger.error("Cannot refresh: missing refresh token or database session")
+        if not qb_token_manager.has_token() and not await qb_token_manager.load(self.db):
+            logger.error("Cannot refresh: no QuickBooks token loaded")
             return False
         
-        try:
-            # Create auth client
-            auth_client = AuthClient(
-                client_id=self.client_id,
-                client_secret=self.client_secret,
-                redirect_uri=self.redirect_uri,
-                environment=self.environment
-            )
-            
-            # Refresh token
-            auth_client.refresh(refresh_token=self.refresh_token)
-            
-            # Save new tokens
-            await self.save_tokens_to_db(
-                realm_id=self.realm_id,
-                access_token=auth_client.access_token,
-                refresh_token=auth_client.refresh_token,
-                expires_in=auth_client.expires_in
-            )
-            
-            logger.info("QuickBooks access token refreshed successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error refreshing access token: {e}", exc_info=True)
-            return False
+        refreshed = await qb_token_manager.refresh(force=force)
+        if refreshed:
+            self._adopt_tokens()
+        return refreshed
     
     # ==================== OAuth Flow ====================
     
@@ -424,53 +433,54 @@ class QuickBooksService:
     
     async def _ensure_authenticated(self):
         """Ensure service is authenticated before API calls"""
-        if not self.qb_client:
+        if not self.api:
             # Try to load tokens
             await self.load_tokens_from_db()
-        
-        if not self.is_authenticated():
-            raise Exception("QuickBooks not authenticated. Please connect first.")
+        elif qb_token_manager.access_token and qb_token_manager.access_token != self.access_token:
+            # Background refresher rotated the token since this instance was built
+            self._adopt_tokens()
         
         # Auto-refresh if needed
-        if self.is_token_expired():
+        if self.api and self.is_token_expired():
             await self.refresh_access_token()
+        
+        if not self.is_authenticated():
+            raise Exception("QuickBooks not authenticated. Please connect first.")
     
-    async def get_customers(self) -> List[Customer]:
-        """Get all customers from QuickBooks"""
-        await self._ensure_authenticated()
-        return Customer.all(qb=self.qb_client)
-    
-    async def get_invoices(self, customer_id: Optional[str] = None) -> List[Invoice]:
-        """Get invoices from QuickBooks"""
-        await self._ensure_authenticated()
+    async def get_customers(self, use_case: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get all customers from QuickBooks (every STARTPOSITION page).
         
+        Args:
+            use_case: Field set to request (see app/utils/qb_query_builder.py),
+                e.g. "matching"; None fetches every field
+        """
+        return await self.query_all(QBQuery("Customer", use_case))
+    
+    async def get_invoices(self, customer_id: Optional[str] = None, use_case: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get invoices from QuickBooks (every STARTPOSITION page), optionally projected to a use case's fields"""
+        query = QBQuery("Invoice", use_case)
         if customer_id:
-            query = f"SELECT * FROM Invoice WHERE CustomerRef = '{customer_id}'"
-            return Invoice.query(query, qb=self.qb_client)
-        else:
-            return Invoice.all(qb=self.qb_client)
+            query.where_equals("CustomerRef", customer_id)
+        return await self.query_all(query)
     
-    async def get_estimates(self, customer_id: Optional[str] = None) -> List[Estimate]:
-        """Get estimates from QuickBooks"""
-        await self._ensure_authenticated()
-        
+    async def get_estimates(self, customer_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get estimates from QuickBooks (every STARTPOSITION page)"""
         if customer_id:
-            query = f"SELECT * FROM Estimate WHERE CustomerRef = '{customer_id}'"
-            return Estimate.query(query, qb=self.qb_client)
-        else:
-            return Estimate.all(qb=self.qb_client)
+            return await self.query_all(f"SELECT * FROM Estimate WHERE CustomerRef = '{customer_id}'")
+        return await self.query_all("SELECT * FROM Estimate")
     
-    async def query(self, query_string: str, entity_class=None):
-        """Execute a raw QuickBooks query with hybrid SDK/HTTP routing.
-        
-        Strategy (based on stress test findings - see docs/audits/QUICKBOOKS_SDK_VS_HTTP_ANALYSIS.md):
-        - Block known-unsupported patterns (CustomerTypeRef)
-        - Use HTTP for COUNT queries (SDK bug returns 0)
-        - Use SDK for all other queries (3.6x faster)
+    async def get_items(self, item_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get items/services from QuickBooks, optionally of one Type (every STARTPOSITION page)"""
+        if item_type:
+            return await self.query_all(f"SELECT * FROM Item WHERE Type = '{item_type}'")
+        return await self.query_all("SELECT * FROM Item")
+    
+    async def query(self, query_string: Union[str, QBQuery]):
+        """Execute a raw QuickBooks query over the pooled async client.
         
         Args:
-            query_string: SQL-like query string (e.g., "SELECT * FROM Payment WHERE...")
-            entity_class: Optional entity class to query with SDK
+            query_string: SQL-like query string (e.g., "SELECT * FROM Payment WHERE..."),
+                or a QBQuery whose results are trimmed to its fields
         
         Returns:
             List of entity dictionaries or COUNT result dict
@@ -478,128 +488,333 @@ class QuickBooksService:
         await self._ensure_authenticated()
         
         # Guardrail: Block known-unsupported patterns
-        if "CustomerTypeRef" in query_string:
+        if filters_on(query_string, "CustomerTypeRef"):
             raise ValueError(
                 "CustomerTypeRef is not queryable in QuickBooks API. "
                 "Fetch all customers with 'SELECT * FROM Customer' and post-filter in Python: "
                 "[c for c in customers if c.get('CustomerTypeRef', {}).get('value') == '698682']"
             )
         
-        # Route COUNT queries to HTTP (SDK bug - returns 0)
-        if "COUNT(*)" in query_string.upper():
-            logger.info("[QB QUERY] Routing COUNT query to HTTP (SDK bug)")
-            return await self._http_query(query_string)
-        
-        # Route all other queries to SDK (3.6x faster)
-        logger.info("[QB QUERY] Routing query to SDK (3.6x faster than HTTP)")
-        return await self._sdk_query(query_string, entity_class)
+        results = await self._api_query(str(query_string))
+        if isinstance(query_string, QBQuery) and isinstance(results, list):
+            return query_string.records(results)
+        return results
     
-    async def _sdk_query(self, query_string: str, entity_class=None):
-        """Execute query using QuickBooks SDK (faster, but COUNT broken).
+    async def iter_query(
+        self,
+        query_string: Union[str, QBQuery],
+        page_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        breaker=None,
+        start_position: int = 1
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream a query page by page over STARTPOSITION windows.
+        
+        Pages are fetched over the pooled async client with up to
+        QB_QUERY_CONCURRENCY windows in flight.
         
-        Performance: 289ms average (3.6x faster than HTTP)
-        Limitation: COUNT(*) returns 0 (use HTTP instead)
+        Args:
+            query_string: Entity query (string or QBQuery - pages of a QBQuery are
+                trimmed to its fields); STARTPOSITION/MAXRESULTS are managed here
+            page_size: MAXRESULTS per page (default QB_QUERY_PAGE_SIZE)
+            concurrency: Parallel page fetches (default QB_QUERY_CONCURRENCY)
+            breaker: Optional CircuitBreaker each page fetch goes through
+            start_position: STARTPOSITION of the first page (resuming a sync run)
+        
+        Yields:
+            Lists of entity dictionaries
         """
-        # Determine entity class from query if not provided
-        if entity_class is None:
-            query_upper = query_string.upper()
-            if "FROM CUSTOMER" in query_upper:
-                entity_class = Customer
-            elif "FROM INVOICE" in query_upper:
-                entity_class = Invoice
-            elif "FROM ESTIMATE" in query_upper:
-                entity_class = Estimate
-            elif "FROM BILL" in query_upper:
-                entity_class = Bill
-            else:
-                # Fallback to HTTP if entity unknown
-                logger.warning(f"Unknown entity in query, falling back to HTTP: {query_string}")
-                return await self._http_query(query_string)
+        await self._ensure_authenticated()
         
-        try:
-            results = entity_class.query(query_string, qb=self.qb_client)
-            
-            # Convert SDK objects to dictionaries
-            if results:
-                dict_results = [r.to_dict() if hasattr(r, 'to_dict') else r for r in results]
-                logger.info(f"[METRICS] SDK query returned {len(dict_results)} entities")
-                return dict_results
-            else:
-                logger.info("[METRICS] SDK query returned 0 entities")
-                return []
-        except Exception as e:
-            logger.error(f"SDK query failed, falling back to HTTP: {e}")
-            return await self._http_query(query_string)
+        if filters_on(query_string, "CustomerTypeRef"):
+            raise ValueError("CustomerTypeRef is not queryable in QuickBooks API - post-filter in Python")
+        records = query_string.records if isinstance(query_string, QBQuery) else None
+        
+        async def fetch_page(page_query_string: str):
+            if breaker:
+                return await breaker.call(self._api_query, page_query_string)
+            return await self._api_query(page_query_string)
+        
+        async for page in iter_query_pages(
+            fetch_page,
+            str(query_string),
+            page_size=page_size or settings.QB_QUERY_PAGE_SIZE,
+            concurrency=concurrency or settings.QB_QUERY_CONCURRENCY,
+            start_position=start_position
+        ):
+            yield records(page) if records else page
+    
+    async def query_all(self, query_string: Union[str, QBQuery]) -> List[Dict[str, Any]]:
+        """Collect every page of a query into one list (use iter_query for large sets)."""
+        results = []
+        async for page in self.iter_query(query_string):
+            results.extend(page)
+        return results
     
-    async def _http_query(self, query_string: str):
-        """Execute query using direct HTTP (required for COUNT, fallback for SDK failures).
+    async def _api_query(self, query_string: str):
+        """Run one query on the pooled client and log the entity count."""
+        results = await self.api.query(query_string, self.access_token)
+        if isinstance(results, list):
+            logger.info(f"[METRICS] QB query returned {len(results)} entities")
+        return results
+    
+    async def cdc(
+        self,
+        entities: List[str],
+        changed_since: datetime,
+        breaker=None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """ChangeDataCapture for several entity types in one call (see QuickBooksClient.cdc).
         
-        Performance: 1034ms average (slower than SDK)
-        Use cases: COUNT queries, SDK failures, unknown entities
+        Args:
+            entities: QB entity names, e.g. ["Customer", "Invoice", "Payment"]
+            changed_since: Window start (QuickBooks allows at most 30 days back)
+            breaker: Optional CircuitBreaker the call goes through
         """
-        base_url = self.qb_client.api_url_v3
-        encoded_query = urllib.parse.quote(query_string)
-        url = f"{base_url}/company/{self.realm_id}/query?query={encoded_query}&minorversion=75"
-        
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "text/plain"
-        }
+        await self._ensure_authenticated()
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            
-            if response.status_code != 200:
-                error_msg = f"Query failed: HTTP {response.status_code} - {response.text[:200]}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-            
-            data = response.json()
-            
-            # Check for Fault
-            if "Fault" in data:
-                fault = data["Fault"]
-                error_msg = f"QB Query Fault: {fault}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-            
-            # Extract QueryResponse
-            query_response = data.get("QueryResponse", {})
-            
-            # Handle COUNT queries
-            if "totalCount" in query_response:
-                logger.info(f"[METRICS] HTTP COUNT query returned: {query_response['totalCount']}")
-                return {"totalCount": query_response["totalCount"]}
-            
-            # Handle entity queries - return the entity array
-            # QB returns Customer, Invoice, Payment, etc. as the key
-            for key in query_response:
-                if key not in ["startPosition", "maxResults", "totalCount"]:
-                    entities = query_response[key]
-                    # Ensure it's always a list
-                    if not isinstance(entities, list):
-                        entities = [entities]
-                    logger.info(f"[METRICS] HTTP query returned {len(entities)} {key} entities")
-                    return entities
-            
-            # Empty result
-            logger.info("[METRICS] HTTP query returned 0 entities")
-            return []
+        if changed_since.tzinfo is None:
+            changed_since = changed_since.replace(tzinfo=timezone.utc)
+        since_str = changed_since.isoformat(timespec='seconds')
+        
+        if breaker:
+            return await breaker.call(self.api.cdc, entities, since_str, self.access_token)
+        return await self.api.cdc(entities, since_str, self.access_token)
+    
+    async def batch(self, items: List[Dict[str, Any]], breaker=None) -> Dict[str, Dict[str, Any]]:
+        """One /batch request (see QuickBooksClient.batch); use QuickBooksBatchWriter for more than 30 items."""
+        await self._ensure_authenticated()
+        if breaker:
+            return await breaker.call(self.api.batch, items, self.access_token)
+        return await self.api.batch(items, self.access_token)
+    
+    async def get_company_info(self) -> Dict[str, Any]:
+        """Get company information from QuickBooks."""
+        await self._ensure_authenticated()
+        return await self.api.read("CompanyInfo", self.realm_id, self.access_token)
+    
+    async def get_customer_by_id(self, customer_id: str) -> Dict[str, Any]:
+        """Get a specific customer by QuickBooks ID."""
+        await self._ensure_authenticated()
+        return await self.api.read("Customer", customer_id, self.access_token)
     
-    async def create_invoice(self, invoice_data: Dict[str, Any]) -> Optional[Invoice]:
+    async def get_invoice_by_id(self, invoice_id: str) -> Dict[str, Any]:
+        """Get a specific invoice by QuickBooks ID."""
+        await self._ensure_authenticated()
+        return await self.api.read("Invoice", invoice_id, self.access_token)
+    
+    async def create_customer(self, customer_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create customer in QuickBooks"""
+        await self._ensure_authenticated()
+        customer = await self.api.create("Customer", customer_data, self.access_token)
+        logger.info(f"Created customer: {customer.get('DisplayName')} ({customer.get('Id')})")
+        return customer
+    
+    async def create_invoice(self, invoice_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create invoice in QuickBooks"""
         await self._ensure_authenticated()
+        invoice = await self.api.create("Invoice", invoice_data, self.access_token)
+        logger.info(f"Created invoice: {invoice.get('DocNumber')} ({invoice.get('Id')})")
+        return invoice
+    
+    async def update_invoice(self, invoice_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Sparse-update an invoice; fetches the current SyncToken when not supplied."""
+        await self._ensure_authenticated()
+        if "SyncToken" not in updates:
+            existing_invoice = await self.get_invoice_by_id(invoice_id)
+            updates = {**updates, "SyncToken": existing_invoice.get("SyncToken")}
+        invoice = await self.api.update("Invoice", {**updates, "Id": invoice_id}, self.access_token)
+        logger.info(f"Updated invoice: {invoice.get('DocNumber')} ({invoice_id})")
+        return invoice
+    
+    async def update_customer(
+        self,
+        customer_id: str,
+        customer_data: Dict[str, Any],
+        sync_token: str,
+        existing_customer: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Sparse-update one customer (see customer_update_payload); use update_customers for bulk."""
+        await self._ensure_authenticated()
+        payload = customer_update_payload(customer_id, customer_data, sync_token, existing_customer)
+        customer = await self.api.update("Customer", payload, self.access_token)
+        logger.info(f"Updated customer ID {customer_id}: {customer.get('DisplayName')}")
+        return customer
+    
+    async def update_customers(self, updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Sparse-update many customers through /batch (30 per request).
+        
+        Args:
+            updates: Dicts with customer_id, customer_data, sync_token and
+                optional existing_customer (same meaning as update_customer)
         
+        Returns:
+            One QuickBooksBatchWriter result per update, in order
+        """
+        operations = [
+            update_op("Customer", customer_update_payload(
+                update["customer_id"], update["customer_data"], update["sync_token"], update.get("existing_customer")
+            ))
+            for update in updates
+        ]
+        return await QuickBooksBatchWriter(self, breaker=qb_circuit_breaker).run(operations)
+    
+    async def create_customers(self, customers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create many customers through /batch (30 per request); one result per customer, in order."""
+        operations = [create_op("Customer", customer) for customer in customers]
+        return await QuickBooksBatchWriter(self, breaker=qb_circuit_breaker).run(operations)
+    
+    async def _get_customer_type_id(self, type_name: str) -> Optional[str]:
+        """Resolve a CustomerType name (e.g. "GC Compliance") to its QB ID."""
+        if type_name in _customer_type_ids:
+            return _customer_type_ids[type_name]
         try:
-            invoice = Invoice()
-            # Set invoice fields from invoice_data
-            # ... (invoice creation logic)
-            invoice.save(qb=self.qb_client)
-            return invoice
+            types = await self.query(f"SELECT * FROM CustomerType WHERE Name = '{type_name}'")
         except Exception as e:
-            logger.error(f"Error creating invoice: {e}", exc_info=True)
+            logger.error(f"Failed to query CustomerType: {e}")
+            return None
+        if not types:
+            logger.warning(f"CustomerType '{type_name}' not found in QuickBooks")
             return None
+        _customer_type_ids[type_name] = types[0].get("Id")
+        logger.info(f"CustomerType '{type_name}' resolved to ID: {_customer_type_ids[type_name]}")
+        return _customer_type_ids[type_name]
+    
+    async def sync_gc_customer_types_from_sheets(self, google_service, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Set CustomerTypeRef to 'GC Compliance' on every QB customer matching a Sheets client.
+        
+        Clients are matched by exact name, name without LLC, then email;
+        customers already typed GC Compliance are skipped. The updates go out
+        through /batch (the query results carry each SyncToken), so N
+        customers cost ceil(N / 30) API calls instead of 2N. A customer
+        matched by several clients is updated once - a second update with
+        the same SyncToken would fail as a Stale Object Error.
+        
+        Args:
+            google_service: Google Sheets service instance
+            dry_run: If True, preview changes without updating
+        
+        Returns:
+            Dictionary with sync results
+        """
+        try:
+            logger.info(f"[QB TYPE SYNC] Starting CustomerTypeRef sync (dry_run={dry_run})")
+            
+            clients_data = await google_service.get_clients_data()
+            logger.info(f"[QB TYPE SYNC] Found {len(clients_data)} clients in Google Sheets")
+            
+            qb_customers = await self.get_customers(use_case="matching")
+            logger.info(f"[QB TYPE SYNC] Found {len(qb_customers)} customers in QuickBooks")
+            
+            gc_type_id = await self._get_customer_type_id("GC Compliance")
+            if not gc_type_id:
+                return {"status": "failed", "error": "CustomerType 'GC Compliance' not found in QuickBooks"}
+            
+            qb_by_name = {}
+            qb_by_email = {}
+            for customer in qb_customers:
+                name = (customer.get('DisplayName') or '').strip().lower()
+                email = ((customer.get('PrimaryEmailAddr') or {}).get('Address') or '').strip().lower()
+                if name:
+                    qb_by_name[name] = customer
+                if email:
+                    qb_by_email[email] = customer
+            
+            matched = []
+            skipped = []
+            not_found = []
+            to_update = {}  # QB Id -> customer, one update each
+            clients_by_customer = {}  # QB Id -> match infos of every client matching it
+            
+            for client in clients_data:
+                client_name = (client.get('Full Name') or client.get('Client Name', '')).strip()
+                client_email = client.get('Email', '').strip()
+                if not client_name:
+                    continue
+                
+                name_lower = client_name.lower()
+                name_without_llc = name_lower.replace(' llc', '').replace(', llc', '').strip()
+                if name_lower in qb_by_name:
+                    qb_customer, match_method = qb_by_name[name_lower], "exact name"
+                elif name_without_llc in qb_by_name:
+                    qb_customer, match_method = qb_by_name[name_without_llc], "name (without LLC)"
+                elif client_email and client_email.lower() in qb_by_email:
+                    qb_customer, match_method = qb_by_email[client_email.lower()], "email"
+                else:
+                    not_found.append({"client_name": client_name, "email": client_email})
+                    continue
+                
+                current_type_id = ((qb_customer.get('CustomerTypeRef') or {}).get('value') or '').strip()
+                match_info = {
+                    "client_name": client_name,
+                    "qb_id": qb_customer.get('Id'),
+                    "qb_name": qb_customer.get('DisplayName'),
+                    "match_method": match_method,
+                    "current_type_id": current_type_id,
+                    "already_gc": current_type_id == gc_type_id
+                }
+                if current_type_id == gc_type_id:
+                    skipped.append(match_info)
+                    continue
+                
+                matched.append(match_info)
+                to_update.setdefault(qb_customer['Id'], qb_customer)
+                clients_by_customer.setdefault(qb_customer['Id'], []).append(match_info)
+            
+            updated = []
+            errors = []
+            if not dry_run and to_update:
+                results = await self.update_customers([
+                    {
+                        "customer_id": qb_customer['Id'],
+                        "customer_data": {"CustomerTypeRef": {"value": gc_type_id}},
+                        "sync_token": qb_customer.get('SyncToken'),
+                        "existing_customer": qb_customer
+                    }
+                    for qb_customer in to_update.values()
+                ])
+                for qb_id, result in zip(to_update, results):
+                    for match_info in clients_by_customer[qb_id]:
+                        if result["ok"]:
+                            updated.append({
+                                **match_info,
+                                "updated_type": (result["entity"].get('CustomerTypeRef') or {}).get('name', 'GC Compliance')
+                            })
+                        else:
+                            errors.append({**match_info, "error": result["error"]})
+                            logger.error(f"[QB TYPE SYNC] Error updating {match_info['client_name']}: {result['error']}")
+            
+            result = {
+                "status": "success",
+                "dry_run": dry_run,
+                "total_clients": len(clients_data),
+                "matched": len(matched),
+                "skipped_already_set": len(skipped),
+                "updated": len(updated),
+                "not_found_in_qb": len(not_found),
+                "errors": len(errors),
+                "matched_details": matched[:20],  # First 20 for brevity
+                "skipped_details": skipped[:10],
+                "not_found_details": not_found,
+                "error_details": errors
+            }
+            if dry_run:
+                result["message"] = f"Dry run: {len(to_update)} customers would be updated to GC Compliance"
+            else:
+                updated_customers = len({entry['qb_id'] for entry in updated})
+                result["message"] = f"Updated {updated_customers} customers to GC Compliance"
+            
+            logger.info(f"[QB TYPE SYNC] Complete: {result['message']}")
+            return result
+            
+        except Exception as e:
+            logger.error(f"[QB TYPE SYNC] Error: {e}", exc_info=True)
+            return {
+                "status": "failed",
+                "error": f"Sync failed: {str(e)}"
+            }
 
 
 # Module-level service instance (for backward compatibility)
@@ -14,7 +14,8 @@ QBO has TWO read paths with different reliability:
 Query limitations:
 - Invalid predicates fail SILENTLY (return empty results, not errors)
 - Reference fields (CustomerTypeRef) are NOT filterable despite being present on objects
-- One entity per query, no OR clauses, MAXRESULTS ≤ 1000
+- One entity per query, no OR clauses, MAXRESULTS ≤ 1000 (walked in STARTPOSITION
+  pages via QuickBooksService.iter_query - never a single capped query)
 - GET-by-Id can succeed even when Query returns 0 rows
 
 Strategy:
@@ -24,18 +25,31 @@ Strategy:
 """
 
 import logging
-import json
-from datetime import datetime, timezone
-from typing import List, Dict, Optional, Any
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
+from app.config import settings
+from app.services.qb_cache_loader import (
+    CACHE_TABLES,
+    context_customer_row,
+    context_invoice_row,
+    customer_cache_row,
+    invoice_cache_row,
+    payment_cache_row,
+    qb_cache_loader,
+)
+from app.services.qb_promotion_service import qb_promotion_service
+from app.services.qb_reference_cache import CDC_REFERENCE_ENTITIES, REFERENCE_ENTITIES, qb_reference_cache
+from app.services.qb_sync_journal import qb_sync_journal
 from app.services.quickbooks_service import get_quickbooks_service
 from app.utils.circuit_breaker import qb_circuit_breaker, CircuitBreakerError
+from app.utils.qb_query_builder import QBQuery
+from app.utils.qb_sync_pipeline import PageStream
 
 logger = logging.getLogger(__name__)
 
-
 class QuickBooksSyncService:
     """
     Manages synchronization between QuickBooks and local cache tables.
@@ -46,198 +60,165 @@ class QuickBooksSyncService:
     - Error tracking: Records sync failures per record
     - Metrics: Tracks sync duration and record counts
     - Filtering: Only syncs "GC Compliance" customers (CustomerTypeRef=698682)
+      into the cache tables; every customer and invoice goes to the chat
+      context tier (quickbooks_context_*) from the same pages
     - Authoritative IDs: Uses QB IDs only, never name/amount matching
     """
     
     # QuickBooks CustomerType ID for "GC Compliance" customers
     GC_COMPLIANCE_CUSTOMER_TYPE = "698682"
     
+    # QuickBooks entity name per cache entity type (targeted fetches)
+    QB_ENTITY_NAMES = {"customers": "Customer", "invoices": "Invoice", "payments": "Payment"}
+    
+    # Chat-context tier per cache entity type (every record, not just GC Compliance)
+    CONTEXT_TYPES = {"customers": "context_customers", "invoices": "context_invoices"}
+    
+    # QB IDs per "WHERE Id IN (...)" query
+    ID_FETCH_CHUNK_SIZE = 100
+    
+    # ChangeDataCapture limits: QuickBooks truncates a response at 1000 objects
+    # per entity and rejects windows older than 30 days - either one means the
+    # CDC sync falls back to the query flow
+    CDC_MAX_CHANGES = 1000
+    CDC_MAX_LOOKBACK = timedelta(days=30)
+    
     def __init__(self):
         self.qb_service = None  # Injected per-request with DB session
     
-    async def sync_customers(self, db: AsyncSession, since: Optional[datetime] = None) -> Dict[str, Any]:
+    async def sync_customers(
+        self,
+        db: AsyncSession,
+        since: Optional[datetime] = None,
+        stream: Optional[PageStream] = None,
+        run: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Sync customers from QuickBooks to quickbooks_customers_cache.
         
+        Streams STARTPOSITION pages and upserts each page as it arrives, so
+        memory stays constant regardless of customer count.
+        
         Args:
             db: Database session
             since: Only fetch customers modified after this timestamp (for delta sync)
+            stream: Pages already being fetched by the sync_all pipeline; when
+                given, since is ignored
+            run: sync_runs journal entry the stream was opened for (required
+                with stream). Otherwise the run is opened here - resuming an
+                interrupted run of the same query from its last committed page
             
         Returns:
             Dict with sync metrics (records_synced, duration_ms, errors)
-        """        # Inject DB-aware QuickBooks service
-        self.qb_service = get_quickbooks_service(db)
-                # Inject DB-aware QuickBooks service
+        """
+        # Inject DB-aware QuickBooks service
         self.qb_service = get_quickbooks_service(db)
         
         start_time = datetime.now(timezone.utc)
         records_synced = 0
+        fetched = 0
         errors = 0
+        change_counts = {"inserted": 0, "updated": 0, "unchanged": 0}
         
         try:
             logger.info(f"[SYNC] Starting customer sync (delta: {since is not None})")
             
-            # Get last sync time from sync_status if not provided
-            if since is None:
-                result = await db.execute(
-                    text("SELECT last_sync_at FROM sync_status WHERE entity_type = 'customers'")
-                )
-                row = result.fetchone()
-                since = row.last_sync_at if row and row.last_sync_at else None
-            
-            # Build QuickBooks query
             # NOTE: CustomerTypeRef is NOT queryable - must fetch all and filter in Python
-            query = "SELECT * FROM Customer"
-            where_clauses = []
-            
-            if since:
-                # Format datetime for QuickBooks API (ISO 8601)
-                since_str = since.strftime('%Y-%m-%dT%H:%M:%S-00:00')
-                where_clauses.append(f"Metadata.LastUpdatedTime > '{since_str}'")
-                logger.info(f"[SYNC] Delta query: fetching customers modified after {since_str}")
-            else:
-                logger.info(f"[SYNC] Full sync: fetching all customers (will filter to GC Compliance in Python)")
-            
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
-            query += " MAXRESULTS 1000"
-            
-            # Fetch customers from QuickBooks with circuit breaker protection
+            pages = stream
+            if pages is None:
+                if since is None:
+                    since = await self._get_last_sync(db, 'customers')
+                if not since:
+                    logger.info(f"[SYNC] Full sync: fetching all customers (will filter to GC Compliance in Python)")
+                run, pages = await self._open_run(db, 'customers', since)
+            # A resumed run keeps its original start as the delta watermark
+            watermark = run["started_at"]
+            
+            # Stream pages from QuickBooks with circuit breaker protection per page
             try:
-                all_customers = await qb_circuit_breaker.call(
-                    self.qb_service.query,
-                    query
-                )
-                logger.info(f"[SYNC] Query returned {len(all_customers)} total customers")
-                
-                # Filter to GC Compliance customers only (CustomerTypeRef not queryable in QB API)
-                customers = [
-                    c for c in all_customers 
-                    if c.get('CustomerTypeRef', {}).get('value') == self.GC_COMPLIANCE_CUSTOMER_TYPE
-                ]
-                logger.info(f"[SYNC] Filtered to {len(customers)} GC Compliance customers (CustomerTypeRef={self.GC_COMPLIANCE_CUSTOMER_TYPE})")
+                async for page in pages:
+                    fetched += len(page)
+                    errors_before_page = errors
+                    rows = []
+                    failed = []
+                    
+                    for customer in page:
+                        qb_customer_id = customer.get('Id')
+                        try:
+                            # CRITICAL: Only GC Compliance customers (CustomerTypeRef not queryable in QB API)
+                            customer_type_ref = customer.get('CustomerTypeRef', {})
+                            customer_type_id = customer_type_ref.get('value') if customer_type_ref else None
+                            
+                            if customer_type_id != self.GC_COMPLIANCE_CUSTOMER_TYPE:
+                                continue
+                            
+                            # QB ID is authoritative - never match by name
+                            if not qb_customer_id:
+                                logger.error(f"[SYNC] Skipping customer: missing QB ID")
+                                errors += 1
+                                continue
+                            
+                            rows.append(customer_cache_row(customer))
+                        except Exception as e:
+                            logger.error(f"Failed to sync customer {qb_customer_id}: {e}")
+                            errors += 1
+                            failed.append({"error": str(e), "qb_customer_id": qb_customer_id})
+                    
+                    await self._cache_context(db, 'customers', page)
+                    if rows:
+                        page_counts = await qb_cache_loader.upsert(db, 'customers', rows)
+                        for outcome, count in page_counts.items():
+                            change_counts[outcome] += count
+                        records_synced += len(rows)
+                    if failed:
+                        await db.execute(
+                            text("UPDATE quickbooks_customers_cache SET sync_error = :error WHERE qb_customer_id = :qb_customer_id"),
+                            failed
+                        )
+                    
+                    # Commit each page with its checkpoint - the delta watermark only moves once the walk completes
+                    await qb_sync_journal.checkpoint(db, run, len(page), len(rows), errors - errors_before_page)
+                    await db.commit()
             except CircuitBreakerError as e:
-                # Circuit is open - fail fast without attempting API call
+                # Circuit is open - fail fast without attempting further API calls
                 logger.error(f"[SYNC] Circuit breaker blocked sync: {e}")
                 duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-                await self._update_sync_status(db, 'customers', start_time, 0, duration_ms, 1)
+                await qb_sync_journal.fail(db, run, str(e))
+                await self._update_sync_status(db, 'customers', None, duration_ms, records_synced, errors + 1, str(e))
                 return {
-                    "records_synced": 0, 
+                    "records_synced": records_synced, 
                     "duration_ms": duration_ms, 
-                    "errors": 1,
+                    "errors": errors + 1,
                     "circuit_breaker_status": qb_circuit_breaker.get_status(),
                     "error": str(e)
                 }
             
-            if not customers:
-                logger.info("[SYNC] No customers to sync")
-                await self._update_sync_status(db, 'customers', start_time, 0, 0, 0)
-                return {"records_synced": 0, "duration_ms": 0, "errors": 0, "created": 0, "updated": 0, "skipped": 0}
-            
-            logger.info(f"[SYNC] Fetched {len(customers)} customers from QuickBooks")
-            
-            # Process each customer
-            for customer in customers:
-                try:
-                    qb_customer_id = customer.get('Id')
-                    
-                    # CRITICAL: Validate this is a GC Compliance customer
-                    customer_type_ref = customer.get('CustomerTypeRef', {})
-                    customer_type_id = customer_type_ref.get('value') if customer_type_ref else None
-                    
-                    if customer_type_id != self.GC_COMPLIANCE_CUSTOMER_TYPE:
-                        logger.warning(f"[SYNC] Skipping customer {qb_customer_id}: not GC Compliance (type={customer_type_id})")
-                        continue
-                    
-                    # QB ID is authoritative - never match by name
-                    if not qb_customer_id:
-                        logger.error(f"[SYNC] Skipping customer: missing QB ID")
-                        errors += 1
-                        continue
-                    
-                    # Extract customer data
-                    # Parse QB timestamp string to datetime
-                    qb_last_modified_str = customer.get('MetaData', {}).get('LastUpdatedTime')
-                    qb_last_modified = datetime.fromisoformat(qb_last_modified_str.replace('Z', '+00:00')) if qb_last_modified_str else None
-                    
-                    customer_data = {
-                        'qb_customer_id': qb_customer_id,
-                        'display_name': customer.get('DisplayName'),
-                        'company_name': customer.get('CompanyName'),
-                        'given_name': customer.get('GivenName'),
-                        'family_name': customer.get('FamilyName'),
-                        'email': customer.get('PrimaryEmailAddr', {}).get('Address') if customer.get('PrimaryEmailAddr') else None,
-                        'phone': customer.get('PrimaryPhone', {}).get('FreeFormNumber') if customer.get('PrimaryPhone') else None,
-                        'qb_data': json.dumps(customer),  # JSON-encode for JSONB column
-                        'qb_last_modified': qb_last_modified,
-                        'is_active': customer.get('Active', True),
-                        'sync_error': None,
-                        'cached_at': datetime.now(timezone.utc)
-                    }
-                    
-                    # Upsert into cache table
-                    await db.execute(
-                        text("""
-                            INSERT INTO quickbooks_customers_cache 
-                            (qb_customer_id, display_name, company_name, given_name, family_name, 
-                             email, phone, qb_data, qb_last_modified, is_active, sync_error, cached_at)
-                            VALUES 
-                            (:qb_customer_id, :display_name, :company_name, :given_name, :family_name,
-                             :email, :phone, :qb_data, :qb_last_modified, :is_active, :sync_error, :cached_at)
-                            ON CONFLICT (qb_customer_id) DO UPDATE SET
-                                display_name = EXCLUDED.display_name,
-                                company_name = EXCLUDED.company_name,
-                                given_name = EXCLUDED.given_name,
-                                family_name = EXCLUDED.family_name,
-                                email = EXCLUDED.email,
-                                phone = EXCLUDED.phone,
-                                qb_data = EXCLUDED.qb_data,
-                                qb_last_modified = EXCLUDED.qb_last_modified,
-                                is_active = EXCLUDED.is_active,
-                                sync_error = NULL,
-                                cached_at = EXCLUDED.cached_at
-                        """),
-                        customer_data
-                    )
-                    
-                    records_synced += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to sync customer {qb_customer_id}: {e}")
-                    errors += 1
-                    
-                    # Store error in cache
-                    try:
-                        await db.execute(
-                            text("""
-                                UPDATE quickbooks_customers_cache 
-                                SET sync_error = :error 
-                                WHERE qb_customer_id = :qb_customer_id
-                            """),
-                            {"error": str(e), "qb_customer_id": qb_customer_id}
-                        )
-                    except:
-                        pass
-            
-            # Commit all changes
-            await db.commit()
+            logger.info(f"[SYNC] Query returned {fetched} total customers, {records_synced} GC Compliance (CustomerTypeRef={self.GC_COMPLIANCE_CUSTOMER_TYPE})")
             
             # Calculate duration
             end_time = datetime.now(timezone.utc)
             duration_ms = int((end_time - start_time).total_seconds() * 1000)
             
             # Update sync status
-            await self._update_sync_status(db, 'customers', start_time, duration_ms, records_synced, errors)
+            await qb_sync_journal.complete(db, run)
+            await self._update_sync_status(db, 'customers', watermark, duration_ms, records_synced, errors)
             
-            logger.info(f"[SYNC] Customer sync complete: {records_synced} synced, {errors} errors, {duration_ms}ms")
+            logger.info(
+                f"[SYNC] Customer sync complete: {records_synced} synced "
+                f"({change_counts['inserted']} new, {change_counts['updated']} changed, {change_counts['unchanged']} unchanged), "
+                f"{errors} errors, {duration_ms}ms"
+            )
             
             return {
                 "records_synced": records_synced,
                 "duration_ms": duration_ms,
                 "errors": errors,
-                "created": 0,  # TODO: Track created vs updated
-                "updated": records_synced,
-                "skipped": 0
+                "created": change_counts["inserted"],
+                "updated": change_counts["updated"],
+                "unchanged": change_counts["unchanged"],
+                "skipped": fetched - records_synced - errors,
+                "run_id": run["id"],
+                "resumed": run["resumed"]
             }
             
         except Exception as e:
@@ -246,17 +227,28 @@ class QuickBooksSyncService:
             
             # Update sync status with error
             duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-            await self._update_sync_status(db, 'customers', start_time, duration_ms, records_synced, errors + 1, str(e))
+            if run is not None:
+                await qb_sync_journal.fail(db, run, str(e))
+            await self._update_sync_status(db, 'customers', None, duration_ms, records_synced, errors + 1, str(e))
             
             raise
     
-    async def sync_invoices(self, db: AsyncSession, since: Optional[datetime] = None, auto_promote: bool = True) -> Dict[str, Any]:
+    async def sync_invoices(
+        self,
+        db: AsyncSession,
+        since: Optional[datetime] = None,
+        auto_promote: bool = True,
+        stream: Optional[PageStream] = None,
+        run: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Sync invoices from QuickBooks to quickbooks_invoices_cache.
         
         Args:
             db: Database session
             since: Only fetch invoices modified after this timestamp
+            stream, run: Pages already being fetched by the sync_all pipeline and
+                their journal run (see sync_customers)
             auto_promote: If True, automatically promotes cached invoices to main invoices table
             
         Returns:
@@ -267,52 +259,20 @@ class QuickBooksSyncService:
         
         start_time = datetime.now(timezone.utc)
         records_synced = 0
+        fetched = 0
         errors = 0
+        change_counts = {"inserted": 0, "updated": 0, "unchanged": 0}
         
         try:
             logger.info(f"[SYNC] Starting invoice sync (delta: {since is not None})")
             
-            # Get last sync time if not provided
-            if since is None:
-                result = await db.execute(
-                    text("SELECT last_sync_at FROM sync_status WHERE entity_type = 'invoices'")
-                )
-                row = result.fetchone()
-                since = row.last_sync_at if row and row.last_sync_at else None
-            
-            # Build query
-            query = "SELECT * FROM Invoice"
-            if since:
-                since_str = since.strftime('%Y-%m-%dT%H:%M:%S-00:00')
-                query += f" WHERE Metadata.LastUpdatedTime > '{since_str}'"
-                logger.info(f"[SYNC] Delta query: fetching invoices modified after {since_str}")
-            
-            query += " MAXRESULTS 1000"
-            
-            # Fetch invoices with circuit breaker protection
-            try:
-                invoices = await qb_circuit_breaker.call(
-                    self.qb_service.query,
-                    query
-                )
-            except CircuitBreakerError as e:
-                logger.error(f"[SYNC] Circuit breaker blocked invoice sync: {e}")
-                duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-                await self._update_sync_status(db, 'invoices', start_time, 0, duration_ms, 1)
-                return {
-                    "records_synced": 0,
-                    "duration_ms": duration_ms,
-                    "errors": 1,
-                    "circuit_breaker_status": qb_circuit_breaker.get_status(),
-                    "error": str(e)
-                }
-            
-            if not invoices:
-                logger.info("[SYNC] No invoices to sync")
-                await self._update_sync_status(db, 'invoices', start_time, 0, 0, 0)
-                return {"records_synced": 0, "duration_ms": 0, "errors": 0, "created": 0, "updated": 0, "skipped": 0}
-            
-            logger.info(f"[SYNC] Fetched {len(invoices)} invoices from QuickBooks")
+            pages = stream
+            if pages is None:
+                if since is None:
+                    since = await self._get_last_sync(db, 'invoices')
+                run, pages = await self._open_run(db, 'invoices', since)
+            # A resumed run keeps its original start as the delta watermark
+            watermark = run["started_at"]
             
             # Get list of GC Compliance customer IDs from cache
             result = await db.execute(
@@ -321,96 +281,76 @@ class QuickBooksSyncService:
             gc_customer_ids = {row.qb_customer_id for row in result.fetchall()}
             logger.info(f"[SYNC] Filtering invoices for {len(gc_customer_ids)} GC Compliance customers")
             
-            # Process each invoice
-            for invoice in invoices:
-                try:
-                    qb_invoice_id = invoice.get('Id')
-                    customer_ref = invoice.get('CustomerRef', {})
-                    customer_id = customer_ref.get('value') if customer_ref else None
-                    
-                    # CRITICAL: Only sync invoices for GC Compliance customers
-                    if customer_id not in gc_customer_ids:
-                        logger.debug(f"[SYNC] Skipping invoice {qb_invoice_id}: customer {customer_id} not in GC Compliance")
-                        continue
-                    
-                    # QB ID is authoritative
-                    if not qb_invoice_id:
-                        logger.error(f"[SYNC] Skipping invoice: missing QB ID")
-                        errors += 1
-                        continue
-                    
-                    # Parse QB timestamp string to datetime
-                    qb_last_modified_str = invoice.get('MetaData', {}).get('LastUpdatedTime')
-                    qb_last_modified = datetime.fromisoformat(qb_last_modified_str.replace('Z', '+00:00')) if qb_last_modified_str else None
-                    
-                    # Parse date string to date object
-                    due_date_str = invoice.get('DueDate')
-                    due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date() if due_date_str else None
-                    
-                    invoice_data = {
-                        'qb_invoice_id': qb_invoice_id,
-                        'customer_id': invoice.get('CustomerRef', {}).get('value'),
-                        'doc_number': invoice.get('DocNumber'),
-                        'total_amount': invoice.get('TotalAmt'),
-                        'balance': invoice.get('Balance'),
-                        'due_date': due_date,
-                        'qb_data': json.dumps(invoice),  # JSON-encode for JSONB column
-                        'qb_last_modified': qb_last_modified,
-                        'is_active': True,  # Invoices don't have Active field
-                        'sync_error': None,
-                        'cached_at': datetime.now(timezone.utc)
-                    }
-                    
-                    # Upsert
-                    await db.execute(
-                        text("""
-                            INSERT INTO quickbooks_invoices_cache 
-                            (qb_invoice_id, customer_id, doc_number, total_amount, balance, 
-                             due_date, qb_data, qb_last_modified, is_active, sync_error, cached_at)
-                            VALUES 
-                            (:qb_invoice_id, :customer_id, :doc_number, :total_amount, :balance,
-                             :due_date, :qb_data, :qb_last_modified, :is_active, :sync_error, :cached_at)
-                            ON CONFLICT (qb_invoice_id) DO UPDATE SET
-                                customer_id = EXCLUDED.customer_id,
-                                doc_number = EXCLUDED.doc_number,
-                                total_amount = EXCLUDED.total_amount,
-                                balance = EXCLUDED.balance,
-                                due_date = EXCLUDED.due_date,
-                                qb_data = EXCLUDED.qb_data,
-                                qb_last_modified = EXCLUDED.qb_last_modified,
-                                is_active = EXCLUDED.is_active,
-                                sync_error = NULL,
-                                cached_at = EXCLUDED.cached_at
-                        """),
-                        invoice_data
-                    )
-                    
-                    records_synced += 1
+            # Stream pages with circuit breaker protection per page
+            try:
+                async for page in pages:
+                    fetched += len(page)
+                    errors_before_page = errors
+                    rows = []
+                    failed = []
                     
-                except Exception as e:
-                    logger.error(f"Failed to sync invoice {qb_invoice_id}: {e}")
-                    errors += 1
+                    for invoice in page:
+                        qb_invoice_id = invoice.get('Id')
+                        try:
+                            customer_ref = invoice.get('CustomerRef', {})
+                            customer_id = customer_ref.get('value') if customer_ref else None
+                            
+                            # CRITICAL: Only sync invoices for GC Compliance customers
+                            if customer_id not in gc_customer_ids:
+                                continue
+                            
+                            # QB ID is authoritative
+                            if not qb_invoice_id:
+                                logger.error(f"[SYNC] Skipping invoice: missing QB ID")
+                                errors += 1
+                                continue
+                            
+                            rows.append(invoice_cache_row(invoice))
+                        except Exception as e:
+                            logger.error(f"Failed to sync invoice {qb_invoice_id}: {e}")
+                            errors += 1
+                            failed.append({"error": str(e), "qb_invoice_id": qb_invoice_id})
                     
-                    try:
+                    await self._cache_context(db, 'invoices', page)
+                    if rows:
+                        page_counts = await qb_cache_loader.upsert(db, 'invoices', rows)
+                        for outcome, count in page_counts.items():
+                            change_counts[outcome] += count
+                        records_synced += len(rows)
+                    if failed:
                         await db.execute(
-                            text("""
-                                UPDATE quickbooks_invoices_cache 
-                                SET sync_error = :error 
-                                WHERE qb_invoice_id = :qb_invoice_id
-                            """),
-                            {"error": str(e), "qb_invoice_id": qb_invoice_id}
+                            text("UPDATE quickbooks_invoices_cache SET sync_error = :error WHERE qb_invoice_id = :qb_invoice_id"),
+                            failed
                         )
-                    except:
-                        pass
+                    
+                    await qb_sync_journal.checkpoint(db, run, len(page), len(rows), errors - errors_before_page)
+                    await db.commit()
+            except CircuitBreakerError as e:
+                logger.error(f"[SYNC] Circuit breaker blocked invoice sync: {e}")
+                duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
+                await qb_sync_journal.fail(db, run, str(e))
+                await self._update_sync_status(db, 'invoices', None, duration_ms, records_synced, errors + 1, str(e))
+                return {
+                    "records_synced": records_synced,
+                    "duration_ms": duration_ms,
+                    "errors": errors + 1,
+                    "circuit_breaker_status": qb_circuit_breaker.get_status(),
+                    "error": str(e)
+                }
             
-            await db.commit()
+            logger.info(f"[SYNC] Fetched {fetched} invoices from QuickBooks, {records_synced} for GC Compliance customers")
             
             end_time = datetime.now(timezone.utc)
             duration_ms = int((end_time - start_time).total_seconds() * 1000)
             
-            await self._update_sync_status(db, 'invoices', start_time, duration_ms, records_synced, errors)
+            await qb_sync_journal.complete(db, run)
+            await self._update_sync_status(db, 'invoices', watermark, duration_ms, records_synced, errors)
             
-            logger.info(f"[SYNC] Invoice sync complete: {records_synced} synced, {errors} errors, {duration_ms}ms")
+            logger.info(
+                f"[SYNC] Invoice sync complete: {records_synced} synced "
+                f"({change_counts['inserted']} new, {change_counts['updated']} changed, {change_counts['unchanged']} unchanged), "
+                f"{errors} errors, {duration_ms}ms"
+            )
             
             # Auto-promote to main table if enabled
             promotion_result = None
@@ -426,9 +366,12 @@ class QuickBooksSyncService:
                 "records_synced": records_synced,
                 "duration_ms": duration_ms,
                 "errors": errors,
-                "created": 0,  # TODO: Track created vs updated
-                "updated": records_synced,
-                "skipped": 0,
+                "created": change_counts["inserted"],
+                "updated": change_counts["updated"],
+                "unchanged": change_counts["unchanged"],
+                "skipped": fetched - records_synced - errors,
+                "run_id": run["id"],
+                "resumed": run["resumed"],
                 "promotion": promotion_result
             }
             
@@ -437,17 +380,28 @@ class QuickBooksSyncService:
             await db.rollback()
             
             duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-            await self._update_sync_status(db, 'invoices', start_time, duration_ms, records_synced, errors + 1, str(e))
+            if run is not None:
+                await qb_sync_journal.fail(db, run, str(e))
+            await self._update_sync_status(db, 'invoices', None, duration_ms, records_synced, errors + 1, str(e))
             
             raise
     
-    async def sync_payments(self, db: AsyncSession, since: Optional[datetime] = None, auto_promote: bool = True) -> Dict[str, Any]:
+    async def sync_payments(
+        self,
+        db: AsyncSession,
+        since: Optional[datetime] = None,
+        auto_promote: bool = True,
+        stream: Optional[PageStream] = None,
+        run: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Sync payments from QuickBooks to quickbooks_payments_cache.
         
         Args:
             db: Database session
             since: Only fetch payments modified after this timestamp
+            stream, run: Pages already being fetched by the sync_all pipeline and
+                their journal run (see sync_customers)
             auto_promote: If True, automatically promotes cached payments to main payments table
             
         Returns:
@@ -458,52 +412,20 @@ class QuickBooksSyncService:
         
         start_time = datetime.now(timezone.utc)
         records_synced = 0
+        fetched = 0
         errors = 0
+        change_counts = {"inserted": 0, "updated": 0, "unchanged": 0}
         
         try:
             logger.info(f"[SYNC] Starting payment sync (delta: {since is not None})")
             
-            # Get last sync time if not provided
-            if since is None:
-                result = await db.execute(
-                    text("SELECT last_sync_at FROM sync_status WHERE entity_type = 'payments'")
-                )
-                row = result.fetchone()
-                since = row.last_sync_at if row and row.last_sync_at else None
-            
-            # Build query
-            query = "SELECT * FROM Payment"
-            if since:
-                since_str = since.strftime('%Y-%m-%dT%H:%M:%S-00:00')
-                query += f" WHERE Metadata.LastUpdatedTime > '{since_str}'"
-                logger.info(f"[SYNC] Delta query: fetching payments modified after {since_str}")
-            
-            query += " MAXRESULTS 1000"
-            
-            # Fetch payments with circuit breaker protection
-            try:
-                payments = await qb_circuit_breaker.call(
-                    self.qb_service.query,
-                    query
-                )
-            except CircuitBreakerError as e:
-                logger.error(f"[SYNC] Circuit breaker blocked payment sync: {e}")
-                duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-                await self._update_sync_status(db, 'payments', start_time, 0, duration_ms, 1)
-                return {
-                    "records_synced": 0,
-                    "duration_ms": duration_ms,
-                    "errors": 1,
-                    "circuit_breaker_status": qb_circuit_breaker.get_status(),
-                    "error": str(e)
-                }
-            
-            if not payments:
-                logger.info("[SYNC] No payments to sync")
-                await self._update_sync_status(db, 'payments', start_time, 0, 0, 0)
-                return {"records_synced": 0, "duration_ms": 0, "errors": 0, "created": 0, "updated": 0, "skipped": 0}
-            
-            logger.info(f"[SYNC] Fetched {len(payments)} payments from QuickBooks")
+            pages = stream
+            if pages is None:
+                if since is None:
+                    since = await self._get_last_sync(db, 'payments')
+                run, pages = await self._open_run(db, 'payments', since)
+            # A resumed run keeps its original start as the delta watermark
+            watermark = run["started_at"]
             
             # Get list of GC Compliance invoice IDs from cache
             result = await db.execute(
@@ -512,119 +434,80 @@ class QuickBooksSyncService:
             gc_invoice_ids = {row.qb_invoice_id for row in result.fetchall()}
             logger.info(f"[SYNC] Filtering payments for {len(gc_invoice_ids)} GC Compliance invoices")
             
-            # Process each payment
-            for payment in payments:
-                try:
-                    qb_payment_id = payment.get('Id')
-                    customer_ref = payment.get('CustomerRef', {})
-                    customer_id = customer_ref.get('value') if customer_ref else None
-                    
-                    # Extract linked invoice IDs from payment lines
-                    linked_invoice_ids = []
-                    for line in payment.get('Line', []):
-                        linked_txns = line.get('LinkedTxn', [])
-                        for linked_txn in linked_txns:
-                            if linked_txn.get('TxnType') == 'Invoice':
-                                linked_invoice_ids.append(linked_txn.get('TxnId'))
-                    
-                    # CRITICAL: Only sync payments for GC Compliance invoices
-                    has_gc_invoice = any(inv_id in gc_invoice_ids for inv_id in linked_invoice_ids)
-                    if not has_gc_invoice:
-                        logger.debug(f"[SYNC] Skipping payment {qb_payment_id}: no GC Compliance invoices linked")
-                        continue
-                    
-                    # QB ID is authoritative
-                    if not qb_payment_id:
-                        logger.error(f"[SYNC] Skipping payment: missing QB ID")
-                        errors += 1
-                        continue
-                    
-                    # Extract linked invoice if present
-                    invoice_id = None
-                    if payment.get('Line'):
-                        for line in payment['Line']:
-                            if line.get('LinkedTxn'):
-                                for linked_txn in line['LinkedTxn']:
-                                    if linked_txn.get('TxnType') == 'Invoice':
-                                        invoice_id = linked_txn.get('TxnId')
-                                        break
-                    
-                    # Parse QB timestamp string to datetime
-                    qb_last_modified_str = payment.get('MetaData', {}).get('LastUpdatedTime')
-                    qb_last_modified = datetime.fromisoformat(qb_last_modified_str.replace('Z', '+00:00')) if qb_last_modified_str else None
-                    
-                    # Parse date string to date object
-                    payment_date_str = payment.get('TxnDate')
-                    payment_date = datetime.strptime(payment_date_str, '%Y-%m-%d').date() if payment_date_str else None
-                    
-                    payment_data = {
-                        'qb_payment_id': qb_payment_id,
-                        'customer_id': payment.get('CustomerRef', {}).get('value'),
-                        'invoice_id': invoice_id,
-                        'amount': payment.get('TotalAmt'),
-                        'payment_date': payment_date,
-                        'payment_method': payment.get('PaymentMethodRef', {}).get('name'),
-                        'reference_number': payment.get('PaymentRefNum'),
-                        'qb_data': json.dumps(payment),  # JSON-encode for JSONB column
-                        'qb_last_modified': qb_last_modified,
-                        'is_active': True,
-                        'sync_error': None,
-                        'cached_at': datetime.now(timezone.utc)
-                    }
-                    
-                    # Upsert
-                    await db.execute(
-                        text("""
-                            INSERT INTO quickbooks_payments_cache 
-                            (qb_payment_id, customer_id, invoice_id, amount, payment_date, 
-                             payment_method, reference_number, qb_data, qb_last_modified, 
-                             is_active, sync_error, cached_at)
-                            VALUES 
-                            (:qb_payment_id, :customer_id, :invoice_id, :amount, :payment_date,
-                             :payment_method, :reference_number, :qb_data, :qb_last_modified,
-                             :is_active, :sync_error, :cached_at)
-                            ON CONFLICT (qb_payment_id) DO UPDATE SET
-                                customer_id = EXCLUDED.customer_id,
-                                invoice_id = EXCLUDED.invoice_id,
-                                amount = EXCLUDED.amount,
-                                payment_date = EXCLUDED.payment_date,
-                                payment_method = EXCLUDED.payment_method,
-                                reference_number = EXCLUDED.reference_number,
-                                qb_data = EXCLUDED.qb_data,
-                                qb_last_modified = EXCLUDED.qb_last_modified,
-                                is_active = EXCLUDED.is_active,
-                                sync_error = NULL,
-                                cached_at = EXCLUDED.cached_at
-                        """),
-                        payment_data
-                    )
-                    
-                    records_synced += 1
+            # Stream pages with circuit breaker protection per page
+            try:
+                async for page in pages:
+                    fetched += len(page)
+                    errors_before_page = errors
+                    rows = []
+                    failed = []
                     
-                except Exception as e:
-                    logger.error(f"Failed to sync payment {qb_payment_id}: {e}")
-                    errors += 1
+                    for payment in page:
+                        qb_payment_id = payment.get('Id')
+                        try:
+                            # Extract linked invoice IDs from payment lines
+                            linked_invoice_ids = [
+                                linked_txn.get('TxnId')
+                                for line in payment.get('Line', [])
+                                for linked_txn in line.get('LinkedTxn', [])
+                                if linked_txn.get('TxnType') == 'Invoice'
+                            ]
+                            
+                            # CRITICAL: Only sync payments for GC Compliance invoices
+                            if not any(inv_id in gc_invoice_ids for inv_id in linked_invoice_ids):
+                                continue
+                            
+                            # QB ID is authoritative
+                            if not qb_payment_id:
+                                logger.error(f"[SYNC] Skipping payment: missing QB ID")
+                                errors += 1
+                                continue
+                            
+                            rows.append(payment_cache_row(payment, linked_invoice_ids[0]))
+                        except Exception as e:
+                            logger.error(f"Failed to sync payment {qb_payment_id}: {e}")
+                            errors += 1
+                            failed.append({"error": str(e), "qb_payment_id": qb_payment_id})
                     
-                    try:
+                    if rows:
+                        page_counts = await qb_cache_loader.upsert(db, 'payments', rows)
+                        for outcome, count in page_counts.items():
+                            change_counts[outcome] += count
+                        records_synced += len(rows)
+                    if failed:
                         await db.execute(
-                            text("""
-                                UPDATE quickbooks_payments_cache 
-                                SET sync_error = :error 
-                                WHERE qb_payment_id = :qb_payment_id
-                            """),
-                            {"error": str(e), "qb_payment_id": qb_payment_id}
+                            text("UPDATE quickbooks_payments_cache SET sync_error = :error WHERE qb_payment_id = :qb_payment_id"),
+                            failed
                         )
-                    except:
-                        pass
+                    
+                    await qb_sync_journal.checkpoint(db, run, len(page), len(rows), errors - errors_before_page)
+                    await db.commit()
+            except CircuitBreakerError as e:
+                logger.error(f"[SYNC] Circuit breaker blocked payment sync: {e}")
+                duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
+                await qb_sync_journal.fail(db, run, str(e))
+                await self._update_sync_status(db, 'payments', None, duration_ms, records_synced, errors + 1, str(e))
+                return {
+                    "records_synced": records_synced,
+                    "duration_ms": duration_ms,
+                    "errors": errors + 1,
+                    "circuit_breaker_status": qb_circuit_breaker.get_status(),
+                    "error": str(e)
+                }
             
-            await db.commit()
+            logger.info(f"[SYNC] Fetched {fetched} payments from QuickBooks, {records_synced} for GC Compliance invoices")
             
             end_time = datetime.now(timezone.utc)
             duration_ms = int((end_time - start_time).total_seconds() * 1000)
             
-            await self._update_sync_status(db, 'payments', start_time, duration_ms, records_synced, errors)
+            await qb_sync_journal.complete(db, run)
+            await self._update_sync_status(db, 'payments', watermark, duration_ms, records_synced, errors)
             
-            logger.info(f"[SYNC] Payment sync complete: {records_synced} synced, {errors} errors, {duration_ms}ms")
+            logger.info(
+                f"[SYNC] Payment sync complete: {records_synced} synced "
+                f"({change_counts['inserted']} new, {change_counts['updated']} changed, {change_counts['unchanged']} unchanged), "
+                f"{errors} errors, {duration_ms}ms"
+            )
             
             # Auto-promote to main table if enabled
             promotion_result = None
@@ -640,9 +523,12 @@ class QuickBooksSyncService:
                 "records_synced": records_synced,
                 "duration_ms": duration_ms,
                 "errors": errors,
-                "created": 0,  # TODO: Track created vs updated
-                "updated": records_synced,
-                "skipped": 0,
+                "created": change_counts["inserted"],
+                "updated": change_counts["updated"],
+                "unchanged": change_counts["unchanged"],
+                "skipped": fetched - records_synced - errors,
+                "run_id": run["id"],
+                "resumed": run["resumed"],
                 "promotion": promotion_result  # Include promotion metrics
             }
             
@@ -651,11 +537,13 @@ class QuickBooksSyncService:
             await db.rollback()
             
             duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-            await self._update_sync_status(db, 'payments', start_time, duration_ms, records_synced, errors + 1, str(e))
+            if run is not None:
+                await qb_sync_journal.fail(db, run, str(e))
+            await self._update_sync_status(db, 'payments', None, duration_ms, records_synced, errors + 1, str(e))
             
             raise
     
-    async def sync_all(self, db: AsyncSession, force_full_sync: bool = False) -> Dict[str, Any]:
+    async def sync_all(self, db: AsyncSession, force_full_sync: bool = False, mode: Optional[str] = None) -> Dict[str, Any]:
         """
         Sync all entity types in mandatory order: Customers → Invoices → Payments.
         
@@ -665,13 +553,26 @@ class QuickBooksSyncService:
         
         Only GC Compliance customers (CustomerTypeRef=698682) and their related data are synced.
         
+        In query mode the three fetches run concurrently as a pipeline
+        (app/utils/qb_sync_pipeline.py); only the apply stages follow the
+        order above. results["pipeline"] reports per-stage throughput and
+        queue depths.
+        
         Args:
             db: Database session
             force_full_sync: If True, ignores last_sync_at and syncs everything
+            mode: "query" (three delta queries) or "cdc" (one ChangeDataCapture
+                call); defaults to settings.QB_SYNC_MODE. CDC falls back to the
+                query flow when it cannot cover the window.
             
         Returns:
             Dict with combined metrics from all syncs
         """
+        if (mode or settings.QB_SYNC_MODE) == "cdc" and not force_full_sync:
+            results = await self._sync_all_cdc(db)
+            if results is not None:
+                return results
+        
         logger.info(f"[SYNC] Starting full GC Compliance sync (force_full: {force_full_sync})")
         
         results = {
@@ -683,31 +584,44 @@ class QuickBooksSyncService:
             "total_errors": 0
         }
         
+        self.qb_service = get_quickbooks_service(db)
+        start_time = datetime.now(timezone.utc)
+        runs: Dict[str, Dict[str, Any]] = {}
+        streams: Dict[str, PageStream] = {}
+        
         try:
+            # Load tokens here, on db, so fetch tasks never touch the session while this task uses it
+            await self.qb_service._ensure_authenticated()
+            
+            # Fetch all three entity types concurrently; apply below in dependency order
+            for entity_type in ("customers", "invoices", "payments"):
+                since = None if force_full_sync else await self._get_last_sync(db, entity_type)
+                runs[entity_type], pages = await self._open_run(db, entity_type, since)
+                streams[entity_type] = PageStream(entity_type, pages, settings.QB_SYNC_PIPELINE_QUEUE_PAGES).start()
+            
             # Step 1: Sync customers (filtered by CustomerTypeRef=698682)
             logger.info("[SYNC] Step 1/3: Syncing GC Compliance customers...")
-            since = None if force_full_sync else await self._get_last_sync(db, 'customers')
-            results["customers"] = await self.sync_customers(db, since=since)
+            results["customers"] = await self.sync_customers(db, stream=streams["customers"], run=runs["customers"])
             logger.info(f"[SYNC] Step 1/3 complete: {results['customers']['records_synced']} customers synced")
             
             # Step 2: Sync invoices (only for GC Compliance customers)
             logger.info("[SYNC] Step 2/3: Syncing invoices for GC Compliance customers...")
-            since = None if force_full_sync else await self._get_last_sync(db, 'invoices')
-            results["invoices"] = await self.sync_invoices(db, since=since)
+            results["invoices"] = await self.sync_invoices(db, stream=streams["invoices"], run=runs["invoices"])
             logger.info(f"[SYNC] Step 2/3 complete: {results['invoices']['records_synced']} invoices synced")
             
             # Step 3: Sync payments (only for GC Compliance invoices)
             logger.info("[SYNC] Step 3/3: Syncing payments for GC Compliance invoices...")
-            since = None if force_full_sync else await self._get_last_sync(db, 'payments')
-            results["payments"] = await self.sync_payments(db, since=since)
+            results["payments"] = await self.sync_payments(db, stream=streams["payments"], run=runs["payments"])
             logger.info(f"[SYNC] Step 3/3 complete: {results['payments']['records_synced']} payments synced")
             
             # Calculate totals
             for entity_result in [results["customers"], results["invoices"], results["payments"]]:
                 if entity_result:
                     results["total_records"] += entity_result["records_synced"]
-                    results["total_duration_ms"] += entity_result["duration_ms"]
                     results["total_errors"] += entity_result["errors"]
+            # Stages overlap, so the total is wall time rather than the sum of stage durations
+            results["total_duration_ms"] = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
+            results["pipeline"] = {entity_type: stream.get_stats() for entity_type, stream in streams.items()}
             
             logger.info(f"[SYNC] Full sync complete: {results['total_records']} records, {results['total_duration_ms']}ms, {results['total_errors']} errors")
             
@@ -715,7 +629,456 @@ class QuickBooksSyncService:
             
         except Exception as e:
             logger.error(f"Full sync failed: {e}", exc_info=True)
+            # Later stages never ran - leave their runs resumable
+            for run in runs.values():
+                if "status" not in run:
+                    await qb_sync_journal.fail(db, run, f"Aborted: {e}")
             raise
+        finally:
+            # A failed stage leaves later fetches running - stop them
+            for stream in streams.values():
+                await stream.cancel()
+    
+    async def _sync_all_cdc(self, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """
+        Delta sync of customers, invoices, payments and deletions with one
+        ChangeDataCapture call covering the window since the oldest watermark.
+        
+        Changes go through the same cache upsert (GC Compliance filtered) and
+        targeted promotion as webhook syncs; deleted entities deactivate their
+        cache rows.
+        
+        Returns:
+            Same shape as sync_all (plus mode/api_calls), or None when CDC
+            cannot cover the window (no watermark, older than 30 days, or a
+            truncated response) and the query flow should run instead
+        """
+        self.qb_service = get_quickbooks_service(db)
+        
+        watermarks = [await self._get_last_sync(db, entity_type) for entity_type in self.QB_ENTITY_NAMES]
+        if any(watermark is None for watermark in watermarks):
+            logger.info("[SYNC] CDC needs a previous sync for every entity type, using query sync")
+            return None
+        since = min(
+            watermark if watermark.tzinfo else watermark.replace(tzinfo=timezone.utc) for watermark in watermarks
+        )
+        start_time = datetime.now(timezone.utc)
+        if start_time - since > self.CDC_MAX_LOOKBACK:
+            logger.info(f"[SYNC] Last sync {since.isoformat()} is outside the CDC window, using query sync")
+            return None
+        
+        results = {
+            "customers": None,
+            "invoices": None,
+            "payments": None,
+            "total_records": 0,
+            "total_duration_ms": 0,
+            "total_errors": 0,
+            "mode": "cdc",
+            "api_calls": 1
+        }
+        
+        logger.info(f"[SYNC] Starting CDC sync for changes since {since.isoformat()}")
+        try:
+            # Item / Term / Vendor ride along for the reference-data cache (same call)
+            changes = await self.qb_service.cdc(
+                list(self.QB_ENTITY_NAMES.values()) + [REFERENCE_ENTITIES[t] for t in CDC_REFERENCE_ENTITIES],
+                since,
+                breaker=qb_circuit_breaker
+            )
+        except CircuitBreakerError as e:
+            logger.error(f"[SYNC] Circuit breaker blocked CDC sync: {e}")
+            for entity_type in self.QB_ENTITY_NAMES:
+                results[entity_type] = {"records_synced": 0, "duration_ms": 0, "errors": 1, "error": str(e)}
+            results["total_errors"] = len(self.QB_ENTITY_NAMES)
+            results["circuit_breaker_status"] = qb_circuit_breaker.get_status()
+            return results
+        
+        truncated = [
+            qb_entity for qb_entity in self.QB_ENTITY_NAMES.values()
+            if len(changes.get(qb_entity, [])) >= self.CDC_MAX_CHANGES
+        ]
+        if truncated:
+            logger.info(f"[SYNC] CDC response truncated for {', '.join(truncated)}, using query sync")
+            return None
+        
+        for entity_type, qb_entity in self.QB_ENTITY_NAMES.items():
+            entity_start = datetime.now(timezone.utc)
+            entities = changes.get(qb_entity, [])
+            deleted_ids = [entity["Id"] for entity in entities if entity.get("status") == "Deleted"]
+            changed = [entity for entity in entities if entity.get("status") != "Deleted"]
+            
+            try:
+                applied = await self._apply_changes(db, entity_type, changed, deleted_ids)
+            except Exception as e:
+                logger.error(f"[SYNC] CDC {entity_type} sync failed: {e}", exc_info=True)
+                await db.rollback()
+                duration_ms = int((datetime.now(timezone.utc) - entity_start).total_seconds() * 1000)
+                await self._update_sync_status(db, entity_type, None, duration_ms, 0, 1, str(e))
+                raise
+            
+            promotion_result = None
+            try:
+                promotion_result = await self._promote_changed(db, entity_type, applied["cached_ids"])
+            except Exception as e:
+                logger.error(f"[SYNC] Auto-promotion failed (sync succeeded): {e}")
+            
+            duration_ms = int((datetime.now(timezone.utc) - entity_start).total_seconds() * 1000)
+            await self._update_sync_status(db, entity_type, start_time, duration_ms, applied["records_synced"], 0)
+            results[entity_type] = {
+                "records_synced": applied["records_synced"],
+                "duration_ms": duration_ms,
+                "errors": 0,
+                "created": applied["created"],
+                "updated": applied["updated"],
+                "unchanged": applied["unchanged"],
+                "deactivated": applied["deactivated"],
+                "skipped": len(changed) - applied["records_synced"],
+                "promotion": promotion_result
+            }
+            results["total_records"] += applied["records_synced"]
+        
+        results["reference"] = await self._apply_reference_changes(db, changes, since, start_time)
+        results["total_duration_ms"] = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
+        logger.info(
+            f"[SYNC] CDC sync complete: {results['total_records']} records, "
+            f"{sum(results[entity_type]['deactivated'] for entity_type in self.QB_ENTITY_NAMES)} deactivated, "
+            f"{results['total_duration_ms']}ms"
+        )
+        return results
+    
+    async def _apply_reference_changes(
+        self,
+        db: AsyncSession,
+        changes: Dict[str, List[Dict[str, Any]]],
+        since: datetime,
+        start_time: datetime
+    ) -> Dict[str, int]:
+        """
+        Hand the CDC response's Item / Term / Vendor changes to the reference
+        cache. Only types already complete up to since are updated; the rest
+        are left to the cache's TTL reload. Failures never fail the sync.
+        """
+        applied = {}
+        try:
+            refreshed = await qb_reference_cache.refreshed_at(db, CDC_REFERENCE_ENTITIES)
+            for entity_type in CDC_REFERENCE_ENTITIES:
+                entities = changes.get(REFERENCE_ENTITIES[entity_type], [])
+                if entity_type not in refreshed or refreshed[entity_type] < since or len(entities) >= self.CDC_MAX_CHANGES:
+                    continue
+                deleted_ids = [entity["Id"] for entity in entities if entity.get("status") == "Deleted"]
+                changed = [entity for entity in entities if entity.get("status") != "Deleted"]
+                applied[entity_type] = await qb_reference_cache.apply_changes(
+                    db, entity_type, changed, deleted_ids, refreshed_at=start_time
+                )
+        except Exception as e:
+            logger.error(f"[SYNC] CDC reference-data update failed (sync succeeded): {e}")
+            await db.rollback()
+        return applied
+    
+    async def probe_changes(self, db: AsyncSession) -> Dict[str, Any]:
+        """
+        Cheap "did anything change since the watermark?" check (scheduler):
+        one ChangeDataCapture call instead of a full sync.
+        
+        Returns:
+            Dict with changed (True/False, or None when the watermark cannot
+            be probed - no previous sync or older than the CDC window), since,
+            checked_at and per-entity change counts
+        """
+        checked_at = datetime.now(timezone.utc)
+        watermarks = [await self._get_last_sync(db, entity_type) for entity_type in self.QB_ENTITY_NAMES]
+        if any(watermark is None for watermark in watermarks):
+            return {"changed": None, "reason": "no previous sync"}
+        since = min(watermarks)
+        if checked_at - since > self.CDC_MAX_LOOKBACK:
+            return {"changed": None, "reason": "last sync outside the CDC window"}
+        
+        self.qb_service = get_quickbooks_service(db)
+        changes = await self.qb_service.cdc(list(self.QB_ENTITY_NAMES.values()), since, breaker=qb_circuit_breaker)
+        counts = {
+            entity_type: len(changes.get(qb_entity, []))
+            for entity_type, qb_entity in self.QB_ENTITY_NAMES.items()
+        }
+        return {"changed": any(counts.values()), "since": since, "checked_at": checked_at, "counts": counts}
+    
+    async def advance_watermarks(self, db: AsyncSession, checked_at: datetime):
+        """Nothing changed up to checked_at (probe_changes) - move every watermark there without a sync."""
+        await db.execute(
+            text("""
+                UPDATE sync_status SET last_sync_at = :checked_at, updated_at = :checked_at
+                WHERE entity_type IN ('customers', 'invoices', 'payments') AND last_sync_at < :checked_at
+            """),
+            {"checked_at": checked_at}
+        )
+        await db.commit()
+    
+    async def sync_by_ids(
+        self,
+        db: AsyncSession,
+        entity_type: str,
+        qb_ids: List[str],
+        deleted_ids: Optional[List[str]] = None,
+        auto_promote: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Targeted sync of specific QuickBooks entities (webhook-driven).
+        
+        Fetches only the given IDs (SELECT <sync fields> FROM <Entity> WHERE Id IN (...)),
+        applies the same GC Compliance filters as the full sync, upserts the
+        cache and promotes just those rows. Entities QuickBooks reported as
+        deleted are marked inactive in the cache.
+        
+        Does not touch sync_status - the delta watermark belongs to the full sync.
+        
+        Args:
+            db: Database session
+            entity_type: customers, invoices or payments
+            qb_ids: QB IDs to fetch and upsert
+            deleted_ids: QB IDs to mark inactive
+            auto_promote: Promote the upserted invoices/payments to the main tables
+            
+        Returns:
+            Dict with fetched, records_synced, deactivated and promotion
+        """
+        self.qb_service = get_quickbooks_service(db)
+        
+        qb_entity = self.QB_ENTITY_NAMES[entity_type]
+        entities = []
+        
+        for start in range(0, len(qb_ids), self.ID_FETCH_CHUNK_SIZE):
+            chunk = qb_ids[start:start + self.ID_FETCH_CHUNK_SIZE]
+            async for page in self.qb_service.iter_query(
+                QBQuery(qb_entity, "sync").where_in("Id", chunk), breaker=qb_circuit_breaker
+            ):
+                entities.extend(page)
+        
+        result = await self._apply_changes(db, entity_type, entities, deleted_ids)
+        logger.info(
+            f"[SYNC] Targeted {entity_type} sync: {len(entities)} fetched, "
+            f"{result['records_synced']} cached, {result['deactivated']} deactivated"
+        )
+        
+        promotion_result = None
+        if auto_promote:
+            promotion_result = await self._promote_changed(db, entity_type, result["cached_ids"])
+        
+        return {
+            "fetched": len(entities),
+            "records_synced": result["records_synced"],
+            "deactivated": result["deactivated"],
+            "promotion": promotion_result
+        }
+    
+    async def _apply_changes(
+        self,
+        db: AsyncSession,
+        entity_type: str,
+        entities: List[Dict[str, Any]],
+        deleted_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Upsert changed entities (GC Compliance filtered) and deactivate deleted
+        ones in one cache table - and, unfiltered, in its chat-context table -
+        then commit.
+        
+        Returns:
+            Dict with records_synced, created/updated/unchanged, deactivated
+            and cached_ids (QB IDs written to the cache)
+        """
+        table, key = CACHE_TABLES[entity_type]
+        rows = []
+        for start in range(0, len(entities), self.ID_FETCH_CHUNK_SIZE):
+            rows.extend(await self._cache_rows_for(db, entity_type, entities[start:start + self.ID_FETCH_CHUNK_SIZE]))
+        
+        change_counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+        if rows:
+            change_counts = await qb_cache_loader.upsert(db, entity_type, rows)
+        
+        deactivated = 0
+        if deleted_ids:
+            result = await db.execute(
+                text(f"UPDATE {table} SET is_active = false, cached_at = CURRENT_TIMESTAMP WHERE {key} IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": deleted_ids}
+            )
+            deactivated = result.rowcount
+        await self._cache_context(db, entity_type, entities, deleted_ids)
+        await db.commit()
+        
+        return {
+            "records_synced": len(rows),
+            "created": change_counts["inserted"],
+            "updated": change_counts["updated"],
+            "unchanged": change_counts["unchanged"],
+            "deactivated": deactivated,
+            "cached_ids": [row[key] for row in rows]
+        }
+    
+    async def _promote_changed(self, db: AsyncSession, entity_type: str, qb_ids: List[str]) -> Optional[Dict[str, Any]]:
+        """Promote just the given cached invoices/payments (customers are not promoted)."""
+        if not qb_ids or entity_type == "customers":
+            return None
+        if entity_type == "invoices":
+            return await self.promote_invoices_to_database(db, qb_invoice_ids=qb_ids)
+        return await self.promote_payments_to_database(db, qb_payment_ids=qb_ids)
+    
+    async def _cache_rows_for(self, db: AsyncSession, entity_type: str, page: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cache rows for the GC Compliance entities in one page of a targeted fetch."""
+        if entity_type == "customers":
+            return [
+                customer_cache_row(customer) for customer in page
+                if (customer.get('CustomerTypeRef') or {}).get('value') == self.GC_COMPLIANCE_CUSTOMER_TYPE
+            ]
+        
+        if entity_type == "invoices":
+            customer_ids = list({(invoice.get('CustomerRef') or {}).get('value') for invoice in page} - {None})
+            gc_customer_ids = await self._cached_keys(
+                db, "SELECT qb_customer_id FROM quickbooks_customers_cache WHERE is_active = true AND qb_customer_id IN :ids",
+                customer_ids
+            )
+            return [
+                invoice_cache_row(invoice) for invoice in page
+                if (invoice.get('CustomerRef') or {}).get('value') in gc_customer_ids
+            ]
+        
+        linked = {
+            payment.get('Id'): [
+                linked_txn.get('TxnId')
+                for line in payment.get('Line', [])
+                for linked_txn in line.get('LinkedTxn', [])
+                if linked_txn.get('TxnType') == 'Invoice'
+            ]
+            for payment in page
+        }
+        gc_invoice_ids = await self._cached_keys(
+            db, "SELECT qb_invoice_id FROM quickbooks_invoices_cache WHERE qb_invoice_id IN :ids",
+            list({inv_id for inv_ids in linked.values() for inv_id in inv_ids})
+        )
+        return [
+            payment_cache_row(payment, linked[payment.get('Id')][0]) for payment in page
+            if any(inv_id in gc_invoice_ids for inv_id in linked[payment.get('Id')])
+        ]
+    
+    async def _cache_context(
+        self,
+        db: AsyncSession,
+        entity_type: str,
+        entities: List[Dict[str, Any]],
+        deleted_ids: Optional[List[str]] = None
+    ):
+        """Upsert every customer / invoice into the chat-context tier and deactivate deleted ones (no commit)."""
+        context_type = self.CONTEXT_TYPES.get(entity_type)
+        if context_type is None:
+            return
+        row_for = context_customer_row if entity_type == "customers" else context_invoice_row
+        rows = [row_for(entity) for entity in entities if entity.get('Id')]
+        if rows:
+            await qb_cache_loader.upsert(db, context_type, rows)
+        if deleted_ids:
+            table, key = CACHE_TABLES[context_type]
+            await db.execute(
+                text(f"UPDATE {table} SET is_active = false, cached_at = CURRENT_TIMESTAMP WHERE {key} IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": deleted_ids}
+            )
+    
+    async def refresh_context(self, db: AsyncSession) -> Dict[str, Any]:
+        """
+        Reload the chat-context tier from QuickBooks: every customer (inactive
+        included) and every invoice, "context" fields only. Rows QuickBooks no
+        longer returns are deactivated.
+        
+        Explicit refresh only (POST /v1/quickbooks/sync/context) - query
+        syncs, CDC and webhooks keep the tier current between refreshes, and
+        the chat never calls QuickBooks.
+        
+        Returns:
+            Dict per entity type with records_synced, created/updated/unchanged,
+            deactivated and duration_ms
+        """
+        self.qb_service = get_quickbooks_service(db)
+        await self.qb_service._ensure_authenticated()
+        queries = {
+            "customers": QBQuery("Customer", "context").where("Active IN (true, false)"),
+            "invoices": QBQuery("Invoice", "context"),
+        }
+        
+        results = {}
+        for entity_type, query in queries.items():
+            start_time = datetime.now(timezone.utc)
+            context_type = self.CONTEXT_TYPES[entity_type]
+            table, key = CACHE_TABLES[context_type]
+            row_for = context_customer_row if entity_type == "customers" else context_invoice_row
+            change_counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+            seen = []
+            
+            async for page in self.qb_service.iter_query(query.build(), breaker=qb_circuit_breaker):
+                rows = [row_for(entity) for entity in page if entity.get('Id')]
+                if rows:
+                    for outcome, count in (await qb_cache_loader.upsert(db, context_type, rows)).items():
+                        change_counts[outcome] += count
+                    seen.extend(row[key] for row in rows)
+                await db.commit()
+            
+            result = await db.execute(
+                text(f"UPDATE {table} SET is_active = false, cached_at = CURRENT_TIMESTAMP WHERE is_active AND {key} NOT IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": seen or [""]}
+            )
+            deactivated = result.rowcount
+            await db.commit()
+            
+            duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
+            await self._update_sync_status(db, context_type, start_time, duration_ms, len(seen), 0)
+            results[entity_type] = {
+                "records_synced": len(seen),
+                "created": change_counts["inserted"],
+                "updated": change_counts["updated"],
+                "unchanged": change_counts["unchanged"],
+                "deactivated": deactivated,
+                "duration_ms": duration_ms
+            }
+            logger.info(f"[SYNC] Context refresh: {len(seen)} {entity_type}, {deactivated} deactivated, {duration_ms}ms")
+        
+        return results
+    
+    @staticmethod
+    async def _cached_keys(db: AsyncSession, sql: str, ids: List[str]) -> set:
+        if not ids:
+            return set()
+        result = await db.execute(text(sql).bindparams(bindparam("ids", expanding=True)), {"ids": ids})
+        return set(result.scalars().all())
+    
+    async def _open_run(
+        self, db: AsyncSession, entity_type: str, since: Optional[datetime]
+    ) -> Tuple[Dict[str, Any], AsyncIterator[List[Dict[str, Any]]]]:
+        """Open (or resume) the journal run for a query sync and start its page walk at the checkpoint."""
+        run = await qb_sync_journal.open_run(
+            db, entity_type, self._delta_query(entity_type, since), since, settings.QB_QUERY_PAGE_SIZE
+        )
+        pages = self.qb_service.iter_query(
+            run["query"],
+            page_size=run["page_size"],
+            breaker=qb_circuit_breaker,
+            start_position=run["start_position"]
+        )
+        return run, pages
+    
+    def _delta_query(self, entity_type: str, since: Optional[datetime]) -> str:
+        """
+        Query (sync fields only) for every entity of the type, or only those
+        modified after since - ordered by Id, so a journal checkpoint
+        (STARTPOSITION) still points at the same place when the run resumes.
+        """
+        # New records get higher Ids and edits don't move a record, so neither shifts the walk
+        query = QBQuery(self.QB_ENTITY_NAMES[entity_type], "sync").order_by("Id")
+        if since:
+            # Format datetime for QuickBooks API (ISO 8601)
+            since_str = since.strftime('%Y-%m-%dT%H:%M:%S-00:00')
+            query.where(f"Metadata.LastUpdatedTime > '{since_str}'")
+            logger.info(f"[SYNC] Delta query: fetching {entity_type} modified after {since_str}")
+        return query.build()
     
     async def _get_last_sync(self, db: AsyncSession, entity_type: str) -> Optional[datetime]:
         """Get last successful sync timestamp for an entity type."""
@@ -730,18 +1093,18 @@ class QuickBooksSyncService:
         self, 
         db: AsyncSession, 
         entity_type: str, 
-        sync_time: datetime,
+        sync_time: Optional[datetime],
         duration_ms: int,
         records_synced: int,
         errors: int,
         error_message: Optional[str] = None
     ):
-        """Update sync_status table with sync results."""
+        """Update sync_status table with sync results (sync_time None keeps the watermark - failed runs)."""
         try:
             await db.execute(
                 text("""
                     UPDATE sync_status SET
-                        last_sync_at = :sync_time,
+                        last_sync_at = COALESCE(:sync_time, last_sync_at),
                         last_sync_duration_ms = :duration_ms,
                         records_synced = :records_synced,
                         sync_errors = :errors,
@@ -850,8 +1213,10 @@ class QuickBooksSyncService:
         """
         Promote invoices from cache to main invoices table.
         
-        Maps QB customer IDs to app client_ids using clients table.
-        Creates business_id automatically via database trigger.
+        Set-based (see QuickBooksPromotionService): client/project mapping is
+        resolved for the whole batch in one join and all promotable rows are
+        upserted in one statement. Creates business_id automatically via
+        database trigger.
         
         Args:
             db: Database session
@@ -859,189 +1224,10 @@ class QuickBooksSyncService:
                            If None, promotes all cached invoices.
         
         Returns:
-            Dict with promotion metrics (promoted, skipped, errors)
+            Dict with promotion metrics (promoted, skipped, errors) plus
+            skipped_rows / error_rows with the QB ID and reason
         """
-        start_time = datetime.now(timezone.utc)
-        promoted = 0
-        skipped = 0
-        errors = 0
-        
-        try:
-            logger.info(f"[PROMOTE] Starting invoice promotion from cache to main table")
-            
-            # Build query to get cached invoices
-            if qb_invoice_ids:
-                placeholders = ','.join([f':id_{i}' for i in range(len(qb_invoice_ids))])
-                query = f"""
-                    SELECT * FROM quickbooks_invoices_cache 
-                    WHERE qb_invoice_id IN ({placeholders})
-                """
-                params = {f'id_{i}': qb_id for i, qb_id in enumerate(qb_invoice_ids)}
-            else:
-                query = "SELECT * FROM quickbooks_invoices_cache WHERE is_active = true"
-                params = {}
-            
-            result = await db.execute(text(query), params)
-            cached_invoices = result.fetchall()
-            
-            logger.info(f"[PROMOTE] Found {len(cached_invoices)} cached invoices to process")
-            
-            for cached_invoice in cached_invoices:
-                try:
-                    qb_invoice_id = cached_invoice.qb_invoice_id
-                    qb_customer_id = cached_invoice.customer_id
-                    
-                    # Map QB customer ID to app client_id
-                    client_result = await db.execute(
-                        text("SELECT client_id FROM clients WHERE qb_customer_id = :qb_customer_id"),
-                        {"qb_customer_id": qb_customer_id}
-                    )
-                    client_row = client_result.fetchone()
-                    
-                    if not client_row:
-                        logger.warning(f"[PROMOTE] Skipping invoice {qb_invoice_id}: QB customer {qb_customer_id} not found in clients table")
-                        skipped += 1
-                        continue
-                    
-                    client_id = client_row.client_id
-                    
-                    # Get project_id from client
-                    # WARNING: Using LIMIT 1 is a temporary fallback for single-project clients only.
-                    # Production-safe approach requires:
-                    # 1. QB custom field mapping (e.g., Class or Department)
-                    # 2. DocNumber pattern matching (e.g., "PROJ-123-INV001")
-                    # 3. Explicit client-project mapping table
-                    # If client has multiple projects and no clear mapping → SKIP, do not guess
-                    # TODO: Implement proper project resolution before multi-project clients
-                    project_result = await db.execute(
-                        text("SELECT project_id FROM projects WHERE client_id = :client_id LIMIT 1"),
-                        {"client_id": client_id}
-                    )
-                    project_row = project_result.fetchone()
-                    
-                    if not project_row:
-                        logger.warning(f"[PROMOTE] Skipping invoice {qb_invoice_id}: No project found for client {client_id}")
-                        skipped += 1
-                        continue
-                    
-                    project_id = project_row.project_id
-                    
-                    # Parse QB JSON data
-                    qb_data = json.loads(cached_invoice.qb_data) if isinstance(cached_invoice.qb_data, str) else cached_invoice.qb_data
-                    
-                    # Extract invoice details from cache
-                    total_amount = float(cached_invoice.total_amount or 0)
-                    balance = float(cached_invoice.balance or 0)
-                    
-                    # Derive status from QB data
-                    # If balance is 0, invoice is paid. Otherwise, it's open.
-                    status = 'PAID' if balance == 0 else 'OPEN'
-                    
-                    # Extract additional QB fields with safe null handling
-                    bill_email_obj = qb_data.get('BillEmail')
-                    bill_email = bill_email_obj.get('Address') if bill_email_obj else None
-                    
-                    currency_ref = qb_data.get('CurrencyRef')
-                    currency_code = currency_ref.get('value') if currency_ref else None
-                    
-                    sales_term_ref = qb_data.get('SalesTermRef')
-                    payment_terms = sales_term_ref.get('name') if sales_term_ref else None
-                    
-                    customer_memo_obj = qb_data.get('CustomerMemo')
-                    customer_memo = customer_memo_obj.get('value') if customer_memo_obj else None
-                    
-                    invoice_data = {
-                        'qb_invoice_id': qb_invoice_id,
-                        'project_id': project_id,
-                        'client_id': client_id,
-                        'invoice_number': qb_data.get('DocNumber'),
-                        'invoice_date': datetime.fromisoformat(qb_data['TxnDate']) if qb_data.get('TxnDate') else None,
-                        'due_date': datetime.fromisoformat(qb_data['DueDate']) if qb_data.get('DueDate') else None,
-                        'subtotal': total_amount,  # QB API doesn't separate subtotal from total consistently
-                        'total_amount': total_amount,
-                        'amount_paid': total_amount - balance,  # Calculate paid amount from balance
-                        'balance_due': balance,
-                        'status': status,  # Derived from balance
-                        'sync_status': 'synced',
-                        'notes': f"Imported from QuickBooks (QB ID: {qb_invoice_id})",
-                        # New QB-specific fields
-                        'email_status': qb_data.get('EmailStatus'),
-                        'print_status': qb_data.get('PrintStatus'),
-                        'bill_email': bill_email,
-                        'bill_address': json.dumps(qb_data.get('BillAddr')) if qb_data.get('BillAddr') else None,
-                        'ship_address': json.dumps(qb_data.get('ShipAddr')) if qb_data.get('ShipAddr') else None,
-                        'currency_code': currency_code,
-                        'payment_terms': payment_terms,
-                        'qb_metadata': json.dumps(qb_data.get('MetaData')) if qb_data.get('MetaData') else None,
-                        'private_note': qb_data.get('PrivateNote'),
-                        'customer_memo': customer_memo
-                    }
-                    
-                    # Upsert into invoices table
-                    # Note: amount_paid will be recalculated when payments are promoted
-                    await db.execute(
-                        text("""
-                            INSERT INTO invoices 
-                            (qb_invoice_id, project_id, client_id, invoice_number, invoice_date, due_date,
-                             subtotal, total_amount, amount_paid, balance_due, status, sync_status, notes,
-                             email_status, print_status, bill_email, bill_address, ship_address,
-                             currency_code, payment_terms, qb_metadata, private_note, customer_memo)
-                            VALUES 
-                            (:qb_invoice_id, :project_id, :client_id, :invoice_number, :invoice_date, :due_date,
-                             :subtotal, :total_amount, :amount_paid, :balance_due, :status, :sync_status, :notes,
-                             :email_status, :print_status, :bill_email, :bill_address, :ship_address,
-                             :currency_code, :payment_terms, :qb_metadata, :private_note, :customer_memo)
-                            ON CONFLICT (qb_invoice_id) DO UPDATE SET
-                                invoice_number = EXCLUDED.invoice_number,
-                                invoice_date = EXCLUDED.invoice_date,
-                                due_date = EXCLUDED.due_date,
-                                subtotal = EXCLUDED.subtotal,
-                                total_amount = EXCLUDED.total_amount,
-                                amount_paid = EXCLUDED.amount_paid,
-                                balance_due = EXCLUDED.balance_due,
-                                status = EXCLUDED.status,
-                                email_status = EXCLUDED.email_status,
-                                print_status = EXCLUDED.print_status,
-                                bill_email = EXCLUDED.bill_email,
-                                bill_address = EXCLUDED.bill_address,
-                                ship_address = EXCLUDED.ship_address,
-                                currency_code = EXCLUDED.currency_code,
-                                payment_terms = EXCLUDED.payment_terms,
-                                qb_metadata = EXCLUDED.qb_metadata,
-                                private_note = EXCLUDED.private_note,
-                                customer_memo = EXCLUDED.customer_memo,
-                                updated_at = CURRENT_TIMESTAMP
-                        """),
-                        invoice_data
-                    )
-                    
-                    promoted += 1
-                    logger.debug(f"[PROMOTE] Promoted invoice {qb_invoice_id}")
-                    # Commit after each successful promotion to avoid transaction cascade failures
-                    await db.commit()
-                    
-                except Exception as e:
-                    logger.error(f"[PROMOTE] Failed to promote invoice {qb_invoice_id}: {e}")
-                    errors += 1
-                    # Rollback the failed transaction to allow subsequent invoices to process
-                    await db.rollback()
-            
-            # Final commit (likely no-op since we commit after each success)
-            
-            duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-            logger.info(f"[PROMOTE] Invoice promotion complete: {promoted} promoted, {skipped} skipped, {errors} errors, {duration_ms}ms")
-            
-            return {
-                "promoted": promoted,
-                "skipped": skipped,
-                "errors": errors,
-                "duration_ms": duration_ms
-            }
-            
-        except Exception as e:
-            logger.error(f"[PROMOTE] Invoice promotion failed: {e}", exc_info=True)
-            await db.rollback()
-            raise
+        return await qb_promotion_service.promote_invoices(db, qb_invoice_ids)
     
     async def promote_payments_to_database(
         self,
@@ -1052,7 +1238,8 @@ class QuickBooksSyncService:
         Promote payments from cache to main payments table.
         
         Maps QB customer IDs to client_ids and QB invoice IDs to invoice_ids.
-        Updates invoice.amount_paid and invoice.balance_due automatically.
+        Recomputes invoice.amount_paid and invoice.balance_due for every
+        touched invoice in the same transaction.
         
         Args:
             db: Database session
@@ -1060,208 +1247,10 @@ class QuickBooksSyncService:
                            If None, promotes all cached payments.
         
         Returns:
-            Dict with promotion metrics
+            Dict with promotion metrics plus skipped_rows / error_rows and
+            invoices_recomputed
         """
-        start_time = datetime.now(timezone.utc)
-        promoted = 0
-        skipped = 0
-        errors = 0
-        
-        try:
-            logger.info(f"[PROMOTE] Starting payment promotion from cache to main table")
-            
-            # Build query
-            if qb_payment_ids:
-                placeholders = ','.join([f':id_{i}' for i in range(len(qb_payment_ids))])
-                query = f"""
-                    SELECT * FROM quickbooks_payments_cache 
-                    WHERE qb_payment_id IN ({placeholders})
-                """
-                params = {f'id_{i}': qb_id for i, qb_id in enumerate(qb_payment_ids)}
-            else:
-                query = "SELECT * FROM quickbooks_payments_cache WHERE is_active = true"
-                params = {}
-            
-            result = await db.execute(text(query), params)
-            cached_payments = result.fetchall()
-            
-            logger.info(f"[PROMOTE] Found {len(cached_payments)} cached payments to process")
-            
-            for cached_payment in cached_payments:
-                try:
-                    qb_payment_id = cached_payment.qb_payment_id
-                    qb_customer_id = cached_payment.customer_id
-                    qb_invoice_id = cached_payment.invoice_id
-                    
-                    # Map QB customer ID to client_id
-                    client_result = await db.execute(
-                        text("SELECT client_id FROM clients WHERE qb_customer_id = :qb_customer_id"),
-                        {"qb_customer_id": qb_customer_id}
-                    )
-                    client_row = client_result.fetchone()
-                    
-                    if not client_row:
-                        logger.warning(f"[PROMOTE] Skipping payment {qb_payment_id}: QB customer {qb_customer_id} not found")
-                        skipped += 1
-                        continue
-                    
-                    client_id = client_row.client_id
-                    
-                    # Map QB invoice ID to invoice_id (if payment is linked to invoice)
-                    invoice_id = None
-                    project_id = None
-                    if qb_invoice_id:
-                        invoice_result = await db.execute(
-                            text("SELECT invoice_id, project_id FROM invoices WHERE qb_invoice_id = :qb_invoice_id"),
-                            {"qb_invoice_id": qb_invoice_id}
-                        )
-                        invoice_row = invoice_result.fetchone()
-                        
-                        if invoice_row:
-                            invoice_id = invoice_row.invoice_id
-                            project_id = invoice_row.project_id
-                        else:
-                            # CRITICAL: Payment references an invoice that hasn't been promoted yet or failed promotion
-                            # This is an orphan payment - SKIP to prevent breaking invoice-level accounting
-                            logger.warning(f"[PROMOTE] Skipping payment {qb_payment_id}: QB invoice {qb_invoice_id} not found in main invoices table (promote invoices first)")
-                            skipped += 1
-                            continue
-                    else:
-                        # Payment without invoice link (rare but valid in QB for prepayments/credits)
-                        # Try to get project from client for these edge cases only
-                        project_result = await db.execute(
-                            text("SELECT project_id FROM projects WHERE client_id = :client_id LIMIT 1"),
-                            {"client_id": client_id}
-                        )
-                        project_row = project_result.fetchone()
-                        
-                        if not project_row:
-                            logger.warning(f"[PROMOTE] Skipping unlinked payment {qb_payment_id}: No project found for client {client_id}")
-                            skipped += 1
-                            continue
-                        
-                        project_id = project_row.project_id
-                        logger.info(f"[PROMOTE] Payment {qb_payment_id} has no invoice link - treating as prepayment/credit")
-                    
-                    # Extract QB payment data
-                    qb_data = cached_payment.qb_data or {}
-                    
-                    # Extract deposit account
-                    deposit_ref = qb_data.get('DepositToAccountRef')
-                    deposit_account = deposit_ref.get('value') if deposit_ref else None
-                    
-                    # Extract currency
-                    currency_ref = qb_data.get('CurrencyRef')
-                    currency_code = currency_ref.get('value') if currency_ref else None
-                    
-                    # Extract QB metadata
-                    metadata = qb_data.get('MetaData')
-                    qb_metadata = json.dumps(metadata) if metadata else None
-                    
-                    # Extract Line array for linked transactions
-                    line_array = qb_data.get('Line', [])
-                    linked_transactions = json.dumps(line_array) if line_array else None
-                    
-                    payment_data = {
-                        'qb_payment_id': qb_payment_id,
-                        'invoice_id': invoice_id,
-                        'client_id': client_id,
-                        'project_id': project_id,
-                        'amount': float(cached_payment.amount) if cached_payment.amount else 0.0,
-                        'payment_date': cached_payment.payment_date,
-                        'payment_method': cached_payment.payment_method or 'Check',
-                        'status': 'POSTED',  # POSTED = successfully received payment (valid enum: FAILED, PENDING, POSTED, REFUNDED)
-                        'reference_number': cached_payment.reference_number,
-                        'check_number': cached_payment.reference_number,  # Use reference_number as check_number
-                        'sync_status': 'synced',
-                        'notes': f"Imported from QuickBooks (QB ID: {qb_payment_id})",
-                        # QuickBooks metadata fields
-                        'deposit_account': deposit_account,
-                        'currency_code': currency_code,
-                        'total_amount': float(qb_data.get('TotalAmt', 0)) if qb_data.get('TotalAmt') else None,
-                        'unapplied_amount': float(qb_data.get('UnappliedAmt', 0)) if qb_data.get('UnappliedAmt') is not None else None,
-                        'process_payment': qb_data.get('ProcessPayment'),
-                        'linked_transactions': linked_transactions,
-                        'qb_metadata': qb_metadata,
-                        'private_note': qb_data.get('PrivateNote')
-                    }
-                    
-                    # Upsert into payments table
-                    await db.execute(
-                        text("""
-                            INSERT INTO payments 
-                            (qb_payment_id, invoice_id, client_id, project_id, amount, payment_date,
-                             payment_method, status, reference_number, check_number, sync_status, notes,
-                             deposit_account, currency_code, total_amount, unapplied_amount, process_payment,
-                             linked_transactions, qb_metadata, private_note)
-                            VALUES 
-                            (:qb_payment_id, :invoice_id, :client_id, :project_id, :amount, :payment_date,
-                             :payment_method, :status, :reference_number, :check_number, :sync_status, :notes,
-                             :deposit_account, :currency_code, :total_amount, :unapplied_amount, :process_payment,
-                             :linked_transactions, :qb_metadata, :private_note)
-                            ON CONFLICT (qb_payment_id) DO UPDATE SET
-                                amount = EXCLUDED.amount,
-                                payment_date = EXCLUDED.payment_date,
-                                payment_method = EXCLUDED.payment_method,
-                                reference_number = EXCLUDED.reference_number,
-                                deposit_account = EXCLUDED.deposit_account,
-                                currency_code = EXCLUDED.currency_code,
-                                total_amount = EXCLUDED.total_amount,
-                                unapplied_amount = EXCLUDED.unapplied_amount,
-                                process_payment = EXCLUDED.process_payment,
-                                linked_transactions = EXCLUDED.linked_transactions,
-                                qb_metadata = EXCLUDED.qb_metadata,
-                                private_note = EXCLUDED.private_note,
-                                updated_at = CURRENT_TIMESTAMP
-                        """),
-                        payment_data
-                    )
-                    
-                    # Update invoice amount_paid and balance_due if payment is linked
-                    if invoice_id:
-                        await db.execute(
-                            text("""
-                                UPDATE invoices 
-                                SET 
-                                    amount_paid = COALESCE((
-                                        SELECT SUM(amount) 
-                                        FROM payments 
-                                        WHERE invoice_id = :invoice_id AND status = 'POSTED'
-                                    ), 0),
-                                    balance_due = total_amount - COALESCE((
-                                        SELECT SUM(amount) 
-                                        FROM payments 
-                                        WHERE invoice_id = :invoice_id AND status = 'POSTED'
-                                    ), 0),
-                                    updated_at = CURRENT_TIMESTAMP
-                                WHERE invoice_id = :invoice_id
-                            """),
-                            {"invoice_id": invoice_id}
-                        )
-                    
-                    promoted += 1
-                    await db.commit()  # Commit after each success
-                    logger.debug(f"[PROMOTE] Promoted payment {qb_payment_id}")
-                    
-                except Exception as e:
-                    logger.error(f"[PROMOTE] Failed to promote payment {qb_payment_id}: {e}")
-                    errors += 1
-                    await db.rollback()  # Rollback to reset transaction
-            
-            duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-            logger.info(f"[PROMOTE] Payment promotion complete: {promoted} promoted, {skipped} skipped, {errors} errors, {duration_ms}ms")
-            
-            return {
-                "promoted": promoted,
-                "skipped": skipped,
-                "errors": errors,
-                "duration_ms": duration_ms
-            }
-            
-        except Exception as e:
-            logger.error(f"[PROMOTE] Payment promotion failed: {e}", exc_info=True)
-            await db.rollback()
-            raise
+        return await qb_promotion_service.promote_payments(db, qb_payment_ids)
 
 
 # Singleton instance
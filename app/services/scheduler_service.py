@@ -1,48 +1,151 @@
 """
 Scheduler Service for Automated QuickBooks Sync
 
-Manages scheduled sync jobs that run 3x daily:
-- 8:00 AM EST
-- 1:00 PM EST  
-- 6:00 PM EST
+Runs the QuickBooks sync on an adaptive schedule instead of a fixed
+8 AM / 1 PM / 6 PM cron:
+- Leader election: every app instance runs the scheduler, but only the one
+  holding the "quickbooks_sync_scheduler" PostgreSQL advisory lock syncs;
+  the others re-check every QB_SCHEDULER_MIN_INTERVAL_MINUTES and take over
+  if the leader goes away
+- Adaptive interval: QB_SCHEDULER_BASE_INTERVAL_MINUTES during weekday
+  business hours (US/Eastern), QB_SCHEDULER_MAX_INTERVAL_MINUTES otherwise,
+  shortened by recent change volume + webhook activity and lengthened by
+  consecutive quiet runs, within [MIN, MAX]
+- Jitter: +/- QB_SCHEDULER_JITTER of the interval
+- Skip: webhook events since the watermark always trigger a sync; otherwise
+  one ChangeDataCapture probe checks whether anything changed since the
+  watermark - if not, the sync is skipped and the watermarks move forward
 
-Uses APScheduler with timezone-aware cron triggers.
+Each tick schedules the next one (APScheduler date trigger); the reasoning
+behind the next run is reported by get_status().
 """
 
 import logging
-from datetime import datetime
-from typing import Optional
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
 from pytz import timezone as pytz_timezone
+from sqlalchemy import text
 
 from app.services.quickbooks_sync_service import qb_sync_service
 from app.db.session import get_db
+from app.config import settings
+from app.utils.leader_election import AdvisoryLockLeader
+from app.utils.qb_rate_governor import background_priority
+from app.utils.query_stats import track_queries
 
 logger = logging.getLogger(__name__)
 
 # Eastern Time timezone
 EST = pytz_timezone('US/Eastern')
 
+# Quiet runs beyond this stop lengthening the interval (2^4 = 16x)
+_MAX_QUIET_DOUBLINGS = 4
+
+# First tick after start - lets the app finish starting up
+_FIRST_TICK_DELAY = timedelta(minutes=1)
+
+SCHEDULER_SIGNALS_SQL = text("""
+    SELECT
+        (SELECT COALESCE(SUM(records_synced), 0) FROM sync_status
+         WHERE entity_type IN ('customers', 'invoices', 'payments')) AS last_changes,
+        (SELECT COUNT(*) FROM webhook_events WHERE created_at > :hour_ago) AS webhook_events_last_hour,
+        (SELECT COUNT(*) FROM webhook_events
+         WHERE created_at > (SELECT MIN(last_sync_at) FROM sync_status
+                             WHERE entity_type IN ('customers', 'invoices', 'payments'))) AS webhook_events_since_sync
+""")
+
+
+def is_business_hours(now: datetime) -> bool:
+    """Weekday within QB_SCHEDULER_BUSINESS_HOURS (US/Eastern)."""
+    local = now.astimezone(EST)
+    start, end = (int(hour) for hour in settings.QB_SCHEDULER_BUSINESS_HOURS.split("-"))
+    return local.weekday() < 5 and start <= local.hour < end
+
+
+def plan_next_run(
+    now: datetime,
+    recent_changes: int,
+    webhook_events_last_hour: int,
+    quiet_runs: int,
+    rng: random.Random = random
+) -> Dict[str, Any]:
+    """
+    Decide when the next sync runs.
+    
+    Args:
+        now: Current time (timezone-aware)
+        recent_changes: Records the last sync applied
+        webhook_events_last_hour: Webhook notifications stored in the last hour
+        quiet_runs: Consecutive runs that found nothing to sync
+        rng: Source of jitter
+    
+    Returns:
+        Dict with next_run_at, interval/jitter and a human-readable reason
+    """
+    business_hours = is_business_hours(now)
+    base = settings.QB_SCHEDULER_BASE_INTERVAL_MINUTES if business_hours else settings.QB_SCHEDULER_MAX_INTERVAL_MINUTES
+    activity = recent_changes + webhook_events_last_hour
+    
+    if activity:
+        interval = base / (1 + activity / settings.QB_SCHEDULER_BUSY_CHANGES)
+        why = f"{recent_changes} changes last sync + {webhook_events_last_hour} webhook events in the last hour"
+    else:
+        interval = base * 2 ** min(quiet_runs, _MAX_QUIET_DOUBLINGS)
+        why = f"no activity, {quiet_runs} quiet runs in a row"
+    interval = min(max(interval, settings.QB_SCHEDULER_MIN_INTERVAL_MINUTES), settings.QB_SCHEDULER_MAX_INTERVAL_MINUTES)
+    
+    jitter_seconds = rng.uniform(-1, 1) * settings.QB_SCHEDULER_JITTER * interval * 60
+    next_run_at = now + timedelta(seconds=interval * 60 + jitter_seconds)
+    return {
+        "next_run_at": next_run_at,
+        "interval_minutes": round(interval, 1),
+        "jitter_seconds": round(jitter_seconds),
+        "business_hours": business_hours,
+        "base_interval_minutes": base,
+        "signals": {
+            "recent_changes": recent_changes,
+            "webhook_events_last_hour": webhook_events_last_hour,
+            "quiet_runs": quiet_runs,
+        },
+        "reason": f"{'business hours' if business_hours else 'off hours'}, {why} -> every {interval:.0f} min",
+    }
+
 
 class SchedulerService:
     """
     Manages scheduled QuickBooks sync jobs.
     
     Features:
-    - 3x daily sync at 8 AM, 1 PM, 6 PM EST
-    - Timezone-aware scheduling
+    - Adaptive, jittered interval (see module docstring)
+    - Single leader across app instances (PostgreSQL advisory lock)
+    - Skips syncs when nothing changed since the watermark
     - Manual start/stop/pause controls
-    - Job status monitoring
+    - Job status monitoring with next-run reasoning
     """
     
-    def __init__(self):
+    def __init__(self, session_factory=None):
         self.scheduler = AsyncIOScheduler(timezone=EST)
         self.is_running = False
         self.job_id = "quickbooks_sync_job"
+        self.leader = AdvisoryLockLeader("quickbooks_sync_scheduler")
+        self._session_factory = session_factory
+        self.next_plan: Optional[Dict[str, Any]] = None
+        self.last_tick: Optional[Dict[str, Any]] = None
+        self.recent_changes: Optional[int] = None  # None until this instance has synced
+        self.quiet_runs = 0
         
-    async def _run_scheduled_sync(self):
-        """Execute scheduled sync job"""
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.db.session import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+    
+    async def _run_scheduled_sync(self) -> Optional[Dict[str, Any]]:
+        """Execute scheduled sync job; returns the sync result (None on failure)"""
         try:
             logger.info("[SCHEDULER] Starting scheduled QuickBooks sync...")
             
@@ -52,8 +155,10 @@ class SchedulerService:
                 db_gen = get_db()
                 db = await anext(db_gen)
                 
-                # Run sync for all entities
-                result = await qb_sync_service.sync_all(db, force_full_sync=False)
+                # Run sync for all entities (SQL counts + N+1 patterns logged per run)
+                with track_queries("scheduled_sync") as query_stats, background_priority():
+                    result = await qb_sync_service.sync_all(db, force_full_sync=False)
+                query_stats.log_summary(settings.QUERY_STATS_N_PLUS_ONE_THRESHOLD)
                 
                 logger.info(
                     f"[SCHEDULER] Sync complete: "
@@ -62,6 +167,7 @@ class SchedulerService:
                     f"payments={result['payments']['records_synced']}, "
                     f"total_duration={result['total_duration_ms']}ms"
                 )
+                return result
                 
             except Exception as e:
                 logger.error(f"[SCHEDULER] Sync failed: {e}", exc_info=True)
@@ -71,45 +177,115 @@ class SchedulerService:
                     
         except Exception as e:
             logger.error(f"[SCHEDULER] Critical error in scheduled sync: {e}", exc_info=True)
+        return None
+    
+    # ==================== Adaptive loop ====================
+    
+    async def _tick(self):
+        """One scheduling step: lead, decide, maybe sync, then schedule the next step."""
+        now = datetime.now(timezone.utc)
+        try:
+            if not await self.leader.acquire():
+                self.last_tick = {"at": now.isoformat(), "outcome": "standby",
+                                  "reason": "another instance holds the scheduler lock"}
+                plan = plan_next_run(now, 0, 0, 0)
+                plan["next_run_at"] = now + timedelta(minutes=settings.QB_SCHEDULER_MIN_INTERVAL_MINUTES)
+                plan["reason"] = "standby - re-checking leadership"
+                return
+            
+            async with self.session_factory() as db:
+                signals = (await db.execute(SCHEDULER_SIGNALS_SQL, {"hour_ago": now - timedelta(hours=1)})).one()
+                decision = await self._decide(db, signals.webhook_events_since_sync)
+            
+            if decision["run"]:
+                result = await self._run_scheduled_sync()
+                changes = result["total_records"] if result else 0
+                outcome = "synced" if result else "failed"
+            else:
+                changes = 0
+                outcome = "skipped"
+            self.recent_changes = changes
+            self.quiet_runs = self.quiet_runs + 1 if changes == 0 and outcome != "failed" else 0
+            self.last_tick = {"at": now.isoformat(), "outcome": outcome, "reason": decision["reason"],
+                              "records_synced": changes}
+            
+            plan = plan_next_run(
+                datetime.now(timezone.utc),
+                self.recent_changes if self.recent_changes is not None else signals.last_changes,
+                signals.webhook_events_last_hour,
+                self.quiet_runs
+            )
+        except Exception as e:
+            logger.error(f"[SCHEDULER] Tick failed: {e}", exc_info=True)
+            self.last_tick = {"at": now.isoformat(), "outcome": "failed", "reason": str(e)}
+            plan = plan_next_run(datetime.now(timezone.utc), 0, 0, 0)
+            plan["next_run_at"] = datetime.now(timezone.utc) + timedelta(minutes=settings.QB_SCHEDULER_MIN_INTERVAL_MINUTES)
+            plan["reason"] = "previous tick failed - retrying"
+        finally:
+            self.next_plan = plan
+            if self.is_running:
+                self._schedule(plan)
+    
+    async def _decide(self, db, webhook_events_since_sync: int) -> Dict[str, Any]:
+        """Run the sync, or skip it when the watermark shows nothing changed."""
+        if webhook_events_since_sync:
+            return {"run": True, "reason": f"{webhook_events_since_sync} webhook events since the last sync"}
+        if settings.QB_SYNC_MODE == "cdc":
+            return {"run": True, "reason": "CDC sync mode (the sync is itself one call)"}
+        
+        try:
+            with background_priority():
+                probe = await qb_sync_service.probe_changes(db)
+        except Exception as e:
+            logger.warning(f"[SCHEDULER] Change probe failed, syncing anyway: {e}")
+            return {"run": True, "reason": f"change probe failed: {e}"}
+        
+        if probe["changed"] is None:
+            return {"run": True, "reason": probe["reason"]}
+        if probe["changed"]:
+            counts = ", ".join(f"{entity_type}={count}" for entity_type, count in probe["counts"].items() if count)
+            return {"run": True, "reason": f"QuickBooks changes since {probe['since'].isoformat()}: {counts}"}
+        
+        await qb_sync_service.advance_watermarks(db, probe["checked_at"])
+        logger.info(f"[SCHEDULER] Nothing changed since {probe['since'].isoformat()} - sync skipped")
+        return {"run": False, "reason": f"no QuickBooks changes since {probe['since'].isoformat()}"}
+    
+    def _schedule(self, plan: Dict[str, Any]):
+        self.scheduler.add_job(
+            self._tick,
+            trigger=DateTrigger(run_date=plan["next_run_at"], timezone=EST),
+            id=self.job_id,
+            name="QuickBooks Sync (adaptive)",
+            replace_existing=True,
+            max_instances=1,  # Prevent concurrent runs
+            misfire_grace_time=None,  # Run late (e.g. after resume) rather than drop the loop
+            coalesce=True
+        )
+        logger.info(
+            f"[SCHEDULER] Next sync check {plan['next_run_at'].astimezone(EST).strftime('%Y-%m-%d %I:%M %p %Z')} "
+            f"({plan['reason']})"
+        )
+    
+    # ==================== Controls ====================
     
     async def start(self):
-        """Start the scheduler with 3x daily sync jobs"""
+        """Start the scheduler loop (first check shortly after startup)"""
         if self.is_running:
             logger.warning("[SCHEDULER] Already running")
             return
         
         try:
-            # Add sync job with cron trigger (8 AM, 1 PM, 6 PM EST)
-            self.scheduler.add_job(
-                self._run_scheduled_sync,
-                trigger=CronTrigger(
-                    hour='8,13,18',  # 8 AM, 1 PM, 6 PM
-                    minute='0',
-                    timezone=EST
-                ),
-                id=self.job_id,
-                name="QuickBooks Sync (3x daily)",
-                replace_existing=True,
-                max_instances=1  # Prevent concurrent runs
-            )
-            
             self.scheduler.start()
             self.is_running = True
-            
-            # Log next run times
-            job = self.scheduler.get_job(self.job_id)
-            if job:
-                next_run = job.next_run_time
-                logger.info(
-                    f"[SCHEDULER] Started. Next sync: {next_run.strftime('%Y-%m-%d %I:%M %p %Z')}"
-                )
+            self.next_plan = {"next_run_at": datetime.now(timezone.utc) + _FIRST_TICK_DELAY, "reason": "first check after startup"}
+            self._schedule(self.next_plan)
             
         except Exception as e:
             logger.error(f"[SCHEDULER] Failed to start: {e}", exc_info=True)
             raise
     
     async def stop(self):
-        """Stop the scheduler"""
+        """Stop the scheduler and give up leadership"""
         if not self.is_running:
             logger.warning("[SCHEDULER] Not running")
             return
@@ -117,6 +293,7 @@ class SchedulerService:
         try:
             self.scheduler.shutdown(wait=False)
             self.is_running = False
+            await self.leader.release()
             logger.info("[SCHEDULER] Stopped")
         except Exception as e:
             logger.error(f"[SCHEDULER] Failed to stop: {e}", exc_info=True)
@@ -149,12 +326,12 @@ class SchedulerService:
             raise
     
     async def trigger_now(self):
-        """Manually trigger sync job immediately (outside schedule)"""
+        """Manually trigger sync job immediately (outside schedule, on any instance)"""
         logger.info("[SCHEDULER] Manually triggering sync job...")
         await self._run_scheduled_sync()
     
     def get_status(self) -> dict:
-        """Get current scheduler status"""
+        """Get current scheduler status, leadership and next-run reasoning"""
         if not self.is_running:
             return {
                 "is_running": False,
@@ -163,25 +340,28 @@ class SchedulerService:
         
         try:
             job = self.scheduler.get_job(self.job_id)
-            
-            if not job:
-                return {
-                    "is_running": True,
-                    "message": "Scheduler running but job not found"
-                }
-            
-            next_run = job.next_run_time
+            next_run = job.next_run_time if job else None
+            next_plan = None
+            if self.next_plan:
+                next_plan = {**self.next_plan, "next_run_at": self.next_plan["next_run_at"].isoformat()}
             
             return {
                 "is_running": True,
                 "is_paused": self.scheduler.state == 2,  # STATE_PAUSED = 2
-                "job_name": job.name,
-                "job_id": job.id,
-                "trigger": str(job.trigger),
+                "job_name": job.name if job else None,
+                "job_id": self.job_id,
                 "next_run_time": next_run.isoformat() if next_run else None,
                 "next_run_time_formatted": next_run.strftime('%Y-%m-%d %I:%M %p %Z') if next_run else None,
+                "next_run": next_plan,
+                "last_tick": self.last_tick,
+                "leader": self.leader.get_status(),
                 "timezone": "US/Eastern (EST/EDT)",
-                "schedule": "3x daily at 8:00 AM, 1:00 PM, 6:00 PM EST"
+                "schedule": (
+                    f"adaptive: {settings.QB_SCHEDULER_MIN_INTERVAL_MINUTES:.0f}-"
+                    f"{settings.QB_SCHEDULER_MAX_INTERVAL_MINUTES:.0f} min, "
+                    f"base {settings.QB_SCHEDULER_BASE_INTERVAL_MINUTES:.0f} min on weekdays "
+                    f"{settings.QB_SCHEDULER_BUSINESS_HOURS}h"
+                )
             }
         except Exception as e:
             logger.error(f"[SCHEDULER] Failed to get status: {e}", exc_info=True)
@@ -126,7 +126,6 @@ class SiteVisitService:
         
         db.add(visit)
         await db.flush()
-        await db.refresh(visit)
         
         logger.info(f"Scheduled site visit {visit.business_id} for project {project.business_id}")
         return visit
@@ -164,7 +163,6 @@ class SiteVisitService:
         visit.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(visit)
         
         logger.info(f"Started site visit {visit.business_id}")
         return visit
@@ -204,7 +202,6 @@ class SiteVisitService:
         visit.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(visit)
         
         logger.info(f"Completed site visit {visit.business_id}")
         return visit
@@ -247,7 +244,6 @@ class SiteVisitService:
         visit.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(visit)
         
         logger.info(f"Added {len(photos)} photos to site visit {visit.business_id}")
         return visit
@@ -293,7 +289,6 @@ class SiteVisitService:
         visit.updated_at = datetime.now(timezone.utc)
         
         await db.flush()
-        await db.refresh(visit)
         
         logger.info(f"Created {len(actions)} follow-up actions for site visit {visit.business_id}")
         return visit
@@ -10,13 +10,18 @@ Handles authentication using Supabase Auth:
 Best practices implemented:
 - Supabase handles password hashing, email verification, token generation
 - App handles role management and app-specific metadata
-- JWT verification using Supabase's JWKS endpoint
+- JWT verification using Supabase's JWKS endpoint (keys fetched async,
+  see app/services/jwks_provider.py)
+- Verified claims cached by token hash until exp, so repeat requests with
+  the same bearer token skip signature verification
 - Automatic user sync from auth.users to app users table
+- Authenticated principals cached in memory (app/services/principal_cache.py)
 """
+import hashlib
+import time
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import jwt
-from jwt import PyJWKClient
 import httpx
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -24,6 +29,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.db.models import User
 from app.db.session import get_db
+from app.services.jwks_provider import JWKSProvider
+from app.services.principal_cache import principal_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,21 +52,32 @@ class SupabaseAuthService:
         self.jwt_secret = settings.SUPABASE_JWT_SECRET
         
         # JWT verification using JWKS (JSON Web Key Set)
-        self.jwks_client = None
+        self.jwks = None
         if self.supabase_url:
-            jwks_url = f"{self.supabase_url}/auth/v1/jwks"
-            self.jwks_client = PyJWKClient(jwks_url)
+            self.jwks = JWKSProvider(f"{self.supabase_url}/auth/v1/jwks")
+        
+        # sha256(token) -> (verified claims, exp)
+        self._verified: Dict[str, Tuple[Dict[str, Any], float]] = {}
     
-    def verify_jwt(self, token: str) -> Optional[Dict[str, Any]]:
+    async def verify_jwt(self, token: str) -> Optional[Dict[str, Any]]:
         """
         Verify JWT token from Supabase Auth.
         
+        A token verified before is answered from memory until its exp.
+        
         Args:
             token: JWT access token from Supabase
             
         Returns:
             Decoded payload if valid, None if invalid
         """
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        cached = self._verified.get(token_hash)
+        if cached is not None:
+            if cached[1] > time.time():
+                return dict(cached[0])
+            del self._verified[token_hash]
+        
         try:
             # Method 1: Verify using JWT secret (faster, requires secret)
             if self.jwt_secret:
@@ -70,11 +88,10 @@ class SupabaseAuthService:
                     audience="authenticated",
                     options={"verify_aud": True}
                 )
-                return payload
             
             # Method 2: Verify using JWKS (no secret needed)
-            elif self.jwks_client:
-                signing_key = self.jwks_client.get_signing_key_from_jwt(token)
+            elif self.jwks:
+                signing_key = await self.jwks.get_signing_key(token)
                 payload = jwt.decode(
                     token,
                     signing_key.key,
@@ -82,11 +99,13 @@ class SupabaseAuthService:
                     audience="authenticated",
                     options={"verify_aud": True}
                 )
-                return payload
             
             else:
                 logger.error("No JWT verification method available (need SUPABASE_JWT_SECRET or SUPABASE_URL)")
                 return None
+            
+            self._remember_claims(token_hash, payload)
+            return payload
                 
         except jwt.ExpiredSignatureError:
             logger.warning("JWT token expired")
@@ -98,10 +117,58 @@ class SupabaseAuthService:
             logger.error(f"JWT verification error: {e}", exc_info=True)
             return None
     
+    def _remember_claims(self, token_hash: str, payload: Dict[str, Any]):
+        """Keep verified claims until the token's exp (tokens without exp are not cached)."""
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        while len(self._verified) >= settings.VERIFIED_TOKEN_CACHE_MAX_ENTRIES:
+            del self._verified[next(iter(self._verified))]
+        self._verified[token_hash] = (dict(payload), float(expires_at))
+    
+    def clear_verified_tokens(self):
+        """Forget cached token verifications (secret or key rotation, tests)."""
+        self._verified.clear()
+    
+    async def get_principal(
+        self,
+        db: AsyncSession,
+        supabase_user_id: str,
+        email: str,
+        user_metadata: Dict = None,
+        token_expires_at: Optional[float] = None
+    ) -> Optional[User]:
+        """
+        App user for a verified token - served from the principal cache
+        (no SQL) until the token expires or the cache TTL runs out.
+        
+        Activity is recorded in memory and written in batches.
+        
+        Args:
+            db: Request database session (the cached user is merged into it)
+            supabase_user_id: JWT sub
+            email: JWT email
+            user_metadata: JWT user_metadata (used when the user is created)
+            token_expires_at: JWT exp (epoch seconds)
+        """
+        user = await principal_cache.get(db, supabase_user_id)
+        if user is None:
+            # Get-or-create: the lookup before the INSERT must not read a lagging replica
+            db.info["use_replica"] = False
+            user = await self.get_or_create_user(db, supabase_user_id, email, user_metadata)
+            if user is None:
+                return None
+            principal_cache.put(user, token_expires_at)
+        principal_cache.record_activity(user.id)
+        return user
+    
     async def get_or_create_user(self, db: AsyncSession, supabase_user_id: str, email: str, user_metadata: Dict = None) -> Optional[User]:
         """
         Get or create app user from Supabase auth user.
         
+        Reads only for an existing user - last_activity_at is written behind
+        by principal_cache.
+        
         Args:
             db: Database session
             supabase_user_id: Supabase auth.users.id
@@ -119,9 +186,6 @@ class SupabaseAuthService:
             user = result.scalar_one_or_none()
             
             if user:
-                # Update last activity
-                user.last_activity_at = datetime.now(timezone.utc)
-                await db.commit()
                 return user
             
             # Create new user
@@ -135,13 +199,12 @@ class SupabaseAuthService:
                 full_name=full_name,
                 role="client",  # Default role
                 is_active=True,
-                is_email_verified=True,  # Supabase handles verification
-                last_activity_at=datetime.now(timezone.utc)
+                is_email_verified=True  # Supabase handles verification
             )
             
+            # Single INSERT ... RETURNING loads id/created_at (eager_defaults)
             db.add(user)
             await db.commit()
-            await db.refresh(user)
             
             logger.info(f"Created new user: {email} (supabase_id: {supabase_user_id})")
             return user
@@ -196,6 +259,7 @@ class SupabaseAuthService:
             user.role = role
             user.updated_at = datetime.now(timezone.utc)
             await db.commit()
+            principal_cache.invalidate(user.supabase_user_id)
             
             logger.info(f"Updated user {user.email} role to {role}")
             return True
@@ -223,6 +287,7 @@ class SupabaseAuthService:
             user.updated_at = datetime.now(timezone.utc)
             
             await db.commit()
+            principal_cache.invalidate(user.supabase_user_id)
             return True
             
         except Exception as e:
@@ -244,6 +309,7 @@ class SupabaseAuthService:
             user.is_active = False
             user.updated_at = datetime.now(timezone.utc)
             await db.commit()
+            principal_cache.invalidate(user.supabase_user_id)
             
             logger.info(f"Deactivated user: {user.email}")
             return True
@@ -264,10 +330,10 @@ class SupabaseAuthService:
             if not user:
                 return False
             
-            now = datetime.now(timezone.utc)
-            user.last_login_at = now
-            user.last_activity_at = now
+            user.last_login_at = datetime.now(timezone.utc)
             await db.commit()
+            principal_cache.invalidate(user.supabase_user_id)
+            principal_cache.record_activity(user.id)
             
             return True
             
@@ -15,6 +15,11 @@ Thresholds:
 - Failure threshold: 3 consecutive failures → OPEN
 - Cooldown periods: 30s → 60s → 120s (exponential backoff)
 - Success threshold in HALF_OPEN: 1 success → CLOSED
+- HALF_OPEN admits one probe at a time; concurrent calls fail fast
+
+Throttling (RateLimitedError - QuickBooks 429s that outlasted the rate
+governor's backoff) is not an outage: it never counts as a failure, and a
+throttled HALF_OPEN probe leaves the circuit HALF_OPEN for the next probe.
 """
 
 import logging
@@ -23,6 +28,8 @@ from enum import Enum
 from typing import Optional, Callable, Any
 from functools import wraps
 
+from app.utils.qb_rate_governor import RateLimitedError
+
 logger = logging.getLogger(__name__)
 
 
@@ -69,6 +76,14 @@ class CircuitBreaker:
         self.last_failure_time: Optional[datetime] = None
         self.opened_at: Optional[datetime] = None
         self.current_cooldown = cooldown_seconds
+        self._probe_in_flight = False
+        
+        # Metrics
+        self.half_open_probes = 0
+        self.probe_successes = 0
+        self.probe_failures = 0
+        self.rejected_calls = 0
+        self.throttled_calls = 0
         
         logger.info(
             f"[CIRCUIT_BREAKER] Initialized '{name}' "
@@ -140,8 +155,8 @@ class CircuitBreaker:
                     f"{self.failure_threshold} (error: {error})"
                 )
     
-    def _check_state(self):
-        """Check and update circuit state before call"""
+    def _check_state(self) -> bool:
+        """Check and update circuit state before call; return True for a HALF_OPEN probe"""
         if self.state == CircuitState.OPEN:
             if self._should_attempt_reset():
                 # Cooldown elapsed → try half-open
@@ -152,6 +167,7 @@ class CircuitBreaker:
                 )
             else:
                 # Still cooling down
+                self.rejected_calls += 1
                 elapsed = (datetime.utcnow() - self.opened_at).total_seconds()
                 remaining = self.current_cooldown - elapsed
                 raise CircuitBreakerError(
@@ -159,6 +175,17 @@ class CircuitBreaker:
                     f"Retry in {remaining:.0f}s. "
                     f"Last failure: {self.last_failure_time}"
                 )
+        
+        if self.state == CircuitState.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected_calls += 1
+                raise CircuitBreakerError(
+                    f"Circuit breaker '{self.name}' is HALF_OPEN with a recovery probe in flight"
+                )
+            self._probe_in_flight = True
+            self.half_open_probes += 1
+            return True
+        return False
     
     async def call(self, func: Callable, *args, **kwargs) -> Any:
         """
@@ -172,18 +199,29 @@ class CircuitBreaker:
             Function result if successful
             
         Raises:
-            CircuitBreakerError: If circuit is open
+            CircuitBreakerError: If circuit is open (or a HALF_OPEN probe is in flight)
             Exception: Original exception from function (circuit records failure)
         """
-        self._check_state()
+        probe = self._check_state()
         
         try:
             result = await func(*args, **kwargs)
+            if probe:
+                self.probe_successes += 1
             self._record_success()
             return result
+        except RateLimitedError:
+            # Throttled, not down - neither a failure nor a recovery
+            self.throttled_calls += 1
+            raise
         except Exception as e:
+            if probe:
+                self.probe_failures += 1
             self._record_failure(e)
             raise
+        finally:
+            if probe:
+                self._probe_in_flight = False
     
     def __call__(self, func: Callable):
         """Decorator for wrapping functions with circuit breaker"""
@@ -206,7 +244,15 @@ class CircuitBreaker:
                 self.current_cooldown - (datetime.utcnow() - self.opened_at).total_seconds()
                 if self.state == CircuitState.OPEN and self.opened_at
                 else 0
-            )
+            ),
+            "metrics": {
+                "half_open_probes": self.half_open_probes,
+                "probe_successes": self.probe_successes,
+                "probe_failures": self.probe_failures,
+                "probe_in_flight": self._probe_in_flight,
+                "rejected_calls": self.rejected_calls,
+                "throttled_calls": self.throttled_calls
+            }
         }
     
     def reset(self):
@@ -218,6 +264,7 @@ class CircuitBreaker:
         self.last_failure_time = None
         self.opened_at = None
         self.current_cooldown = self.cooldown_seconds
+        self._probe_in_flight = False
         logger.info(f"[CIRCUIT_BREAKER] '{self.name}' manually reset (was {old_state.value})")
 
 
@@ -9,6 +9,8 @@ Phase D.2: Reduces token usage by 40-50% via intelligent truncation
 import logging
 from typing import Dict, Any, Set, Optional
 
+from app.utils.qb_query_builder import compact_record, fields_for
+
 logger = logging.getLogger(__name__)
 
 
@@ -137,17 +139,21 @@ async def build_database_context() -> Dict[str, Any]:
     - Clients (count only, full list available on request)
     - Payments (with status breakdown)
     
+    Reads are routed to the read replica when one is configured.
+    
     Returns:
         Dict with database data and summaries
     """
     try:
+        from app.db.routing import replica_reads
         from app.services.db_service import db_service
         
-        # Fetch all data from database (with caching!)
-        projects = await db_service.get_projects_data()
-        permits = await db_service.get_permits_data()
-        clients = await db_service.get_clients_data()
-        payments = await db_service.get_payments_data()
+        # Fetch all data from database (with caching!) - full-table reads go to replica
+        with replica_reads():
+            projects = await db_service.get_projects_data()
+            permits = await db_service.get_permits_data()
+            clients = await db_service.get_clients_data()
+            payments = await db_service.get_payments_data()
         
         # Summarize project statuses
         project_statuses = {}
@@ -198,15 +204,68 @@ async def build_database_context() -> Dict[str, Any]:
         }
 
 
+def summarize_quickbooks(customers_snapshot, invoices_snapshot) -> Dict[str, Any]:
+    """
+    Customers, 10 most recent invoices and summary statistics from the
+    chat-context snapshots - every QuickBooks customer and invoice, not just
+    GC Compliance ones (memoized per snapshot version by qb_read_cache).
+    
+    Active customers only (QuickBooks lists hide inactive ones); invoices are
+    limited to those customers. Records are trimmed to the "context" field
+    set - the prompt never sees line items, addresses or tax detail.
+    """
+    customer_fields = fields_for("context", "Customer")
+    invoice_fields = fields_for("context", "Invoice")
+    customers = [compact_record(row.qb_data, customer_fields) for row in customers_snapshot.active() if row.qb_data]
+    
+    # Build lookup set of customer IDs for invoice filtering
+    customer_ids = {c.get("Id") for c in customers if c.get("Id")}
+    
+    # Filter invoices to match our customer list
+    invoices = [
+        compact_record(row.qb_data, invoice_fields) for row in invoices_snapshot.active()
+        if row.qb_data and row.qb_data.get("CustomerRef", {}).get("value") in customer_ids
+    ]
+    
+    # Sort and limit to 10 most recent invoices for context
+    recent_invoices = sorted(
+        invoices,
+        key=lambda x: x.get("MetaData", {}).get("CreateTime", ""),
+        reverse=True
+    )[:10]
+    
+    # Calculate summary statistics
+    total_amount = sum(float(inv.get("TotalAmt", 0)) for inv in invoices)
+    paid_invoices = [inv for inv in invoices if inv.get("Balance", 0) == 0]
+    unpaid_invoices = [inv for inv in invoices if inv.get("Balance", 0) > 0]
+    
+    return {
+        "customers": customers,
+        "invoices": recent_invoices,  # 10 most recent
+        "summary": {
+            "total_customers": len(customers),
+            "total_invoices": len(invoices),
+            "recent_invoices_shown": len(recent_invoices),
+            "total_amount": total_amount,
+            "paid_count": len(paid_invoices),
+            "unpaid_count": len(unpaid_invoices)
+        },
+        "synced_at": max(
+            (snapshot.version[0] for snapshot in (customers_snapshot, invoices_snapshot) if snapshot.version and snapshot.version[0]),
+            default=None
+        )
+    }
+
+
 async def build_quickbooks_context(qb_service) -> Dict[str, Any]:
     """
     Build context from QuickBooks data (all customers).
     
-    PHASE D.1 OPTIMIZATION:
-    - Uses PostgreSQL cache (5-min TTL) to reduce QB API calls by 90%
-    - Cache automatically populated on first call
-    - Subsequent calls within 5-min window use cache (no API call)
-    - Cache invalidated on create/update operations
+    Reads the chat-context tier through qb_read_cache: an in-memory snapshot
+    (L1) checked against its version with one small query, re-read from the
+    quickbooks_context_* tables (L2) only after a sync, CDC run, webhook or
+    explicit refresh (POST /v1/quickbooks/sync/context) changed them. No
+    QuickBooks API calls on the chat path.
     
     Returns all customers and their invoices for AI context.
     CustomerTypeRef filtering removed - all customers are relevant.
@@ -224,14 +283,17 @@ async def build_quickbooks_context(qb_service) -> Dict[str, Any]:
                 "error": "QuickBooks not authenticated"
             }
 
-        # PHASE D.1: Fetch QuickBooks data (uses PostgreSQL cache!)
-        # First call: API + cache population (slow)
-        # Subsequent calls within 5 min: Cache only (90% faster)
-        all_customers = await qb_service.get_customers()
-        all_invoices = await qb_service.get_invoices()
+        from app.services.qb_read_cache import qb_read_cache
+        
+        cached = await qb_read_cache.derive(
+            qb_service.db, "quickbooks_context", ("context_customers", "context_invoices"), summarize_quickbooks
+        )
+        
+        if cached["synced_at"] is None:
+            logger.warning("[QB CONTEXT] Context cache never fully loaded - run POST /v1/quickbooks/sync/context")
         
-        if not all_customers:
-            logger.info("[QB CONTEXT] No customers found in QuickBooks")
+        if not cached["customers"]:
+            logger.info("[QB CONTEXT] No customers in the QuickBooks context cache")
             return {
                 "authenticated": True,
                 "customers": [],
@@ -241,47 +303,19 @@ async def build_quickbooks_context(qb_service) -> Dict[str, Any]:
                     "total_invoices": 0
                 }
             }
-
-        # Use all customers (no filtering)
-        customers = all_customers
         
-        logger.info(f"[QB CONTEXT] Loaded {len(customers)} customers from QuickBooks")
-
-        # Build lookup set of customer IDs for invoice filtering
-        customer_ids = {c.get("Id") for c in customers if c.get("Id")}
-
-        # Filter invoices to match our customer list
-        invoices = [
-            inv for inv in all_invoices
-            if inv.get("CustomerRef", {}).get("value") in customer_ids
-        ]
+        logger.info(
+            f"[QB CONTEXT] {cached['summary']['total_customers']} customers, "
+            f"{cached['summary']['total_invoices']} invoices from cache (refreshed {cached['synced_at']})"
+        )
         
-        logger.info(f"[QB CONTEXT] Loaded {len(invoices)} invoices from QuickBooks")
-
-        # Sort and limit to 10 most recent invoices for context
-        recent_invoices = sorted(
-            invoices,
-            key=lambda x: x.get("MetaData", {}).get("CreateTime", ""),
-            reverse=True
-        )[:10]
-
-        # Calculate summary statistics
-        total_amount = sum(float(inv.get("TotalAmt", 0)) for inv in invoices)
-        paid_invoices = [inv for inv in invoices if inv.get("Balance", 0) == 0]
-        unpaid_invoices = [inv for inv in invoices if inv.get("Balance", 0) > 0]
-
+        # Shared memoized value - hand out copies of the containers
         return {
             "authenticated": True,
-            "customers": customers,
-            "invoices": recent_invoices,  # 10 most recent
-            "summary": {
-                "total_customers": len(customers),
-                "total_invoices": len(invoices),
-                "recent_invoices_shown": len(recent_invoices),
-                "total_amount": total_amount,
-                "paid_count": len(paid_invoices),
-                "unpaid_count": len(unpaid_invoices)
-            }
+            "customers": list(cached["customers"]),
+            "invoices": list(cached["invoices"]),
+            "summary": dict(cached["summary"]),
+            "source": "cache"
         }
 
     except Exception as e:
@@ -0,0 +1,119 @@
+"""
+Leader election with a PostgreSQL advisory lock.
+
+Every app instance runs the same background jobs (e.g. the sync scheduler);
+only the instance holding the job's session-level advisory lock acts on them.
+The lock lives on one dedicated connection, so it is released automatically
+when the leader's process or connection dies and another instance takes
+over on its next acquire() attempt.
+
+Usage:
+    leader = AdvisoryLockLeader("quickbooks_sync_scheduler")
+    if await leader.acquire():
+        ...  # this instance is the leader
+    await leader.release()
+
+On databases without advisory locks (SQLite in development) every instance
+is the leader.
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+def advisory_lock_key(name: str) -> int:
+    """Stable signed 64-bit lock key for a name (hash() is salted per process)."""
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+class AdvisoryLockLeader:
+    """Holds (or competes for) one named advisory lock."""
+
+    def __init__(self, name: str, engine: Optional[AsyncEngine] = None):
+        self.name = name
+        self.key = advisory_lock_key(name)
+        self._engine = engine
+        self._conn: Optional[AsyncConnection] = None
+        self.is_leader = False
+        self.acquired_count = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            from app.db.session import engine
+            self._engine = engine
+        return self._engine
+
+    async def acquire(self) -> bool:
+        """Try to become (or confirm still being) the leader; never blocks on the lock."""
+        if self.engine.dialect.name != "postgresql":
+            self.is_leader = True
+            return True
+
+        if self._conn is not None:
+            # Still leader as long as the lock connection is alive
+            try:
+                await self._conn.execute(text("SELECT 1"))
+                return True
+            except Exception as e:
+                logger.warning(f"[LEADER] Lost lock connection for {self.name}: {e}")
+                await self._close()
+
+        try:
+            conn = await self.engine.connect()
+            try:
+                acquired = (await conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+                )).scalar()
+                # Leave no transaction open on the lock connection
+                await conn.commit()
+            except Exception:
+                await conn.close()
+                raise
+            if acquired:
+                self._conn = conn
+                self.is_leader = True
+                self.acquired_count += 1
+                logger.info(f"[LEADER] Acquired {self.name} leadership")
+            else:
+                await conn.close()
+            self.last_error = None
+        except Exception as e:
+            logger.error(f"[LEADER] Advisory lock attempt for {self.name} failed: {e}")
+            self.last_error = str(e)
+        return self.is_leader
+
+    async def release(self):
+        if self._conn is not None:
+            try:
+                await self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+                await self._conn.commit()
+                logger.info(f"[LEADER] Released {self.name} leadership")
+            except Exception as e:
+                logger.warning(f"[LEADER] Unlock of {self.name} failed (connection close releases it): {e}")
+        await self._close()
+
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        self.is_leader = False
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "lock": self.name,
+            "lock_key": self.key,
+            "is_leader": self.is_leader,
+            "times_acquired": self.acquired_count,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,95 @@
+"""
+Paginated QuickBooks Query Iterator
+
+QuickBooks caps every query at MAXRESULTS 1000; anything beyond that must be
+walked with STARTPOSITION windows (1-based). A single un-paged query
+silently drops the rest.
+
+iter_query_pages() walks the windows and yields one page (list of entity
+dicts) at a time, in STARTPOSITION order:
+- The first page is fetched alone - delta syncs usually fit in one page,
+  so no extra API calls are spent on empty windows
+- After a full page, up to `concurrency` windows are in flight at once
+  (sliding window); the walk stops at the first short page and cancels
+  any windows past the end
+- At most `concurrency` pages are held in memory, so callers can
+  transform/upsert page by page with constant memory
+"""
+
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+QB_MAX_RESULTS = 1000
+
+_PAGING_CLAUSE = re.compile(r"\s+(STARTPOSITION|MAXRESULTS)\s+\d+", re.IGNORECASE)
+
+
+def strip_paging(query_string: str) -> str:
+    """Remove any STARTPOSITION/MAXRESULTS clauses from a query."""
+    return _PAGING_CLAUSE.sub("", query_string).strip()
+
+
+def page_query(query_string: str, start_position: int, page_size: int) -> str:
+    """Query for one STARTPOSITION window."""
+    return f"{query_string} STARTPOSITION {start_position} MAXRESULTS {page_size}"
+
+
+async def iter_query_pages(
+    fetch_page: Callable[[str], Awaitable[List[Dict[str, Any]]]],
+    query_string: str,
+    page_size: int = QB_MAX_RESULTS,
+    concurrency: int = 4,
+    start_position: int = 1,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield every page of a QuickBooks query.
+
+    Args:
+        fetch_page: Coroutine function executing one query string -> list of entities
+        query_string: Base query (any STARTPOSITION/MAXRESULTS is replaced)
+        page_size: MAXRESULTS per window (capped at 1000)
+        concurrency: Max windows in flight at once
+        start_position: First STARTPOSITION (resuming an interrupted walk)
+
+    Yields:
+        Non-empty lists of entity dicts, in order
+    """
+    base_query = strip_paging(query_string)
+    page_size = min(page_size, QB_MAX_RESULTS)
+    concurrency = max(concurrency, 1)
+
+    pending: deque = deque()
+    next_start = start_position
+
+    def schedule():
+        nonlocal next_start
+        pending.append(asyncio.ensure_future(fetch_page(page_query(base_query, next_start, page_size))))
+        next_start += page_size
+
+    pages = 0
+    entities = 0
+    schedule()
+    try:
+        while pending:
+            page = await pending.popleft() or []
+            if page:
+                pages += 1
+                entities += len(page)
+                yield page
+            if len(page) < page_size:
+                break
+            # Keep the window full once we know there is more than one page
+            while len(pending) < concurrency:
+                schedule()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    logger.info(f"[QB PAGINATION] {entities} entities in {pages} pages: {base_query[:80]}")
@@ -0,0 +1,145 @@
+"""
+Field-Projected QuickBooks Queries
+
+`SELECT *` returns every property QuickBooks stores - Line arrays, tax
+detail, custom fields, ship/bill addresses, delivery info - for every
+entity, even when the caller only reads a name and a balance. QuickBooks
+accepts a field list instead (SELECT Id, DisplayName FROM Customer), so
+each use case asks for just the top-level fields it reads:
+
+- context:  chat context lines (names, contact, balances, dates)
+- matching: Sheet client <-> QB customer matching and the sparse updates
+            that follow it (SyncToken plus the name fields QuickBooks
+            requires on every Customer update)
+- sync:     every field the cache tables, promotion SQL and cache routes
+            read from qb_data
+
+QBQuery builds the query string; QBQuery.records() trims a response page
+to the same fields, so entities that arrive unprojected (ChangeDataCapture
+has no field list) compact to the same record - and the same content
+hash - as a projected query result.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+_WHERE = re.compile(r"\sWHERE\s", re.IGNORECASE)
+
+_META = ("Id", "SyncToken", "MetaData")
+
+# use case -> QB entity -> top-level fields requested
+FIELD_SETS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "context": {
+        "Customer": _META + (
+            "DisplayName", "CompanyName", "FullyQualifiedName", "PrimaryEmailAddr", "PrimaryPhone",
+            "Balance", "Active",
+        ),
+        "Invoice": _META + ("DocNumber", "CustomerRef", "TxnDate", "DueDate", "TotalAmt", "Balance"),
+    },
+    "matching": {
+        "Customer": _META + (
+            "DisplayName", "CompanyName", "FullyQualifiedName", "GivenName", "MiddleName", "FamilyName",
+            "Title", "Suffix", "PrimaryEmailAddr", "CustomerTypeRef", "Active",
+        ),
+    },
+    "sync": {
+        "Customer": _META + (
+            "DisplayName", "CompanyName", "FullyQualifiedName", "GivenName", "MiddleName", "FamilyName",
+            "Title", "Suffix", "PrimaryEmailAddr", "PrimaryPhone", "BillAddr", "CustomerTypeRef",
+            "Balance", "Active",
+        ),
+        "Invoice": _META + (
+            "DocNumber", "TxnDate", "DueDate", "CustomerRef", "Line", "TotalAmt", "Balance",
+            "EmailStatus", "PrintStatus", "BillEmail", "BillAddr", "ShipAddr", "CurrencyRef",
+            "SalesTermRef", "PrivateNote", "CustomerMemo",
+        ),
+        "Payment": _META + (
+            "TxnDate", "CustomerRef", "TotalAmt", "UnappliedAmt", "ProcessPayment", "PaymentMethodRef",
+            "PaymentRefNum", "DepositToAccountRef", "CurrencyRef", "Line", "PrivateNote",
+        ),
+    },
+}
+
+
+def fields_for(use_case: str, entity: str) -> Tuple[str, ...]:
+    """Fields one use case reads from one entity type (KeyError if it has none)."""
+    try:
+        return FIELD_SETS[use_case][entity]
+    except KeyError:
+        raise KeyError(f"No QuickBooks field set for {use_case}/{entity}") from None
+
+
+def compact_record(entity: Dict[str, Any], fields: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+    """The given top-level fields of a QB entity (fields None: the entity itself)."""
+    if fields is None:
+        return entity
+    return {field: entity[field] for field in fields if field in entity}
+
+
+def quote(value: Any) -> str:
+    """QBO SQL string literal (single quotes backslash-escaped)."""
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def filters_on(query: Union[str, "QBQuery"], field: str) -> bool:
+    """Whether a query's WHERE clause references field (selecting it is fine)."""
+    if isinstance(query, QBQuery):
+        return any(field in condition for condition in query.conditions)
+    parts = _WHERE.split(query, maxsplit=1)
+    return len(parts) == 2 and field in parts[1]
+
+
+class QBQuery:
+    """
+    One QuickBooks query: SELECT <fields | *> FROM <entity> [WHERE ...] [ORDERBY ...].
+
+    STARTPOSITION / MAXRESULTS are left to iter_query. Methods chain:
+
+        QBQuery("Customer", "matching").where_in("Id", ids)
+    """
+
+    def __init__(self, entity: str, use_case: Optional[str] = None, fields: Optional[Iterable[str]] = None):
+        self.entity = entity
+        if fields is not None:
+            self.fields: Optional[Tuple[str, ...]] = tuple(fields)
+        elif use_case is not None:
+            self.fields = fields_for(use_case, entity)
+        else:
+            self.fields = None
+        self.conditions: List[str] = []
+        self.order: Optional[str] = None
+
+    def where(self, condition: str) -> "QBQuery":
+        """AND a raw condition, e.g. "Metadata.LastUpdatedTime > '...'"."""
+        self.conditions.append(condition)
+        return self
+
+    def where_equals(self, field: str, value: Any) -> "QBQuery":
+        return self.where(f"{field} = {quote(value)}")
+
+    def where_in(self, field: str, values: Iterable[Any]) -> "QBQuery":
+        return self.where(f"{field} IN ({', '.join(quote(value) for value in values)})")
+
+    def order_by(self, clause: str) -> "QBQuery":
+        self.order = clause
+        return self
+
+    def build(self) -> str:
+        query = f"SELECT {', '.join(self.fields) if self.fields else '*'} FROM {self.entity}"
+        if self.conditions:
+            query += " WHERE " + " AND ".join(self.conditions)
+        if self.order:
+            query += f" ORDERBY {self.order}"
+        return query
+
+    def records(self, page: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Trim one response page to the projected fields (QuickBooks adds domain/sparse)."""
+        if self.fields is None:
+            return page
+        return [compact_record(entity, self.fields) for entity in page]
+
+    def __str__(self) -> str:
+        return self.build()
+
+    def __repr__(self) -> str:
+        return f"QBQuery({self.build()!r})"
@@ -0,0 +1,261 @@
+"""
+Realm-wide QuickBooks rate governor.
+
+Every QuickBooks API request (QuickBooksClient.request) takes a slot from
+its realm's governor first, so chat handlers, /v1/quickbooks routes, the
+scheduler and the webhook worker share one budget instead of each hitting
+the API on its own:
+- Token bucket: QB_RATE_LIMIT_PER_MINUTE requests per minute (QuickBooks
+  allows 500/min per realm), refilled continuously
+- Concurrency: at most QB_MAX_CONCURRENT_REQUESTS requests in flight per
+  realm (QuickBooks allows 10)
+- Priority: waiters are served interactive-first, and background work
+  (scheduled/manual syncs, webhook worker - marked with background_priority())
+  cannot use the last QB_INTERACTIVE_RESERVED_TOKENS tokens or
+  QB_INTERACTIVE_RESERVED_SLOTS slots, so a chat request never queues
+  behind a full sync
+- Adaptive backoff: a 429 pauses the realm for Retry-After (or an
+  exponential backoff when absent) and halves the refill rate; each
+  success recovers 5% of it
+
+Usage:
+    with background_priority():
+        await qb_sync_service.sync_all(db)
+
+    async with qb_rate_governor.slot(realm_id):
+        response = await http.request(...)
+    if response.status_code == 429:
+        qb_rate_governor.record_throttle(realm_id, retry_after)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_current_priority: ContextVar[int] = ContextVar("qb_priority", default=INTERACTIVE)
+
+# Adaptive rate bounds (fraction of QB_RATE_LIMIT_PER_MINUTE)
+_MIN_RATE_FACTOR = 0.1
+_RATE_RECOVERY_STEP = 0.05
+_INITIAL_BACKOFF_SECONDS = 1.0
+
+
+class RateLimitedError(Exception):
+    """QuickBooks kept answering 429 after the governor's retries."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Run QuickBooks calls made in this context (and tasks it spawns) at background priority."""
+    token = _current_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+class RealmGovernor:
+    """Token bucket + priority-ordered concurrency limit for one realm."""
+
+    def __init__(self, realm_id: str):
+        self.realm_id = realm_id
+        self.capacity = settings.QB_RATE_LIMIT_PER_MINUTE
+        self.max_concurrent = settings.QB_MAX_CONCURRENT_REQUESTS
+        self.reserved_tokens = min(settings.QB_INTERACTIVE_RESERVED_TOKENS, self.capacity - 1)
+        self.reserved_slots = min(settings.QB_INTERACTIVE_RESERVED_SLOTS, self.max_concurrent - 1)
+
+        self.tokens = float(self.capacity)
+        self.rate_factor = 1.0
+        self.active = 0
+        self.paused_until = 0.0
+        self.backoff = _INITIAL_BACKOFF_SECONDS
+        self._refilled_at: Optional[float] = None
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._cond = asyncio.Condition()
+
+        # Metrics
+        self.requests = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.throttle_waits = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.wait_seconds = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self.max_wait_seconds = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self.throttled_responses = 0
+        self.last_retry_after: Optional[float] = None
+
+    # ==================== Bucket ====================
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / 60.0 * self.rate_factor
+
+    def _refill(self, now: float):
+        if self._refilled_at is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._refilled_at) * self.refill_per_second)
+        self._refilled_at = now
+
+    def _can_start(self, priority: int, now: float) -> bool:
+        if now < self.paused_until:
+            return False
+        floor = 1 + (self.reserved_tokens if priority == BACKGROUND else 0)
+        slots = self.max_concurrent - (self.reserved_slots if priority == BACKGROUND else 0)
+        return self.tokens >= floor and self.active < slots
+
+    def _wait_timeout(self, priority: int, now: float) -> Optional[float]:
+        """Seconds until the head waiter could start without a release, or None to wait for one."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        floor = 1 + (self.reserved_tokens if priority == BACKGROUND else 0)
+        if self.tokens < floor:
+            return (floor - self.tokens) / self.refill_per_second
+        return None
+
+    # ==================== Slots ====================
+
+    async def acquire(self, priority: int):
+        loop_start = self._now()
+        entry = (priority, next(self._sequence))
+        async with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = self._now()
+                    self._refill(now)
+                    if self._waiters[0] == entry and self._can_start(priority, now):
+                        heapq.heappop(self._waiters)
+                        self.tokens -= 1
+                        self.active += 1
+                        break
+                    timeout = self._wait_timeout(self._waiters[0][0], now)
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+            # The next waiter may be able to start too
+            self._cond.notify_all()
+
+        waited = self._now() - loop_start
+        self.requests[priority] += 1
+        if waited > 0.001:
+            self.throttle_waits[priority] += 1
+            self.wait_seconds[priority] += waited
+            self.max_wait_seconds[priority] = max(self.max_wait_seconds[priority], waited)
+
+    async def release(self):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    # ==================== Feedback ====================
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """A 429 came back: pause the realm and halve the refill rate."""
+        delay = retry_after if retry_after is not None else self.backoff
+        self.backoff = min(self.backoff * 2, settings.QB_THROTTLE_MAX_BACKOFF_SECONDS)
+        now = self._now()
+        self.paused_until = max(self.paused_until, now + delay)
+        self.rate_factor = max(_MIN_RATE_FACTOR, self.rate_factor / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.throttled_responses += 1
+        self.last_retry_after = retry_after
+        logger.warning(
+            f"[QB RATE] Realm {self.realm_id} throttled (429): pausing {delay:.1f}s, "
+            f"rate now {self.refill_per_second * 60:.0f}/min"
+        )
+
+    def record_success(self):
+        self.backoff = _INITIAL_BACKOFF_SECONDS
+        if self.rate_factor < 1.0:
+            self.rate_factor = min(1.0, self.rate_factor + _RATE_RECOVERY_STEP)
+
+    def get_status(self) -> Dict[str, Any]:
+        now = self._now() if self._refilled_at is not None else 0.0
+        return {
+            "realm_id": self.realm_id,
+            "tokens": round(self.tokens, 1),
+            "capacity_per_minute": self.capacity,
+            "effective_rate_per_minute": round(self.refill_per_second * 60, 1),
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "waiting": len(self._waiters),
+            "paused_for_seconds": round(max(0.0, self.paused_until - now), 1),
+            "throttled_responses": self.throttled_responses,
+            "last_retry_after": self.last_retry_after,
+            "by_priority": {
+                PRIORITY_NAMES[priority]: {
+                    "requests": self.requests[priority],
+                    "throttle_waits": self.throttle_waits[priority],
+                    "wait_ms_total": round(self.wait_seconds[priority] * 1000),
+                    "wait_ms_max": round(self.max_wait_seconds[priority] * 1000),
+                }
+                for priority in PRIORITY_NAMES
+            },
+        }
+
+
+class QuickBooksRateGovernor:
+    """Process-wide registry of per-realm governors."""
+
+    def __init__(self):
+        self._realms: Dict[str, RealmGovernor] = {}
+
+    def realm(self, realm_id: str) -> RealmGovernor:
+        governor = self._realms.get(realm_id)
+        if governor is None:
+            governor = self._realms[realm_id] = RealmGovernor(realm_id)
+        return governor
+
+    @asynccontextmanager
+    async def slot(self, realm_id: str, priority: Optional[int] = None) -> AsyncIterator[RealmGovernor]:
+        """Hold one request slot (and token) for the realm at the context's priority."""
+        governor = self.realm(realm_id)
+        await governor.acquire(current_priority() if priority is None else priority)
+        try:
+            yield governor
+        finally:
+            await governor.release()
+
+    def record_throttle(self, realm_id: str, retry_after: Optional[float] = None):
+        self.realm(realm_id).record_throttle(retry_after)
+
+    def record_success(self, realm_id: str):
+        self.realm(realm_id).record_success()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {realm_id: governor.get_status() for realm_id, governor in self._realms.items()}
+
+    def reset(self):
+        """Drop all realm state (tests / admin)."""
+        self._realms.clear()
+
+
+# Global instance shared by every QuickBooksClient
+qb_rate_governor = QuickBooksRateGovernor()
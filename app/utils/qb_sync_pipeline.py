@@ -0,0 +1,127 @@
+"""
+Staged QuickBooks sync pipeline.
+
+sync_all used to fetch and apply customers, then invoices, then payments,
+so QuickBooks network time for invoices/payments waited behind the
+customer upserts. With the pipeline:
+- one fetch task per entity type walks its query pages concurrently with
+  the others (the realm rate governor bounds the combined request rate)
+  and puts pages on a bounded queue (QB_SYNC_PIPELINE_QUEUE_PAGES) - a
+  fetch that runs ahead of its apply stage blocks instead of buffering
+  the whole entity set
+- apply stages still run one entity type at a time in dependency order
+  (customers -> invoices -> payments), consuming their stream page by page
+
+A fetch error is re-raised in the apply stage at the point the stream
+reaches it, so pages fetched before the error are still applied.
+
+Usage:
+    stream = PageStream("invoices", qb_service.iter_query(query), maxsize=4).start()
+    async for page in stream:
+        ...  # apply
+    stream.get_stats()
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class PageStream:
+    """Pages from a background fetch task, consumed by one apply stage through a bounded queue."""
+
+    def __init__(self, entity_type: str, pages: AsyncIterator[List[Dict[str, Any]]], maxsize: int):
+        self.entity_type = entity_type
+        self._pages = pages
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+
+        # Stage metrics
+        self.fetched_pages = 0
+        self.fetched_entities = 0
+        self.fetch_seconds = 0.0
+        self.max_queue_depth = 0
+        self.applied_pages = 0
+        self.apply_wait_seconds = 0.0  # Apply stage blocked on an empty queue
+        self.apply_started_at: Optional[float] = None
+        self.apply_finished_at: Optional[float] = None
+
+    def start(self) -> "PageStream":
+        self.started_at = time.perf_counter()
+        self._task = asyncio.create_task(self._fetch())
+        return self
+
+    async def _fetch(self):
+        try:
+            async for page in self._pages:
+                self.fetched_pages += 1
+                self.fetched_entities += len(page)
+                await self._queue.put(page)
+                self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+            await self._queue.put(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[SYNC PIPELINE] {self.entity_type} fetch failed: {e}")
+            await self._queue.put(e)
+        finally:
+            self.fetch_seconds = time.perf_counter() - self.started_at
+
+    async def __aiter__(self):
+        self.apply_started_at = time.perf_counter()
+        try:
+            while True:
+                waited_from = time.perf_counter()
+                item = await self._queue.get()
+                self.apply_wait_seconds += time.perf_counter() - waited_from
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                self.applied_pages += 1
+        finally:
+            self.apply_finished_at = time.perf_counter()
+
+    async def cancel(self):
+        """Stop the fetch task (apply stage failed or the sync was aborted)."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        apply_seconds = (
+            (self.apply_finished_at or time.perf_counter()) - self.apply_started_at
+            if self.apply_started_at else 0.0
+        )
+        return {
+            "fetch": {
+                "pages": self.fetched_pages,
+                "entities": self.fetched_entities,
+                "duration_ms": round(self.fetch_seconds * 1000),
+                "entities_per_sec": round(self.fetched_entities / self.fetch_seconds, 1) if self.fetch_seconds else None,
+            },
+            "queue": {
+                "maxsize": self._queue.maxsize,
+                "max_depth": self.max_queue_depth,
+                "depth": self._queue.qsize(),
+            },
+            "apply": {
+                "pages": self.applied_pages,
+                "duration_ms": round(apply_seconds * 1000),
+                "wait_ms": round(self.apply_wait_seconds * 1000),
+                "entities_per_sec": (
+                    round(self.fetched_entities / (apply_seconds - self.apply_wait_seconds), 1)
+                    if apply_seconds - self.apply_wait_seconds > 0 else None
+                ),
+            },
+        }
@@ -0,0 +1,138 @@
+"""
+Per-request SQL instrumentation.
+
+SQLAlchemy engine events record every statement executed while a
+QueryStats tracker is active in the current context (contextvar). One
+tracker is opened per HTTP request by QueryStatsMiddleware and per
+scheduled sync run, giving:
+- query count and total DB time
+- repeated-statement patterns (N+1 detection)
+- a Server-Timing header value
+
+Usage:
+    with track_queries("GET /v1/projects") as stats:
+        ...  # run queries
+    stats.count, stats.db_time, stats.repeated_statements(5)
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+# Literals inlined into raw text() SQL would make each N+1 query look unique
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Collapse a SQL statement to its shape (literals -> ?, single-spaced)."""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """Statement counters for one unit of work (request or background job)."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.db_time = 0.0  # seconds
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float):
+        """Record one executed statement."""
+        self.count += 1
+        self.db_time += duration
+        self.statements[normalize_statement(statement)] += 1
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements executed at least `threshold` times (N+1 candidates)."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+    def to_dict(self) -> Dict[str, float]:
+        """Summary for RequestTimer / logs."""
+        return {"db_queries": self.count, "db_time": self.db_time}
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Server-Timing header value (durations in ms)."""
+        value = f'db;dur={self.db_time * 1000:.1f};desc="{self.count} queries"'
+        if total is not None:
+            value += f", app;dur={total * 1000:.1f}"
+        return value
+
+    def log_summary(self, n_plus_one_threshold: int):
+        """Log query totals; warn about statements repeated past the threshold."""
+        offenders = self.repeated_statements(n_plus_one_threshold)
+        for sql, n in offenders:
+            logger.warning(f"[N+1] {self.label}: {n}x {sql[:200]}")
+        if self.count:
+            logger.info(
+                f"[SQL] {self.label}: {self.count} queries, {self.db_time * 1000:.1f}ms DB"
+                + (f", {len(offenders)} repeated pattern(s)" if offenders else "")
+            )
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    """Tracker for the current request/job, or None when not tracking."""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(label: str) -> Iterator[QueryStats]:
+    """Track all statements executed in this context."""
+    stats = QueryStats(label)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    stats.record(statement, time.perf_counter() - start_times.pop())
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute never fires for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def install_query_instrumentation(engine):
+    """
+    Attach the statement listeners to an engine (sync or async).
+
+    Listeners are no-ops unless a tracker is active, so this is safe to
+    install unconditionally. SQLAlchemy's async greenlets inherit the
+    caller's context, so the contextvar is visible inside the events.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
@@ -6,6 +6,8 @@ import logging
 from functools import wraps
 from typing import Optional, Callable, Any
 
+from app.utils.query_stats import get_query_stats
+
 logger = logging.getLogger(__name__)
 
 
@@ -150,13 +152,18 @@ class RequestTimer:
         
         Returns:
             Dict with operation names as keys and durations as values,
-            plus 'total' key with total request time
+            plus 'total' key with total request time. When SQL tracking is
+            active, also 'db_queries' (count) and 'db_time' (seconds).
         """
         total_time = time.time() - self.request_start
-        return {
+        summary = {
             **self.timings,
             'total': total_time
         }
+        query_stats = get_query_stats()
+        if query_stats is not None:
+            summary.update(query_stats.to_dict())
+        return summary
     
     def log_summary(self):
         """Log complete timing summary"""
@@ -164,5 +171,8 @@ class RequestTimer:
         session_prefix = f"[{self.session_id}]" if self.session_id else "[GLOBAL]"
         
         # Format summary as key=value pairs
-        summary_str = " | ".join([f"{k}={v:.3f}s" for k, v in summary.items()])
+        summary_str = " | ".join([
+            f"{k}={v}" if isinstance(v, int) else f"{k}={v:.3f}s"
+            for k, v in summary.items()
+        ])
         logger.info(f"{session_prefix} [TIMING SUMMARY] {summary_str}")
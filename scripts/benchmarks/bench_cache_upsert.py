@@ -0,0 +1,203 @@
+"""
+QuickBooks Cache Upsert Benchmark
+
+Measures throughput of loading QuickBooks invoices into
+quickbooks_invoices_cache with three write strategies:
+- per_row:     one INSERT ... ON CONFLICT round trip per entity (original sync)
+- executemany: the same statement executed once per page
+- bulk:        QuickBooksCacheLoader (SELECT + one json_populate_recordset
+               upsert per batch, unchanged rows skipped)
+
+Each strategy runs three scenarios on the same table, in order:
+- cold:      empty table, every row is new
+- unchanged: full re-sync where nothing changed
+- changed:   full re-sync where --change-pct of the rows changed
+
+The scratch database (hr_cache_upsert_bench) is DROPPED and recreated on
+the given server - never point this at a database you care about.
+
+Usage:
+    python scripts/benchmarks/bench_cache_upsert.py --server-url postgresql+asyncpg://postgres@localhost/postgres
+    python scripts/benchmarks/bench_cache_upsert.py --server-url ... --rows 50000 --change-pct 2
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.services.qb_cache_loader import QuickBooksCacheLoader, invoice_cache_row
+from app.utils.qb_pagination import QB_MAX_RESULTS
+
+BENCH_DATABASE = "hr_cache_upsert_bench"
+
+# quickbooks_invoices_cache as left by the migrations
+CREATE_TABLE = """
+    CREATE TABLE quickbooks_invoices_cache (
+        qb_invoice_id VARCHAR(50) PRIMARY KEY,
+        customer_id VARCHAR(50),
+        doc_number VARCHAR(50),
+        total_amount NUMERIC(12, 2),
+        balance NUMERIC(12, 2),
+        due_date TIMESTAMPTZ,
+        qb_data JSONB,
+        content_hash VARCHAR(64),
+        qb_last_modified TIMESTAMPTZ,
+        is_active BOOLEAN NOT NULL DEFAULT true,
+        sync_error TEXT,
+        cached_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+# Pre-bulk-loader statement (per row / executemany baselines)
+LEGACY_UPSERT = text("""
+    INSERT INTO quickbooks_invoices_cache
+    (qb_invoice_id, customer_id, doc_number, total_amount, balance,
+     due_date, qb_data, content_hash, qb_last_modified, is_active, sync_error, cached_at)
+    VALUES
+    (:qb_invoice_id, :customer_id, :doc_number, :total_amount, :balance,
+     :due_date, :qb_data, :content_hash, :qb_last_modified, :is_active, :sync_error, :cached_at)
+    ON CONFLICT (qb_invoice_id) DO UPDATE SET
+        customer_id = EXCLUDED.customer_id,
+        doc_number = EXCLUDED.doc_number,
+        total_amount = EXCLUDED.total_amount,
+        balance = EXCLUDED.balance,
+        due_date = EXCLUDED.due_date,
+        qb_data = EXCLUDED.qb_data,
+        content_hash = EXCLUDED.content_hash,
+        qb_last_modified = EXCLUDED.qb_last_modified,
+        is_active = EXCLUDED.is_active,
+        sync_error = NULL,
+        cached_at = EXCLUDED.cached_at
+""")
+
+
+def make_invoices(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "Id": str(i),
+            "DocNumber": f"{1000 + i}",
+            "CustomerRef": {"value": str(i % 300), "name": f"Customer {i % 300}"},
+            "TxnDate": "2025-01-15",
+            "DueDate": "2025-02-15",
+            "TotalAmt": 1000 + i % 500,
+            "Balance": i % 500,
+            "Line": [{"Id": "1", "Amount": 1000 + i % 500, "DetailType": "SalesItemLineDetail",
+                      "Description": f"Permit services #{i}"}],
+            "MetaData": {"LastUpdatedTime": "2025-01-15T10:00:00-08:00"},
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def change_some(invoices: List[Dict[str, Any]], pct: float, seed: int) -> List[Dict[str, Any]]:
+    """Copy of invoices with pct% of balances changed (and LastUpdatedTime bumped)."""
+    rng = random.Random(seed)
+    changed = [dict(invoice) for invoice in invoices]
+    for i in rng.sample(range(len(changed)), int(len(changed) * pct / 100)):
+        changed[i]["Balance"] = changed[i]["Balance"] + 1
+        changed[i]["MetaData"] = {"LastUpdatedTime": "2025-03-01T10:00:00-08:00"}
+    return changed
+
+
+def pages(items: List[Any]):
+    for start in range(0, len(items), QB_MAX_RESULTS):
+        yield items[start:start + QB_MAX_RESULTS]
+
+
+async def load(db: AsyncSession, strategy: str, invoices: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Load every page with one strategy, committing per page like the sync does."""
+    loader = QuickBooksCacheLoader()
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    for page in pages(invoices):
+        rows = [invoice_cache_row(invoice) for invoice in page]
+        if strategy == "per_row":
+            for row in rows:
+                await db.execute(LEGACY_UPSERT, row)
+        elif strategy == "executemany":
+            await db.execute(LEGACY_UPSERT, rows)
+        else:
+            for outcome, count in (await loader.upsert(db, "invoices", rows)).items():
+                counts[outcome] += count
+        await db.commit()
+    return counts
+
+
+async def rows_written(db: AsyncSession, since: datetime) -> int:
+    """Rows inserted or rewritten since `since` (every write stamps cached_at)."""
+    result = await db.execute(
+        text("SELECT count(*) FROM quickbooks_invoices_cache WHERE cached_at >= :since"),
+        {"since": since},
+    )
+    return result.scalar()
+
+
+async def run_benchmark(server_url: str, rows: int, change_pct: float) -> List[Dict[str, Any]]:
+    admin = create_async_engine(server_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}"))
+        await conn.execute(text(f"CREATE DATABASE {BENCH_DATABASE}"))
+    await admin.dispose()
+
+    engine = create_async_engine(make_url(server_url).set(database=BENCH_DATABASE))
+    invoices = make_invoices(rows)
+    changed = change_some(invoices, change_pct, seed=42)
+    results = []
+
+    for strategy in ("per_row", "executemany", "bulk"):
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS quickbooks_invoices_cache"))
+            await conn.execute(text(CREATE_TABLE))
+
+        async with AsyncSession(engine) as db:
+            for scenario, data in (("cold", invoices), ("unchanged", invoices), ("changed", changed)):
+                started_at = datetime.now(timezone.utc)
+                start = time.perf_counter()
+                counts = await load(db, strategy, data)
+                elapsed = time.perf_counter() - start
+                results.append({
+                    "strategy": strategy,
+                    "scenario": scenario,
+                    "seconds": elapsed,
+                    "rows_per_second": len(data) / elapsed,
+                    "rows_written": await rows_written(db, started_at),
+                    "counts": counts if strategy == "bulk" else None,
+                })
+
+    await engine.dispose()
+    return results
+
+
+def print_results(results: List[Dict[str, Any]], rows: int):
+    print("=" * 96)
+    print(f"QUICKBOOKS CACHE UPSERT BENCHMARK ({rows} invoices, pages of {QB_MAX_RESULTS})")
+    print("=" * 96)
+    print(f"{'Strategy':<13}{'Scenario':<11}{'seconds':>9}{'rows/s':>11}{'written':>9}  counts")
+    print("-" * 96)
+    for r in results:
+        counts = r["counts"]
+        detail = (f"{counts['inserted']} new / {counts['updated']} changed / {counts['unchanged']} unchanged"
+                  if counts else "")
+        print(f"{r['strategy']:<13}{r['scenario']:<11}{r['seconds']:>9.2f}{r['rows_per_second']:>11.0f}"
+              f"{r['rows_written']:>9}  {detail}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark QuickBooks cache upsert strategies")
+    parser.add_argument("--server-url", required=True,
+                        help="Admin URL of a local Postgres server (scratch DB is created there)")
+    parser.add_argument("--rows", type=int, default=20000, help="Invoices per load")
+    parser.add_argument("--change-pct", type=float, default=5, help="Percent of rows changed in the last scenario")
+    args = parser.parse_args()
+
+    print_results(asyncio.run(run_benchmark(args.server_url, args.rows, args.change_pct)), args.rows)
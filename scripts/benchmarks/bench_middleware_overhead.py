@@ -0,0 +1,271 @@
+"""
+Request-Overhead Benchmark for the Middleware Chain
+
+Measures what the middleware stack adds to a request, calling the ASGI app
+directly (no server, no HTTP client, no database) so only framework and
+middleware time is counted. Three stacks around the same routes:
+- bare:       no middleware (the floor)
+- asgi:       the production chain - CORS, HTTPSRedirectFix, QueryStats and
+              SupabaseJWT - as the pure ASGI middlewares in app/middleware/
+- base_http:  the same layers as BaseHTTPMiddleware subclasses, doing the
+              same work (how the chain was written before)
+
+Routes: a public JSON route, a protected JSON route (HS256 token, primed
+principal cache and verified-token cache - the steady state of a signed-in
+user) and a protected StreamingResponse. Per request the report gives the
+mean and p50 / p95 in microseconds; --concurrency runs that many requests
+at once per batch.
+
+Also times the public-route test alone: the precompiled PublicRouteMatcher
+against the old `any(path.startswith(route) ...)` scan.
+
+Usage:
+    python scripts/benchmarks/bench_middleware_overhead.py
+    python scripts/benchmarks/bench_middleware_overhead.py --requests 20000 --concurrency 8 --output middleware.json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import jwt
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.config import settings
+from app.db.models import User
+from app.middleware.https_redirect_fix_middleware import HTTPSRedirectFixMiddleware
+from app.middleware.query_stats_middleware import QueryStatsMiddleware
+from app.middleware.route_matcher import PublicRouteMatcher
+from app.middleware.supabase_auth_middleware import SupabaseJWTMiddleware
+from app.services.principal_cache import principal_cache
+from app.services.supabase_auth_service import supabase_auth_service
+from app.utils.query_stats import track_queries
+
+SECRET = "bench-supabase-secret"
+SUPABASE_USER_ID = "5d0b6a9e-2f61-4f0e-9a53-0c1d2e3f4a5b"
+
+
+# ==================== BaseHTTPMiddleware equivalents ====================
+
+class BaseHTTPSRedirectFix(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if request.headers.get("x-forwarded-proto") == "https":
+            request.scope["scheme"] = "https"
+        return await call_next(request)
+
+
+class BaseQueryStats(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        with track_queries(f"{request.method} {request.url.path}") as stats:
+            response = await call_next(request)
+        if settings.ENABLE_SERVER_TIMING:
+            response.headers["Server-Timing"] = stats.server_timing(time.perf_counter() - start)
+        response.background = BackgroundTask(stats.log_summary, settings.QUERY_STATS_N_PLUS_ONE_THRESHOLD)
+        return response
+
+
+class BaseSupabaseJWT(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.auth = SupabaseJWTMiddleware(app)
+
+    async def dispatch(self, request, call_next):
+        if any(request.url.path.startswith(route) for route in SupabaseJWTMiddleware.PUBLIC_ROUTES[1:]) \
+                or request.url.path == "/":
+            return await call_next(request)
+        response = await self.auth.authenticate(request.scope)
+        if response is not None:
+            return response
+        return await call_next(request)
+
+
+# ==================== App and driver ====================
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/v1/me")
+    async def me(request: Request):
+        # No auth layer in the bare stack
+        return {"user_id": getattr(request.state, "user_id", None), "role": getattr(request.state, "user_role", None)}
+
+    @app.get("/v1/export")
+    async def export():
+        return StreamingResponse((f"row {n}\n" for n in range(20)), media_type="text/plain")
+
+    if stack == "bare":
+        return app
+    layers = {
+        "asgi": [SupabaseJWTMiddleware, QueryStatsMiddleware, HTTPSRedirectFixMiddleware],
+        "base_http": [BaseSupabaseJWT, BaseQueryStats, BaseHTTPSRedirectFix],
+    }[stack]
+    for layer in layers:
+        app.add_middleware(layer)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["https://portal.houserenovatorsllc.com"],
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["*"],
+    )
+    return app
+
+
+def make_scope(path: str, token: str) -> Dict[str, Any]:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"origin", b"https://portal.houserenovatorsllc.com"),
+            (b"x-forwarded-proto", b"https"),
+            (b"authorization", f"Bearer {token}".encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def call(app, path: str, token: str) -> float:
+    status = []
+    received = asyncio.Event()
+
+    async def receive():
+        # The body once, then block like a connected client (StreamingResponse listens for disconnect)
+        if received.is_set():
+            await asyncio.Event().wait()
+        received.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    start = time.perf_counter()
+    await app(make_scope(path, token), receive, send)
+    elapsed = time.perf_counter() - start
+    if status != [200]:
+        raise RuntimeError(f"{path} answered {status}")
+    return elapsed
+
+
+async def measure(app, path: str, token: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    for _ in range(min(200, requests)):
+        await call(app, path, token)  # Warm-up (route compilation, caches)
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for _ in range(requests // concurrency):
+        latencies.extend(await asyncio.gather(*(call(app, path, token) for _ in range(concurrency))))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "mean_us": round(statistics.fmean(latencies) * 1e6, 1),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "p95_us": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1e6, 1),
+        "requests_per_second": round(len(latencies) / wall),
+    }
+
+
+def bench_route_matching(iterations: int) -> Dict[str, Any]:
+    routes = SupabaseJWTMiddleware.PUBLIC_ROUTES[1:]
+    matcher = PublicRouteMatcher(SupabaseJWTMiddleware.PUBLIC_ROUTES)
+    paths = ["/health", "/v1/projects/123", "/v1/quickbooks/invoices", "/docs", "/v1/chat/sessions/abc/messages"]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for path in paths:
+            any(path.startswith(route) for route in routes)
+    scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for path in paths:
+            matcher(path)
+    compiled = time.perf_counter() - start
+
+    checks = iterations * len(paths)
+    return {"startswith_scan_ns": round(scan / checks * 1e9), "compiled_matcher_ns": round(compiled / checks * 1e9)}
+
+
+async def run(args) -> Dict[str, Any]:
+    supabase_auth_service.jwt_secret = SECRET
+    token = jwt.encode(
+        {"sub": SUPABASE_USER_ID, "email": "pm@example.com", "aud": "authenticated", "exp": int(time.time()) + 86400},
+        SECRET,
+        algorithm="HS256",
+    )
+    principal_cache.put(User(
+        id="bench-user", supabase_user_id=SUPABASE_USER_ID, email="pm@example.com", role="pm", is_active=True
+    ))
+
+    results: Dict[str, Any] = {}
+    for stack in ("bare", "asgi", "base_http"):
+        app = build_app(stack)
+        results[stack] = {
+            route: await measure(app, path, token, args.requests, args.concurrency)
+            for route, path in (("public", "/health"), ("protected", "/v1/me"), ("streaming", "/v1/export"))
+        }
+    return {
+        "benchmark": "middleware_overhead",
+        "config": {"requests": args.requests, "concurrency": args.concurrency},
+        "stacks": results,
+        "route_matching": bench_route_matching(args.match_iterations),
+    }
+
+
+def print_results(report: Dict[str, Any]):
+    print("=" * 84)
+    print(f"MIDDLEWARE REQUEST OVERHEAD ({report['config']['requests']} requests per route, "
+          f"concurrency {report['config']['concurrency']})")
+    print("=" * 84)
+    print(f"{'Stack':<11}{'Route':<11}{'mean us':>10}{'p50 us':>10}{'p95 us':>10}{'req/s':>10}{'overhead us':>14}")
+    print("-" * 84)
+    bare = report["stacks"]["bare"]
+    for stack, routes in report["stacks"].items():
+        for route, r in routes.items():
+            overhead = r["mean_us"] - bare[route]["mean_us"]
+            print(f"{stack:<11}{route:<11}{r['mean_us']:>10.1f}{r['p50_us']:>10.1f}{r['p95_us']:>10.1f}"
+                  f"{r['requests_per_second']:>10}{overhead:>14.1f}")
+    matching = report["route_matching"]
+    print("-" * 84)
+    print(f"Public-route test: startswith scan {matching['startswith_scan_ns']}ns, "
+          f"compiled matcher {matching['compiled_matcher_ns']}ns per path")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-request overhead of the middleware chain")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per stack and route")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight per batch")
+    parser.add_argument("--match-iterations", type=int, default=100000)
+    parser.add_argument("--output", help="Write the JSON results here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_results(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
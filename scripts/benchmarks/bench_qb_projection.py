@@ -0,0 +1,124 @@
+"""
+QuickBooks Query Projection Benchmark (simulated QuickBooks)
+
+Compares `SELECT *` with the field-projected query of each use case in
+app/utils/qb_query_builder.py (context, matching, sync) against the
+in-repo simulator (tests/qb_simulator.py, served in-process):
+- bytes:    response bytes for every STARTPOSITION page of the query
+- parse_ms: json.loads of those bodies plus trimming to records
+            (best of --repeat runs, no I/O)
+- wall_ms:  the whole query through QuickBooksService.query_all
+            (pooled client, pagination, parse)
+
+No database is needed. The simulator returns every property a real
+company would (addresses, custom fields, tax detail, delivery info), so
+the `SELECT *` sizes are representative of production payloads.
+
+Usage:
+    python scripts/benchmarks/bench_qb_projection.py
+    python scripts/benchmarks/bench_qb_projection.py --customers 2000 --invoices-per-customer 5 --output projection.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.utils.qb_pagination import QB_MAX_RESULTS, page_query
+from app.utils.qb_query_builder import FIELD_SETS, QBQuery
+
+
+def page_bodies(simulator, query: QBQuery) -> List[bytes]:
+    """Raw response body of every page of the query, as the simulator would send it."""
+    bodies = []
+    start = 1
+    while True:
+        payload = simulator.query(page_query(str(query), start, QB_MAX_RESULTS))
+        bodies.append(json.dumps(payload).encode())
+        if len(payload["QueryResponse"].get(query.entity, [])) < QB_MAX_RESULTS:
+            return bodies
+        start += QB_MAX_RESULTS
+
+
+def parse_ms(query: QBQuery, bodies: List[bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for body in bodies:
+            query.records(json.loads(body)["QueryResponse"].get(query.entity, []))
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def measure(simulator, qb_service, query: QBQuery, repeat: int) -> Dict[str, Any]:
+    bodies = page_bodies(simulator, query)
+    simulator.reset_stats()
+    start = time.perf_counter()
+    records = await qb_service.query_all(query)
+    wall_ms = (time.perf_counter() - start) * 1000
+    return {
+        "query": str(query),
+        "records": len(records),
+        "bytes": sum(len(body) for body in bodies),
+        "bytes_per_record": round(sum(len(body) for body in bodies) / max(len(records), 1)),
+        "parse_ms": round(parse_ms(query, bodies, repeat), 3),
+        "wall_ms": round(wall_ms, 2),
+        "api_requests": simulator.stats["requests"],
+    }
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    from tests.qb_simulator import QuickBooksSimulator, simulated_quickbooks_service
+
+    simulator = QuickBooksSimulator(
+        customers=args.customers,
+        invoices_per_customer=args.invoices_per_customer,
+        seed=args.seed,
+    )
+    qb_service = simulated_quickbooks_service(simulator)
+
+    results = []
+    for use_case, entities in FIELD_SETS.items():
+        for entity in entities:
+            star = await measure(simulator, qb_service, QBQuery(entity), args.repeat)
+            projected = await measure(simulator, qb_service, QBQuery(entity, use_case), args.repeat)
+            results.append({"use_case": use_case, "entity": entity, "select_star": star, "projected": projected})
+    await qb_service.api.aclose()
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print("=" * 100)
+    print("QUICKBOOKS QUERY PROJECTION BENCHMARK (SELECT * vs projected)")
+    print("=" * 100)
+    print(f"{'Use case':<10}{'Entity':<10}{'records':>8}{'KB *':>10}{'KB proj':>10}{'bytes':>8}"
+          f"{'parse * ms':>12}{'proj ms':>9}{'wall * ms':>11}{'proj ms':>9}")
+    print("-" * 100)
+    for r in results:
+        star, projected = r["select_star"], r["projected"]
+        print(
+            f"{r['use_case']:<10}{r['entity']:<10}{star['records']:>8}{star['bytes'] / 1024:>10.1f}"
+            f"{projected['bytes'] / 1024:>10.1f}{projected['bytes'] / star['bytes']:>7.0%} "
+            f"{star['parse_ms']:>12.2f}{projected['parse_ms']:>9.2f}{star['wall_ms']:>11.1f}{projected['wall_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark projected QuickBooks queries against SELECT *")
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--invoices-per-customer", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5, help="Parse runs per query (best is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON results here")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
@@ -0,0 +1,275 @@
+"""
+QuickBooks Sync Benchmark (simulated QuickBooks)
+
+Runs the QuickBooks paths end-to-end against the in-repo simulator
+(tests/qb_simulator.py, served in-process) and a scratch Postgres database,
+replacing the one-off sandbox stress scripts:
+- full_sync:    sync_all(force_full_sync=True) into empty cache tables,
+                including promotion
+- delta_query:  sync_all in query mode after --change-pct of invoices changed
+- delta_cdc:    the same change volume through one ChangeDataCapture call
+- promotion:    re-promotion of every cached invoice and payment
+- webhooks:     --change-pct changes delivered as signed webhooks, stored by
+                the webhook route and applied by the worker
+- chat_context: build_quickbooks_context cold, then --context-iterations
+                warm builds (p50 / p95)
+
+Every phase reports wall time, simulated API requests (by operation), 429s,
+faults, records and response bytes returned. The JSON report (--output) records the
+configuration and environment, so runs on the same machine are comparable;
+--compare prints the time ratio of each phase against an earlier report.
+
+The scratch database (hr_qb_sync_bench) is DROPPED and recreated on the
+given server - never point this at a database you care about.
+
+Usage:
+    python scripts/benchmarks/bench_qb_sync.py --server-url postgresql+asyncpg://postgres@localhost/postgres
+    python scripts/benchmarks/bench_qb_sync.py --server-url ... --customers 2000 --latency-ms 150 --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+BENCH_DATABASE = "hr_qb_sync_bench"
+WEBHOOK_TOKEN = "bench-token"
+
+
+async def create_database(server_url: str):
+    from app.db.models import Base
+    from tests.conftest import POSTGRES_SCHEMA_PATCHES
+
+    admin = create_async_engine(server_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}"))
+        await conn.execute(text(f"CREATE DATABASE {BENCH_DATABASE}"))
+    await admin.dispose()
+
+    engine = create_async_engine(make_url(server_url).set(database=BENCH_DATABASE), pool_size=10)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in POSTGRES_SCHEMA_PATCHES:
+            await conn.execute(text(statement))
+    return engine
+
+
+async def timed(simulator, work: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Run one phase; wall time plus the simulator's request counters."""
+    simulator.reset_stats()
+    start = time.perf_counter()
+    detail = await work()
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "api_requests": simulator.stats["requests"],
+        "throttled": simulator.stats["throttled"],
+        "faults": simulator.stats["faults"],
+        "records_returned": simulator.stats["records_returned"],
+        "bytes_returned": simulator.stats["bytes_sent"],
+        "by_operation": dict(simulator.stats["by_operation"]),
+        **detail,
+    }
+
+
+def sync_detail(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "records_synced": result["total_records"],
+        "errors": result["total_errors"],
+        "mode": result.get("mode", "query"),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    from fastapi import FastAPI
+
+    from app.config import settings
+    from app.db.session import get_db
+    from app.routes.quickbooks_webhooks import router as webhook_router
+    from app.services import qb_reference_cache as reference_module
+    from app.services import quickbooks_sync_service as sync_module
+    from app.services.qb_promotion_service import qb_promotion_service
+    from app.services.qb_read_cache import qb_read_cache
+    from app.services.qb_webhook_worker import QuickBooksWebhookWorker
+    from app.utils.context_builder import build_quickbooks_context
+    from tests.qb_simulator import QuickBooksSimulator, link_gc_clients, simulated_quickbooks_service
+
+    simulator = QuickBooksSimulator(
+        customers=args.customers,
+        invoices_per_customer=args.invoices_per_customer,
+        gc_pct=args.gc_pct,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        latency_per_record_ms=args.latency_per_record_ms,
+        rate_limit_per_minute=args.rate_limit_per_minute,
+        max_concurrent=args.max_concurrent,
+        fault_rate=args.fault_rate,
+        seed=args.seed,
+    )
+    sync_module.get_quickbooks_service = lambda db: simulated_quickbooks_service(simulator, db)
+    reference_module.get_quickbooks_service = sync_module.get_quickbooks_service
+    settings.QUICKBOOKS_WEBHOOK_TOKEN = WEBHOOK_TOKEN
+    changes = max(1, int(len(simulator.entities["Invoice"]) * args.change_pct / 100))
+
+    engine = await create_database(args.server_url)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    phases: Dict[str, Any] = {}
+
+    async with factory() as db:
+        linked = await link_gc_clients(db, simulator)
+        service = sync_module.QuickBooksSyncService()
+
+        async def full_sync():
+            return sync_detail(await service.sync_all(db, force_full_sync=True))
+        phases["full_sync"] = await timed(simulator, full_sync)
+
+        async def delta(mode):
+            return sync_detail(await service.sync_all(db, mode=mode))
+        for mode in ("query", "cdc"):
+            # LastUpdatedTime has one-second resolution - edit after the watermark's second
+            await asyncio.sleep(1.05)
+            simulator.touch("Invoice", changes)
+            simulator.pending_webhooks.clear()
+            phases[f"delta_{mode}"] = await timed(simulator, lambda: delta(mode))
+
+        async def promotion():
+            invoices = await qb_promotion_service.promote_invoices(db)
+            payments = await qb_promotion_service.promote_payments(db)
+            return {"promoted": invoices["promoted"] + payments["promoted"], "skipped": invoices["skipped"] + payments["skipped"]}
+        phases["promotion"] = await timed(simulator, promotion)
+
+    async def webhooks():
+        async def bench_get_db():
+            async with factory() as session:
+                yield session
+
+        app = FastAPI()
+        app.include_router(webhook_router)
+        app.dependency_overrides[get_db] = bench_get_db
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            statuses = await simulator.emit_webhooks(client, "/v1/quickbooks/webhook", WEBHOOK_TOKEN)
+        processed = await QuickBooksWebhookWorker(session_factory=factory).drain()
+        return {"notifications": len(statuses), "events_processed": processed}
+    simulator.touch("Invoice", changes)
+    phases["webhooks"] = await timed(simulator, webhooks)
+
+    async with factory() as db:
+        qb_service = simulated_quickbooks_service(simulator, db)
+        qb_read_cache.reset()
+
+        async def chat_context():
+            start = time.perf_counter()
+            context = await build_quickbooks_context(qb_service)
+            cold_ms = (time.perf_counter() - start) * 1000
+            warm = []
+            for _ in range(args.context_iterations):
+                start = time.perf_counter()
+                await build_quickbooks_context(qb_service)
+                warm.append((time.perf_counter() - start) * 1000)
+            warm.sort()
+            return {
+                "customers": context["summary"].get("total_customers", 0),
+                "invoices": context["summary"].get("total_invoices", 0),
+                "cold_ms": round(cold_ms, 2),
+                "p50_ms": round(statistics.median(warm), 3),
+                "p95_ms": round(warm[max(0, int(len(warm) * 0.95) - 1)], 3),
+            }
+        phases["chat_context"] = await timed(simulator, chat_context)
+
+        postgres_version = (await db.execute(text("SHOW server_version"))).scalar()
+
+    await engine.dispose()
+    return {
+        "benchmark": "qb_sync",
+        "label": args.label,
+        "generated_at": datetime.now().isoformat(),
+        "config": {
+            "customers": args.customers,
+            "gc_customers": linked,
+            "invoices": len(simulator.entities["Invoice"]),
+            "payments": len(simulator.entities["Payment"]),
+            "change_pct": args.change_pct,
+            "changed_per_phase": changes,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "latency_per_record_ms": args.latency_per_record_ms,
+            "rate_limit_per_minute": args.rate_limit_per_minute,
+            "max_concurrent": args.max_concurrent,
+            "fault_rate": args.fault_rate,
+            "context_iterations": args.context_iterations,
+            "seed": args.seed,
+            "page_size": settings.QB_QUERY_PAGE_SIZE,
+            "query_concurrency": settings.QB_QUERY_CONCURRENCY,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "postgres": postgres_version,
+        },
+        "phases": phases,
+    }
+
+
+def print_report(report: Dict[str, Any], previous: Optional[Dict[str, Any]]):
+    config = report["config"]
+    print("=" * 88)
+    print(f"QUICKBOOKS SYNC BENCHMARK {report['label'] or ''}".rstrip())
+    print(
+        f"{config['customers']} customers ({config['gc_customers']} GC), {config['invoices']} invoices, "
+        f"{config['payments']} payments, latency {config['latency_ms']:g}+{config['jitter_ms']:g}ms"
+    )
+    print("=" * 88)
+    print(f"{'Phase':<14} {'Seconds':>9} {'API calls':>10} {'429s':>6} {'Records':>9}  Detail")
+    for name, phase in report["phases"].items():
+        detail = ", ".join(
+            f"{k}={v}" for k, v in phase.items()
+            if k not in ("seconds", "api_requests", "throttled", "faults", "records_returned", "bytes_returned", "by_operation")
+        )
+        ratio = ""
+        if previous and name in previous.get("phases", {}) and previous["phases"][name]["seconds"]:
+            ratio = f"  [{phase['seconds'] / previous['phases'][name]['seconds']:.2f}x vs {previous.get('label') or 'previous'}]"
+        print(
+            f"{name:<14} {phase['seconds']:>9.3f} {phase['api_requests']:>10} {phase['throttled']:>6} "
+            f"{phase['records_returned']:>9}  {detail}{ratio}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark QuickBooks sync, promotion and chat context against a simulator")
+    parser.add_argument("--server-url", required=True,
+                        help="Admin URL of a local Postgres server (scratch DB is created there)")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--invoices-per-customer", type=int, default=4)
+    parser.add_argument("--gc-pct", type=float, default=80, help="Percent of customers with the GC Compliance type")
+    parser.add_argument("--change-pct", type=float, default=2, help="Percent of invoices changed before each delta phase")
+    parser.add_argument("--latency-ms", type=float, default=150, help="Simulated QuickBooks latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--latency-per-record-ms", type=float, default=0.05)
+    parser.add_argument("--rate-limit-per-minute", type=int, default=500, help="QuickBooks allows 500 per realm")
+    parser.add_argument("--max-concurrent", type=int, default=10, help="QuickBooks allows 10 per realm")
+    parser.add_argument("--fault-rate", type=float, default=0, help="Share of requests answered with 503")
+    parser.add_argument("--context-iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="", help="Name of this run in reports and comparisons")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Earlier JSON report to compare phase times with")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    previous = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(report, previous)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, default=str))
+        print(f"Report written to {args.output}")
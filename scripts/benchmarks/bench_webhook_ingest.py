@@ -0,0 +1,197 @@
+"""
+QuickBooks Webhook Ingestion Load Test
+
+Fires signed QuickBooks webhook notifications at POST /v1/quickbooks/webhook
+from --concurrency concurrent senders and reports ingestion throughput
+(events/s), request rate and ack latency percentiles.
+
+Two targets:
+- default:  the webhook router mounted in-process (httpx ASGITransport) on a
+            scratch database (hr_webhook_bench) created on --server-url -
+            measures the handler + Postgres without network overhead
+- --url:    a running app (e.g. http://localhost:8000); set --token to the
+            app's QUICKBOOKS_WEBHOOK_TOKEN. Events land in that app's database.
+
+--retry-pct of the notifications are re-sent verbatim (Intuit redelivery)
+and must not be stored twice.
+
+The scratch database is DROPPED and recreated - never point --server-url at
+a server whose hr_webhook_bench database you care about.
+
+Usage:
+    python scripts/benchmarks/bench_webhook_ingest.py --server-url postgresql+asyncpg://postgres@localhost/postgres
+    python scripts/benchmarks/bench_webhook_ingest.py --url http://localhost:8000 --token <verifier token>
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+BENCH_DATABASE = "hr_webhook_bench"
+WEBHOOK_PATH = "/v1/quickbooks/webhook"
+
+CREATE_TABLE = """
+    CREATE TABLE webhook_events (
+        id SERIAL PRIMARY KEY,
+        event_id VARCHAR(100) NOT NULL UNIQUE,
+        realm_id VARCHAR(50) NOT NULL,
+        event_type VARCHAR(100) NOT NULL,
+        entity_type VARCHAR(50),
+        entity_ids JSON,
+        payload JSON NOT NULL,
+        processed BOOLEAN NOT NULL DEFAULT false,
+        processed_at TIMESTAMPTZ,
+        processing_error TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+
+def make_bodies(notifications: int, entities_per: int, retry_pct: float, seed: int) -> List[bytes]:
+    """Serialized notifications (unique changes) plus verbatim redeliveries."""
+    rng = random.Random(seed)
+    bodies = []
+    for n in range(notifications):
+        entities = [
+            {
+                "name": rng.choice(("Customer", "Invoice", "Payment")),
+                "id": str(rng.randint(1, 50000)),
+                "operation": rng.choice(("Create", "Update", "Update", "Delete")),
+                "lastUpdated": f"2025-12-14T10:{n // 60 % 60:02d}:{n % 60:02d}.{i:03d}-08:00",
+            }
+            for i in range(entities_per)
+        ]
+        payload = {"eventNotifications": [{"realmId": "9130354791234567", "dataChangeEvent": {"entities": entities}}]}
+        bodies.append(json.dumps(payload).encode())
+    bodies += rng.sample(bodies, int(len(bodies) * retry_pct / 100))
+    rng.shuffle(bodies)
+    return bodies
+
+
+def sign(body: bytes, token: str) -> str:
+    return base64.b64encode(hmac.new(token.encode(), body, hashlib.sha256).digest()).decode()
+
+
+async def fire(client: httpx.AsyncClient, bodies: List[bytes], token: str, concurrency: int) -> Dict[str, Any]:
+    queue = list(reversed(bodies))
+    latencies = []
+    stored = 0
+    failures = 0
+
+    async def sender():
+        nonlocal stored, failures
+        while queue:
+            body = queue.pop()
+            start = time.perf_counter()
+            response = await client.post(WEBHOOK_PATH, content=body, headers={
+                "intuit-signature": sign(body, token), "content-type": "application/json"
+            })
+            latencies.append(time.perf_counter() - start)
+            if response.status_code == 200:
+                stored += response.json().get("events_stored", 0)
+            else:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    return {"seconds": time.perf_counter() - start, "latencies": latencies, "stored": stored, "failures": failures}
+
+
+async def run_in_process(server_url: str, bodies: List[bytes], concurrency: int) -> Dict[str, Any]:
+    from fastapi import FastAPI
+
+    from app.config import settings
+    from app.db.session import get_db
+    from app.routes.quickbooks_webhooks import router
+
+    admin = create_async_engine(server_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}"))
+        await conn.execute(text(f"CREATE DATABASE {BENCH_DATABASE}"))
+    await admin.dispose()
+
+    engine = create_async_engine(make_url(server_url).set(database=BENCH_DATABASE), pool_size=concurrency)
+    async with engine.begin() as conn:
+        await conn.execute(text(CREATE_TABLE))
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def bench_get_db():
+        async with factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = bench_get_db
+    settings.QUICKBOOKS_WEBHOOK_TOKEN = "bench-token"
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        result = await fire(client, bodies, "bench-token", concurrency)
+
+    async with engine.connect() as conn:
+        result["rows"] = (await conn.execute(text("SELECT count(*) FROM webhook_events"))).scalar()
+    await engine.dispose()
+    return result
+
+
+async def run_against_url(url: str, token: str, bodies: List[bytes], concurrency: int) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        result = await fire(client, bodies, token, concurrency)
+    result["rows"] = None
+    return result
+
+
+def print_results(result: Dict[str, Any], requests: int, entities_per: int, unique_events: int, target: str):
+    latencies = sorted(result["latencies"])
+    events_sent = requests * entities_per
+    print("=" * 72)
+    print(f"QUICKBOOKS WEBHOOK INGESTION LOAD TEST ({target})")
+    print("=" * 72)
+    print(f"Requests:            {requests} ({entities_per} entities each, {result['failures']} failed)")
+    print(f"Events sent:         {events_sent} ({unique_events} unique)")
+    print(f"Events stored:       {result['stored']}" + (f" (table rows: {result['rows']})" if result["rows"] is not None else ""))
+    print(f"Elapsed:             {result['seconds']:.2f}s")
+    print(f"Ingestion:           {events_sent / result['seconds']:.0f} events/s, {requests / result['seconds']:.0f} requests/s")
+    print(f"Ack latency p50:     {statistics.median(latencies) * 1000:.1f}ms")
+    print(f"Ack latency p95:     {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms")
+    print(f"Ack latency max:     {latencies[-1] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test QuickBooks webhook ingestion")
+    parser.add_argument("--server-url", help="Admin URL of a local Postgres server (in-process mode)")
+    parser.add_argument("--url", help="Base URL of a running app instead of the in-process router")
+    parser.add_argument("--token", default="", help="QUICKBOOKS_WEBHOOK_TOKEN of the running app (--url mode)")
+    parser.add_argument("--notifications", type=int, default=2000, help="Unique notifications to send")
+    parser.add_argument("--entities", type=int, default=5, help="Entities per notification")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent senders")
+    parser.add_argument("--retry-pct", type=float, default=10, help="Percent of notifications redelivered")
+    args = parser.parse_args()
+
+    if not args.server_url and not args.url:
+        parser.error("one of --server-url or --url is required")
+
+    bodies = make_bodies(args.notifications, args.entities, args.retry_pct, seed=42)
+    if args.url:
+        result = asyncio.run(run_against_url(args.url, args.token, bodies, args.concurrency))
+        target = args.url
+    else:
+        result = asyncio.run(run_in_process(args.server_url, bodies, args.concurrency))
+        target = "in-process router"
+    print_results(result, len(bodies), args.entities, args.notifications * args.entities, target)
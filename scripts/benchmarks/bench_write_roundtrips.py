@@ -0,0 +1,164 @@
+"""
+Write Path Round-Trip Benchmark
+
+Counts SQL statements (database round trips) per service write, comparing:
+- legacy:    db.add() + flush() + refresh()   (INSERT, then SELECT to read back
+             trigger-generated business_id / server timestamps)
+- returning: db.add() + flush() with eager_defaults (single INSERT ... RETURNING)
+
+Everything runs inside one transaction that is rolled back at the end,
+so the target database is left untouched.
+
+Usage:
+    python scripts/benchmarks/bench_write_roundtrips.py
+    python scripts/benchmarks/bench_write_roundtrips.py --iterations 50
+
+Requires DATABASE_URL (with business_id triggers migrated) in the environment.
+"""
+
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+from datetime import datetime, timezone
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.config import settings
+from app.db.models import Client, Project
+from app.services.permit_service import permit_service
+from app.services.inspection_service import inspection_service
+from app.services.invoice_service import invoice_service
+from app.services.site_visit_service import site_visit_service
+
+
+class StatementCounter:
+    """Counts statements sent to the database via cursor execute events."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+async def measure(db: AsyncSession, counter: StatementCounter, operation, legacy: bool):
+    """Run one write; return (statements, elapsed_ms)."""
+    start_count = counter.count
+    start = time.perf_counter()
+    obj = await operation()
+    if legacy:
+        # The pre-RETURNING services re-read every row after flushing
+        await db.refresh(obj)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return counter.count - start_count, elapsed_ms
+
+
+async def run_benchmark(iterations: int):
+    engine = create_async_engine(settings.DATABASE_URL)
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    results = {}
+    invoice_numbers = (f"BENCH-{n:05d}" for n in itertools.count(1))
+
+    async with session_factory() as db:
+        try:
+            client = Client(full_name="Benchmark Client")
+            project = Project(client_id=None, project_name="Benchmark Project")
+            db.add(client)
+            await db.flush()
+            project.client_id = client.client_id
+            db.add(project)
+            await db.flush()
+
+            permit = await permit_service.create_permit(
+                db, project.project_id, "BUILDING", status="DRAFT"
+            )
+            inspection = await inspection_service.create_inspection(
+                db, permit.permit_id, project.project_id, "Footing"
+            )
+            invoice = await invoice_service.create_invoice(
+                db, project.project_id, client.client_id, next(invoice_numbers), Decimal("1000.00"),
+                status="DRAFT"
+            )
+
+            operations = {
+                "create_permit": lambda: permit_service.create_permit(
+                    db, project.project_id, "ELECTRICAL", status="DRAFT"
+                ),
+                "permit.update_status": lambda: permit_service.update_status(
+                    db, permit.permit_id, "SUBMITTED"
+                ),
+                "create_inspection": lambda: inspection_service.create_inspection(
+                    db, permit.permit_id, project.project_id, "Framing"
+                ),
+                "complete_inspection": lambda: inspection_service.complete_inspection(
+                    db, inspection.inspection_id, "Passed"
+                ),
+                "add_photo": lambda: inspection_service.add_photo(
+                    db, inspection.inspection_id, "https://example.com/photo.jpg"
+                ),
+                "create_invoice": lambda: invoice_service.create_invoice(
+                    db, project.project_id, client.client_id, next(invoice_numbers), Decimal("250.00"),
+                    status="DRAFT"
+                ),
+                "invoice.update_status": lambda: invoice_service.update_status(
+                    db, invoice.invoice_id, "SENT"
+                ),
+                "schedule_visit": lambda: site_visit_service.schedule_visit(
+                    db, project.project_id, client.client_id, "Progress Check",
+                    datetime.now(timezone.utc)
+                ),
+            }
+
+            for name, operation in operations.items():
+                row = {}
+                for mode in ("legacy", "returning"):
+                    statements, timings = [], []
+                    for _ in range(iterations):
+                        count, elapsed = await measure(db, counter, operation, mode == "legacy")
+                        statements.append(count)
+                        timings.append(elapsed)
+                    row[mode] = {
+                        "statements": sum(statements) / len(statements),
+                        "avg_ms": sum(timings) / len(timings),
+                    }
+                results[name] = row
+        finally:
+            await db.rollback()
+
+    await engine.dispose()
+    return results
+
+
+def print_report(results):
+    print("=" * 80)
+    print("WRITE PATH ROUND TRIPS (statements per call, incl. existence checks)")
+    print("=" * 80)
+    print(f"{'Operation':<24}{'legacy':>10}{'returning':>12}{'legacy ms':>12}{'returning ms':>15}")
+    print("-" * 80)
+    for name, row in results.items():
+        print(
+            f"{name:<24}"
+            f"{row['legacy']['statements']:>10.1f}"
+            f"{row['returning']['statements']:>12.1f}"
+            f"{row['legacy']['avg_ms']:>12.2f}"
+            f"{row['returning']['avg_ms']:>15.2f}"
+        )
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark write-path round trips")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    print_report(asyncio.run(run_benchmark(args.iterations)))
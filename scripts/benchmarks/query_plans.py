@@ -0,0 +1,402 @@
+"""
+Query-Plan Regression Suite
+
+Seeds a scratch Postgres database with synthetic data at multiples of our
+production volume, runs EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) on the hot
+queries from db_service, the CRUD services and the QuickBooks sync, and
+flags:
+- Seq Scans on tables with >= SEQ_SCAN_MIN_ROWS rows (unless the query is a
+  deliberate full-table read)
+- Regressions against a saved baseline (execution time > REGRESSION_FACTOR x,
+  or a Seq Scan where the baseline used an index)
+
+The scratch database (hr_query_plan_bench) is DROPPED and recreated on the
+given server - never point this at a database you care about. Timings are
+machine-specific, so record a baseline locally (--update-baseline) before
+comparing branches.
+
+Usage:
+    python scripts/benchmarks/query_plans.py --server-url postgresql+asyncpg://postgres@localhost/postgres
+    python scripts/benchmarks/query_plans.py --server-url ... --scales 10,100 --output report.json
+    python scripts/benchmarks/query_plans.py --server-url ... --update-baseline
+
+Exit code 1 when any query is flagged (usable as a CI gate).
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from app.db.models import Base
+
+BENCH_DATABASE = "hr_query_plan_bench"
+BASELINE_FILE = Path(__file__).parent / "query_plan_baseline.json"
+SEQ_SCAN_MIN_ROWS = 1000
+REGRESSION_FACTOR = 2.0
+REGRESSION_MIN_DELTA_MS = 1.0
+
+# Approximate production row counts (1x)
+BASE_VOLUME = {
+    "clients": 250,
+    "projects": 400,
+    "permits": 600,
+    "inspections": 1500,
+    "invoices": 800,
+    "payments": 1200,
+    "site_visits": 500,
+    "qualifiers": 20,
+    "licensed_business_qualifiers": 80,
+    "quickbooks_customers_cache": 300,
+    "quickbooks_invoices_cache": 800,
+    "quickbooks_payments_cache": 1200,
+}
+
+# Columns that exist only in migrations (0364e0fef5ad), not in the ORM models
+SCHEMA_PATCHES = [
+    "ALTER TABLE quickbooks_customers_cache ADD COLUMN IF NOT EXISTS qb_last_modified TIMESTAMPTZ",
+    "ALTER TABLE quickbooks_customers_cache ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT true",
+    "ALTER TABLE quickbooks_invoices_cache ADD COLUMN IF NOT EXISTS qb_last_modified TIMESTAMPTZ",
+    "ALTER TABLE quickbooks_invoices_cache ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT true",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN IF NOT EXISTS invoice_id VARCHAR(50)",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN IF NOT EXISTS amount NUMERIC(12, 2)",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN IF NOT EXISTS qb_last_modified TIMESTAMPTZ",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT true",
+]
+
+# Synthetic data, all set-based. :n is the row count for the table.
+SEED_SQL = {
+    "clients": """
+        INSERT INTO clients (business_id, full_name, email, qb_customer_id, status, created_at)
+        SELECT 'CL-' || lpad(g::text, 6, '0'), 'Client ' || g, 'client' || g || '@example.com',
+               (100000 + g)::text, 'ACTIVE', now() - g * interval '1 hour'
+        FROM generate_series(1, :n) g
+    """,
+    "projects": """
+        INSERT INTO projects (business_id, client_id, project_name, status, start_date, created_at)
+        SELECT 'PRJ-' || lpad(g::text, 6, '0'), c.client_id, 'Project ' || g, 'PLANNING',
+               now() - g * interval '1 day', now() - g * interval '1 hour'
+        FROM generate_series(1, :n) g
+        JOIN (SELECT client_id, row_number() OVER () AS rn FROM clients) c
+          ON c.rn = 1 + (g % (SELECT count(*) FROM clients))
+    """,
+    "permits": """
+        INSERT INTO permits (business_id, project_id, client_id, permit_number, permit_type, status, created_at)
+        SELECT 'PER-' || lpad(g::text, 6, '0'), p.project_id, p.client_id, 'BP-' || g, 'BUILDING', 'SUBMITTED',
+               now() - g * interval '1 hour'
+        FROM generate_series(1, :n) g
+        JOIN (SELECT project_id, client_id, row_number() OVER () AS rn FROM projects) p
+          ON p.rn = 1 + (g % (SELECT count(*) FROM projects))
+    """,
+    "inspections": """
+        INSERT INTO inspections (business_id, permit_id, project_id, inspection_type, status, scheduled_date)
+        SELECT 'INS-' || lpad(g::text, 6, '0'), p.permit_id, p.project_id, 'Framing', 'Scheduled',
+               now() - g * interval '1 hour'
+        FROM generate_series(1, :n) g
+        JOIN (SELECT permit_id, project_id, row_number() OVER () AS rn FROM permits) p
+          ON p.rn = 1 + (g % (SELECT count(*) FROM permits))
+    """,
+    "invoices": """
+        INSERT INTO invoices (business_id, qb_invoice_id, project_id, client_id, invoice_number,
+                              invoice_date, due_date, total_amount, amount_paid, balance_due, status, created_at)
+        SELECT 'INV-' || lpad(g::text, 6, '0'), (200000 + g)::text, p.project_id, p.client_id, 'INV' || g,
+               now() - g * interval '1 hour', now() + interval '30 days', 1000, 0, 1000, 'SENT',
+               now() - g * interval '1 hour'
+        FROM generate_series(1, :n) g
+        JOIN (SELECT project_id, client_id, row_number() OVER () AS rn FROM projects) p
+          ON p.rn = 1 + (g % (SELECT count(*) FROM projects))
+    """,
+    "payments": """
+        INSERT INTO payments (business_id, qb_payment_id, invoice_id, client_id, project_id, amount,
+                              payment_date, payment_method, status, created_at)
+        SELECT 'PAY-' || lpad(g::text, 6, '0'), (300000 + g)::text, i.invoice_id, i.client_id, i.project_id, 250,
+               now() - g * interval '1 hour', 'Check',
+               (CASE WHEN g % 10 = 0 THEN 'PENDING' ELSE 'POSTED' END)::payment_status_enum,
+               now() - g * interval '1 hour'
+        FROM generate_series(1, :n) g
+        JOIN (SELECT invoice_id, client_id, project_id, row_number() OVER () AS rn FROM invoices) i
+          ON i.rn = 1 + (g % (SELECT count(*) FROM invoices))
+    """,
+    "site_visits": """
+        INSERT INTO site_visits (business_id, project_id, client_id, visit_type, status, scheduled_date)
+        SELECT 'SV-' || lpad(g::text, 6, '0'), p.project_id, p.client_id, 'Progress Check', 'Scheduled',
+               now() - g * interval '1 hour'
+        FROM generate_series(1, :n) g
+        JOIN (SELECT project_id, client_id, row_number() OVER () AS rn FROM projects) p
+          ON p.rn = 1 + (g % (SELECT count(*) FROM projects))
+    """,
+    "qualifiers": """
+        INSERT INTO qualifiers (qualifier_id, user_id, full_name, qualifier_id_number, license_type, license_status)
+        SELECT 'QF-' || lpad(g::text, 6, '0'), gen_random_uuid(), 'Qualifier ' || g, 'Q' || g, 'Unlimited', 'ACTIVE'
+        FROM generate_series(1, :n) g
+    """,
+    # Mostly historical (ended) assignments, ~1 active per qualifier
+    "licensed_business_qualifiers": """
+        INSERT INTO licensed_business_qualifiers (licensed_business_id, qualifier_id, start_date, end_date)
+        SELECT gen_random_uuid(), q.id, now() - g * interval '1 day',
+               CASE WHEN g % 4 = 0 THEN NULL ELSE now() - g * interval '1 hour' END
+        FROM generate_series(1, :n) g
+        JOIN (SELECT id, row_number() OVER () AS rn FROM qualifiers) q
+          ON q.rn = 1 + (g % (SELECT count(*) FROM qualifiers))
+    """,
+    "quickbooks_customers_cache": """
+        INSERT INTO quickbooks_customers_cache (qb_customer_id, display_name, qb_data, is_active)
+        SELECT (100000 + g)::text, 'Customer ' || g, '{}'::jsonb, g % 20 <> 0
+        FROM generate_series(1, :n) g
+    """,
+    "quickbooks_invoices_cache": """
+        INSERT INTO quickbooks_invoices_cache (qb_invoice_id, customer_id, doc_number, total_amount, qb_data, is_active)
+        SELECT (200000 + g)::text, (100000 + g % 300)::text, 'INV' || g, 1000, '{}'::jsonb, g % 20 <> 0
+        FROM generate_series(1, :n) g
+    """,
+    "quickbooks_payments_cache": """
+        INSERT INTO quickbooks_payments_cache (qb_payment_id, customer_id, invoice_id, amount, qb_data, is_active)
+        SELECT (300000 + g)::text, (100000 + g % 300)::text, (200000 + g % 800)::text, 250, '{}'::jsonb, true
+        FROM generate_series(1, :n) g
+    """,
+}
+
+# Hot queries. "params" picks real values from the seeded data;
+# "full_scan_ok" marks deliberate whole-table reads.
+HOT_QUERIES: List[Dict[str, Any]] = [
+    # db_service
+    {"name": "clients_all", "source": "db_service.get_clients_data", "full_scan_ok": True,
+     "sql": "SELECT * FROM clients ORDER BY created_at DESC"},
+    {"name": "clients_recent", "source": "db_service.get_clients_data(limit)",
+     "sql": "SELECT * FROM clients ORDER BY created_at DESC LIMIT 50"},
+    {"name": "projects_recent", "source": "db_service.get_projects_data(limit)",
+     "sql": "SELECT * FROM projects ORDER BY created_at DESC LIMIT 50"},
+    {"name": "permits_recent", "source": "db_service.get_permits_data(limit)",
+     "sql": "SELECT * FROM permits ORDER BY created_at DESC LIMIT 50"},
+    {"name": "client_by_business_id", "source": "db_service.get_client_by_business_id",
+     "params": "SELECT business_id AS business_id FROM clients ORDER BY random() LIMIT 1",
+     "sql": "SELECT * FROM clients WHERE business_id = :business_id"},
+    {"name": "invoices_by_project", "source": "db_service.get_invoices_by_project",
+     "params": "SELECT project_id::text AS project_id FROM projects ORDER BY random() LIMIT 1",
+     "sql": "SELECT * FROM invoices WHERE project_id = CAST(:project_id AS uuid) ORDER BY invoice_date DESC"},
+    {"name": "site_visits_by_project", "source": "db_service.get_site_visits_by_project",
+     "params": "SELECT project_id::text AS project_id FROM projects ORDER BY random() LIMIT 1",
+     "sql": "SELECT * FROM site_visits WHERE project_id = CAST(:project_id AS uuid) ORDER BY scheduled_date DESC"},
+    {"name": "qualifier_active_assignments", "source": "db_service.get_qualifier_active_assignments",
+     "params": "SELECT id::text AS qualifier_id FROM qualifiers ORDER BY random() LIMIT 1",
+     "sql": """SELECT * FROM licensed_business_qualifiers
+               WHERE qualifier_id = CAST(:qualifier_id AS uuid) AND end_date IS NULL
+               ORDER BY start_date DESC"""},
+    {"name": "qualifier_capacity_count", "source": "db_service.check_qualifier_capacity",
+     "params": "SELECT id::text AS qualifier_id FROM qualifiers ORDER BY random() LIMIT 1",
+     "sql": """SELECT count(*) FROM licensed_business_qualifiers
+               WHERE qualifier_id = CAST(:qualifier_id AS uuid) AND end_date IS NULL"""},
+    # CRUD services
+    {"name": "permits_by_project", "source": "permit_service.get_permits",
+     "params": "SELECT project_id::text AS project_id FROM projects ORDER BY random() LIMIT 1",
+     "sql": """SELECT * FROM permits WHERE project_id = CAST(:project_id AS uuid)
+               ORDER BY created_at DESC LIMIT 100"""},
+    {"name": "inspections_by_permit", "source": "inspection_service.get_inspections",
+     "params": "SELECT permit_id::text AS permit_id FROM permits ORDER BY random() LIMIT 1",
+     "sql": """SELECT * FROM inspections WHERE permit_id = CAST(:permit_id AS uuid)
+               ORDER BY scheduled_date DESC LIMIT 100"""},
+    {"name": "invoices_by_client", "source": "invoice_service.get_invoices",
+     "params": "SELECT client_id::text AS client_id FROM clients ORDER BY random() LIMIT 1",
+     "sql": """SELECT * FROM invoices WHERE client_id = CAST(:client_id AS uuid)
+               ORDER BY created_at DESC LIMIT 100"""},
+    {"name": "payments_by_invoice", "source": "payment_service.get_payments",
+     "params": "SELECT invoice_id::text AS invoice_id FROM invoices ORDER BY random() LIMIT 1",
+     "sql": """SELECT * FROM payments WHERE invoice_id = CAST(:invoice_id AS uuid)
+               ORDER BY payment_date DESC LIMIT 100"""},
+    # QuickBooks sync / promotion
+    {"name": "client_by_qb_customer_id", "source": "qb_promotion_service (join)",
+     "params": "SELECT qb_customer_id FROM clients ORDER BY random() LIMIT 1",
+     "sql": "SELECT client_id FROM clients WHERE qb_customer_id = :qb_customer_id"},
+    {"name": "project_by_client", "source": "qb_promotion_service (join)",
+     "params": "SELECT client_id::text AS client_id FROM clients ORDER BY random() LIMIT 1",
+     "sql": """SELECT project_id FROM projects WHERE client_id = CAST(:client_id AS uuid)
+               ORDER BY created_at, project_id LIMIT 1"""},
+    {"name": "invoice_by_qb_invoice_id", "source": "qb_promotion_service.promote_payments",
+     "params": "SELECT qb_invoice_id FROM invoices ORDER BY random() LIMIT 1",
+     "sql": "SELECT invoice_id, project_id FROM invoices WHERE qb_invoice_id = :qb_invoice_id"},
+    {"name": "invoice_posted_total", "source": "qb_promotion_service.promote_payments",
+     "params": "SELECT invoice_id::text AS invoice_id FROM invoices ORDER BY random() LIMIT 1",
+     "sql": """SELECT COALESCE(SUM(amount), 0) FROM payments
+               WHERE invoice_id = CAST(:invoice_id AS uuid) AND status = 'POSTED'"""},
+    {"name": "invoices_cache_active", "source": "qb_promotion_service.promote_invoices",
+     "full_scan_ok": True,
+     "sql": "SELECT * FROM quickbooks_invoices_cache WHERE is_active = true"},
+    {"name": "customers_cache_active_ids", "source": "qb_sync_service.sync_invoices",
+     "full_scan_ok": True,
+     "sql": "SELECT qb_customer_id FROM quickbooks_customers_cache WHERE is_active = true"},
+]
+
+
+def _plan_nodes(plan: Dict[str, Any]):
+    """Yield every node of an EXPLAIN JSON plan tree."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def create_bench_database(server_url: str) -> str:
+    """Drop/recreate the scratch database; return its URL."""
+    admin = create_async_engine(server_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}"))
+        await conn.execute(text(f"CREATE DATABASE {BENCH_DATABASE}"))
+    await admin.dispose()
+    return make_url(server_url).set(database=BENCH_DATABASE).render_as_string(hide_password=False)
+
+
+async def create_schema(conn: AsyncConnection):
+    """ORM schema (incl. all indexes declared in models) + migration-only columns."""
+    await conn.run_sync(Base.metadata.create_all)
+    for statement in SCHEMA_PATCHES:
+        await conn.execute(text(statement))
+
+
+async def seed(conn: AsyncConnection, scale: int) -> Dict[str, int]:
+    """Truncate and reseed every table at `scale` x BASE_VOLUME."""
+    await conn.execute(text(f"TRUNCATE {', '.join(SEED_SQL)} CASCADE"))
+    counts = {}
+    for table, sql in SEED_SQL.items():
+        counts[table] = BASE_VOLUME[table] * scale
+        await conn.execute(text(sql), {"n": counts[table]})
+    await conn.execute(text("ANALYZE"))
+    return counts
+
+
+async def explain(conn: AsyncConnection, query: Dict[str, Any], table_rows: Dict[str, int]) -> Dict[str, Any]:
+    """Run EXPLAIN ANALYZE for one hot query and collect scan info."""
+    params = {}
+    if query.get("params"):
+        params = dict((await conn.execute(text(query["params"]))).mappings().one())
+
+    result = await conn.execute(
+        text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query["sql"]), params
+    )
+    plan_json = result.scalar()
+    if isinstance(plan_json, str):
+        plan_json = json.loads(plan_json)
+    root = plan_json[0]
+
+    seq_scans, index_scans, sorts = [], [], 0
+    for node in _plan_nodes(root["Plan"]):
+        if node["Node Type"] == "Seq Scan":
+            seq_scans.append(node["Relation Name"])
+        elif node.get("Index Name"):
+            index_scans.append(f"{node['Node Type']}: {node['Index Name']}")
+        elif node["Node Type"] in ("Sort", "Incremental Sort"):
+            sorts += 1
+
+    flags = []
+    if not query.get("full_scan_ok"):
+        for relation in seq_scans:
+            if table_rows.get(relation, 0) >= SEQ_SCAN_MIN_ROWS:
+                flags.append(f"Seq Scan on {relation} ({table_rows[relation]} rows)")
+
+    return {
+        "source": query["source"],
+        "execution_ms": round(root["Execution Time"], 3),
+        "planning_ms": round(root["Planning Time"], 3),
+        "seq_scans": seq_scans,
+        "index_scans": index_scans,
+        "sorts": sorts,
+        "flags": flags,
+    }
+
+
+def compare_to_baseline(scale_key: str, name: str, result: Dict[str, Any], baseline: Dict[str, Any]):
+    """Append regression flags vs the saved baseline."""
+    previous = baseline.get(scale_key, {}).get(name)
+    if not previous:
+        return
+    if (
+        result["execution_ms"] > previous["execution_ms"] * REGRESSION_FACTOR
+        and result["execution_ms"] - previous["execution_ms"] > REGRESSION_MIN_DELTA_MS
+    ):
+        result["flags"].append(
+            f"Regression: {result['execution_ms']}ms vs baseline {previous['execution_ms']}ms"
+        )
+    new_seq = set(result["seq_scans"]) - set(previous.get("seq_scans", []))
+    if new_seq and not previous.get("full_scan_ok"):
+        result["flags"].append(f"Plan change: new Seq Scan on {', '.join(sorted(new_seq))}")
+
+
+async def run_suite(server_url: str, scales: List[int], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    bench_url = await create_bench_database(server_url)
+    engine = create_async_engine(bench_url)
+    report: Dict[str, Any] = {}
+
+    async with engine.begin() as conn:
+        await create_schema(conn)
+
+    for scale in scales:
+        scale_key = f"{scale}x"
+        async with engine.begin() as conn:
+            table_rows = await seed(conn, scale)
+        async with engine.connect() as conn:
+            report[scale_key] = {}
+            for query in HOT_QUERIES:
+                result = await explain(conn, query, table_rows)
+                compare_to_baseline(scale_key, query["name"], result, baseline)
+                report[scale_key][query["name"]] = result
+
+    await engine.dispose()
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> int:
+    flagged = 0
+    for scale_key, results in report.items():
+        print("=" * 100)
+        print(f"QUERY PLANS @ {scale_key} VOLUME")
+        print("=" * 100)
+        print(f"{'Query':<32}{'exec ms':>10}  {'Access path'}")
+        print("-" * 100)
+        for name, result in results.items():
+            path = ", ".join(
+                result["index_scans"]
+                + [f"Seq Scan: {r}" for r in result["seq_scans"]]
+                + ["Sort"] * result["sorts"]
+            )
+            status = "FLAG" if result["flags"] else "ok"
+            print(f"{name:<32}{result['execution_ms']:>10.2f}  [{status}] {path}")
+            for flag in result["flags"]:
+                print(f"{'':<44}-> {flag}")
+            flagged += bool(result["flags"])
+        print()
+    print(f"{flagged} flagged query plan(s)")
+    return flagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed synthetic data and check hot query plans")
+    parser.add_argument("--server-url", required=True,
+                        help="Admin URL of a local Postgres server (scratch DB is created there)")
+    parser.add_argument("--scales", default="10,100", help="Comma-separated volume multipliers")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help=f"Save this run as {BASELINE_FILE.name}")
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    scales = [int(s) for s in args.scales.split(",")]
+    report = asyncio.run(run_suite(args.server_url, scales, {} if args.update_baseline else baseline))
+
+    flagged = print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(
+            {"generated_at": datetime.now().isoformat(), "report": report}, indent=2
+        ))
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {BASELINE_FILE}")
+
+    sys.exit(1 if flagged else 0)
@@ -3,6 +3,10 @@ QuickBooks Concurrent Request Behavior
 
 Purpose: Test parallel request handling and rate limiting behavior
 Framework: Stress-Test Mode (Discovery Phase)
+
+Usage:
+    python scripts/test_qb_concurrent_requests.py                 # blocking SDK (baseline)
+    python scripts/test_qb_concurrent_requests.py --async-client  # pooled async client
 """
 
 import asyncio
@@ -17,13 +21,18 @@ from app.db.session import AsyncSessionLocal
 from app.services.quickbooks_service import get_quickbooks_service
 from quickbooks.objects.customer import Customer
 
+USE_ASYNC_CLIENT = "--async-client" in sys.argv
+
 
 async def single_query_task(qb_service, query: str, task_id: int):
     """Execute a single query and track timing."""
     
     start = time.time()
     try:
-        result = Customer.query(query, qb=qb_service.qb_client)
+        if USE_ASYNC_CLIENT:
+            result = await qb_service.query(query)
+        else:
+            result = Customer.query(query, qb=qb_service.qb_client)
         elapsed = (time.time() - start) * 1000
         count = len(result) if isinstance(result, list) else (1 if result else 0)
         
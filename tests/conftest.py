@@ -1,19 +1,135 @@
 """
 Test fixtures for AI handler tests.
-Provides mock services for Google Sheets, QuickBooks, and memory manager.
+Provides mock services for Google Sheets, QuickBooks, and memory manager,
+plus a scratch PostgreSQL database for the PostgreSQL-only suites.
 """
+import importlib.util
+import os
+from pathlib import Path
+
 import pytest
 import pytest_asyncio
 from unittest.mock import MagicMock, AsyncMock
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import NullPool
 
 from app.db.models import Base
+from app.services.principal_cache import principal_cache
+from app.services.qb_read_cache import qb_read_cache
+from app.services.qb_reference_cache import qb_reference_cache
+from app.utils.qb_rate_governor import qb_rate_governor
 
 
 # Test database URL (in-memory SQLite for testing)
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
+# Admin URL of a PostgreSQL server for PostgreSQL-only tests
+# (e.g. postgresql+asyncpg://postgres@localhost/postgres); unset = skipped
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+TEST_POSTGRES_DATABASE = "hr_pytest"
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Schema that exists only in the older migrations (0364e0fef5ad, users table), not in the ORM models
+POSTGRES_SCHEMA_PATCHES = [
+    "ALTER TABLE quickbooks_customers_cache ADD COLUMN qb_last_modified TIMESTAMPTZ",
+    "ALTER TABLE quickbooks_customers_cache ADD COLUMN is_active BOOLEAN NOT NULL DEFAULT true",
+    "ALTER TABLE quickbooks_customers_cache ADD COLUMN sync_error TEXT",
+    "ALTER TABLE quickbooks_invoices_cache ADD COLUMN qb_last_modified TIMESTAMPTZ",
+    "ALTER TABLE quickbooks_invoices_cache ADD COLUMN is_active BOOLEAN NOT NULL DEFAULT true",
+    "ALTER TABLE quickbooks_invoices_cache ADD COLUMN sync_error TEXT",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN invoice_id VARCHAR(50)",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN amount NUMERIC(12, 2)",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN reference_number VARCHAR(100)",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN qb_last_modified TIMESTAMPTZ",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN is_active BOOLEAN NOT NULL DEFAULT true",
+    "ALTER TABLE quickbooks_payments_cache ADD COLUMN sync_error TEXT",
+    """CREATE TABLE webhook_events (
+        id SERIAL PRIMARY KEY,
+        event_id VARCHAR(100) NOT NULL UNIQUE,
+        realm_id VARCHAR(50) NOT NULL,
+        event_type VARCHAR(100) NOT NULL,
+        entity_type VARCHAR(50),
+        entity_ids JSON,
+        payload JSON NOT NULL,
+        processed BOOLEAN NOT NULL DEFAULT false,
+        processed_at TIMESTAMPTZ,
+        processing_error TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )""",
+    """CREATE TABLE sync_status (
+        entity_type VARCHAR(50) PRIMARY KEY,
+        last_sync_at TIMESTAMPTZ,
+        last_sync_duration_ms INTEGER,
+        records_synced INTEGER,
+        sync_errors INTEGER NOT NULL DEFAULT 0,
+        last_error_message TEXT,
+        is_syncing BOOLEAN NOT NULL DEFAULT false,
+        next_sync_at TIMESTAMPTZ,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )""",
+    "INSERT INTO sync_status (entity_type, records_synced, sync_errors) VALUES "
+    "('customers', 0, 0), ('invoices', 0, 0), ('payments', 0, 0)",
+    "ALTER TABLE users ADD COLUMN last_activity_at TIMESTAMPTZ",
+]
+
+# Newer revisions, applied with their real upgrade() on top of the above.
+# The ORM models also declare the first two, so those are downgraded first
+# and both directions of their migration code run.
+POSTGRES_MIGRATIONS = [
+    ("5c1e7a9d3f20", True),   # Hot-query indexes
+    ("a4d2c8e61b57", True),   # QuickBooks cache content_hash
+    ("b7e3f1a90c42", False),  # sync_runs journal
+    ("c81f4d2e6a17", False),  # Invoice number counters + prefix indexes
+    ("d5a9e3c7b218", False),  # QuickBooks reference cache
+    ("e4c2a8f6b391", False),  # Cache versions + triggers
+    ("f6a1b3d5c702", False),  # Chat context cache (every customer / invoice)
+]
+
+
+def load_migration(revision: str):
+    """Revision module from alembic/versions (loaded by file - older revisions do not form one history)."""
+    path, = (REPO_ROOT / "alembic" / "versions").glob(f"*_{revision}_*.py")
+    spec = importlib.util.spec_from_file_location(f"migration_{revision}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_migrations(connection):
+    """Run the POSTGRES_MIGRATIONS revisions through alembic Operations on a sync connection."""
+    with Operations.context(MigrationContext.configure(connection)):
+        for revision, declared_by_models in POSTGRES_MIGRATIONS:
+            migration = load_migration(revision)
+            if declared_by_models:
+                migration.downgrade()
+            migration.upgrade()
+
+
+@pytest_asyncio.fixture
+async def postgres_engine():
+    """Engine on a freshly created scratch PostgreSQL database (ORM schema + migrations)."""
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL not set")
+
+    admin = create_async_engine(TEST_POSTGRES_URL, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f"DROP DATABASE IF EXISTS {TEST_POSTGRES_DATABASE}"))
+        await conn.execute(text(f"CREATE DATABASE {TEST_POSTGRES_DATABASE}"))
+    await admin.dispose()
+
+    engine = create_async_engine(make_url(TEST_POSTGRES_URL).set(database=TEST_POSTGRES_DATABASE), poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in POSTGRES_SCHEMA_PATCHES:
+            await conn.execute(text(statement))
+        await conn.run_sync(run_migrations)
+    yield engine
+    await engine.dispose()
+
 
 @pytest_asyncio.fixture
 async def session():
@@ -48,6 +164,38 @@ async def session():
     await engine.dispose()
 
 
+@pytest.fixture(autouse=True)
+def fresh_qb_rate_governor():
+    """Per-realm governors hold asyncio primitives bound to one test's event loop."""
+    qb_rate_governor.reset()
+    yield
+    qb_rate_governor.reset()
+
+
+@pytest.fixture(autouse=True)
+def fresh_qb_reference_cache():
+    """The reference cache's in-memory lists would leak between tests' databases."""
+    qb_reference_cache.reset()
+    yield
+    qb_reference_cache.reset()
+
+
+@pytest.fixture(autouse=True)
+def fresh_qb_read_cache():
+    """Read-cache snapshots are keyed by sync version, which restarts with every scratch database."""
+    qb_read_cache.reset()
+    yield
+    qb_read_cache.reset()
+
+
+@pytest.fixture(autouse=True)
+def fresh_principal_cache():
+    """Cached principals and pending activity refer to users of one test's database."""
+    principal_cache.reset()
+    yield
+    principal_cache.reset()
+
+
 @pytest.fixture
 def mock_google_service():
     """Mock Google Sheets service with common responses"""
@@ -0,0 +1,678 @@
+"""
+QuickBooks Online API Simulator
+
+An in-process ASGI app speaking the v3 endpoints QuickBooksClient uses
+(/query, /{entity}/{id}, create/update POSTs, /cdc, /batch) over a
+generated company, so tests and benchmarks (scripts/benchmarks/bench_qb_sync.py)
+can exercise the sync, promotion and chat paths without the sandbox.
+
+Configurable per instance:
+- dataset size: customers, invoices per customer, share of GC Compliance
+  customers, share of paid invoices (each paid invoice gets a Payment)
+- latency: fixed + jitter per request, plus per returned record
+- pagination: STARTPOSITION / MAXRESULTS (QuickBooks default 100, cap 1000)
+- default_order: the order of queries without ORDERBY (QuickBooks does not
+  promise one; e.g. "MetaData.LastUpdatedTime DESC"), by Id if not given
+- throttling: 429 + Retry-After past rate_limit_per_minute or
+  max_concurrent in-flight requests, or on every throttle_every-th request
+- faults: random 503s at fault_rate, or scripted with fail_next()
+- webhooks: every change is queued as an Intuit dataChangeEvent entity;
+  emit_webhooks() posts them, signed, to a webhook endpoint
+
+The query parser covers what the app sends: SELECT * / COUNT(*) / field
+lists, WHERE conditions joined by AND (=, <, >, <=, >=, LIKE 'x%', IN
+(...)), ORDERBY (numbers, Ids included, compare numerically), STARTPOSITION,
+MAXRESULTS. Entities with an Active flag return only active records unless
+the query filters on Active.
+
+Usage:
+    simulator = QuickBooksSimulator(customers=50, latency_ms=100)
+    qb_service = simulated_quickbooks_service(simulator, db)
+
+    python -m tests.qb_simulator --port 8765 --customers 2000 --latency-ms 150
+"""
+
+import argparse
+import asyncio
+import base64
+import copy
+import hashlib
+import hmac
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+from sqlalchemy import text
+
+from app.services.qb_client import QuickBooksClient
+from app.services.quickbooks_service import QuickBooksService
+
+GC_COMPLIANCE_CUSTOMER_TYPE = "698682"
+DEFAULT_MAX_RESULTS = 100
+MAX_RESULTS_LIMIT = 1000
+CDC_MAX_CHANGES = 1000
+
+# Entities whose queries hide Active = false records unless asked
+ACTIVE_FLAG_ENTITIES = ("Customer", "Item", "Vendor", "Term", "CustomerType", "TaxCode")
+
+QUERY_RE = re.compile(
+    r"^\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<entity>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+ORDERBY\s+(?P<order>[\w.]+)(?:\s+(?P<direction>ASC|DESC))?)?"
+    r"(?:\s+STARTPOSITION\s+(?P<start>\d+))?"
+    r"(?:\s+MAXRESULTS\s+(?P<max>\d+))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+CONDITION_RE = re.compile(r"^(?P<field>[\w.]+)\s*(?P<op>>=|<=|=|>|<|\bLIKE\b|\bIN\b)\s*(?P<value>.+)$", re.IGNORECASE)
+AND_RE = re.compile(r"\s+AND\s+", re.IGNORECASE)
+PATH_RE = re.compile(r"^/v3/company/(?P<realm>[^/]+)/(?P<resource>[a-zA-Z]+)(?:/(?P<id>[^/]+))?$")
+
+STREETS = ("Phillips", "Spruce Pine", "Temple", "Oak Ridge", "Mill Creek", "Harbor", "Cedar", "Laurel")
+SUFFIXES = ("Rd", "St", "Ave", "Ln", "Dr")
+
+
+class SimulatedFault(Exception):
+    """A request the simulator answers with a QuickBooks Fault body."""
+
+    def __init__(self, status: int, message: str, code: str, fault_type: str = "ValidationFault"):
+        super().__init__(message)
+        self.status = status
+        self.body = {"Fault": {"Error": [{"Message": message, "Detail": message, "code": code}], "type": fault_type}}
+
+
+def qb_timestamp(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+def parse_timestamp(value: str) -> datetime:
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def field_value(record: Dict[str, Any], path: str) -> Any:
+    """Dotted, case-insensitive field lookup; references (CustomerRef) compare by value."""
+    value: Any = record
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        key = next((k for k in value if k.lower() == part.lower()), None)
+        value = value.get(key) if key else None
+    if isinstance(value, dict) and "value" in value:
+        return value["value"]
+    return value
+
+
+def parse_literal(token: str) -> Any:
+    token = token.strip()
+    if token.startswith("'") and token.endswith("'"):
+        return token[1:-1].replace("\\'", "'")
+    if token.lower() in ("true", "false"):
+        return token.lower() == "true"
+    try:
+        return float(token) if "." in token else int(token)
+    except ValueError:
+        return token
+
+
+def _comparable(left: Any, right: Any) -> Tuple[Any, Any]:
+    if isinstance(right, str) and isinstance(left, str) and re.match(r"^\d{4}-\d{2}-\d{2}T", right):
+        return parse_timestamp(left), parse_timestamp(right)
+    if isinstance(right, (int, float)) and not isinstance(right, bool) and left is not None:
+        return float(left), float(right)
+    if isinstance(right, str) and left is not None and not isinstance(left, str):
+        return str(left), right
+    return left, right
+
+
+def order_key(value: Any) -> Tuple[bool, bool, Any]:
+    """ORDERBY sort key: NULLs last, numbers (and numeric Ids) before text, compared as numbers."""
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+    return value is None, not numeric, value if numeric else str(value or "")
+
+
+def matches(record: Dict[str, Any], condition: Tuple[str, str, Any]) -> bool:
+    field, op, expected = condition
+    actual = field_value(record, field)
+    if op == "IN":
+        return any(left == right for left, right in (_comparable(actual, value) for value in expected))
+    if actual is None:
+        return False
+    if op == "LIKE":
+        pattern = "^" + re.escape(expected).replace("%", ".*") + "$"
+        return re.match(pattern, str(actual), re.IGNORECASE | re.DOTALL) is not None
+    left, right = _comparable(actual, expected)
+    return {
+        "=": left == right, ">": left > right, "<": left < right, ">=": left >= right, "<=": left <= right
+    }[op]
+
+
+def parse_query(query: str) -> Dict[str, Any]:
+    """QBO SQL -> fields / entity / conditions / order / paging (SimulatedFault on anything else)."""
+    parsed = QUERY_RE.match(query)
+    if not parsed:
+        raise SimulatedFault(400, f"Error parsing query: {query}", "4000", "QueryParserError")
+    conditions = []
+    if parsed.group("where"):
+        for clause in AND_RE.split(parsed.group("where").strip()):
+            condition = CONDITION_RE.match(clause.strip())
+            if not condition:
+                raise SimulatedFault(400, f"Error parsing query: {clause}", "4000", "QueryParserError")
+            op = condition.group("op").upper()
+            value = condition.group("value").strip()
+            if op == "IN":
+                value = [parse_literal(v) for v in re.findall(r"'(?:[^'\\]|\\.)*'|[^,()\s]+", value.strip("() "))]
+            else:
+                value = parse_literal(value)
+            conditions.append((condition.group("field"), op, value))
+    if any(field.lower().startswith("customertyperef") for field, _, _ in conditions):
+        raise SimulatedFault(400, "Property CustomerTypeRef is not queryable", "4001", "QueryParserError")
+
+    max_results = int(parsed.group("max") or DEFAULT_MAX_RESULTS)
+    if max_results > MAX_RESULTS_LIMIT:
+        raise SimulatedFault(400, f"MAXRESULTS cannot exceed {MAX_RESULTS_LIMIT}", "4000", "QueryParserError")
+    fields = parsed.group("fields").strip()
+    return {
+        "entity": parsed.group("entity"),
+        "count": fields.upper().replace(" ", "") == "COUNT(*)",
+        "fields": None if fields in ("*",) or fields.upper().startswith("COUNT") else [f.strip() for f in fields.split(",")],
+        "conditions": conditions,
+        "order": parsed.group("order"),
+        "descending": (parsed.group("direction") or "").upper() == "DESC",
+        "start": int(parsed.group("start") or 1),
+        "max_results": max_results,
+    }
+
+
+def project(record: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """A projected query row: Id plus the requested top-level fields the record has (case-insensitive)."""
+    keys = {k.lower(): k for k in record}
+    selected = [keys[f.lower()] for f in fields if f.lower() in keys]
+    return {"Id": record["Id"], **{key: record[key] for key in selected}}
+
+
+def sign_webhook(body: bytes, token: str) -> str:
+    """intuit-signature header value: base64 HMAC-SHA256 of the raw body."""
+    return base64.b64encode(hmac.new(token.encode(), body, hashlib.sha256).digest()).decode()
+
+
+class QuickBooksSimulator:
+    """ASGI app serving one generated QuickBooks company."""
+
+    def __init__(
+        self,
+        customers: int = 100,
+        invoices_per_customer: int = 3,
+        gc_pct: float = 80,
+        paid_pct: float = 50,
+        realm_id: str = "9130",
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        latency_per_record_ms: float = 0,
+        rate_limit_per_minute: Optional[int] = None,
+        max_concurrent: Optional[int] = None,
+        throttle_every: int = 0,
+        retry_after: float = 1,
+        fault_rate: float = 0,
+        default_order: Optional[str] = None,
+        seed: int = 42,
+    ):
+        self.realm_id = realm_id
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.latency_per_record_ms = latency_per_record_ms
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.max_concurrent = max_concurrent
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.fault_rate = fault_rate
+        self.default_order = default_order
+        self.rng = random.Random(seed)
+
+        # entity -> Id -> record; entity -> Id -> deletion time (for CDC)
+        self.entities: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.deleted: Dict[str, Dict[str, datetime]] = {}
+        self._next_id: Dict[str, int] = {}
+        self.pending_webhooks: List[Dict[str, Any]] = []
+        self._scripted_faults: List[int] = []
+        self._request_times: List[float] = []
+        self._in_flight = 0
+        self.reset_stats()
+        self._generate(customers, invoices_per_customer, gc_pct, paid_pct)
+
+    # ==================== Dataset ====================
+
+    def _generate(self, customers: int, invoices_per_customer: int, gc_pct: float, paid_pct: float):
+        now = datetime.now(timezone.utc)
+
+        def created():
+            return now - timedelta(days=self.rng.uniform(2, 365), seconds=self.rng.randint(0, 86400))
+
+        for type_id, name in ((GC_COMPLIANCE_CUSTOMER_TYPE, "GC Compliance"), ("698683", "Residential")):
+            self._store("CustomerType", {"Id": type_id, "Name": name, "Active": True}, created())
+        for name, kind, price in (("GC Permit Oversight", "Service", 500), ("Inspection Fee", "Service", 150), ("Materials", "NonInventory", 0)):
+            self._store("Item", {"Name": name, "Type": kind, "UnitPrice": price, "Active": True}, created())
+        for name, days in (("Due on receipt", 0), ("Net 15", 15), ("Net 30", 30)):
+            self._store("Term", {"Name": name, "DueDays": days, "Active": True}, created())
+        for name in ("Ace Supply", "County Permits Office"):
+            self._store("Vendor", {"DisplayName": name, "Active": True}, created())
+        self._store("TaxCode", {"Name": "NON", "Active": True}, created())
+
+        for n in range(customers):
+            gc = self.rng.random() * 100 < gc_pct
+            address = f"{self.rng.randint(1, 9999)} {self.rng.choice(STREETS)} {self.rng.choice(SUFFIXES)}"
+            bill_addr = {"Line1": address, "City": "Asheville", "CountrySubDivisionCode": "NC", "PostalCode": "28801"}
+            customer = self._store("Customer", {
+                "DisplayName": f"{address} #{n + 1}",
+                "FullyQualifiedName": f"{address} #{n + 1}",
+                "PrintOnCheckName": f"{address} LLC",
+                "CompanyName": f"{address} LLC",
+                "GivenName": f"Owner{n + 1}",
+                "FamilyName": "Simulated",
+                "PrimaryEmailAddr": {"Address": f"owner{n + 1}@example.com"},
+                "PrimaryPhone": {"FreeFormNumber": f"(555) {n % 1000:03d}-{self.rng.randint(0, 9999):04d}"},
+                # Properties QuickBooks returns on every SELECT * that no use case reads
+                "BillAddr": {"Id": str(n + 100), **bill_addr},
+                "ShipAddr": {"Id": str(n + 100), **bill_addr},
+                "CustomerTypeRef": {"value": GC_COMPLIANCE_CUSTOMER_TYPE if gc else "698683"},
+                "Taxable": False,
+                "Job": False,
+                "BillWithParent": False,
+                "IsProject": False,
+                "PreferredDeliveryMethod": "Email",
+                "CurrencyRef": {"value": "USD", "name": "United States Dollar"},
+                "V4IDPseudonym": f"{self.rng.getrandbits(128):032x}",
+                "Balance": 0,
+                "BalanceWithJobs": 0,
+                "Active": True,
+                "domain": "QBO",
+                "sparse": False,
+            }, created())
+
+            for i in range(invoices_per_customer):
+                txn_date = parse_timestamp(customer["MetaData"]["CreateTime"]) + timedelta(days=self.rng.randint(0, 60))
+                amount = float(self.rng.choice((150, 300, 500, 750, 1200)))
+                paid = self.rng.random() * 100 < paid_pct
+                invoice = self._store("Invoice", {
+                    "DocNumber": f"SIM-{n + 1}-{i + 1}",
+                    "TxnDate": txn_date.date().isoformat(),
+                    "DueDate": (txn_date + timedelta(days=30)).date().isoformat(),
+                    "CustomerRef": {"value": customer["Id"], "name": customer["DisplayName"]},
+                    "Line": [{
+                        "Id": "1",
+                        "LineNum": 1,
+                        "Amount": amount,
+                        "DetailType": "SalesItemLineDetail",
+                        "Description": "GC Permit Oversight",
+                        "SalesItemLineDetail": {
+                            "ItemRef": {"value": "1", "name": "GC Permit Oversight"}, "Qty": 1, "UnitPrice": amount,
+                            "ItemAccountRef": {"value": "79", "name": "Services"}, "TaxCodeRef": {"value": "NON"},
+                        },
+                    }, {"Amount": amount, "DetailType": "SubTotalLineDetail", "SubTotalLineDetail": {}}],
+                    "TotalAmt": amount,
+                    "Balance": 0.0 if paid else amount,
+                    "EmailStatus": "EmailSent",
+                    "PrintStatus": "NotSet",
+                    "BillEmail": {"Address": customer["PrimaryEmailAddr"]["Address"]},
+                    "BillAddr": customer["BillAddr"],
+                    "ShipAddr": customer["ShipAddr"],
+                    "ShipFromAddr": {"Id": "1", "Line1": "1 Pack Square", "Line2": "Asheville, NC 28801"},
+                    "SalesTermRef": {"value": "3", "name": "Net 30"},
+                    "CurrencyRef": {"value": "USD", "name": "United States Dollar"},
+                    "CustomField": [{"DefinitionId": "1", "Name": "Permit #", "Type": "StringType", "StringValue": f"P-{n + 1}-{i + 1}"}],
+                    "TxnTaxDetail": {"TotalTax": 0},
+                    "LinkedTxn": [],
+                    "DeliveryInfo": {"DeliveryType": "Email", "DeliveryTime": qb_timestamp(txn_date)},
+                    "ApplyTaxAfterDiscount": False,
+                    "AllowIPNPayment": False,
+                    "AllowOnlinePayment": False,
+                    "AllowOnlineCreditCardPayment": True,
+                    "AllowOnlineACHPayment": True,
+                    "domain": "QBO",
+                    "sparse": False,
+                }, min(txn_date, now))
+                if paid:
+                    self._store("Payment", {
+                        "TxnDate": (txn_date + timedelta(days=self.rng.randint(1, 30))).date().isoformat(),
+                        "CustomerRef": {"value": customer["Id"], "name": customer["DisplayName"]},
+                        "TotalAmt": amount,
+                        "PaymentMethodRef": {"value": "2", "name": self.rng.choice(("Check", "Cash", "Credit Card"))},
+                        "PaymentRefNum": str(1000 + self.rng.randint(0, 8999)),
+                        "DepositToAccountRef": {"value": "4"},
+                        "CurrencyRef": {"value": "USD", "name": "United States Dollar"},
+                        "UnappliedAmt": 0,
+                        "ProcessPayment": False,
+                        "Line": [{
+                            "Amount": amount,
+                            "LinkedTxn": [{"TxnId": invoice["Id"], "TxnType": "Invoice"}],
+                            "LineEx": {"any": [{"name": "{http://schema.intuit.com/finance/v3}NameValue", "value": {"Name": "txnId", "Value": invoice["Id"]}}]},
+                        }],
+                        "domain": "QBO",
+                        "sparse": False,
+                    }, min(txn_date + timedelta(days=1), now))
+
+    def _store(self, entity: str, record: Dict[str, Any], at: datetime) -> Dict[str, Any]:
+        records = self.entities.setdefault(entity, {})
+        if "Id" not in record:
+            self._next_id[entity] = self._next_id.get(entity, 0) + 1
+            record["Id"] = str(self._next_id[entity])
+        record.setdefault("SyncToken", "0")
+        record["MetaData"] = {"CreateTime": qb_timestamp(at), "LastUpdatedTime": qb_timestamp(at)}
+        records[record["Id"]] = record
+        return record
+
+    # ==================== Changes ====================
+
+    def create(self, entity: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        if entity == "Invoice" and record.get("DocNumber"):
+            if any(r.get("DocNumber") == record["DocNumber"] for r in self.entities.get("Invoice", {}).values()):
+                raise SimulatedFault(400, "Duplicate Document Number Error", "6140")
+        if entity == "Invoice" and "TotalAmt" not in record:
+            record["TotalAmt"] = sum(float(line.get("Amount", 0)) for line in record.get("Line", []))
+            record.setdefault("Balance", record["TotalAmt"])
+        stored = self._store(entity, {k: v for k, v in copy.deepcopy(record).items() if k != "Id"}, datetime.now(timezone.utc))
+        self._notify(entity, stored["Id"], "Create")
+        return stored
+
+    def update(self, entity: str, changes: Dict[str, Any], sparse: bool = True, check_sync_token: bool = True) -> Dict[str, Any]:
+        record = self.entities.get(entity, {}).get(str(changes.get("Id")))
+        if record is None:
+            raise SimulatedFault(400, f"Object Not Found: {entity} {changes.get('Id')}", "610")
+        if check_sync_token and "SyncToken" in changes and str(changes["SyncToken"]) != record["SyncToken"]:
+            raise SimulatedFault(400, "Stale Object Error: You and another user were working on the same thing", "5010")
+        updates = {k: copy.deepcopy(v) for k, v in changes.items() if k not in ("Id", "SyncToken", "MetaData", "sparse")}
+        if not sparse:
+            record = {"Id": record["Id"], "SyncToken": record["SyncToken"], "MetaData": record["MetaData"]}
+            self.entities[entity][record["Id"]] = record
+        record.update(updates)
+        record["SyncToken"] = str(int(record["SyncToken"]) + 1)
+        record["MetaData"] = {**record["MetaData"], "LastUpdatedTime": qb_timestamp(datetime.now(timezone.utc))}
+        self._notify(entity, record["Id"], "Update")
+        return record
+
+    def delete(self, entity: str, entity_id: str):
+        self.entities.get(entity, {}).pop(str(entity_id))
+        self.deleted.setdefault(entity, {})[str(entity_id)] = datetime.now(timezone.utc)
+        self._notify(entity, str(entity_id), "Delete")
+
+    def touch(self, entity: str, count: int) -> List[str]:
+        """Change count random records of an entity (balances / notes) as a user editing QuickBooks would."""
+        records = list(self.entities.get(entity, {}).values())
+        changed = self.rng.sample(records, min(count, len(records)))
+        for record in changed:
+            if entity == "Invoice" and record.get("Balance"):
+                self.update(entity, {"Id": record["Id"], "Balance": round(record["Balance"] / 2, 2)}, check_sync_token=False)
+            else:
+                self.update(entity, {"Id": record["Id"], "PrivateNote": f"edited {self.rng.random():.6f}"}, check_sync_token=False)
+        return [record["Id"] for record in changed]
+
+    def _notify(self, entity: str, entity_id: str, operation: str):
+        self.pending_webhooks.append({
+            "name": entity, "id": entity_id, "operation": operation,
+            "lastUpdated": qb_timestamp(datetime.now(timezone.utc)),
+        })
+
+    def webhook_payloads(self, entities_per_notification: int = 20) -> List[bytes]:
+        """Queued changes as Intuit notification bodies (clears the queue)."""
+        pending, self.pending_webhooks = self.pending_webhooks, []
+        return [
+            json.dumps({"eventNotifications": [{
+                "realmId": self.realm_id,
+                "dataChangeEvent": {"entities": pending[start:start + entities_per_notification]},
+            }]}).encode()
+            for start in range(0, len(pending), entities_per_notification)
+        ]
+
+    async def emit_webhooks(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        token: str,
+        entities_per_notification: int = 20
+    ) -> List[int]:
+        """POST queued changes, signed with the verifier token, to a webhook endpoint; returns the statuses."""
+        statuses = []
+        for body in self.webhook_payloads(entities_per_notification):
+            response = await client.post(url, content=body, headers={
+                "intuit-signature": sign_webhook(body, token), "content-type": "application/json"
+            })
+            statuses.append(response.status_code)
+        return statuses
+
+    # ==================== Reads ====================
+
+    def query(self, query: str) -> Dict[str, Any]:
+        parsed = parse_query(query)
+        entity = parsed["entity"]
+        conditions = parsed["conditions"]
+        records = list(self.entities.get(entity, {}).values())
+        if entity in ACTIVE_FLAG_ENTITIES and not any(field.lower() == "active" for field, _, _ in conditions):
+            records = [r for r in records if r.get("Active", True) is not False]
+        records = [r for r in records if all(matches(r, c) for c in conditions)]
+
+        if parsed["count"]:
+            return {"QueryResponse": {"totalCount": len(records)}}
+
+        order, descending = parsed["order"], parsed["descending"]
+        if not order and self.default_order:
+            order, _, direction = self.default_order.partition(" ")
+            descending = direction.strip().upper() == "DESC"
+        records.sort(key=lambda r: order_key(field_value(r, order or "Id")), reverse=descending)
+        window = records[parsed["start"] - 1:parsed["start"] - 1 + parsed["max_results"]]
+        if parsed["fields"]:
+            window = [project(r, parsed["fields"]) for r in window]
+        self.stats["records_returned"] += len(window)
+        if not window:
+            return {"QueryResponse": {}}
+        return {"QueryResponse": {entity: copy.deepcopy(window), "startPosition": parsed["start"], "maxResults": len(window)}}
+
+    def cdc(self, entities: List[str], changed_since: str) -> Dict[str, Any]:
+        since = parse_timestamp(changed_since)
+        responses = []
+        for entity in entities:
+            changed = [
+                copy.deepcopy(r) for r in self.entities.get(entity, {}).values()
+                if parse_timestamp(r["MetaData"]["LastUpdatedTime"]) > since
+            ]
+            changed += [
+                {"Id": entity_id, "status": "Deleted", "MetaData": {"LastUpdatedTime": qb_timestamp(at)}}
+                for entity_id, at in self.deleted.get(entity, {}).items() if at > since
+            ]
+            self.stats["records_returned"] += min(len(changed), CDC_MAX_CHANGES)
+            responses.append({entity: changed[:CDC_MAX_CHANGES]} if changed else {})
+        return {"CDCResponse": [{"QueryResponse": responses}]}
+
+    def read(self, entity: str, entity_id: str) -> Dict[str, Any]:
+        record = self.entities.get(entity, {}).get(entity_id)
+        if record is None:
+            raise SimulatedFault(400, f"Object Not Found: {entity} {entity_id}", "610")
+        return {entity: copy.deepcopy(record)}
+
+    def batch(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        responses = []
+        for item in items:
+            try:
+                if "Query" in item:
+                    responses.append({"bId": item["bId"], **self.query(item["Query"])})
+                    continue
+                entity = next(k for k in item if k not in ("bId", "operation", "optionsData"))
+                if item.get("operation") == "update":
+                    stored = self.update(entity, item[entity], sparse=item[entity].get("sparse", False))
+                else:
+                    stored = self.create(entity, item[entity])
+                responses.append({"bId": item["bId"], entity: copy.deepcopy(stored)})
+            except SimulatedFault as fault:
+                responses.append({"bId": item["bId"], **fault.body})
+        return {"BatchItemResponse": responses}
+
+    # ==================== Transport ====================
+
+    def fail_next(self, count: int = 1, status: int = 503):
+        """Answer the next count requests with an error status."""
+        self._scripted_faults.extend([status] * count)
+
+    def reset_stats(self):
+        self.stats = {"requests": 0, "throttled": 0, "faults": 0, "records_returned": 0, "bytes_sent": 0, "by_operation": {}}
+
+    def _throttled(self) -> bool:
+        now = time.monotonic()
+        if self.throttle_every and self.stats["requests"] % self.throttle_every == 0:
+            return True
+        if self.max_concurrent is not None and self._in_flight >= self.max_concurrent:
+            return True
+        if self.rate_limit_per_minute is not None:
+            self._request_times = [t for t in self._request_times if now - t < 60]
+            if len(self._request_times) >= self.rate_limit_per_minute:
+                return True
+            self._request_times.append(now)
+        return False
+
+    async def handle(self, method: str, path: str, params: Dict[str, str], headers: Dict[str, str], body: bytes) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """One request -> (status, JSON body, extra headers)."""
+        route = PATH_RE.match(path)
+        if not route or route.group("realm") != self.realm_id:
+            return 404, {"Fault": {"Error": [{"Message": f"Unknown resource {path}", "code": "404"}]}}, {}
+        if not headers.get("authorization", "").startswith("Bearer "):
+            return 401, {"Fault": {"Error": [{"Message": "AuthenticationFailed", "code": "3200"}], "type": "AUTHENTICATION"}}, {}
+
+        resource = route.group("resource")
+        operation = resource if resource in ("query", "cdc", "batch") else f"{method.lower()} {resource}"
+        self.stats["requests"] += 1
+        self.stats["by_operation"][operation] = self.stats["by_operation"].get(operation, 0) + 1
+
+        if self._throttled():
+            self.stats["throttled"] += 1
+            return 429, {"Fault": {"Error": [{"Message": "ThrottleExceeded", "code": "003001"}], "type": "SERVICE"}}, {
+                "Retry-After": f"{self.retry_after:g}"
+            }
+        if self._scripted_faults or (self.fault_rate and self.rng.random() < self.fault_rate):
+            self.stats["faults"] += 1
+            status = self._scripted_faults.pop(0) if self._scripted_faults else 503
+            return status, {"Fault": {"Error": [{"Message": "Service unavailable", "code": str(status)}], "type": "SERVICE"}}, {}
+
+        self._in_flight += 1
+        try:
+            records_before = self.stats["records_returned"]
+            try:
+                if resource == "query":
+                    payload = self.query(params.get("query", ""))
+                elif resource == "cdc":
+                    payload = self.cdc(params.get("entities", "").split(","), params.get("changedSince", ""))
+                elif resource == "batch":
+                    payload = self.batch(json.loads(body).get("BatchItemRequest", []))
+                else:
+                    entity = next((name for name in self.entities if name.lower() == resource.lower()), resource.capitalize())
+                    if method == "GET":
+                        payload = self.read(entity, route.group("id") or "")
+                    elif params.get("operation") == "update":
+                        record = json.loads(body)
+                        payload = {entity: self.update(entity, record, sparse=record.get("sparse", False))}
+                    else:
+                        payload = {entity: self.create(entity, json.loads(body))}
+                status = 200
+            except SimulatedFault as fault:
+                status, payload = fault.status, fault.body
+
+            delay = self.latency_ms + self.rng.uniform(0, self.jitter_ms)
+            delay += self.latency_per_record_ms * (self.stats["records_returned"] - records_before)
+            if delay:
+                await asyncio.sleep(delay / 1000)
+            return status, {**payload, "time": qb_timestamp(datetime.now(timezone.utc))}, {}
+        finally:
+            self._in_flight -= 1
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        params = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+        headers = {k.decode().lower(): v.decode() for k, v in scope.get("headers", [])}
+
+        status, payload, extra_headers = await self.handle(scope["method"], scope["path"], params, headers, body)
+        encoded = json.dumps(payload).encode()
+        self.stats["bytes_sent"] += len(encoded)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(encoded)).encode())]
+            + [(k.lower().encode(), v.encode()) for k, v in extra_headers.items()],
+        })
+        await send({"type": "http.response.body", "body": encoded})
+
+
+def simulated_quickbooks_service(simulator: QuickBooksSimulator, db=None) -> QuickBooksService:
+    """Authenticated QuickBooksService whose pooled client talks to the simulator in-process."""
+    qb = QuickBooksService(db=db)
+    qb.realm_id = simulator.realm_id
+    qb.access_token = "simulated-access"
+    qb.refresh_token = "simulated-refresh"
+    qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    qb.api = QuickBooksClient(simulator.realm_id, "http://qb.sim", transport=httpx.ASGITransport(app=simulator))
+    return qb
+
+
+async def link_gc_clients(db, simulator: QuickBooksSimulator) -> int:
+    """One client (qb_customer_id set) and one project per GC Compliance customer, so promotion can resolve them."""
+    customers = [
+        c for c in simulator.entities["Customer"].values()
+        if c["CustomerTypeRef"]["value"] == GC_COMPLIANCE_CUSTOMER_TYPE
+    ]
+    if customers:
+        await db.execute(
+            text("INSERT INTO clients (full_name, qb_customer_id, qb_display_name) VALUES (:full_name, :qb_customer_id, :full_name)"),
+            [{"full_name": c["DisplayName"], "qb_customer_id": c["Id"]} for c in customers]
+        )
+        await db.execute(text("""
+            INSERT INTO projects (client_id, project_name)
+            SELECT client_id, full_name FROM clients c
+            WHERE qb_customer_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM projects p WHERE p.client_id = c.client_id)
+        """))
+        await db.commit()
+    return len(customers)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a simulated QuickBooks company over HTTP")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--invoices-per-customer", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--rate-limit-per-minute", type=int, default=500, help="QuickBooks allows 500 per realm")
+    parser.add_argument("--max-concurrent", type=int, default=10, help="QuickBooks allows 10 per realm")
+    parser.add_argument("--fault-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    simulator = QuickBooksSimulator(
+        customers=args.customers,
+        invoices_per_customer=args.invoices_per_customer,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_per_minute=args.rate_limit_per_minute,
+        max_concurrent=args.max_concurrent,
+        fault_rate=args.fault_rate,
+    )
+    print(f"QuickBooks simulator: realm {simulator.realm_id} at http://127.0.0.1:{args.port}/v3/company/{simulator.realm_id}")
+    uvicorn.run(simulator, host="127.0.0.1", port=args.port, log_level="warning")
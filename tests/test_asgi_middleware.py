@@ -0,0 +1,107 @@
+"""
+Tests for the pure ASGI middlewares (app/middleware/).
+
+Public-route matching is tested directly; the Supabase JWT middleware and
+the proxy scheme fix run in front of a small FastAPI app, with HS256 tokens
+and a primed principal cache so no database is needed.
+"""
+
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.db.models import User
+from app.middleware.auth_middleware import JWTAuthMiddleware
+from app.middleware.https_redirect_fix_middleware import HTTPSRedirectFixMiddleware
+from app.middleware.route_matcher import PublicRouteMatcher
+from app.middleware.supabase_auth_middleware import SupabaseJWTMiddleware
+from app.services.principal_cache import principal_cache
+from app.services.supabase_auth_service import supabase_auth_service
+
+SECRET = "test-supabase-secret"
+
+
+def test_public_route_matcher():
+    is_public = PublicRouteMatcher(SupabaseJWTMiddleware.PUBLIC_ROUTES)
+
+    assert is_public("/")
+    assert is_public("/docs") and is_public("/docs/oauth2-redirect")
+    assert is_public("/v1/auth/health")
+    # "/" no longer makes every path public, and prefixes stop at a path segment
+    assert not is_public("/v1/projects")
+    assert not is_public("/docsearch")
+    assert not is_public("/v1/auth/healthz")
+    assert PublicRouteMatcher(JWTAuthMiddleware.PUBLIC_ROUTES)("/v1/auth/supabase/me")
+    assert not PublicRouteMatcher([])("/")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(supabase_auth_service, "jwt_secret", SECRET)
+    supabase_auth_service.clear_verified_tokens()
+
+    app = FastAPI()
+    app.add_middleware(SupabaseJWTMiddleware)
+    app.add_middleware(HTTPSRedirectFixMiddleware)
+
+    @app.get("/health")
+    async def health(request: Request):
+        return {"scheme": request.url.scheme}
+
+    @app.get("/v1/me")
+    async def me(request: Request):
+        return {"user_id": request.state.user_id, "role": request.state.user_role}
+
+    @app.get("/v1/export")
+    async def export():
+        return StreamingResponse((f"row {n}\n" for n in range(3)), media_type="text/plain")
+
+    yield app
+    supabase_auth_service.clear_verified_tokens()
+
+
+def token(sub="5d0b6a9e-2f61-4f0e-9a53-0c1d2e3f4a5b"):
+    claims = {"sub": sub, "email": "pm@example.com", "aud": "authenticated", "exp": int(time.time()) + 3600}
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+@pytest.mark.asyncio
+async def test_supabase_middleware_guards_protected_routes(app):
+    principal_cache.put(User(
+        id="u-1", supabase_user_id="5d0b6a9e-2f61-4f0e-9a53-0c1d2e3f4a5b", email="pm@example.com",
+        role="pm", is_active=True,
+    ))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        health = await client.get("/health", headers={"X-Forwarded-Proto": "https"})
+        missing = await client.get("/v1/me")
+        malformed = await client.get("/v1/me", headers={"Authorization": "Token abc"})
+        invalid = await client.get("/v1/me", headers={"Authorization": "Bearer not-a-jwt"})
+        me = await client.get("/v1/me", headers={"Authorization": f"Bearer {token()}"})
+        export = await client.get("/v1/export", headers={"Authorization": f"Bearer {token()}"})
+
+    assert health.json() == {"scheme": "https"}
+    assert (missing.status_code, missing.json()["detail"]) == (401, "Authorization header missing")
+    assert malformed.json()["detail"].startswith("Invalid authorization header format")
+    assert (invalid.status_code, invalid.json()["detail"]) == (401, "Invalid or expired token")
+    assert me.json() == {"user_id": "u-1", "role": "pm"}
+    assert (export.status_code, export.text) == (200, "row 0\nrow 1\nrow 2\n")
+
+
+@pytest.mark.asyncio
+async def test_deactivated_principal_is_rejected(app):
+    principal_cache.put(User(
+        id="u-2", supabase_user_id="7e1c7b0f-3a72-4f1f-8b64-1d2e3f4a5b6c", email="gone@example.com",
+        role="client", is_active=False,
+    ))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(
+            "/v1/me", headers={"Authorization": f"Bearer {token('7e1c7b0f-3a72-4f1f-8b64-1d2e3f4a5b6c')}"}
+        )
+
+    assert (response.status_code, response.json()["detail"]) == (403, "User account is deactivated")
@@ -0,0 +1,139 @@
+"""
+Tests for property-based invoice numbering (app/services/invoice_number_allocator.py).
+
+Counter allocation and the create_quickbooks_invoice handler run on the
+postgres_engine scratch database (QuickBooks served by an httpx
+MockTransport) and are skipped unless TEST_POSTGRES_URL is set; the
+QuickBooks DocNumber lookup runs without a database.
+"""
+
+import asyncio
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.handlers.ai_functions import handle_create_quickbooks_invoice
+from app.services.invoice_number_allocator import invoice_number_allocator, suffix_of
+from app.services.qb_client import QuickBooksClient
+from app.services.quickbooks_service import QuickBooksService
+
+BASE = "64-Phillips-Spruce-Pine"
+
+
+def test_suffix_of_counts_base_as_one_and_ignores_longer_addresses():
+    assert suffix_of(BASE, BASE) == 1
+    assert suffix_of(f"{BASE}-7", BASE) == 7
+    assert suffix_of(f"{BASE}-Rd", BASE) == 0
+    assert suffix_of(f"{BASE}-2-B", BASE) == 0
+    assert suffix_of("64-Phillips", BASE) == 0
+    assert suffix_of(None, BASE) == 0
+
+
+def prefix_query_response(query, doc_numbers):
+    """QuickBooks answer to a paged DocNumber LIKE query over doc_numbers."""
+    prefix = re.search(r"LIKE '(.*)%'", query).group(1).replace("\\'", "'")
+    start, size = (int(n) for n in re.search(r"STARTPOSITION (\d+) MAXRESULTS (\d+)", query).groups())
+    matches = [{"DocNumber": n} for n in sorted(doc_numbers) if n.startswith(prefix)][start - 1:start - 1 + size]
+    return httpx.Response(200, json={"QueryResponse": {"Invoice": matches} if matches else {}})
+
+
+def stub_quickbooks_service(handler, db=None):
+    qb = QuickBooksService(db=db)
+    qb.realm_id = "9130"
+    qb.access_token = "access"
+    qb.refresh_token = "refresh"
+    qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    qb.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(handler))
+    return qb
+
+
+@pytest.mark.asyncio
+async def test_quickbooks_suffix_reads_every_page(monkeypatch):
+    monkeypatch.setattr(settings, "QB_QUERY_PAGE_SIZE", 2)
+    base = "12-O'Brien-Way"
+    in_quickbooks = {base, *(f"{base}-{n}" for n in range(2, 8)), "12-Other-St-40"}
+    queries = []
+
+    async def stub(request):
+        queries.append(request.url.params["query"])
+        return prefix_query_response(queries[-1], in_quickbooks)
+
+    assert await invoice_number_allocator.quickbooks_suffix(stub_quickbooks_service(stub), base) == 7
+    assert len(queries) >= 4
+    assert queries[0] == "SELECT DocNumber FROM Invoice WHERE DocNumber LIKE '12-O\\'Brien-Way%' STARTPOSITION 1 MAXRESULTS 2"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_allocations_never_collide(postgres_engine):
+    factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        await db.execute(text("""
+            INSERT INTO quickbooks_invoices_cache (qb_invoice_id, doc_number) VALUES
+                ('1', :base), ('2', :base || '-3'), ('3', :base || '-Rd-9'), ('4', '64-Phillips-Spruce-Pine_x-99')
+        """), {"base": BASE})
+        await db.execute(text("""
+            INSERT INTO invoices (project_id, invoice_number) VALUES (gen_random_uuid(), :number)
+        """), {"number": f"{BASE}-4"})
+        await db.commit()
+
+    async def allocate():
+        async with factory() as db:
+            return await invoice_number_allocator.allocate(db, BASE)
+
+    numbers = await asyncio.gather(*(allocate() for _ in range(10)))
+
+    assert sorted(numbers, key=lambda n: suffix_of(n, BASE)) == [f"{BASE}-{n}" for n in range(5, 15)]
+    async with factory() as db:
+        assert await invoice_number_allocator.allocate(db, "Temple-Baptist") == "Temple-Baptist"
+        assert await invoice_number_allocator.allocate(db, "Temple-Baptist") == "Temple-Baptist-2"
+        # A number seen in the cache later (e.g. created in QuickBooks) moves the counter past it
+        await db.execute(text("INSERT INTO quickbooks_invoices_cache (qb_invoice_id, doc_number) VALUES ('5', 'Temple-Baptist-8')"))
+        await db.commit()
+        assert await invoice_number_allocator.allocate(db, "Temple-Baptist") == "Temple-Baptist-9"
+
+
+@pytest.mark.asyncio
+async def test_handler_reconciles_with_quickbooks_only_on_duplicate(postgres_engine):
+    in_quickbooks = {"Temple-Baptist", "Temple-Baptist-2"}  # Created after the last sync
+    queries = []
+
+    async def stub(request):
+        if request.method == "GET":
+            query = request.url.params["query"]
+            queries.append(query)
+            if "FROM Item" in query:
+                return httpx.Response(200, json={"QueryResponse": {"Item": [{"Id": "108", "Name": "GC Permit Oversight"}]}})
+            return prefix_query_response(query, in_quickbooks)
+
+        doc_number = json.loads(request.content)["DocNumber"]
+        if doc_number in in_quickbooks:
+            return httpx.Response(400, json={"Fault": {"type": "ValidationFault", "Error": [
+                {"Message": "Duplicate Document Number Error", "code": "6140"}
+            ]}})
+        in_quickbooks.add(doc_number)
+        return httpx.Response(200, json={"Invoice": {"Id": "77", "DocNumber": doc_number}})
+
+    factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        qb = stub_quickbooks_service(stub, db)
+
+        args = {"customer_id": "42", "customer_name": "Temple Baptist", "amount": 500, "description": "GC Permit Oversight"}
+        first = await handle_create_quickbooks_invoice(args, None, qb, MagicMock(), "s1")
+        second = await handle_create_quickbooks_invoice(args, None, qb, MagicMock(), "s1")
+
+        assert (first["status"], first["invoice_number"]) == ("success", "Temple-Baptist-3")
+        assert second["invoice_number"] == "Temple-Baptist-4"
+        # One prefix query on the conflict - never a full invoice download
+        assert [q for q in queries if "FROM Invoice" in q] == [
+            "SELECT DocNumber FROM Invoice WHERE DocNumber LIKE 'Temple-Baptist%' STARTPOSITION 1 MAXRESULTS 1000"
+        ]
+        assert (await db.execute(text(
+            "SELECT last_suffix FROM invoice_number_counters WHERE prefix = 'Temple-Baptist'"
+        ))).scalar() == 4
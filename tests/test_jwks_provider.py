@@ -0,0 +1,117 @@
+"""
+Tests for async JWKS fetching (app/services/jwks_provider.py) and the
+verified-token cache in SupabaseAuthService.verify_jwt.
+
+The JWKS endpoint is an httpx.MockTransport serving keys generated here.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from app.services import jwks_provider as jwks_module
+from app.services.jwks_provider import JWKSProvider
+from app.services.supabase_auth_service import SupabaseAuthService
+
+JWKS_URL = "https://project.supabase.co/auth/v1/jwks"
+
+
+class FakeJWKSEndpoint:
+    def __init__(self):
+        self.private_keys = {}
+        self.requests = 0
+        self.fail = False
+
+    def add_key(self, kid):
+        self.private_keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    async def handler(self, request):
+        self.requests += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            return httpx.Response(503)
+        keys = []
+        for kid, private_key in self.private_keys.items():
+            jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+            keys.append({**jwk, "kid": kid, "alg": "RS256", "use": "sig"})
+        return httpx.Response(200, json={"keys": keys})
+
+    def token(self, kid, sub="user-1", expires_in=3600):
+        claims = {"sub": sub, "email": f"{sub}@example.com", "aud": "authenticated", "exp": int(time.time()) + expires_in}
+        return jwt.encode(claims, self.private_keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def endpoint():
+    endpoint = FakeJWKSEndpoint()
+    endpoint.add_key("key-1")
+    return endpoint
+
+
+@pytest.fixture
+def auth(endpoint):
+    service = SupabaseAuthService()
+    service.jwt_secret = ""
+    service.jwks = JWKSProvider(JWKS_URL, transport=httpx.MockTransport(endpoint.handler))
+    return service
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch(auth, endpoint):
+    tokens = [endpoint.token("key-1", sub=f"user-{n}") for n in range(20)]
+    payloads = await asyncio.gather(*(auth.verify_jwt(token) for token in tokens))
+
+    assert [p["sub"] for p in payloads] == [f"user-{n}" for n in range(20)]
+    assert endpoint.requests == 1
+    await auth.jwks.stop()
+
+
+@pytest.mark.asyncio
+async def test_repeat_tokens_skip_signature_verification(auth, endpoint, monkeypatch):
+    await auth.jwks.start()
+    token = endpoint.token("key-1")
+    assert (await auth.verify_jwt(token))["sub"] == "user-1"
+
+    decodes = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *args, **kwargs: decodes.append(1) or real_decode(*args, **kwargs))
+    for _ in range(5):
+        assert (await auth.verify_jwt(token))["sub"] == "user-1"
+    assert decodes == []
+
+    # Cached claims end at exp
+    for token_hash, (claims, _) in list(auth._verified.items()):
+        auth._verified[token_hash] = (claims, time.time() - 1)
+    assert await auth.verify_jwt(token) is not None
+    assert len(decodes) == 1
+    assert await auth.verify_jwt(token + "x") is None
+    await auth.jwks.stop()
+
+
+@pytest.mark.asyncio
+async def test_rotated_keys_are_refetched_at_most_once_per_window(auth, endpoint, monkeypatch):
+    await auth.jwks.start()
+    assert endpoint.requests == 1
+
+    endpoint.add_key("key-2")
+    rotated = endpoint.token("key-2")
+    # Fetched moments ago: an unknown kid is rejected without another request
+    assert await auth.verify_jwt(rotated) is None
+    assert endpoint.requests == 1
+
+    monkeypatch.setattr(jwks_module, "UNKNOWN_KID_REFETCH_SECONDS", 0)
+    assert (await auth.verify_jwt(rotated))["sub"] == "user-1"
+    assert endpoint.requests == 2
+
+    # A failed refresh keeps the keys already loaded
+    endpoint.fail = True
+    assert not await auth.jwks.refresh()
+    assert await auth.verify_jwt(endpoint.token("key-1", sub="user-2")) is not None
+    assert auth.jwks.get_status()["keys"] == 2
+    await auth.jwks.stop()
@@ -0,0 +1,116 @@
+"""
+Tests for the authenticated-principal cache (app/services/principal_cache.py).
+
+Cache hits, invalidation and the batched activity flush run against the
+scratch PostgreSQL database (users.last_activity_at is migration-only);
+expiry is tested in memory.
+"""
+
+import time
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.db.models import User
+from app.services.principal_cache import PrincipalCache, principal_cache
+from app.services.supabase_auth_service import supabase_auth_service
+
+SUPABASE_ID = "5d0b6a9e-2f61-4f0e-9a53-0c1d2e3f4a5b"
+
+
+@pytest_asyncio.fixture
+async def factory(postgres_engine):
+    principal_cache._session_factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+    yield principal_cache._session_factory
+    principal_cache._session_factory = None
+
+
+def count_statements(engine):
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_repeat_requests_are_served_without_sql(factory, postgres_engine):
+    async with factory() as db:
+        db.info["use_replica"] = True  # GET request
+        created = await supabase_auth_service.get_principal(
+            db, SUPABASE_ID, "pm@example.com", {"full_name": "Pat Manager"}, time.time() + 3600
+        )
+        assert db.info["use_replica"] is False  # Get-or-create reads the primary
+    assert created.full_name == "Pat Manager"
+
+    statements = count_statements(postgres_engine)
+    async with factory() as db:
+        cached = await supabase_auth_service.get_principal(db, SUPABASE_ID, "pm@example.com")
+        assert (cached.id, cached.role, cached.is_active) == (created.id, "client", True)
+        assert statements == []
+
+        # Merged into the request session: routes can still refresh and update it
+        await db.refresh(cached)
+        cached.full_name = "Pat M."
+        await db.commit()
+    assert principal_cache.get_status()["hits"] == 1
+
+    async with factory() as db:
+        assert await supabase_auth_service.update_user_role(db, created.id, "admin")
+    async with factory() as db:
+        reloaded = await supabase_auth_service.get_principal(db, SUPABASE_ID, "pm@example.com")
+    assert (reloaded.role, reloaded.full_name) == ("admin", "Pat M.")
+    assert principal_cache.get_status()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_activity_is_written_in_one_batch(factory, postgres_engine):
+    async with factory() as db:
+        users = [
+            await supabase_auth_service.get_or_create_user(db, f"00000000-0000-0000-0000-00000000000{n}", f"u{n}@example.com")
+            for n in range(3)
+        ]
+    for _ in range(5):
+        for user in users:
+            principal_cache.record_activity(user.id)
+    stale = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    principal_cache._activity[users[0].id] = stale
+
+    statements = count_statements(postgres_engine)
+    assert await principal_cache.flush_activity() == 3
+    assert len([s for s in statements if s.lstrip().startswith("UPDATE users")]) == 1
+    assert await principal_cache.flush_activity() == 0
+
+    async with factory() as db:
+        await db.execute(text("UPDATE users SET last_activity_at = now() WHERE id = :id"), {"id": users[1].id})
+        await db.commit()
+    # An older timestamp never overwrites a newer one
+    principal_cache._activity[users[1].id] = stale
+    await principal_cache.stop()
+    async with factory() as db:
+        seen = dict((await db.execute(text("SELECT email, last_activity_at FROM users"))).all())
+    assert seen["u0@example.com"] == stale
+    assert seen["u1@example.com"] > stale
+    assert seen["u2@example.com"] > stale
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_with_the_token(monkeypatch):
+    monkeypatch.setattr(settings, "PRINCIPAL_CACHE_MAX_ENTRIES", 2)
+    cache = PrincipalCache()
+    session = AsyncSession()  # unbound: a hit must not need the database
+    users = [User(id=f"u{n}", supabase_user_id=f"s{n}", email=f"u{n}@example.com", role="pm") for n in range(3)]
+
+    cache.put(users[0], token_expires_at=time.time() - 1)
+    assert await cache.get(session, "s0") is None
+
+    for user in users:
+        cache.put(user)
+    # Oldest entry evicted at PRINCIPAL_CACHE_MAX_ENTRIES
+    assert await cache.get(session, "s0") is None
+    assert (await cache.get(session, "s2")).email == "u2@example.com"
+    cache.invalidate("s2")
+    assert await cache.get(session, "s2") is None
+    assert cache.get_status()["principals"] == 1
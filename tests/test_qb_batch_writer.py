@@ -0,0 +1,194 @@
+"""
+Tests for QuickBooks /batch writes (app/services/qb_batch_writer.py) and the
+bulk flows built on them.
+
+A local QuickBooks stub (httpx MockTransport) serves /query and /batch,
+answers batch items out of order and faults selected items, so per-item
+result mapping and API call counts can be checked.
+"""
+
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from app.handlers.ai_functions import handle_update_quickbooks_customer
+from app.services import quickbooks_service as qb_service_module
+from app.services.qb_batch_writer import QuickBooksBatchWriter, create_op, query_op, update_op
+from app.services.quickbooks_service import QuickBooksService
+
+GC_TYPE_ID = "698682"
+
+
+class QuickBooksStub:
+    """Customer store behind /query and /batch; faults updates for stale_ids and outdated SyncTokens."""
+
+    def __init__(self, customers, stale_ids=(), failing_bid=None):
+        self.customers = {c["Id"]: c for c in customers}
+        self.stale_ids = set(stale_ids)
+        self.failing_bid = failing_bid
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rsplit("/", 1)[-1]
+        if path == "query":
+            query = request.url.params["query"]
+            self.requests.append(("query", query))
+            return httpx.Response(200, json={"QueryResponse": self.query(query)})
+
+        items = json.loads(request.content)["BatchItemRequest"]
+        self.requests.append(("batch", len(items)))
+        if self.failing_bid in {item["bId"] for item in items}:
+            return httpx.Response(503, text="Service Unavailable")
+        responses = [self.batch_item(item) for item in items]
+        return httpx.Response(200, json={"BatchItemResponse": list(reversed(responses))})
+
+    def query(self, query):
+        if "FROM CustomerType" in query:
+            return {"CustomerType": [{"Id": GC_TYPE_ID, "Name": "GC Compliance"}]}
+        if int((re.search(r"STARTPOSITION (\d+)", query) or [None, "1"])[1]) > 1:
+            return {}
+        ids = re.findall(r"'([^']+)'", query)
+        customers = [c for c in self.customers.values() if not ids or c["Id"] in ids]
+        return {"Customer": customers, "startPosition": 1, "maxResults": len(customers)} if customers else {}
+
+    def batch_item(self, item):
+        if "Query" in item:
+            return {"bId": item["bId"], "QueryResponse": self.query(item["Query"])}
+        customer = item["Customer"]
+        if item["operation"] == "create":
+            created = {**customer, "Id": str(1000 + len(self.customers)), "SyncToken": "0"}
+            self.customers[created["Id"]] = created
+            return {"bId": item["bId"], "Customer": created}
+        current = self.customers[customer["Id"]]
+        if customer["Id"] in self.stale_ids or customer["SyncToken"] != current["SyncToken"]:
+            return {"bId": item["bId"], "Fault": {"type": "ValidationFault", "Error": [
+                {"Message": "Stale Object Error", "Detail": "You and root were working on this at the same time.",
+                 "code": "5010"}]}}
+        current.update({k: v for k, v in customer.items() if k != "sparse"})
+        current["SyncToken"] = str(int(current["SyncToken"]) + 1)
+        return {"bId": item["bId"], "Customer": current}
+
+
+def customer(i, type_id="1"):
+    return {"Id": str(i), "DisplayName": f"Client {i}", "SyncToken": "3",
+            "PrimaryEmailAddr": {"Address": f"client{i}@example.com"}, "CustomerTypeRef": {"value": type_id}}
+
+
+def authenticated_service(stub) -> QuickBooksService:
+    service = QuickBooksService()
+    service.realm_id = "9130"
+    service.access_token = "access"
+    service.refresh_token = "refresh"
+    service.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    service.api = qb_service_module.QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(stub))
+    return service
+
+
+@pytest.fixture(autouse=True)
+def fresh_customer_type_cache(monkeypatch):
+    monkeypatch.setattr(qb_service_module, "_customer_type_ids", {})
+
+
+@pytest.mark.asyncio
+async def test_writer_packs_30_per_request_and_maps_results_in_order():
+    stub = QuickBooksStub([customer(i) for i in range(1, 61)], stale_ids={"7"})
+    operations = [update_op("Customer", {"Id": str(i), "SyncToken": "3", "Notes": "bulk"}) for i in range(1, 61)]
+    operations += [create_op("Customer", {"DisplayName": "New Client"}), query_op("SELECT * FROM Customer WHERE Id IN ('1')")]
+
+    writer = QuickBooksBatchWriter(authenticated_service(stub))
+    results = await writer.run(operations)
+
+    assert stub.requests == [("batch", 30), ("batch", 30), ("batch", 2)]
+    assert writer.api_calls == 3
+    assert [r["entity"]["Id"] for r in results[:6] if r["ok"]] == ["1", "2", "3", "4", "5", "6"]
+    assert results[6] == {"ok": False, "fault": results[6]["fault"],
+                          "error": "Stale Object Error - You and root were working on this at the same time."}
+    assert results[6]["fault"]["Error"][0]["code"] == "5010"
+    assert results[60]["entity"]["DisplayName"] == "New Client"
+    assert [c["Id"] for c in results[61]["entities"]] == ["1"]
+    assert stub.customers["8"]["Notes"] == "bulk"
+
+
+@pytest.mark.asyncio
+async def test_failed_request_only_fails_its_own_chunk():
+    stub = QuickBooksStub([customer(i) for i in range(1, 46)], failing_bid="30")
+    operations = [update_op("Customer", {"Id": str(i), "SyncToken": "3", "Notes": "bulk"}) for i in range(1, 46)]
+
+    results = await QuickBooksBatchWriter(authenticated_service(stub)).run(operations)
+
+    assert all(r["ok"] for r in results[:30])
+    assert not any(r["ok"] for r in results[30:])
+    assert "HTTP 503" in results[30]["error"]
+
+
+@pytest.mark.asyncio
+async def test_customer_type_sync_updates_in_batches():
+    """70 clients -> 1 customer query + 1 type query + 3 /batch calls (was 2 calls per customer)."""
+    customers = [customer(i, GC_TYPE_ID if i <= 5 else "1") for i in range(1, 81)]
+    stub = QuickBooksStub(customers, stale_ids={"42"})
+
+    class Sheets:
+        async def get_clients_data(self):
+            return [{"Full Name": f"Client {i}", "Email": ""} for i in range(1, 71)] + [{"Full Name": "Nobody"}]
+
+    result = await authenticated_service(stub).sync_gc_customer_types_from_sheets(Sheets())
+
+    assert [kind for kind, _ in stub.requests].count("batch") == 3
+    assert len(stub.requests) == 5
+    assert (result["matched"], result["skipped_already_set"], result["not_found_in_qb"]) == (65, 5, 1)
+    assert (result["updated"], result["errors"]) == (64, 1)
+    assert result["error_details"][0]["qb_id"] == "42"
+    assert stub.customers["10"]["CustomerTypeRef"] == {"value": GC_TYPE_ID}
+    assert stub.customers["10"]["DisplayName"] == "Client 10"
+
+
+@pytest.mark.asyncio
+async def test_customer_type_sync_updates_shared_customer_once():
+    """Clients matching the same customer share one update instead of racing its SyncToken."""
+    stub = QuickBooksStub([customer(1), customer(2)])
+
+    class Sheets:
+        async def get_clients_data(self):
+            return [
+                {"Full Name": "Client 1", "Email": ""},
+                {"Full Name": "Client 1 LLC", "Email": ""},
+                {"Full Name": "C. One", "Email": "client1@example.com"},
+                {"Full Name": "Client 2", "Email": ""},
+            ]
+
+    result = await authenticated_service(stub).sync_gc_customer_types_from_sheets(Sheets())
+
+    assert ("batch", 2) in stub.requests
+    assert (result["matched"], result["updated"], result["errors"]) == (4, 4, 0)
+    assert result["message"] == "Updated 2 customers to GC Compliance"
+    assert stub.customers["1"]["SyncToken"] == "4"
+
+
+@pytest.mark.asyncio
+async def test_update_customer_handler_bulk():
+    stub = QuickBooksStub([customer(i) for i in range(1, 41)], stale_ids={"3"})
+    args = {"customer_ids": [str(i) for i in range(1, 36)] + ["999"], "updates": {"Notes": "VIP"}}
+
+    result = await handle_update_quickbooks_customer(args, None, authenticated_service(stub), None, "session")
+
+    assert [kind for kind, _ in stub.requests] == ["query", "batch", "batch"]
+    assert len(result["updated"]) == 34
+    assert {e["customer_id"] for e in result["errors"]} == {"3", "999"}
+    assert stub.customers["35"]["Notes"] == "VIP"
+
+
+@pytest.mark.asyncio
+async def test_update_customer_handler_updates_repeated_ids_once():
+    """A repeated Id is updated once instead of racing its own SyncToken."""
+    stub = QuickBooksStub([customer(1), customer(2)])
+    args = {"customer_id": "1", "customer_ids": ["1", "2", "2", "1"], "updates": {"Notes": "VIP"}}
+
+    result = await handle_update_quickbooks_customer(args, None, authenticated_service(stub), None, "session")
+
+    assert [e["customer_id"] for e in result["errors"]] == []
+    assert len(result["updated"]) == 2
+    assert result["message"] == "Updated 2 of 2 QuickBooks customers"
+    assert stub.customers["1"]["SyncToken"] == "4"
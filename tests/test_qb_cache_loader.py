@@ -0,0 +1,131 @@
+"""
+Tests for the QuickBooks cache bulk loader (app/services/qb_cache_loader.py).
+
+Runs against SQLite (same ON CONFLICT upsert syntax as PostgreSQL) and
+checks inserted/updated/unchanged classification and that unchanged rows
+are never rewritten.
+"""
+
+import copy
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.services.qb_cache_loader import QuickBooksCacheLoader, content_hash, customer_cache_row
+
+
+def make_customer(i, name=None, updated="2025-01-01T00:00:00-08:00"):
+    return {
+        "Id": str(i),
+        "DisplayName": name or f"Customer {i}",
+        "Active": True,
+        "MetaData": {"LastUpdatedTime": updated},
+    }
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/loader.db", poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            CREATE TABLE quickbooks_customers_cache (
+                qb_customer_id TEXT PRIMARY KEY, display_name TEXT, company_name TEXT,
+                given_name TEXT, family_name TEXT, email TEXT, phone TEXT, qb_data TEXT,
+                content_hash TEXT, qb_last_modified TIMESTAMP, is_active BOOLEAN,
+                sync_error TEXT, cached_at TIMESTAMP
+            )
+        """))
+    async with AsyncSession(engine) as session:
+        yield session
+    await engine.dispose()
+
+
+async def cached_at(db, qb_customer_id):
+    result = await db.execute(
+        text("SELECT cached_at FROM quickbooks_customers_cache WHERE qb_customer_id = :id"),
+        {"id": qb_customer_id},
+    )
+    return result.scalar()
+
+
+def test_content_hash_ignores_metadata():
+    customer = make_customer(1)
+    touched = make_customer(1, updated="2025-06-01T00:00:00-08:00")
+    renamed = make_customer(1, name="Renamed")
+
+    assert content_hash(customer) == content_hash(touched)
+    assert content_hash(customer) != content_hash(renamed)
+
+
+@pytest.mark.asyncio
+async def test_classifies_inserted_updated_unchanged(db):
+    """Second load only writes the rows whose content changed."""
+    loader = QuickBooksCacheLoader(batch_size=7)
+    customers = [make_customer(i) for i in range(1, 26)]
+
+    first = await loader.upsert(db, "customers", [customer_cache_row(c) for c in customers])
+    await db.commit()
+    assert first == {"inserted": 25, "updated": 0, "unchanged": 0}
+    untouched_at = await cached_at(db, "2")
+
+    changed = copy.deepcopy(customers)
+    changed[0]["DisplayName"] = "Renamed 1"
+    changed[4]["DisplayName"] = "Renamed 5"
+    changed.append(make_customer(26))
+
+    second = await loader.upsert(db, "customers", [customer_cache_row(c) for c in changed])
+    await db.commit()
+    assert second == {"inserted": 1, "updated": 2, "unchanged": 23}
+
+    names = dict((await db.execute(text(
+        "SELECT qb_customer_id, display_name FROM quickbooks_customers_cache WHERE qb_customer_id IN ('1', '5')"
+    ))).fetchall())
+    assert names == {"1": "Renamed 1", "5": "Renamed 5"}
+    assert await cached_at(db, "2") == untouched_at
+
+
+@pytest.mark.asyncio
+async def test_rows_with_sync_error_are_rewritten(db):
+    """A cached sync_error forces a rewrite (which clears it) even if content matches."""
+    loader = QuickBooksCacheLoader()
+    rows = [customer_cache_row(make_customer(1))]
+    await loader.upsert(db, "customers", rows)
+    await db.execute(text("UPDATE quickbooks_customers_cache SET sync_error = 'boom'"))
+    await db.commit()
+
+    counts = await loader.upsert(db, "customers", rows)
+    await db.commit()
+
+    assert counts == {"inserted": 0, "updated": 1, "unchanged": 0}
+    assert (await db.execute(text("SELECT sync_error FROM quickbooks_customers_cache"))).scalar() is None
+
+
+@pytest.mark.asyncio
+async def test_deactivated_rows_are_reactivated(db):
+    """A row deactivated by a delete keeps its hash; the same payload coming back reactivates it."""
+    loader = QuickBooksCacheLoader()
+    rows = [customer_cache_row(make_customer(1))]
+    await loader.upsert(db, "customers", rows)
+    await db.execute(text("UPDATE quickbooks_customers_cache SET is_active = false"))
+    await db.commit()
+
+    counts = await loader.upsert(db, "customers", rows)
+    await db.commit()
+
+    assert counts == {"inserted": 0, "updated": 1, "unchanged": 0}
+    assert (await db.execute(text("SELECT is_active FROM quickbooks_customers_cache"))).scalar() == 1
+
+
+@pytest.mark.asyncio
+async def test_duplicate_keys_in_batch_last_wins(db):
+    """Duplicate Ids in one batch collapse to the last occurrence."""
+    rows = [customer_cache_row(make_customer(1)), customer_cache_row(make_customer(1, name="Latest"))]
+
+    counts = await QuickBooksCacheLoader().upsert(db, "customers", rows)
+    await db.commit()
+
+    assert counts == {"inserted": 1, "updated": 0, "unchanged": 0}
+    assert (await db.execute(text("SELECT display_name FROM quickbooks_customers_cache"))).scalar() == "Latest"
@@ -100,32 +100,29 @@ async def test_cache_customers_new(cache_service, mock_db, sample_qb_customer):
     # Cache customer
     count = await cache_service.cache_customers([sample_qb_customer])
     
-    # Verify
+    # Verify: one lookup SELECT + one multi-row upsert, no ORM adds
     assert count == 1
-    assert mock_db.add.called
+    assert mock_db.execute.call_count == 2
+    assert not mock_db.add.called
     assert mock_db.commit.called
 
 
 @pytest.mark.asyncio
-async def test_cache_customers_update_existing(cache_service, mock_db, sample_qb_customer):
-    """Test updating existing cached customer."""
-    # Mock: Existing customer
-    existing = QuickBooksCustomerCache(
-        qb_customer_id='QB123',
-        display_name='Old Name',
-        cached_at=datetime.utcnow() - timedelta(minutes=10)
-    )
+async def test_cache_customers_skips_unchanged(cache_service, mock_db, sample_qb_customer):
+    """Test unchanged cached customer is not rewritten."""
+    from app.services.qb_cache_loader import content_hash
+    
+    # Mock: Existing customer with identical content
+    existing = MagicMock(cache_key='QB123', content_hash=content_hash(sample_qb_customer), sync_error=None)
     mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = existing
+    mock_result.fetchall.return_value = [existing]
     mock_db.execute.return_value = mock_result
     
-    # Cache customer (should update)
     count = await cache_service.cache_customers([sample_qb_customer])
     
-    # Verify update
+    # Verify: lookup only, no upsert
     assert count == 1
-    assert existing.display_name == 'John Doe'
-    assert existing.company_name == 'Doe Construction'
+    assert mock_db.execute.call_count == 1
     assert mock_db.commit.called
 
 
@@ -146,7 +143,8 @@ async def test_cache_customers_bulk(cache_service, mock_db):
     count = await cache_service.cache_customers(customers)
     
     assert count == 3
-    assert mock_db.add.call_count == 3
+    upsert_params = mock_db.execute.call_args_list[-1].args[1]
+    assert {upsert_params[f'qb_customer_id_{i}'] for i in range(3)} == {'QB1', 'QB2', 'QB3'}
 
 
 @pytest.mark.asyncio
@@ -165,7 +163,7 @@ async def test_cache_customers_skip_invalid(cache_service, mock_db):
     count = await cache_service.cache_customers(customers)
     
     assert count == 1  # Only valid customer cached
-    assert mock_db.add.call_count == 1
+    assert 'qb_customer_id_1' not in mock_db.execute.call_args_list[-1].args[1]
 
 
 @pytest.mark.asyncio
@@ -223,7 +221,7 @@ async def test_cache_invoices(cache_service, mock_db, sample_qb_invoice):
     count = await cache_service.cache_invoices([sample_qb_invoice])
     
     assert count == 1
-    assert mock_db.add.called
+    assert mock_db.execute.call_count == 2
     assert mock_db.commit.called
 
 
@@ -257,7 +255,7 @@ async def test_cache_payments(cache_service, mock_db, sample_qb_payment):
     count = await cache_service.cache_payments([sample_qb_payment])
     
     assert count == 1
-    assert mock_db.add.called
+    assert mock_db.execute.call_args_list[-1].args[1]['invoice_id_0'] == 'INV123'
     assert mock_db.commit.called
 
 
@@ -451,7 +449,7 @@ async def test_cache_empty_list(cache_service, mock_db):
     count = await cache_service.cache_customers([])
     
     assert count == 0
-    assert not mock_db.add.called
+    assert not mock_db.execute.called
 
 
 @pytest.mark.asyncio
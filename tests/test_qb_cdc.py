@@ -0,0 +1,193 @@
+"""
+Tests for the ChangeDataCapture sync mode (QuickBooksSyncService.sync_all(mode="cdc")).
+
+A local QuickBooks stub (httpx MockTransport) serves /cdc and /query from the
+same set of changes so both modes can be compared by API calls. The sync
+runs on the postgres_engine scratch database (cache upserts and promotion
+are PostgreSQL-only) and is skipped unless TEST_POSTGRES_URL is set.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.services import quickbooks_sync_service as sync_module
+from app.services.qb_client import QuickBooksClient
+from app.services.quickbooks_service import QuickBooksService
+
+GC = {"value": sync_module.QuickBooksSyncService.GC_COMPLIANCE_CUSTOMER_TYPE}
+UPDATED = {"LastUpdatedTime": "2025-01-15T10:00:00-08:00"}
+
+
+class QuickBooksStub:
+    """Serves the same changes through /cdc (with deletions) and /query (without)."""
+
+    def __init__(self, changes):
+        self.changes = changes
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rsplit("/", 1)[-1]
+        self.requests.append(path)
+        if path == "cdc":
+            entities = request.url.params["entities"].split(",")
+            return httpx.Response(200, json={"CDCResponse": [{"QueryResponse": [
+                {entity: self.changes.get(entity, []), "startPosition": 1, "maxResults": len(self.changes.get(entity, []))}
+                for entity in entities
+            ]}]})
+        query = request.url.params["query"]
+        entity = re.search(r"FROM (\w+)", query).group(1)
+        page = [e for e in self.changes.get(entity, []) if e.get("status") != "Deleted"]
+        if int(re.search(r"STARTPOSITION (\d+)", query).group(1)) > 1 or not page:
+            return httpx.Response(200, json={"QueryResponse": {}})
+        return httpx.Response(200, json={"QueryResponse": {entity: page, "startPosition": 1, "maxResults": len(page)}})
+
+
+def invoice(qb_id, doc_number, balance):
+    return {"Id": qb_id, "DocNumber": doc_number, "CustomerRef": {"value": "1"}, "TxnDate": "2025-01-15",
+            "TotalAmt": 1000, "Balance": balance, "MetaData": UPDATED}
+
+
+CHANGES = {
+    "Customer": [{"Id": "1", "DisplayName": "Client One", "Active": True, "CustomerTypeRef": GC, "MetaData": UPDATED}],
+    "Invoice": [
+        invoice("101", "INV-101", 750),
+        {"Id": "103", "status": "Deleted", "MetaData": UPDATED},
+    ],
+    "Payment": [{"Id": "301", "CustomerRef": {"value": "1"}, "TotalAmt": 250, "TxnDate": "2025-01-20",
+                 "MetaData": UPDATED, "Line": [{"LinkedTxn": [{"TxnId": "101", "TxnType": "Invoice"}]}]}],
+}
+
+
+def use_stub(monkeypatch, stub):
+    def service(db):
+        qb = QuickBooksService(db=db)
+        qb.realm_id = "9130"
+        qb.access_token = "access"
+        qb.refresh_token = "refresh"
+        qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        qb.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(stub))
+        return qb
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", service)
+
+
+@pytest_asyncio.fixture
+async def db(postgres_engine):
+    async with postgres_engine.begin() as conn:
+        await conn.execute(text("""
+            INSERT INTO clients (client_id, full_name, qb_customer_id)
+            VALUES ('00000000-0000-0000-0000-0000000000c1', 'Client One', '1')
+        """))
+        await conn.execute(text("""
+            INSERT INTO projects (project_id, project_name, client_id)
+            VALUES ('00000000-0000-0000-0000-0000000000a1', 'Project One', '00000000-0000-0000-0000-0000000000c1')
+        """))
+        await conn.execute(text("""
+            INSERT INTO quickbooks_invoices_cache (qb_invoice_id, customer_id, doc_number, qb_data)
+            VALUES ('103', '1', 'INV-103', '{}')
+        """))
+        await conn.execute(text("UPDATE sync_status SET last_sync_at = now() - interval '1 hour'"))
+
+    async with async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+
+
+@pytest.mark.asyncio
+async def test_client_cdc_groups_entities_by_type():
+    async def handler(request):
+        assert request.url.params["changedSince"] == "2025-01-15T00:00:00+00:00"
+        return httpx.Response(200, json={"CDCResponse": [{"QueryResponse": [
+            {"Customer": [{"Id": "1"}], "startPosition": 1, "maxResults": 1},
+            {"Invoice": [{"Id": "7"}, {"Id": "8", "status": "Deleted"}], "startPosition": 1, "maxResults": 2},
+        ]}], "time": "2025-01-16T00:00:00Z"})
+
+    client = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(handler))
+    changes = await client.cdc(["Customer", "Invoice", "Payment"], "2025-01-15T00:00:00+00:00", "access")
+
+    assert changes == {"Customer": [{"Id": "1"}], "Invoice": [{"Id": "7"}, {"Id": "8", "status": "Deleted"}],
+                       "Payment": []}
+
+
+@pytest.mark.asyncio
+async def test_cdc_sync_applies_changes_and_deletes_in_one_call(db, monkeypatch):
+    stub = QuickBooksStub(CHANGES)
+    use_stub(monkeypatch, stub)
+
+    result = await sync_module.QuickBooksSyncService().sync_all(db, mode="cdc")
+
+    assert stub.requests == ["cdc"]
+    assert (result["mode"], result["api_calls"], result["total_records"]) == ("cdc", 1, 3)
+    assert result["invoices"]["deactivated"] == 1
+    assert (await db.execute(text(
+        "SELECT is_active FROM quickbooks_invoices_cache WHERE qb_invoice_id = '103'"
+    ))).scalar() is False
+    paid = (await db.execute(text("SELECT amount_paid FROM invoices WHERE qb_invoice_id = '101'"))).scalar()
+    assert float(paid) == 250
+    assert (await db.execute(text("SELECT count(*) FROM payments"))).scalar() == 1
+    # CDC keeps the chat-context tier current too
+    assert (await db.execute(text(
+        "SELECT count(*) FROM quickbooks_context_customers c JOIN quickbooks_context_invoices i ON i.customer_id = c.qb_customer_id"
+    ))).scalar() == 1
+    assert (await db.execute(text(
+        "SELECT bool_and(last_sync_at > now() - interval '1 minute') FROM sync_status"
+        " WHERE entity_type IN ('customers', 'invoices', 'payments')"
+    ))).scalar() is True
+
+
+@pytest.mark.asyncio
+async def test_query_mode_needs_a_call_per_entity_and_misses_deletes(db, monkeypatch):
+    stub = QuickBooksStub(CHANGES)
+    use_stub(monkeypatch, stub)
+
+    result = await sync_module.QuickBooksSyncService().sync_all(db, mode="query")
+
+    assert stub.requests == ["query", "query", "query"]
+    assert result["total_records"] == 3
+    assert (await db.execute(text(
+        "SELECT is_active FROM quickbooks_invoices_cache WHERE qb_invoice_id = '103'"
+    ))).scalar() is True
+
+
+@pytest.mark.asyncio
+async def test_cdc_falls_back_to_query_outside_window(db, monkeypatch):
+    stub = QuickBooksStub(CHANGES)
+    use_stub(monkeypatch, stub)
+    await db.execute(text("UPDATE sync_status SET last_sync_at = now() - interval '31 days'"))
+    await db.commit()
+
+    result = await sync_module.QuickBooksSyncService().sync_all(db, mode="cdc")
+
+    assert "cdc" not in stub.requests
+    assert "mode" not in result
+    assert result["total_records"] == 3
+
+
+@pytest.mark.asyncio
+async def test_context_refresh_loads_every_customer_and_deactivates_missing_ones(db, monkeypatch):
+    changes = dict(CHANGES, Customer=CHANGES["Customer"] + [
+        {"Id": "2", "DisplayName": "Walk-in Retail", "Active": True, "MetaData": UPDATED},  # Not GC Compliance
+    ])
+    stub = QuickBooksStub(changes)
+    use_stub(monkeypatch, stub)
+    await db.execute(text("INSERT INTO quickbooks_context_invoices (qb_invoice_id, customer_id, qb_data) VALUES ('103', '1', '{}')"))
+    await db.commit()
+
+    result = await sync_module.QuickBooksSyncService().refresh_context(db)
+
+    assert stub.requests == ["query", "query"]
+    assert (result["customers"]["created"], result["invoices"]["created"]) == (2, 1)
+    assert result["invoices"]["deactivated"] == 1
+    assert (await db.execute(text(
+        "SELECT string_agg(display_name, ', ' ORDER BY display_name) FROM quickbooks_context_customers"
+    ))).scalar() == "Client One, Walk-in Retail"
+    assert (await db.execute(text(
+        "SELECT is_active FROM quickbooks_context_invoices WHERE qb_invoice_id = '103'"
+    ))).scalar() is False
+    assert (await db.execute(text(
+        "SELECT count(*) FROM sync_status WHERE entity_type LIKE 'context_%' AND last_sync_at > now() - interval '1 minute'"
+    ))).scalar() == 2
@@ -0,0 +1,93 @@
+"""
+Unit tests for the async QuickBooks client (app/services/qb_client.py).
+
+Uses an httpx MockTransport in place of the QBO v3 API.
+"""
+
+import json
+
+import httpx
+import pytest
+
+from app.services import qb_client as qb_client_module
+from app.services.qb_client import QuickBooksAPIError, QuickBooksClient, get_qb_client
+
+
+def make_client(handler) -> QuickBooksClient:
+    return QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_query_returns_entity_dicts():
+    """Query results come back as plain dicts; COUNT returns totalCount."""
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if "COUNT" in request.url.params["query"]:
+            return httpx.Response(200, json={"QueryResponse": {"totalCount": 42}})
+        return httpx.Response(200, json={"QueryResponse": {"Invoice": [{"Id": "1"}], "maxResults": 1}})
+
+    client = make_client(handler)
+    assert await client.query("SELECT * FROM Invoice", "tok") == [{"Id": "1"}]
+    assert await client.query("SELECT COUNT(*) FROM Invoice", "tok") == {"totalCount": 42}
+
+    request = seen[0]
+    assert request.url.path == "/v3/company/9130/query"
+    assert request.url.params["minorversion"] == "75"
+    assert request.headers["Authorization"] == "Bearer tok"
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_read_create_update():
+    """read/create/update hit the entity endpoints; update is sparse."""
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"Invoice": {"Id": "7", "SyncToken": "1"}})
+
+    client = make_client(handler)
+    assert await client.read("Invoice", "7", "tok") == {"Id": "7", "SyncToken": "1"}
+    await client.create("Invoice", {"CustomerRef": {"value": "3"}}, "tok")
+    await client.update("Invoice", {"Id": "7", "SyncToken": "1", "DueDate": "2026-01-01"}, "tok")
+
+    read, create, update = seen
+    assert (read.method, read.url.path) == ("GET", "/v3/company/9130/invoice/7")
+    assert (create.method, create.url.path) == ("POST", "/v3/company/9130/invoice")
+    assert update.url.params["operation"] == "update"
+    assert json.loads(update.content)["sparse"] is True
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fault_raises_api_error():
+    """HTTP errors and Fault bodies raise QuickBooksAPIError."""
+    def handler(request):
+        if request.method == "GET":
+            return httpx.Response(200, json={"Fault": {"Error": [{"Message": "Stale object"}]}})
+        return httpx.Response(401, text="unauthorized")
+
+    client = make_client(handler)
+    with pytest.raises(QuickBooksAPIError) as fault:
+        await client.read("Customer", "1", "tok")
+    assert fault.value.fault == {"Error": [{"Message": "Stale object"}]}
+
+    with pytest.raises(QuickBooksAPIError) as http_error:
+        await client.create("Customer", {}, "tok")
+    assert http_error.value.status_code == 401
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_one_pooled_client_per_realm(monkeypatch):
+    """get_qb_client reuses one client per realm/environment."""
+    monkeypatch.setattr(qb_client_module, "_clients", {})
+
+    first = get_qb_client("9130", "https://sandbox-quickbooks.api.intuit.com")
+    assert get_qb_client("9130", "https://sandbox-quickbooks.api.intuit.com") is first
+    assert get_qb_client("9131", "https://sandbox-quickbooks.api.intuit.com") is not first
+
+    await qb_client_module.close_qb_clients()
+    assert qb_client_module._clients == {}
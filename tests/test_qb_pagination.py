@@ -0,0 +1,192 @@
+"""
+Tests for the paginated QuickBooks query iterator.
+
+Runs QuickBooksService.iter_query and QuickBooksSyncService.sync_customers
+against a local QuickBooks query API stub (httpx MockTransport) holding
+10k+ entities, checking STARTPOSITION windows, bounded parallelism and
+page-by-page upserts.
+"""
+
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.services import quickbooks_sync_service as sync_module
+from app.services.qb_client import QuickBooksClient
+from app.services.quickbooks_service import QuickBooksService
+from app.utils.qb_pagination import iter_query_pages, strip_paging
+
+CUSTOMER_COUNT = 10_500
+GC_TYPE = sync_module.QuickBooksSyncService.GC_COMPLIANCE_CUSTOMER_TYPE
+
+
+class QuickBooksStub:
+    """Minimal QBO /query endpoint: honours STARTPOSITION/MAXRESULTS, tracks concurrency."""
+
+    def __init__(self, customers):
+        self.customers = customers
+        self.queries = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        query = request.url.params["query"]
+        self.queries.append(query)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            start = int(re.search(r"STARTPOSITION (\d+)", query).group(1))
+            limit = min(int(re.search(r"MAXRESULTS (\d+)", query).group(1)), 1000)
+            page = self.customers[start - 1:start - 1 + limit]
+            body = {"QueryResponse": {"Customer": page, "startPosition": start, "maxResults": len(page)}}
+            if not page:
+                body = {"QueryResponse": {}}
+            return httpx.Response(200, json=body)
+        finally:
+            self.in_flight -= 1
+
+
+def make_customers(n):
+    return [
+        {
+            "Id": str(i),
+            "DisplayName": f"Customer {i}",
+            "Active": True,
+            "CustomerTypeRef": {"value": GC_TYPE if i % 2 == 0 else "1"},
+            "MetaData": {"LastUpdatedTime": "2025-01-01T00:00:00-08:00"},
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+@pytest.fixture
+def stub():
+    return QuickBooksStub(make_customers(CUSTOMER_COUNT))
+
+
+def authenticated_service(stub, db=None) -> QuickBooksService:
+    """QuickBooksService whose pooled client talks to the stub."""
+    service = QuickBooksService(db=db)
+    service.realm_id = "9130"
+    service.access_token = "access"
+    service.refresh_token = "refresh"
+    service.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    service.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(stub))
+    return service
+
+
+def test_strip_paging():
+    assert strip_paging("SELECT * FROM Invoice STARTPOSITION 5 maxresults 1000") == "SELECT * FROM Invoice"
+
+
+@pytest.mark.asyncio
+async def test_iter_query_walks_every_window(stub):
+    """All 10k+ entities arrive once, in order, with bounded parallel fetches."""
+    service = authenticated_service(stub)
+    ids = []
+    async for page in service.iter_query("SELECT * FROM Customer MAXRESULTS 1000", concurrency=4):
+        assert len(page) <= 1000
+        ids.extend(int(c["Id"]) for c in page)
+
+    assert ids == list(range(1, CUSTOMER_COUNT + 1))
+    assert stub.max_in_flight == 4
+    # 11 data windows + at most concurrency-1 windows past the end
+    assert 11 <= len(stub.queries) <= 14
+    assert stub.queries[0] == "SELECT * FROM Customer STARTPOSITION 1 MAXRESULTS 1000"
+
+
+@pytest.mark.asyncio
+async def test_single_page_uses_one_request(stub):
+    """Small (delta) result sets cost exactly one API call."""
+    stub.customers = stub.customers[:37]
+    pages = [page async for page in authenticated_service(stub).iter_query("SELECT * FROM Customer")]
+
+    assert [len(p) for p in pages] == [37]
+    assert len(stub.queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_page_cancels_in_flight_windows():
+    """A failing window propagates and cancels the other in-flight fetches."""
+    cancelled = []
+
+    async def fetch_page(query):
+        start = int(re.search(r"STARTPOSITION (\d+)", query).group(1))
+        if start == 1:
+            return [{}] * 10
+        if start == 11:
+            raise RuntimeError("QB 500")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(start)
+            raise
+
+    with pytest.raises(RuntimeError):
+        async for _ in iter_query_pages(fetch_page, "SELECT * FROM Payment", page_size=10, concurrency=3):
+            pass
+
+    assert sorted(cancelled) == [21, 31]
+
+
+@pytest_asyncio.fixture
+async def cache_db(tmp_path):
+    """SQLite stand-in for the customer cache, chat-context, sync_status and sync_runs tables."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/cache.db", poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            CREATE TABLE quickbooks_customers_cache (
+                qb_customer_id TEXT PRIMARY KEY, display_name TEXT, company_name TEXT,
+                given_name TEXT, family_name TEXT, email TEXT, phone TEXT, qb_data TEXT, content_hash TEXT,
+                qb_last_modified TIMESTAMP, is_active BOOLEAN, sync_error TEXT, cached_at TIMESTAMP
+            )
+        """))
+        await conn.execute(text("""
+            CREATE TABLE quickbooks_context_customers (
+                qb_customer_id TEXT PRIMARY KEY, display_name TEXT, qb_data TEXT, content_hash TEXT,
+                qb_last_modified TIMESTAMP, is_active BOOLEAN, sync_error TEXT, cached_at TIMESTAMP
+            )
+        """))
+        await conn.execute(text("""
+            CREATE TABLE sync_status (
+                entity_type TEXT PRIMARY KEY, last_sync_at TIMESTAMP, last_sync_duration_ms INTEGER,
+                records_synced INTEGER, sync_errors INTEGER, last_error_message TEXT,
+                is_syncing BOOLEAN, updated_at TIMESTAMP
+            )
+        """))
+        await conn.execute(text("INSERT INTO sync_status (entity_type) VALUES ('customers')"))
+        await conn.execute(text("""
+            CREATE TABLE sync_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, entity_type TEXT, query TEXT, since TIMESTAMP,
+                page_size INTEGER, status TEXT DEFAULT 'running', pages_committed INTEGER DEFAULT 0,
+                next_start_position INTEGER DEFAULT 1, records_fetched INTEGER DEFAULT 0,
+                records_synced INTEGER DEFAULT 0, errors INTEGER DEFAULT 0, last_error TEXT,
+                resume_count INTEGER DEFAULT 0, started_at TIMESTAMP, updated_at TIMESTAMP, finished_at TIMESTAMP
+            )
+        """))
+    async with AsyncSession(engine) as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sync_customers_upserts_every_page(stub, cache_db, monkeypatch):
+    """Full customer sync keeps GC Compliance customers from every page, not just the first 1000."""
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", lambda db: authenticated_service(stub, db))
+
+    result = await sync_module.QuickBooksSyncService().sync_customers(cache_db, since=None)
+
+    cached = (await cache_db.execute(text("SELECT COUNT(*) FROM quickbooks_customers_cache"))).scalar()
+    assert result["records_synced"] == cached == CUSTOMER_COUNT // 2
+    # The chat-context tier gets every customer from the same pages
+    assert (await cache_db.execute(text("SELECT COUNT(*) FROM quickbooks_context_customers"))).scalar() == CUSTOMER_COUNT
+    assert result["skipped"] == CUSTOMER_COUNT - CUSTOMER_COUNT // 2
+    assert result["errors"] == 0
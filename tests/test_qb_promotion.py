@@ -0,0 +1,144 @@
+"""
+Tests for set-based QuickBooks promotion (app/services/qb_promotion_service.py).
+
+The promotion statements are PostgreSQL-only (CTE INSERT ... RETURNING,
+jsonb, LATERAL), so these tests run on the postgres_engine scratch database
+and are skipped unless TEST_POSTGRES_URL is set.
+"""
+
+import json
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.services.qb_promotion_service import qb_promotion_service
+
+
+@pytest_asyncio.fixture
+async def db(postgres_engine):
+    async with postgres_engine.begin() as conn:
+        # Two clients: C1 with one project, C2 with none
+        await conn.execute(text("""
+            INSERT INTO clients (client_id, full_name, qb_customer_id) VALUES
+            ('00000000-0000-0000-0000-0000000000c1', 'Client One', '1'),
+            ('00000000-0000-0000-0000-0000000000c2', 'Client Two', '2')
+        """))
+        await conn.execute(text("""
+            INSERT INTO projects (project_id, project_name, client_id) VALUES
+            ('00000000-0000-0000-0000-0000000000a1', 'Project One', '00000000-0000-0000-0000-0000000000c1')
+        """))
+
+    async with async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+
+
+async def cache_invoice(db, qb_id, customer_id, doc_number, total, balance):
+    invoice = {"Id": qb_id, "DocNumber": doc_number, "CustomerRef": {"value": customer_id},
+               "TxnDate": "2025-01-15", "DueDate": "2025-02-15", "TotalAmt": total, "Balance": balance,
+               "BillEmail": {"Address": "billing@example.com"}, "MetaData": {"LastUpdatedTime": "2025-01-15T10:00:00Z"}}
+    await db.execute(
+        text("""INSERT INTO quickbooks_invoices_cache (qb_invoice_id, customer_id, doc_number, total_amount, balance, qb_data)
+                VALUES (:id, :customer_id, :doc_number, :total, :balance, CAST(:qb_data AS jsonb))"""),
+        {"id": qb_id, "customer_id": customer_id, "doc_number": doc_number, "total": total,
+         "balance": balance, "qb_data": json.dumps(invoice)},
+    )
+
+
+async def cache_payment(db, qb_id, customer_id, qb_invoice_id, amount):
+    payment = {"Id": qb_id, "CustomerRef": {"value": customer_id}, "TotalAmt": amount, "UnappliedAmt": 0,
+               "Line": [{"LinkedTxn": [{"TxnId": qb_invoice_id, "TxnType": "Invoice"}]}] if qb_invoice_id else []}
+    await db.execute(
+        text("""INSERT INTO quickbooks_payments_cache (qb_payment_id, customer_id, invoice_id, amount, payment_date, qb_data)
+                VALUES (:id, :customer_id, :invoice_id, :amount, :payment_date, CAST(:qb_data AS jsonb))"""),
+        {"id": qb_id, "customer_id": customer_id, "invoice_id": qb_invoice_id, "amount": amount,
+         "payment_date": date(2025, 1, 20), "qb_data": json.dumps(payment)},
+    )
+
+
+@pytest.mark.asyncio
+async def test_promote_invoices_reports_skips_and_duplicates(db):
+    """Promotable rows land in one pass; the rest are reported with a reason."""
+    await cache_invoice(db, "101", "1", "INV-1", 1000, 0)
+    await cache_invoice(db, "102", "1", "INV-2", 1000, 400)
+    await cache_invoice(db, "103", "1", "INV-3", 1000, 1000)
+    await cache_invoice(db, "104", "9", "INV-4", 500, 500)    # unknown customer
+    await cache_invoice(db, "105", "2", "INV-5", 500, 500)    # client without project
+    await cache_invoice(db, "106", "1", "INV-1", 700, 700)    # DocNumber of 101
+    await db.commit()
+
+    report = await qb_promotion_service.promote_invoices(db)
+
+    assert report["promoted"] == 3
+    assert {(r["qb_id"], r["reason"]) for r in report["skipped_rows"]} == {
+        ("104", "client_not_found"), ("105", "no_project")}
+    assert [(r["qb_id"], r["reason"]) for r in report["error_rows"]] == [("106", "duplicate_invoice_number")]
+    assert (report["skipped"], report["errors"]) == (2, 1)
+
+    rows = (await db.execute(text(
+        "SELECT qb_invoice_id, status::text, amount_paid, balance_due, bill_email, invoice_date::date "
+        "FROM invoices ORDER BY qb_invoice_id"
+    ))).fetchall()
+    assert [(r[0], r[1], float(r[2]), float(r[3])) for r in rows] == [
+        ("101", "PAID", 1000, 0), ("102", "PARTIALLY_PAID", 600, 400), ("103", "SENT", 0, 1000)]
+    assert rows[0].bill_email == "billing@example.com"
+    assert rows[0].invoice_date == date(2025, 1, 15)
+
+    # Re-running is an idempotent upsert
+    again = await qb_promotion_service.promote_invoices(db, ["101", "102"])
+    assert again["promoted"] == 2
+    assert (await db.execute(text("SELECT count(*) FROM invoices"))).scalar() == 3
+
+
+@pytest.mark.asyncio
+async def test_promote_payments_recomputes_invoice_amounts(db):
+    """Payments upsert in one statement and touched invoices are recomputed in the same transaction."""
+    await cache_invoice(db, "201", "1", "INV-201", 1000, 1000)
+    await db.commit()
+    await qb_promotion_service.promote_invoices(db)
+
+    await cache_payment(db, "301", "1", "201", 300)
+    await cache_payment(db, "302", "1", "201", 200)
+    await cache_payment(db, "303", "1", None, 50)       # prepayment -> client's project
+    await cache_payment(db, "304", "1", "999", 10)      # invoice never promoted
+    await cache_payment(db, "305", "9", "201", 10)      # unknown customer
+    await db.commit()
+
+    report = await qb_promotion_service.promote_payments(db)
+
+    assert report["promoted"] == 3
+    assert {(r["qb_id"], r["reason"]) for r in report["skipped_rows"]} == {
+        ("304", "invoice_not_promoted"), ("305", "client_not_found")}
+    assert report["invoices_recomputed"] == 1
+
+    invoice = (await db.execute(text(
+        "SELECT amount_paid, balance_due FROM invoices WHERE qb_invoice_id = '201'"
+    ))).one()
+    assert (float(invoice.amount_paid), float(invoice.balance_due)) == (500, 500)
+
+    prepayment = (await db.execute(text(
+        "SELECT invoice_id, project_id::text, status::text FROM payments WHERE qb_payment_id = '303'"
+    ))).one()
+    assert prepayment.invoice_id is None
+    assert prepayment.project_id == "00000000-0000-0000-0000-0000000000a1"
+    assert prepayment.status == "POSTED"
+
+
+@pytest.mark.asyncio
+async def test_bad_row_falls_back_to_per_row_savepoints(db):
+    """A row that breaks the batch statement is isolated; the others are still promoted."""
+    await cache_invoice(db, "401", "1", "INV-401", 100, 0)
+    await cache_invoice(db, "402", "1", "INV-402", 100, 0)
+    await db.execute(text(
+        "UPDATE quickbooks_invoices_cache SET qb_data = jsonb_set(qb_data, '{TxnDate}', '\"not-a-date\"') "
+        "WHERE qb_invoice_id = '402'"
+    ))
+    await db.commit()
+
+    report = await qb_promotion_service.promote_invoices(db)
+
+    assert report["promoted"] == 1
+    assert [r["qb_id"] for r in report["error_rows"]] == ["402"]
+    assert (await db.execute(text("SELECT qb_invoice_id FROM invoices"))).scalars().all() == ["401"]
@@ -0,0 +1,64 @@
+"""
+Tests for field-projected QuickBooks queries (app/utils/qb_query_builder.py).
+
+Query strings and record trimming are tested in memory; projected reads go
+through QuickBooksService against the in-process simulator.
+"""
+
+import json
+
+import pytest
+
+from app.services.qb_cache_loader import invoice_cache_row
+from app.utils.qb_query_builder import FIELD_SETS, QBQuery, filters_on
+from tests.qb_simulator import QuickBooksSimulator, simulated_quickbooks_service
+
+
+def test_query_strings():
+    assert str(QBQuery("Invoice")) == "SELECT * FROM Invoice"
+    assert str(
+        QBQuery("Customer", fields=["Id", "DisplayName"]).where("Active = true").where_in("Id", ["1", "O'Brien"])
+    ) == "SELECT Id, DisplayName FROM Customer WHERE Active = true AND Id IN ('1', 'O\\'Brien')"
+    assert str(QBQuery("Invoice", "context").where_equals("CustomerRef", "4").order_by("TxnDate DESC")).startswith(
+        "SELECT Id, SyncToken, MetaData, DocNumber, CustomerRef, TxnDate, DueDate, TotalAmt, Balance FROM Invoice "
+    )
+    with pytest.raises(KeyError):
+        QBQuery("Payment", "matching")
+
+    # Selecting CustomerTypeRef is fine - only filtering on it is unsupported
+    assert not filters_on(str(QBQuery("Customer", "sync")), "CustomerTypeRef")
+    assert filters_on("SELECT * FROM Customer WHERE CustomerTypeRef = '698682'", "CustomerTypeRef")
+    assert filters_on(QBQuery("Customer").where_equals("CustomerTypeRef", "698682"), "CustomerTypeRef")
+
+
+def test_unprojected_entities_compact_to_the_same_cache_row():
+    simulator = QuickBooksSimulator(customers=3, invoices_per_customer=1)
+    full = simulator.entities["Invoice"]["1"]
+    projected = QBQuery("Invoice", "sync").records(
+        simulator.query(str(QBQuery("Invoice", "sync").where_in("Id", ["1"])))["QueryResponse"]["Invoice"]
+    )[0]
+
+    full_row, projected_row = invoice_cache_row(full), invoice_cache_row(projected)
+    assert full_row["content_hash"] == projected_row["content_hash"]
+    assert set(json.loads(full_row["qb_data"])) == set(FIELD_SETS["sync"]["Invoice"]) - {"PrivateNote", "CustomerMemo"}
+    assert "CustomField" in full and "CustomField" not in json.loads(full_row["qb_data"])
+
+
+@pytest.mark.asyncio
+async def test_projected_reads_return_compact_records():
+    simulator = QuickBooksSimulator(customers=12, invoices_per_customer=2)
+    qb = simulated_quickbooks_service(simulator)
+
+    everything = await qb.get_customers()
+    simulator.reset_stats()
+    matching = await qb.get_customers(use_case="matching")
+    invoices = await qb.get_invoices(customer_id="4", use_case="context")
+
+    assert [c["Id"] for c in matching] == [c["Id"] for c in everything]
+    assert all(set(c) <= set(FIELD_SETS["matching"]["Customer"]) for c in matching)
+    assert {"SyncToken", "GivenName", "CustomerTypeRef"} <= set(matching[0])
+    assert [i["CustomerRef"]["value"] for i in invoices] == ["4", "4"]
+    assert "Line" not in invoices[0]
+    # Same number of requests, a fraction of the bytes
+    assert simulator.stats["requests"] == 2
+    assert simulator.stats["bytes_sent"] < len(json.dumps(everything))
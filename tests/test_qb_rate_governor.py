@@ -0,0 +1,149 @@
+"""
+Tests for the realm-wide QuickBooks rate governor (app/utils/qb_rate_governor.py)
+and its circuit breaker integration.
+
+Governors run on the real event loop clock with small limits; QuickBooks
+429s come from an httpx MockTransport.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services.qb_client import QuickBooksClient, QuickBooksRateLimitError
+from app.utils.circuit_breaker import CircuitBreaker, CircuitBreakerError, CircuitState
+from app.utils.qb_rate_governor import BACKGROUND, INTERACTIVE, background_priority, qb_rate_governor
+
+
+@pytest.mark.asyncio
+async def test_background_cannot_take_reserved_slots(monkeypatch):
+    """With one slot reserved, background work queues while chat still gets through."""
+    monkeypatch.setattr(settings, "QB_MAX_CONCURRENT_REQUESTS", 2)
+    monkeypatch.setattr(settings, "QB_INTERACTIVE_RESERVED_SLOTS", 1)
+    governor = qb_rate_governor.realm("9130")
+    order = []
+
+    async def call(name, priority, hold):
+        async with qb_rate_governor.slot("9130", priority):
+            order.append(name)
+            await hold.wait()
+
+    release_first, release_rest = asyncio.Event(), asyncio.Event()
+    release_rest.set()
+    first = asyncio.create_task(call("sync-1", BACKGROUND, release_first))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(call("sync-2", BACKGROUND, release_rest))
+    await asyncio.sleep(0.01)
+    chat = asyncio.create_task(call("chat", INTERACTIVE, release_rest))
+    await asyncio.sleep(0.01)
+
+    assert order == ["sync-1", "chat"]
+    release_first.set()
+    await asyncio.gather(first, second, chat)
+    assert order == ["sync-1", "chat", "sync-2"]
+    assert governor.throttle_waits == {INTERACTIVE: 0, BACKGROUND: 1}
+
+
+@pytest.mark.asyncio
+async def test_waiting_interactive_requests_go_first(monkeypatch):
+    monkeypatch.setattr(settings, "QB_MAX_CONCURRENT_REQUESTS", 1)
+    monkeypatch.setattr(settings, "QB_INTERACTIVE_RESERVED_SLOTS", 0)
+    order = []
+    gate = asyncio.Event()
+
+    async def call(name, priority=None):
+        async with qb_rate_governor.slot("9130", priority):
+            order.append(name)
+            await gate.wait()
+
+    holder = asyncio.create_task(call("holder"))
+    await asyncio.sleep(0.01)
+    with background_priority():
+        queued = [asyncio.create_task(call(f"sync-{i}")) for i in range(3)]
+    await asyncio.sleep(0.01)
+    queued.append(asyncio.create_task(call("chat")))
+    await asyncio.sleep(0.01)
+
+    gate.set()
+    await asyncio.gather(holder, *queued)
+    assert order == ["holder", "chat", "sync-0", "sync-1", "sync-2"]
+
+
+@pytest.mark.asyncio
+async def test_empty_bucket_waits_for_refill(monkeypatch):
+    monkeypatch.setattr(settings, "QB_RATE_LIMIT_PER_MINUTE", 600)  # 10 tokens/s
+    governor = qb_rate_governor.realm("9130")
+    governor.tokens = 0
+
+    async with qb_rate_governor.slot("9130"):
+        pass
+
+    status = governor.get_status()["by_priority"]["interactive"]
+    assert status["throttle_waits"] == 1
+    assert 60 <= status["wait_ms_max"] <= 500
+
+
+@pytest.mark.asyncio
+async def test_429_backs_off_for_retry_after_and_retries(monkeypatch):
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "0.2"}, text="Too Many Requests"),
+        httpx.Response(200, json={"QueryResponse": {"Customer": [{"Id": "1"}]}}),
+    ])
+    client = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(lambda request: next(responses)))
+    loop = asyncio.get_running_loop()
+
+    start = loop.time()
+    assert await client.query("SELECT * FROM Customer", "tok") == [{"Id": "1"}]
+
+    assert loop.time() - start >= 0.2
+    status = qb_rate_governor.get_status()["9130"]
+    assert (status["throttled_responses"], status["last_retry_after"]) == (1, 0.2)
+    assert status["effective_rate_per_minute"] == pytest.approx(settings.QB_RATE_LIMIT_PER_MINUTE * 0.55)
+
+
+@pytest.mark.asyncio
+async def test_persistent_429_is_not_a_circuit_failure(monkeypatch):
+    monkeypatch.setattr(settings, "QB_THROTTLE_MAX_RETRIES", 1)
+    client = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(
+        lambda request: httpx.Response(429, headers={"Retry-After": "0"})
+    ))
+    breaker = CircuitBreaker("test", failure_threshold=1)
+
+    with pytest.raises(QuickBooksRateLimitError):
+        await breaker.call(client.query, "SELECT * FROM Customer", "tok")
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.get_status()["metrics"]["throttled_calls"] == 1
+    assert qb_rate_governor.get_status()["9130"]["throttled_responses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_half_open_admits_one_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, cooldown_seconds=0)
+
+    async def fail():
+        raise RuntimeError("QB 500")
+
+    with pytest.raises(RuntimeError):
+        await breaker.call(fail)
+    assert breaker.state == CircuitState.OPEN
+
+    probe_started, finish_probe = asyncio.Event(), asyncio.Event()
+
+    async def slow_ok():
+        probe_started.set()
+        await finish_probe.wait()
+        return "ok"
+
+    probe = asyncio.create_task(breaker.call(slow_ok))
+    await probe_started.wait()
+    with pytest.raises(CircuitBreakerError):
+        await breaker.call(slow_ok)
+    finish_probe.set()
+
+    assert await probe == "ok"
+    assert breaker.state == CircuitState.CLOSED
+    metrics = breaker.get_status()["metrics"]
+    assert (metrics["half_open_probes"], metrics["probe_successes"], metrics["rejected_calls"]) == (1, 1, 1)
@@ -0,0 +1,161 @@
+"""
+Tests for the two-tier QuickBooks read cache (app/services/qb_read_cache.py).
+
+Chat context and the /v1/quickbooks/sync/cache/* routes are served from
+in-memory snapshots of the quickbooks_context_* and quickbooks_*_cache
+tables; a QuickBooks stub fails every request, so any live API call breaks
+the test. Everything runs
+on the postgres_engine scratch database (cache-version triggers included)
+and is skipped unless TEST_POSTGRES_URL is set.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.session import get_db
+from app.routes.auth_supabase import get_current_user
+from app.routes.quickbooks_sync import router
+from app.services.qb_client import QuickBooksClient
+from app.services.qb_read_cache import qb_read_cache
+from app.services.quickbooks_service import QuickBooksService
+from app.utils.context_builder import build_quickbooks_context
+
+
+async def insert_customer(db, qb_id, name, active=True):
+    await db.execute(
+        text("""
+            INSERT INTO quickbooks_customers_cache (qb_customer_id, display_name, qb_data, is_active)
+            VALUES (:qb_id, :name, CAST(:qb_data AS jsonb), :active)
+        """),
+        {"qb_id": qb_id, "name": name, "active": active, "qb_data": json.dumps({"Id": qb_id, "DisplayName": name})}
+    )
+
+
+async def insert_invoice(db, qb_id, customer_id, total, balance, created, due_date=None):
+    qb_data = {
+        "Id": qb_id, "DocNumber": f"INV-{qb_id}", "CustomerRef": {"value": customer_id, "name": f"Customer {customer_id}"},
+        "TotalAmt": total, "Balance": balance, "MetaData": {"CreateTime": created},
+    }
+    await db.execute(
+        text("""
+            INSERT INTO quickbooks_invoices_cache (qb_invoice_id, customer_id, doc_number, total_amount, balance, due_date, qb_data)
+            VALUES (:qb_id, :customer_id, :doc_number, :total, :balance, :due_date, CAST(:qb_data AS jsonb))
+        """),
+        {
+            "qb_id": qb_id, "customer_id": customer_id, "doc_number": f"INV-{qb_id}", "total": total,
+            "balance": balance, "due_date": due_date, "qb_data": json.dumps(qb_data),
+        }
+    )
+
+
+@pytest_asyncio.fixture
+async def factory(postgres_engine):
+    factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        await insert_customer(db, "1", "Temple Baptist")
+        await insert_customer(db, "2", "Ace Builders")
+        await insert_customer(db, "3", "Closed Account", active=False)
+        await insert_invoice(db, "10", "1", 500, 0, "2026-01-05T10:00:00-08:00", datetime(2026, 2, 5, tzinfo=timezone.utc))
+        await insert_invoice(db, "11", "1", 750, 750, "2026-03-01T10:00:00-08:00", datetime(2026, 4, 1, tzinfo=timezone.utc))
+        await insert_invoice(db, "12", "2", 300, 100, "2026-02-01T10:00:00-08:00", datetime(2026, 3, 1, tzinfo=timezone.utc))
+        await insert_invoice(db, "13", "3", 999, 999, "2026-02-02T10:00:00-08:00")
+        # Chat-context tier: the same records plus a customer outside GC Compliance
+        await db.execute(text("""
+            INSERT INTO quickbooks_context_customers (qb_customer_id, display_name, qb_data, is_active)
+            SELECT qb_customer_id, display_name, qb_data, is_active FROM quickbooks_customers_cache
+            UNION ALL
+            SELECT '4', 'Walk-in Retail', '{"Id": "4", "DisplayName": "Walk-in Retail"}', true
+        """))
+        await db.execute(text("""
+            INSERT INTO quickbooks_context_invoices (qb_invoice_id, customer_id, qb_data)
+            SELECT qb_invoice_id, customer_id, qb_data FROM quickbooks_invoices_cache
+            UNION ALL
+            SELECT '14', '4', CAST(:qb_data AS jsonb)
+        """), {"qb_data": json.dumps({
+            "Id": "14", "DocNumber": "INV-14", "CustomerRef": {"value": "4"},
+            "TotalAmt": 200, "Balance": 0, "MetaData": {"CreateTime": "2026-03-15T10:00:00-08:00"},
+        })})
+        await db.commit()
+    return factory
+
+
+def offline_qb_service(db, requests):
+    async def stub(request):
+        requests.append(request.url)
+        return httpx.Response(503, text="QuickBooks must not be called")
+
+    qb = QuickBooksService(db=db)
+    qb.realm_id = "9130"
+    qb.access_token = "access"
+    qb.refresh_token = "refresh"
+    qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    qb.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(stub))
+    return qb
+
+
+@pytest.mark.asyncio
+async def test_chat_context_is_served_from_memory_until_the_cache_changes(factory):
+    requests = []
+    async with factory() as db:
+        qb = offline_qb_service(db, requests)
+        first = await build_quickbooks_context(qb)
+        second = await build_quickbooks_context(qb)
+
+        # Inactive customer left out; non-GC customers included
+        assert [c["Id"] for c in first["customers"]] == ["2", "1", "4"]
+        assert [i["Id"] for i in first["invoices"]] == ["14", "11", "12", "10"]  # Most recent first
+        assert first["summary"] == {
+            "total_customers": 3, "total_invoices": 4, "recent_invoices_shown": 4,
+            "total_amount": 1750.0, "paid_count": 2, "unpaid_count": 2,
+        }
+        assert second == first
+        assert second["customers"] is not first["customers"]
+        assert (qb_read_cache.db_loads, requests) == (2, [])  # One load per table, then memory
+
+        # A webhook / sync write bumps the cache version - only that table is re-read
+        await db.execute(text(
+            "UPDATE quickbooks_context_invoices SET is_active = false, cached_at = CURRENT_TIMESTAMP WHERE qb_invoice_id = '11'"
+        ))
+        await db.commit()
+        third = await build_quickbooks_context(qb)
+
+    assert third["summary"]["total_invoices"] == 3
+    assert third["summary"]["unpaid_count"] == 1
+    assert (qb_read_cache.db_loads, requests) == (3, [])
+
+
+@pytest.mark.asyncio
+async def test_cache_routes_filter_and_page_the_snapshot(factory):
+    async def override_get_db():
+        async with factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: None
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        customers = (await client.get("/v1/quickbooks/sync/cache/customers")).json()
+        everyone = (await client.get("/v1/quickbooks/sync/cache/customers", params={"active_only": False})).json()
+        page = (await client.get("/v1/quickbooks/sync/cache/invoices", params={"limit": 2, "offset": 1})).json()
+        temple = (await client.get("/v1/quickbooks/sync/cache/invoices", params={"customer_id": "1"})).json()
+        invoice = (await client.get("/v1/quickbooks/sync/cache/invoices/12")).json()
+        missing = await client.get("/v1/quickbooks/sync/cache/invoices/99")
+
+    assert [c["display_name"] for c in customers["customers"]] == ["Ace Builders", "Temple Baptist"]
+    assert (customers["total"], everyone["total"]) == (2, 3)
+    # due_date DESC (NULLs first, as in PostgreSQL), then paged
+    assert [i["qb_invoice_id"] for i in page["invoices"]] == ["11", "12"]
+    assert page["total"] == 4
+    assert [i["qb_invoice_id"] for i in temple["invoices"]] == ["11", "10"]
+    assert (invoice["invoice"]["customer_name"], invoice["invoice"]["balance_due"]) == ("Customer 2", 100.0)
+    assert missing.status_code == 404
+    assert qb_read_cache.db_loads == 2  # customers + invoices, each read once
@@ -0,0 +1,190 @@
+"""
+Tests for the QuickBooks reference-data cache (app/services/qb_reference_cache.py).
+
+A QuickBooks stub (httpx MockTransport) serves Item / Vendor / Term queries
+and /cdc and counts requests, so reads can be checked to make no API calls.
+Everything runs on the postgres_engine scratch database and is skipped
+unless TEST_POSTGRES_URL is set.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.session import get_db
+from app.routes.quickbooks import router
+from app.services import qb_reference_cache as reference_module
+from app.services import quickbooks_sync_service as sync_module
+from app.services.qb_client import QuickBooksClient
+from app.services.qb_reference_cache import QuickBooksReferenceCache, qb_reference_cache
+from app.services.qb_webhook_worker import QuickBooksWebhookWorker
+from app.services.quickbooks_service import QuickBooksService
+
+
+class QuickBooksStub:
+    def __init__(self):
+        self.entities = {
+            "Item": [
+                {"Id": "108", "Name": "GC Permit Oversight", "Type": "Service", "Active": True},
+                {"Id": "5", "Name": "Lumber", "Type": "NonInventory", "Active": True},
+                {"Id": "6", "Name": "Old Fee", "Type": "Service", "Active": False},
+            ],
+            "Vendor": [{"Id": "50", "DisplayName": "Ace Supply", "Active": True}],
+        }
+        self.cdc_changes = {}
+        self.requests = []
+        self.fail = False
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rsplit("/", 1)[-1]
+        if self.fail:
+            return httpx.Response(503, text="Service unavailable")
+        if path == "cdc":
+            self.requests.append("cdc")
+            return httpx.Response(200, json={"CDCResponse": [{"QueryResponse": [
+                {entity: self.cdc_changes.get(entity, [])} for entity in request.url.params["entities"].split(",")
+            ]}]})
+        query = request.url.params["query"]
+        self.requests.append(query)
+        entity = re.search(r"FROM (\w+)", query).group(1)
+        records = self.entities.get(entity, [])
+        if "Active IN (true, false)" not in query:
+            records = [r for r in records if r["Active"]]  # Name lists default to active records
+        ids = re.search(r"Id IN \((.*?)\)", query)
+        if ids:
+            wanted = re.findall(r"'(\w+)'", ids.group(1))
+            records = [r for r in records if r["Id"] in wanted]
+        elif int(re.search(r"STARTPOSITION (\d+)", query).group(1)) > 1:
+            records = []
+        return httpx.Response(200, json={"QueryResponse": {entity: records} if records else {}})
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    quickbooks = QuickBooksStub()
+
+    def service(db):
+        qb = QuickBooksService(db=db)
+        qb.realm_id = "9130"
+        qb.access_token = "access"
+        qb.refresh_token = "refresh"
+        qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        qb.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(quickbooks))
+        return qb
+
+    monkeypatch.setattr(reference_module, "get_quickbooks_service", service)
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", service)
+    return quickbooks
+
+
+@pytest_asyncio.fixture
+async def factory(postgres_engine):
+    return async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_reads_come_from_memory_then_postgres_then_quickbooks(factory, stub):
+    async with factory() as db:
+        items = await qb_reference_cache.get(db, "items")
+        active = await qb_reference_cache.get(db, "items", active_only=True)
+        assert await qb_reference_cache.get_by_id(db, "items", "108") == stub.entities["Item"][0]
+
+    assert [item["Id"] for item in items] == ["108", "5", "6"]  # Ordered by name, inactive kept
+    assert [item["Id"] for item in active] == ["108", "5"]
+    assert stub.requests == ["SELECT * FROM Item WHERE Active IN (true, false) STARTPOSITION 1 MAXRESULTS 1000"]
+
+    # Another process: no memory yet, but Postgres is fresh - still no API call
+    other = QuickBooksReferenceCache()
+    async with factory() as db:
+        assert len(await other.get(db, "items")) == 3
+    assert (other.db_loads, len(stub.requests)) == (1, 1)
+
+    # Past the TTL the copy is reloaded; if QuickBooks is down, the stale copy is served
+    async with factory() as db:
+        await db.execute(text("UPDATE qb_reference_status SET refreshed_at = now() - interval '2 days'"))
+        await db.commit()
+        stub.fail = True
+        assert len(await QuickBooksReferenceCache().get(db, "items")) == 3
+
+        stub.fail = False
+        stub.entities["Item"].pop(1)
+        assert [item["Id"] for item in await QuickBooksReferenceCache().get(db, "items")] == ["108", "6"]
+
+
+@pytest.mark.asyncio
+async def test_routes_serve_reference_data_without_api_calls(factory, stub):
+    async def override_get_db():
+        async with factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router, prefix="/v1/quickbooks")
+    app.dependency_overrides[get_db] = override_get_db
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for _ in range(3):
+            items = (await client.get("/v1/quickbooks/items", params={"item_type": "Service"})).json()
+            vendors = (await client.get("/v1/quickbooks/vendors")).json()
+
+    assert [item["Name"] for item in items["items"]] == ["GC Permit Oversight"]
+    assert vendors["vendors"][0]["DisplayName"] == "Ace Supply"
+    assert len(stub.requests) == 2  # One load per type, then memory
+
+
+@pytest.mark.asyncio
+async def test_cdc_sync_and_webhooks_update_reference_data(factory, stub):
+    async with factory() as db:
+        await qb_reference_cache.get(db, "items")
+        await db.execute(text("UPDATE sync_status SET last_sync_at = now() - interval '1 hour'"))
+        await db.execute(text("UPDATE qb_reference_status SET refreshed_at = now() - interval '30 minutes'"))
+        await db.commit()
+
+        stub.cdc_changes = {
+            "Item": [{"Id": "108", "Name": "GC Permit Oversight (2026)", "Type": "Service", "Active": True}],
+            "Vendor": [{"Id": "51", "DisplayName": "Never loaded", "Active": True}],
+        }
+        stub.requests.clear()
+        result = await sync_module.QuickBooksSyncService().sync_all(db, mode="cdc")
+
+        assert stub.requests == ["cdc"]
+        assert result["reference"] == {"items": 1}  # Vendors were never loaded - left to the TTL reload
+        assert (await qb_reference_cache.get_by_id(db, "items", "108"))["Name"] == "GC Permit Oversight (2026)"
+        assert (await db.execute(text(
+            "SELECT refreshed_at > now() - interval '1 minute' FROM qb_reference_status WHERE entity_type = 'items'"
+        ))).scalar() is True
+
+    stub.entities["Item"].append({"Id": "7", "Name": "Inspection Fee", "Type": "Service", "Active": True})
+    async with factory() as db:
+        await db.execute(text("""
+            INSERT INTO webhook_events (event_id, realm_id, event_type, entity_type, entity_ids, payload)
+            VALUES ('e1', '9130', 'Item.Create', 'item', '["7"]', '{}'), ('e2', '9130', 'Item.Delete', 'item', '["6"]', '{}')
+        """))
+        await db.commit()
+
+    await QuickBooksWebhookWorker(session_factory=factory).drain()
+
+    async with factory() as db:
+        assert [item["Id"] for item in await qb_reference_cache.get(db, "items")] == ["108", "7", "5"]
+    assert stub.requests[-1] == "SELECT * FROM Item WHERE Id IN ('7') AND Active IN (true, false) STARTPOSITION 1 MAXRESULTS 1000"
+
+    # An item made inactive is fetched as inactive; one QuickBooks no longer returns is dropped
+    stub.entities["Item"][1]["Active"] = False
+    async with factory() as db:
+        await db.execute(text("""
+            INSERT INTO webhook_events (event_id, realm_id, event_type, entity_type, entity_ids, payload)
+            VALUES ('e3', '9130', 'Item.Update', 'item', '["5", "7"]', '{}')
+        """))
+        await db.commit()
+    stub.entities["Item"] = [item for item in stub.entities["Item"] if item["Id"] != "7"]
+
+    await QuickBooksWebhookWorker(session_factory=factory).drain()
+
+    async with factory() as db:
+        assert (await qb_reference_cache.get_by_id(db, "items", "5"))["Active"] is False
+        assert await qb_reference_cache.get_by_id(db, "items", "7") is None
@@ -0,0 +1,123 @@
+"""
+Tests for the QuickBooks API simulator (tests/qb_simulator.py) driven through
+the real client stack: QuickBooksService -> QuickBooksClient -> rate governor.
+
+The end-to-end sync test runs on the postgres_engine scratch database and is
+skipped unless TEST_POSTGRES_URL is set.
+"""
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.db.session import get_db
+from app.routes.quickbooks_webhooks import router as webhook_router
+from app.services import quickbooks_sync_service as sync_module
+from app.services.qb_client import QuickBooksAPIError
+from app.services.qb_webhook_worker import QuickBooksWebhookWorker
+from tests.qb_simulator import (
+    GC_COMPLIANCE_CUSTOMER_TYPE,
+    QuickBooksSimulator,
+    link_gc_clients,
+    simulated_quickbooks_service,
+)
+
+
+@pytest.mark.asyncio
+async def test_queries_paginate_filter_and_project_like_quickbooks():
+    simulator = QuickBooksSimulator(customers=30, invoices_per_customer=2)
+    qb = simulated_quickbooks_service(simulator)
+
+    customers = []
+    async for page in qb.iter_query("SELECT * FROM Customer", page_size=7):
+        customers.append(len(page))
+    assert customers == [7, 7, 7, 7, 2]
+    assert simulator.stats["by_operation"]["query"] == 5
+
+    assert await qb.query("SELECT COUNT(*) FROM Invoice") == {"totalCount": 60}
+    assert [c["Id"] for c in await qb.query("SELECT * FROM Customer WHERE Id IN ('3', '12')")] == ["3", "12"]
+    assert await qb.query("SELECT DocNumber FROM Invoice WHERE DocNumber LIKE 'SIM-4-%'") == [
+        {"Id": "7", "DocNumber": "SIM-4-1"}, {"Id": "8", "DocNumber": "SIM-4-2"}
+    ]
+    assert len(await qb.query("SELECT * FROM Invoice WHERE CustomerRef = '4'")) == 2
+
+    simulator.update("Customer", {"Id": "3", "Active": False})
+    assert len(await qb.query_all("SELECT * FROM Customer")) == 29
+    assert len(await qb.query_all("SELECT * FROM Customer WHERE Active IN (true, false)")) == 30
+
+    with pytest.raises(QuickBooksAPIError) as duplicate:
+        await qb.create_invoice({"DocNumber": "SIM-1-1", "CustomerRef": {"value": "1"}, "Line": []})
+    assert duplicate.value.fault["Error"][0]["code"] == "6140"
+
+
+@pytest.mark.asyncio
+async def test_throttling_and_faults_surface_through_the_client():
+    simulator = QuickBooksSimulator(customers=5, throttle_every=2, retry_after=0)
+    qb = simulated_quickbooks_service(simulator)
+
+    for _ in range(3):
+        assert len(await qb.query("SELECT * FROM Customer")) == 5
+    assert simulator.stats["throttled"] >= 2  # Each 429 was retried after Retry-After
+
+    simulator.throttle_every = 0
+    simulator.fail_next(1, status=503)
+    with pytest.raises(QuickBooksAPIError) as fault:
+        await qb.query("SELECT * FROM Customer")
+    assert fault.value.status_code == 503
+    assert len(await qb.query("SELECT * FROM Customer")) == 5
+
+
+@pytest.mark.asyncio
+async def test_sync_promotion_and_webhooks_end_to_end(postgres_engine, monkeypatch):
+    simulator = QuickBooksSimulator(customers=40, invoices_per_customer=3, gc_pct=50)
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", lambda db: simulated_quickbooks_service(simulator, db))
+    monkeypatch.setattr(settings, "QUICKBOOKS_WEBHOOK_TOKEN", "sim-token")
+    factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+
+    gc_ids = {
+        c["Id"] for c in simulator.entities["Customer"].values()
+        if c["CustomerTypeRef"]["value"] == GC_COMPLIANCE_CUSTOMER_TYPE
+    }
+    gc_invoices = [i for i in simulator.entities["Invoice"].values() if i["CustomerRef"]["value"] in gc_ids]
+    gc_invoice_ids = {i["Id"] for i in gc_invoices}
+    gc_payments = [
+        p for p in simulator.entities["Payment"].values() if p["Line"][0]["LinkedTxn"][0]["TxnId"] in gc_invoice_ids
+    ]
+
+    async with factory() as db:
+        assert await link_gc_clients(db, simulator) == len(gc_ids)
+        result = await sync_module.QuickBooksSyncService().sync_all(db, force_full_sync=True)
+
+        assert (result["customers"]["records_synced"], result["invoices"]["records_synced"]) == (len(gc_ids), len(gc_invoices))
+        assert result["payments"]["records_synced"] == len(gc_payments)
+        assert result["invoices"]["promotion"]["promoted"] == len(gc_invoices)
+        assert (await db.execute(text("SELECT count(*) FROM payments"))).scalar() == len(gc_payments)
+
+    # A user edits invoices in QuickBooks; Intuit notifies the webhook
+    changed = [i["Id"] for i in gc_invoices if i["Balance"]][:3]
+    for invoice_id in changed:
+        simulator.update("Invoice", {"Id": invoice_id, "Balance": 0})
+
+    async def override_get_db():
+        async with factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(webhook_router)
+    app.dependency_overrides[get_db] = override_get_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+        assert await simulator.emit_webhooks(client, "/v1/quickbooks/webhook", "sim-token") == [200]
+
+    simulator.reset_stats()
+    await QuickBooksWebhookWorker(session_factory=factory).drain()
+    assert simulator.stats["by_operation"] == {"query": 1}  # One Id IN (...) fetch
+
+    async with factory() as db:
+        balances = (await db.execute(
+            text("SELECT balance_due FROM invoices WHERE qb_invoice_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": changed}
+        )).scalars().all()
+    assert [float(b) for b in balances] == [0.0] * len(changed)
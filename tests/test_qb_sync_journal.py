@@ -0,0 +1,181 @@
+"""
+Tests for resumable sync runs (app/services/qb_sync_journal.py).
+
+A QuickBooks stub (httpx MockTransport) pages customers two at a time and
+can fail one STARTPOSITION window, so a sync can be interrupted and resumed;
+tests/qb_simulator.py covers a company that changes while the run is down.
+The journal and cache upserts run on the postgres_engine scratch database
+and are skipped unless TEST_POSTGRES_URL is set.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.db.session import get_db
+from app.routes.auth_supabase import get_current_user
+from app.routes.quickbooks_sync import router
+from app.services import quickbooks_sync_service as sync_module
+from app.services.qb_client import QuickBooksClient
+from app.services.quickbooks_service import QuickBooksService
+from app.utils.circuit_breaker import qb_circuit_breaker
+from tests.qb_simulator import QuickBooksSimulator, SimulatedFault, simulated_quickbooks_service
+
+GC = {"value": sync_module.QuickBooksSyncService.GC_COMPLIANCE_CUSTOMER_TYPE}
+CUSTOMERS = [{"Id": str(i), "DisplayName": f"Client {i}", "Active": True, "CustomerTypeRef": GC} for i in range(1, 8)]
+
+
+class QuickBooksStub:
+    """Customer query pages; fail_at makes that STARTPOSITION window answer HTTP 400."""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.start_positions = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        query = request.url.params["query"]
+        start = int(re.search(r"STARTPOSITION (\d+)", query).group(1))
+        size = int(re.search(r"MAXRESULTS (\d+)", query).group(1))
+        self.start_positions.append(start)
+        if start == self.fail_at:
+            return httpx.Response(400, text="Service fault")
+        page = CUSTOMERS[start - 1:start - 1 + size]
+        return httpx.Response(200, json={"QueryResponse": {"Customer": page} if page else {}})
+
+
+def use_stub(monkeypatch, stub):
+    def service(db):
+        qb = QuickBooksService(db=db)
+        qb.realm_id = "9130"
+        qb.access_token = "access"
+        qb.refresh_token = "refresh"
+        qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        qb.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(stub))
+        return qb
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", service)
+
+
+@pytest_asyncio.fixture
+async def db(postgres_engine, monkeypatch):
+    monkeypatch.setattr(settings, "QB_QUERY_PAGE_SIZE", 2)
+    monkeypatch.setattr(settings, "QB_QUERY_CONCURRENCY", 1)
+    qb_circuit_breaker.reset()
+    async with async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+    qb_circuit_breaker.reset()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_full_sync_resumes_from_checkpoint(db, monkeypatch):
+    first = QuickBooksStub(fail_at=5)
+    use_stub(monkeypatch, first)
+    with pytest.raises(Exception, match="HTTP 400"):
+        await sync_module.QuickBooksSyncService().sync_customers(db)
+
+    run = (await db.execute(text("SELECT * FROM sync_runs"))).one()
+    assert (run.status, run.pages_committed, run.next_start_position, run.records_synced) == ("failed", 2, 5, 4)
+    assert (await db.execute(text(
+        "SELECT last_sync_at FROM sync_status WHERE entity_type = 'customers'"
+    ))).scalar() is None
+
+    second = QuickBooksStub()
+    use_stub(monkeypatch, second)
+    result = await sync_module.QuickBooksSyncService().sync_customers(db)
+
+    assert second.start_positions == [5, 7]
+    assert (result["run_id"], result["resumed"], result["records_synced"]) == (run.id, True, 3)
+    resumed = (await db.execute(text("SELECT * FROM sync_runs"))).one()
+    assert (resumed.status, resumed.resume_count, resumed.records_synced) == ("completed", 1, 7)
+    assert (await db.execute(text("SELECT count(*) FROM quickbooks_customers_cache"))).scalar() == 7
+    # The watermark is the original run's start, not the resume
+    assert (await db.execute(text(
+        "SELECT last_sync_at FROM sync_status WHERE entity_type = 'customers'"
+    ))).scalar() == run.started_at
+
+
+@pytest.mark.asyncio
+async def test_resume_keeps_its_place_when_records_change_between_pages(db, monkeypatch):
+    # Unordered queries come back most recently changed first - only ORDERBY pins the walk
+    simulator = QuickBooksSimulator(
+        customers=7, invoices_per_customer=0, gc_pct=100, default_order="MetaData.LastUpdatedTime DESC"
+    )
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", lambda db: simulated_quickbooks_service(simulator, db))
+    answer = simulator.query
+    fetched = []
+
+    def interrupt_after_two_pages(query):
+        if len(fetched) == 4 and len(simulator.entities["Customer"]) == 7:
+            # While the run is down: two customers are created and an unread one is edited
+            for name in ("New Client A", "New Client B"):
+                simulator.create("Customer", {"DisplayName": name, "Active": True, "CustomerTypeRef": GC})
+            simulator.update("Customer", {"Id": "6", "PrivateNote": "edited"}, check_sync_token=False)
+            raise SimulatedFault(400, "Service fault", "400")
+        response = answer(query)
+        fetched.extend(c["Id"] for c in response["QueryResponse"].get("Customer", []))
+        return response
+
+    monkeypatch.setattr(simulator, "query", interrupt_after_two_pages)
+    with pytest.raises(Exception, match="HTTP 400"):
+        await sync_module.QuickBooksSyncService().sync_customers(db)
+    result = await sync_module.QuickBooksSyncService().sync_customers(db)
+
+    assert result["resumed"] is True
+    # Nothing skipped or read twice; the new customers land after the checkpoint
+    assert fetched == [str(i) for i in range(1, 10)]
+    run = (await db.execute(text("SELECT * FROM sync_runs"))).one()
+    assert (run.status, run.records_fetched) == ("completed", 9)
+    assert (await db.execute(text("SELECT count(*) FROM quickbooks_customers_cache"))).scalar() == 9
+
+
+@pytest.mark.asyncio
+async def test_completed_and_fresh_running_runs_are_not_resumed(db, monkeypatch):
+    stub = QuickBooksStub()
+    use_stub(monkeypatch, stub)
+    await sync_module.QuickBooksSyncService().sync_customers(db)
+    # Another process is mid-run (recent checkpoint) - never taken over
+    await db.execute(text("""
+        INSERT INTO sync_runs (entity_type, query, page_size, next_start_position, updated_at)
+        VALUES ('customers', 'SELECT * FROM Customer', 2, 5, now())
+    """))
+    await db.execute(text("UPDATE sync_status SET last_sync_at = NULL"))
+    await db.commit()
+
+    stub.start_positions.clear()
+    result = await sync_module.QuickBooksSyncService().sync_customers(db)
+
+    assert result["resumed"] is False
+    assert stub.start_positions[0] == 1
+    assert (await db.execute(text("SELECT count(*) FROM sync_runs"))).scalar() == 3
+
+
+@pytest.mark.asyncio
+async def test_status_endpoint_lists_run_history(db, postgres_engine, monkeypatch):
+    use_stub(monkeypatch, QuickBooksStub(fail_at=3))
+    with pytest.raises(Exception):
+        await sync_module.QuickBooksSyncService().sync_customers(db)
+
+    factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: None
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/v1/quickbooks/sync/status", params={"runs": 5})
+
+    assert response.status_code == 200
+    [run] = response.json()["runs"]
+    assert (run["entity_type"], run["status"], run["next_start_position"]) == ("customers", "failed", 3)
+    assert "HTTP 400" in run["last_error"]
@@ -0,0 +1,160 @@
+"""
+Tests for the pipelined query-mode sync_all (app/utils/qb_sync_pipeline.py).
+
+QuickBooks is an httpx MockTransport stub with a per-request delay; the apply
+stages are replaced with recorders so fetch/apply overlap and ordering can be
+checked without a database.
+"""
+
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from app.services import quickbooks_sync_service as sync_module
+from app.services.qb_client import QuickBooksClient
+from app.services.quickbooks_service import QuickBooksService
+from app.utils.qb_sync_pipeline import PageStream
+
+
+async def pages_of(count, fail_after=None):
+    for i in range(count):
+        if i == fail_after:
+            raise RuntimeError("QB 500")
+        yield [{"Id": str(i)}]
+
+
+@pytest.mark.asyncio
+async def test_fetch_blocks_on_full_queue():
+    stream = PageStream("customers", pages_of(6), maxsize=2).start()
+    await asyncio.sleep(0.01)
+    assert stream.fetched_pages == 3  # 2 queued + 1 waiting on put
+
+    applied = [page[0]["Id"] async for page in stream]
+
+    assert applied == ["0", "1", "2", "3", "4", "5"]
+    stats = stream.get_stats()
+    assert (stats["fetch"]["pages"], stats["queue"]["max_depth"], stats["apply"]["pages"]) == (6, 2, 6)
+
+
+@pytest.mark.asyncio
+async def test_fetch_error_surfaces_after_fetched_pages():
+    stream = PageStream("invoices", pages_of(5, fail_after=3), maxsize=4).start()
+    applied = []
+
+    with pytest.raises(RuntimeError, match="QB 500"):
+        async for page in stream:
+            applied.append(page[0]["Id"])
+
+    assert applied == ["0", "1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_sync_all_overlaps_fetches_and_applies_in_order(monkeypatch):
+    requests = []
+
+    async def stub(request: httpx.Request) -> httpx.Response:
+        query = request.url.params["query"]
+        entity = re.search(r"FROM (\w+)", query).group(1)
+        requests.append(entity)
+        await asyncio.sleep(0.05)
+        if int(re.search(r"STARTPOSITION (\d+)", query).group(1)) > 1:
+            return httpx.Response(200, json={"QueryResponse": {}})
+        return httpx.Response(200, json={"QueryResponse": {entity: [{"Id": "1"}], "startPosition": 1, "maxResults": 1}})
+
+    def service(db):
+        qb = QuickBooksService(db=db)
+        qb.realm_id = "9130"
+        qb.access_token = "access"
+        qb.refresh_token = "refresh"
+        qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        qb.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(stub))
+        return qb
+
+    applied = []
+    requested_when_applying = {}
+
+    def recorder(entity_type):
+        async def apply(db, stream=None, run=None, **kwargs):
+            async for page in stream:
+                requested_when_applying.setdefault(entity_type, list(requests))
+                applied.append(entity_type)
+                await asyncio.sleep(0.05)
+            return {"records_synced": 1, "duration_ms": 50, "errors": 0}
+        return apply
+
+    async def never_synced(db, entity_type):
+        return None
+
+    service_under_test = sync_module.QuickBooksSyncService()
+
+    async def open_run(db, entity_type, since):
+        # No sync_runs journal without a database - always a fresh run
+        query = service_under_test._delta_query(entity_type, since)
+        return {"id": entity_type, "resumed": False}, service_under_test.qb_service.iter_query(query)
+
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", service)
+    monkeypatch.setattr(service_under_test, "_get_last_sync", never_synced)
+    monkeypatch.setattr(service_under_test, "_open_run", open_run)
+    for entity_type in ("customers", "invoices", "payments"):
+        monkeypatch.setattr(service_under_test, f"sync_{entity_type}", recorder(entity_type))
+
+    result = await service_under_test.sync_all(None, mode="query")
+
+    assert applied == ["customers", "invoices", "payments"]
+    # Invoice and payment fetches were already in flight before customers were applied
+    assert {"Invoice", "Payment"} <= set(requested_when_applying["customers"])
+    assert result["total_records"] == 3
+    payments = result["pipeline"]["payments"]
+    assert (payments["fetch"]["pages"], payments["fetch"]["entities"], payments["queue"]["maxsize"]) == (1, 1, 4)
+
+
+@pytest.mark.asyncio
+async def test_sync_all_loads_tokens_before_any_fetch_starts(monkeypatch):
+    """Tokens are loaded on the session before the streams start, so fetch tasks never use it."""
+    session_use = []
+
+    async def stub(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"QueryResponse": {}})
+
+    def service(db):
+        qb = QuickBooksService(db=db)
+
+        async def load_tokens_from_db():
+            session_use.append("load_tokens")
+            qb.realm_id = "9130"
+            qb.access_token = "access"
+            qb.refresh_token = "refresh"
+            qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+            qb.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(stub))
+            return True
+
+        qb.load_tokens_from_db = load_tokens_from_db
+        return qb
+
+    service_under_test = sync_module.QuickBooksSyncService()
+
+    async def last_sync(db, entity_type):
+        session_use.append(entity_type)
+        return None
+
+    async def open_run(db, entity_type, since):
+        query = service_under_test._delta_query(entity_type, since)
+        return {"id": entity_type, "resumed": False}, service_under_test.qb_service.iter_query(query)
+
+    async def apply(db, stream=None, run=None, **kwargs):
+        async for page in stream:
+            pass
+        return {"records_synced": 0, "duration_ms": 0, "errors": 0}
+
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", service)
+    monkeypatch.setattr(service_under_test, "_get_last_sync", last_sync)
+    monkeypatch.setattr(service_under_test, "_open_run", open_run)
+    for entity_type in ("customers", "invoices", "payments"):
+        monkeypatch.setattr(service_under_test, f"sync_{entity_type}", apply)
+
+    await service_under_test.sync_all(None, mode="query")
+
+    assert session_use == ["load_tokens", "customers", "invoices", "payments"]
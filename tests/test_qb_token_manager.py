@@ -0,0 +1,179 @@
+"""
+Tests for the process-wide QuickBooks token manager.
+
+Covers the cached DB load, single-flight refresh under concurrency, the
+proactive background refresher and coordination between instances through
+quickbooks_tokens (PostgreSQL). Intuit's token endpoint is never called -
+_refresh_and_persist or _request_refresh is replaced with a counting fake.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.services.qb_token_manager import QuickBooksTokenManager, qb_token_manager
+
+
+def manager_expiring_in(seconds: float) -> QuickBooksTokenManager:
+    manager = QuickBooksTokenManager()
+    manager.set_tokens("9130", "access-0", "refresh-0", datetime.now(timezone.utc) + timedelta(seconds=seconds))
+    return manager
+
+
+def fake_refresh(manager, calls, delay=0.01):
+    async def _refresh_and_persist():
+        calls.append(manager.access_token)
+        await asyncio.sleep(delay)
+        n = len(calls)
+        manager.set_tokens(manager.realm_id, f"access-{n}", f"refresh-{n}", datetime.now(timezone.utc) + timedelta(hours=1))
+    return _refresh_and_persist
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_is_single_flight(monkeypatch):
+    """Fifty requests hitting an expiring token trigger exactly one refresh."""
+    manager = manager_expiring_in(30)
+    calls = []
+    monkeypatch.setattr(manager, "_refresh_and_persist", fake_refresh(manager, calls))
+
+    results = await asyncio.gather(*(manager.refresh() for _ in range(50)))
+
+    assert all(results)
+    assert calls == ["access-0"]
+    assert manager.access_token == "access-1"
+    assert manager.refresh_count == 1
+
+
+@pytest.mark.asyncio
+async def test_forced_refresh_is_shared_by_waiters(monkeypatch):
+    """Concurrent forced refreshes of a valid token still rotate it only once."""
+    manager = manager_expiring_in(3600)
+    calls = []
+    monkeypatch.setattr(manager, "_refresh_and_persist", fake_refresh(manager, calls))
+
+    await asyncio.gather(*(manager.refresh(force=True) for _ in range(5)))
+    assert len(calls) == 1
+
+    assert await manager.refresh() is True
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_load_reads_database_once(monkeypatch):
+    """Only the first load() goes to the database, even under concurrency."""
+    manager = QuickBooksTokenManager()
+    reads = []
+
+    async def _load_from_db(db=None):
+        reads.append(db)
+        await asyncio.sleep(0.01)
+        manager.set_tokens("9130", "access", "refresh", datetime.now(timezone.utc) + timedelta(hours=1))
+
+    monkeypatch.setattr(manager, "_load_from_db", _load_from_db)
+
+    assert all(await asyncio.gather(*(manager.load() for _ in range(10))))
+    assert await manager.load() is True
+    assert len(reads) == 1
+
+
+@pytest.mark.asyncio
+async def test_background_refresher_renews_before_expiry(monkeypatch):
+    """The refresher fires QB_TOKEN_REFRESH_LEAD_SECONDS before expiry, off the request path."""
+    monkeypatch.setattr(settings, "QB_TOKEN_REFRESH_LEAD_SECONDS", 60)
+    manager = manager_expiring_in(60.05)
+    calls = []
+    monkeypatch.setattr(manager, "_refresh_and_persist", fake_refresh(manager, calls, delay=0))
+
+    await manager.start()
+    try:
+        for _ in range(100):
+            if manager.refresh_count:
+                break
+            await asyncio.sleep(0.01)
+        assert calls == ["access-0"]
+        assert not manager.expires_within(settings.QB_TOKEN_REFRESH_LEAD_SECONDS)
+        assert manager.get_status()["background_refresh"] is True
+    finally:
+        await manager.stop()
+    assert manager.get_status()["background_refresh"] is False
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_adopts_token_from_database(monkeypatch):
+    """A refresh that fails because another instance rotated the token reloads and uses that token."""
+    manager = manager_expiring_in(30)
+
+    async def _refresh_and_persist():
+        raise RuntimeError("invalid_grant")
+
+    async def _load_from_db(db=None):
+        manager.set_tokens("9130", "access-other", "refresh-other", datetime.now(timezone.utc) + timedelta(hours=1))
+
+    monkeypatch.setattr(manager, "_refresh_and_persist", _refresh_and_persist)
+    monkeypatch.setattr(manager, "_load_from_db", _load_from_db)
+
+    assert await manager.refresh() is True
+    assert manager.access_token == "access-other"
+
+
+class FakeAuthClient:
+    def __init__(self, n):
+        self.access_token = f"intuit-access-{n}"
+        self.refresh_token = f"intuit-refresh-{n}"
+        self.expires_in = 3600
+
+
+@pytest_asyncio.fixture
+async def token_db(postgres_engine, monkeypatch):
+    """quickbooks_tokens on the scratch database, shared by the global manager and a second 'instance'."""
+    from app.db import session as session_module
+    from app.db.models import QuickBooksToken
+
+    factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(session_module, "AsyncSessionLocal", factory)
+    async with factory() as db:
+        db.add(QuickBooksToken(
+            realm_id="9130", access_token="access-0", refresh_token="refresh-0",
+            access_token_expires_at=datetime.now(timezone.utc) + timedelta(seconds=30),
+            refresh_token_expires_at=datetime.now(timezone.utc) + timedelta(days=100),
+            environment="sandbox", is_active=True,
+        ))
+        await db.commit()
+    qb_token_manager.loaded = False
+    yield factory
+    qb_token_manager.clear()
+    qb_token_manager.loaded = False
+
+
+@pytest.mark.asyncio
+async def test_instances_share_one_rotation_through_the_database(token_db, monkeypatch):
+    """The second instance adopts the first one's refreshed token instead of calling Intuit with a spent refresh token."""
+    other = QuickBooksTokenManager()
+    assert await qb_token_manager.load() and await other.load()
+
+    intuit_calls = []
+
+    async def _request_refresh():
+        intuit_calls.append(1)
+        return FakeAuthClient(len(intuit_calls))
+
+    monkeypatch.setattr(qb_token_manager, "_request_refresh", _request_refresh)
+    monkeypatch.setattr(other, "_request_refresh", _request_refresh)
+
+    assert await qb_token_manager.refresh()
+    assert await other.refresh()
+    assert len(intuit_calls) == 1
+    assert other.access_token == qb_token_manager.access_token == "intuit-access-1"
+    assert other.get_status()["adopted_count"] == 1
+
+    # A disconnect on one instance reaches the other on its next reload
+    async with token_db() as db:
+        await db.execute(text("UPDATE quickbooks_tokens SET is_active = false"))
+        await db.commit()
+    assert await other.reload() is False
+    assert other.access_token is None
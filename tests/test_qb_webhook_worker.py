@@ -0,0 +1,175 @@
+"""
+Tests for the QuickBooks webhook worker (app/services/qb_webhook_worker.py).
+
+Event coalescing is tested in memory. Claiming (FOR UPDATE SKIP LOCKED) and
+the targeted sync run on the postgres_engine scratch database and are
+skipped unless TEST_POSTGRES_URL is set. QuickBooks is a fake that serves
+entities by Id and records every query.
+"""
+
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.services import quickbooks_sync_service
+from app.services.qb_webhook_worker import QuickBooksWebhookWorker, coalesce_events
+from app.utils.circuit_breaker import CircuitBreakerError
+from app.utils.qb_query_builder import QBQuery
+
+GC = {"value": "698682"}
+
+
+class FakeQuickBooks:
+    """Serves `SELECT ... FROM <Entity> WHERE Id IN (...)` from a dict of entities."""
+
+    def __init__(self, entities, error=None):
+        self.entities = entities
+        self.error = error
+        self.queries = []
+
+    async def iter_query(self, query_string, breaker=None):
+        query_string = str(query_string)
+        self.queries.append(query_string)
+        if self.error:
+            raise self.error
+        entity = re.search(r"FROM (\w+)", query_string).group(1)
+        ids = re.findall(r"'([^']+)'", query_string)
+        page = [self.entities[(entity, qb_id)] for qb_id in ids if (entity, qb_id) in self.entities]
+        if page:
+            yield page
+
+
+def event(id, event_type, qb_ids):
+    return SimpleNamespace(id=id, event_type=event_type, entity_type=event_type.split(".")[0].lower(),
+                           entity_ids=json.dumps(qb_ids))
+
+
+def test_coalesce_events_keeps_last_operation_per_entity():
+    batches = coalesce_events([
+        event(1, "Invoice.Create", ["101"]),
+        event(2, "Invoice.Update", ["101"]),
+        event(3, "Invoice.Update", ["102"]),
+        event(4, "Invoice.Delete", ["102"]),
+        event(5, "Estimate.Create", ["7"]),
+        event(6, "Customer.Merge", ["1"]),
+    ])
+
+    assert list(batches) == ["customers", "invoices", "ignored"]
+    assert batches["invoices"] == {"event_ids": [1, 2, 3, 4], "upsert": ["101"], "delete": ["102"]}
+    assert batches["customers"]["upsert"] == ["1"]
+    assert batches["ignored"] == [5]
+
+
+@pytest_asyncio.fixture
+async def factory(postgres_engine):
+    async with postgres_engine.begin() as conn:
+        await conn.execute(text("""
+            INSERT INTO clients (client_id, full_name, qb_customer_id)
+            VALUES ('00000000-0000-0000-0000-0000000000c1', 'Client One', '1')
+        """))
+        await conn.execute(text("""
+            INSERT INTO projects (project_id, project_name, client_id)
+            VALUES ('00000000-0000-0000-0000-0000000000a1', 'Project One', '00000000-0000-0000-0000-0000000000c1')
+        """))
+        await conn.execute(text("""
+            INSERT INTO quickbooks_customers_cache (qb_customer_id, display_name, qb_data)
+            VALUES ('1', 'Client One', '{}')
+        """))
+        await conn.execute(text("""
+            INSERT INTO quickbooks_invoices_cache (qb_invoice_id, customer_id, doc_number, qb_data)
+            VALUES ('103', '1', 'INV-103', '{}')
+        """))
+    return async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def store_events(factory, *events):
+    async with factory() as db:
+        await db.execute(
+            text("""INSERT INTO webhook_events (event_id, realm_id, event_type, entity_type, entity_ids, payload)
+                    VALUES (:event_id, '9130', :event_type, :entity_type, CAST(:entity_ids AS json), '{}')"""),
+            [{"event_id": f"e{i}", "event_type": event_type, "entity_type": event_type.split(".")[0].lower(),
+              "entity_ids": json.dumps([qb_id])} for i, (event_type, qb_id) in enumerate(events)]
+        )
+        await db.commit()
+
+
+def use_quickbooks(monkeypatch, fake):
+    monkeypatch.setattr(quickbooks_sync_service, "get_quickbooks_service", lambda db: fake)
+
+
+def invoice(qb_id, doc_number, balance):
+    return {"Id": qb_id, "DocNumber": doc_number, "CustomerRef": {"value": "1"}, "TxnDate": "2025-01-15",
+            "TotalAmt": 1000, "Balance": balance, "MetaData": {"LastUpdatedTime": "2025-01-15T10:00:00Z"}}
+
+
+@pytest.mark.asyncio
+async def test_worker_applies_burst_as_one_targeted_sync(factory, monkeypatch):
+    """A burst of events becomes one Id IN (...) fetch per entity type, then promotion."""
+    fake = FakeQuickBooks({
+        ("Invoice", "101"): invoice("101", "INV-101", 1000),
+        ("Invoice", "102"): invoice("102", "INV-102", 0),
+        ("Invoice", "900"): {**invoice("900", "INV-900", 0), "CustomerRef": {"value": "77"}},  # not GC
+        ("Payment", "301"): {"Id": "301", "CustomerRef": {"value": "1"}, "TotalAmt": 250, "TxnDate": "2025-01-20",
+                             "Line": [{"LinkedTxn": [{"TxnId": "101", "TxnType": "Invoice"}]}]},
+        ("Customer", "1"): {"Id": "1", "DisplayName": "Client One", "CustomerTypeRef": GC},
+    })
+    use_quickbooks(monkeypatch, fake)
+    await store_events(
+        factory,
+        ("Customer.Update", "1"),
+        ("Invoice.Create", "101"), ("Invoice.Update", "101"), ("Invoice.Update", "101"),
+        ("Invoice.Create", "102"), ("Invoice.Create", "900"),
+        ("Invoice.Delete", "103"),
+        ("Payment.Create", "301"),
+        ("Estimate.Create", "5"),
+    )
+
+    processed = await QuickBooksWebhookWorker(session_factory=factory).drain()
+
+    assert processed == 9
+    assert fake.queries == [
+        str(QBQuery("Customer", "sync").where_in("Id", ["1"])),
+        str(QBQuery("Invoice", "sync").where_in("Id", ["101", "102", "900"])),
+        str(QBQuery("Payment", "sync").where_in("Id", ["301"])),
+    ]
+    async with factory() as db:
+        assert (await db.execute(text(
+            "SELECT count(*) FROM webhook_events WHERE processed AND processing_error IS NULL"
+        ))).scalar() == 9
+        invoices = dict((await db.execute(text("SELECT qb_invoice_id, amount_paid FROM invoices"))).fetchall())
+        assert {qb_id: float(paid) for qb_id, paid in invoices.items()} == {"101": 250, "102": 1000}
+        assert (await db.execute(text(
+            "SELECT is_active FROM quickbooks_invoices_cache WHERE qb_invoice_id = '103'"
+        ))).scalar() is False
+        assert (await db.execute(text("SELECT count(*) FROM payments"))).scalar() == 1
+
+
+@pytest.mark.asyncio
+async def test_claimed_events_are_skipped_by_other_workers(factory, monkeypatch):
+    """Events locked by one worker's claim are invisible to another (SKIP LOCKED)."""
+    fake = FakeQuickBooks({})
+    use_quickbooks(monkeypatch, fake)
+    await store_events(factory, ("Invoice.Update", "101"))
+
+    async with factory() as other_worker:
+        await other_worker.execute(text("SELECT id FROM webhook_events FOR UPDATE"))
+        summary = await QuickBooksWebhookWorker(session_factory=factory).run_once()
+        assert summary["claimed"] == 0
+    assert fake.queries == []
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_leaves_events_queued(factory, monkeypatch):
+    use_quickbooks(monkeypatch, FakeQuickBooks({}, error=CircuitBreakerError("open")))
+    await store_events(factory, ("Invoice.Update", "101"))
+
+    with pytest.raises(CircuitBreakerError):
+        await QuickBooksWebhookWorker(session_factory=factory).run_once()
+
+    async with factory() as db:
+        assert (await db.execute(text("SELECT count(*) FROM webhook_events WHERE NOT processed"))).scalar() == 1
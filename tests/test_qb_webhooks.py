@@ -0,0 +1,94 @@
+"""
+Tests for QuickBooks webhook ingestion (app/routes/quickbooks_webhooks.py).
+
+Signature and event-key helpers are tested in memory. The endpoint test
+posts through the router against the postgres_engine scratch database
+(json_to_recordset insert) and is skipped unless TEST_POSTGRES_URL is set.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.db.session import get_db
+from app.routes.quickbooks_webhooks import (
+    build_event_rows,
+    router,
+    verify_webhook_signature,
+    webhook_event_key,
+)
+
+TOKEN = "verifier-token"
+
+
+def sign(body: bytes, token: str = TOKEN) -> str:
+    return base64.b64encode(hmac.new(token.encode(), body, hashlib.sha256).digest()).decode()
+
+
+def notification(*entities, realm_id="9130"):
+    return {"eventNotifications": [{"realmId": realm_id, "dataChangeEvent": {"entities": list(entities)}}]}
+
+
+def entity(name, id, operation="Update", last_updated="2025-12-14T10:30:00-08:00"):
+    return {"name": name, "id": id, "operation": operation, "lastUpdated": last_updated}
+
+
+def test_signature_is_base64_hmac_of_raw_body():
+    body = json.dumps(notification(entity("Invoice", "1"))).encode()
+    assert verify_webhook_signature(body, sign(body), TOKEN)
+    assert not verify_webhook_signature(body, sign(body, "other-token"), TOKEN)
+    assert not verify_webhook_signature(body + b" ", sign(body), TOKEN)
+
+
+def test_event_key_is_deterministic_per_change():
+    update = entity("Invoice", "1")
+    assert webhook_event_key("9130", update) == webhook_event_key("9130", dict(update))
+    assert webhook_event_key("9130", update) != webhook_event_key("9130", {**update, "lastUpdated": "2025-12-14T10:31:00-08:00"})
+    assert webhook_event_key("9130", update) != webhook_event_key("9131", update)
+    assert len(webhook_event_key("9130", update)) <= 100
+
+
+def test_build_event_rows_flattens_and_dedupes():
+    rows = build_event_rows(notification(
+        entity("Invoice", "1"), entity("Invoice", "1"), entity("Payment", "7", "Create"), {"name": "Invoice"}
+    ))
+    assert [(row["event_type"], row["entity_type"], row["entity_ids"]) for row in rows] == [
+        ("Invoice.Update", "invoice", ["1"]), ("Payment.Create", "payment", ["7"])]
+
+
+@pytest.mark.asyncio
+async def test_webhook_stores_batch_once_and_ignores_retries(postgres_engine, monkeypatch):
+    monkeypatch.setattr(settings, "QUICKBOOKS_WEBHOOK_TOKEN", TOKEN)
+    factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+
+    body = json.dumps(notification(*(entity("Invoice", str(i)) for i in range(50)))).encode()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.post("/v1/quickbooks/webhook", content=body, headers={"intuit-signature": sign(body)})
+        retry = await client.post("/v1/quickbooks/webhook", content=body, headers={"intuit-signature": sign(body)})
+        forged = await client.post("/v1/quickbooks/webhook", content=body, headers={"intuit-signature": sign(body, "x")})
+
+    assert (first.status_code, first.json()["events_stored"]) == (200, 50)
+    assert (retry.status_code, retry.json()["events_stored"]) == (200, 0)
+    assert forged.status_code == 401
+
+    async with factory() as db:
+        stored = (await db.execute(text(
+            "SELECT count(*), count(DISTINCT event_id), bool_and(NOT processed) FROM webhook_events"
+        ))).one()
+    assert tuple(stored) == (50, 50, True)
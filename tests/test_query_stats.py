@@ -0,0 +1,110 @@
+"""
+Unit tests for per-request SQL instrumentation.
+
+Tests statement counting via engine events, N+1 detection, RequestTimer
+integration and the Server-Timing header.
+"""
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.middleware.query_stats_middleware import QueryStatsMiddleware
+from app.utils.query_stats import (
+    get_query_stats,
+    install_query_instrumentation,
+    normalize_statement,
+    track_queries,
+)
+from app.utils.timing import RequestTimer
+
+
+@pytest_asyncio.fixture
+async def engine():
+    """Instrumented in-memory SQLite engine."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=NullPool)
+    install_query_instrumentation(engine)
+    yield engine
+    await engine.dispose()
+
+
+def test_normalize_statement_strips_literals():
+    """Inlined literals collapse to the same statement shape."""
+    a = normalize_statement("SELECT * FROM clients WHERE id = 42 AND name = 'Ann'")
+    b = normalize_statement("SELECT *  FROM clients\n WHERE id = 7 AND name = 'O''Hara'")
+    assert a == b == "SELECT * FROM clients WHERE id = ? AND name = ?"
+
+
+@pytest.mark.asyncio
+async def test_counts_queries_inside_tracker(engine):
+    """Statements are recorded through the async greenlet boundary."""
+    with track_queries("test") as stats:
+        async with engine.connect() as conn:
+            for i in range(3):
+                await conn.execute(text(f"SELECT {i}"))
+
+    assert stats.count == 3
+    assert stats.db_time > 0
+    assert stats.repeated_statements(3) == [("SELECT ?", 3)]
+    assert get_query_stats() is None
+
+
+@pytest.mark.asyncio
+async def test_no_tracking_outside_context(engine):
+    """Listeners are no-ops when no tracker is active."""
+    with track_queries("other") as stats:
+        pass
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    assert stats.count == 0
+
+
+def test_install_is_idempotent():
+    """Installing twice does not double count."""
+    from sqlalchemy import create_engine
+
+    sync_engine = create_engine("sqlite://")
+    install_query_instrumentation(sync_engine)
+    install_query_instrumentation(sync_engine)
+
+    with track_queries("sync") as stats:
+        with sync_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    assert stats.count == 1
+
+
+def test_request_timer_includes_db_stats():
+    """RequestTimer summaries carry query count and DB time when tracking."""
+    with track_queries("timer") as stats:
+        stats.record("SELECT 1", 0.25)
+        summary = RequestTimer("s1").get_summary()
+
+    assert summary["db_queries"] == 1
+    assert summary["db_time"] == 0.25
+    assert "db_queries" not in RequestTimer("s2").get_summary()
+
+
+def test_server_timing_header(monkeypatch):
+    """Middleware adds Server-Timing when enabled."""
+    monkeypatch.setattr(settings, "ENABLE_SERVER_TIMING", True)
+
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        get_query_stats().record("SELECT 1", 0.002)
+        return {"ok": True}
+
+    response = TestClient(app).get("/ping")
+
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith('db;dur=2.0;desc="1 queries", app;dur=')
@@ -0,0 +1,218 @@
+"""
+Unit tests for read-replica routing (app/db/routing.py).
+
+Uses two SQLite databases as primary/replica; each holds a marker row so
+tests can see which engine served a read.
+"""
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import Sequence, event, func, select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from app.db.routing import ReplicaRouter, RoutingSession, is_read_statement, lsn_to_int, replica_reads
+
+
+class FakeLagRouter(ReplicaRouter):
+    """Router with settable replica lag and WAL positions instead of the Postgres probes."""
+
+    lag = 0.0
+    primary_lsn = 0  # None = position unreadable
+    replay_lsn = 0
+
+    def _probe_lag(self) -> float:
+        if self.lag is None:
+            raise ConnectionError("replica down")
+        return self.lag
+
+    def _primary_lsn(self, conn):
+        if self.primary_lsn is None:
+            raise ConnectionError("primary unreachable")
+        conn.execute(text("SELECT 1"))  # The committing connection is still usable
+        return self.primary_lsn
+
+    def _replay_lsn(self):
+        return self.replay_lsn
+
+
+@pytest_asyncio.fixture
+async def routed(tmp_path):
+    """(session_factory, router) over primary/replica SQLite files."""
+    engines = {}
+    for name in ("primary", "replica"):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/{name}.db", poolclass=NullPool)
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE marker (name TEXT)"))
+            await conn.execute(text(f"INSERT INTO marker VALUES ('{name}')"))
+        engines[name] = engine
+
+    router = FakeLagRouter(
+        engines["primary"].sync_engine,
+        engines["replica"].sync_engine,
+        max_lag_seconds=5.0,
+        lag_check_seconds=0,
+    )
+    factory = async_sessionmaker(
+        engines["primary"],
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        router=router,
+        expire_on_commit=False,
+    )
+    yield factory, router
+    for engine in engines.values():
+        await engine.dispose()
+
+
+async def served_by(session) -> str:
+    return (await session.execute(text("SELECT name FROM marker LIMIT 1"))).scalar()
+
+
+def test_is_read_statement():
+    """Only plain SELECTs are replica-safe."""
+    assert is_read_statement(text("  select 1"))
+    assert is_read_statement(select(func.count()))
+    assert not is_read_statement(text("SELECT * FROM t FOR UPDATE SKIP LOCKED"))
+    assert not is_read_statement(text("SELECT * FROM t FOR SHARE"))
+    assert not is_read_statement(text("UPDATE t SET a = 1"))
+    assert not is_read_statement(None)
+    # Side-effecting functions behind a SELECT
+    assert not is_read_statement(text("SELECT pg_advisory_xact_lock(:key)"))
+    assert not is_read_statement(text("select pg_try_advisory_lock(1)"))
+    assert not is_read_statement(select(func.pg_advisory_xact_lock(1)))
+    assert not is_read_statement(select(Sequence("invoice_seq").next_value()))
+    assert not is_read_statement(text("SELECT nextval('invoice_seq')"))
+
+
+def test_lsn_to_int():
+    assert lsn_to_int("0/16B3748") == 0x16B3748
+    assert lsn_to_int("16/B374D848") > lsn_to_int("15/FFFFFFFF")
+    assert lsn_to_int(None) is None
+
+
+@pytest.mark.asyncio
+async def test_sessions_default_to_primary(routed):
+    """Sessions that did not opt in read from the primary."""
+    factory, _ = routed
+    async with factory() as session:
+        assert await served_by(session) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_opted_in_reads_use_replica(routed):
+    """GET sessions and replica_reads() blocks read from the replica."""
+    factory, _ = routed
+    async with factory() as session:
+        session.info["use_replica"] = True
+        assert await served_by(session) == "replica"
+
+    with replica_reads():
+        async with factory() as session:
+            assert await served_by(session) == "replica"
+
+
+@pytest.mark.asyncio
+async def test_read_after_write_stays_on_primary(routed):
+    """Once a session writes, its later reads go to the primary."""
+    factory, router = routed
+    router.primary_lsn, router.replay_lsn = 100, 50  # replica has not replayed the write yet
+    async with factory() as session:
+        session.info["use_replica"] = True
+        await session.execute(text("INSERT INTO marker VALUES ('written')"))
+        assert await served_by(session) == "primary"
+        await session.commit()
+        assert await served_by(session) == "primary"
+    assert router.write_lsn == 100
+
+    # Other sessions avoid the replica until it has replayed the commit, however small the lag
+    async with factory() as session:
+        session.info["use_replica"] = True
+        assert await served_by(session) == "primary"
+
+    router.replay_lsn = 100
+    async with factory() as session:
+        session.info["use_replica"] = True
+        assert await served_by(session) == "replica"
+
+    # Writes committed through session.begin() are recorded too
+    router.primary_lsn = 200
+    async with factory() as session:
+        async with session.begin():
+            await session.execute(text("INSERT INTO marker VALUES ('again')"))
+    assert router.write_lsn == 200
+
+
+@pytest.mark.asyncio
+async def test_write_position_is_read_without_a_new_connection(routed):
+    """The WAL position is read on the connection that committed (NullPool: one connect per checkout)."""
+    factory, router = routed
+    connects = []
+    event.listen(router.primary, "connect", lambda *args: connects.append(1))
+    router.primary_lsn = 300
+    async with factory() as session:
+        await session.execute(text("INSERT INTO marker VALUES ('written')"))
+        await session.commit()
+    assert (router.write_lsn, len(connects)) == (300, 1)
+
+    # Commits without a write read nothing
+    router.primary_lsn = 400
+    async with factory() as session:
+        await served_by(session)
+        await session.commit()
+    assert (router.write_lsn, len(connects)) == (300, 2)
+
+
+@pytest.mark.asyncio
+async def test_unknown_write_position_keeps_reads_on_primary(routed):
+    """Without a WAL position, reads stay on the primary for the lag budget."""
+    factory, router = routed
+    router.primary_lsn = None
+    async with factory() as session:
+        await session.execute(text("INSERT INTO marker VALUES ('written')"))
+        await session.commit()
+
+    async with factory() as session:
+        session.info["use_replica"] = True
+        assert await served_by(session) == "primary"
+
+    router._lsn_unknown_at -= router.max_lag_seconds + 1
+    async with factory() as session:
+        session.info["use_replica"] = True
+        assert await served_by(session) == "replica"
+
+
+@pytest.mark.asyncio
+async def test_read_bind_is_pinned_per_session(routed):
+    """A session keeps its first read bind; opting out or locking moves it to the primary."""
+    factory, router = routed
+    async with factory() as session:
+        session.info["use_replica"] = True
+        assert await served_by(session) == "replica"
+        router.lag = 30.0  # Not re-checked per statement
+        assert await served_by(session) == "replica"
+        session.info["use_replica"] = False
+        assert await served_by(session) == "primary"
+
+    router.lag = 0.0
+    with replica_reads():
+        async with factory() as session:
+            # An advisory lock runs on the primary, and so does the read it guards
+            lock = text("SELECT pg_advisory_xact_lock(:key)")
+            assert session.sync_session.get_bind(clause=lock) is router.primary
+            assert await served_by(session) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_lagging_or_down_replica_falls_back(routed):
+    """Replica lag above the budget, or a failed probe, routes reads to primary."""
+    factory, router = routed
+    router.lag = 30.0
+    async with factory() as session:
+        session.info["use_replica"] = True
+        assert await served_by(session) == "primary"
+
+    router.lag = None
+    async with factory() as session:
+        session.info["use_replica"] = True
+        assert await served_by(session) == "primary"
@@ -0,0 +1,137 @@
+"""
+Tests for the adaptive, leader-elected sync scheduler
+(app/services/scheduler_service.py, app/utils/leader_election.py).
+
+The interval policy is tested as a pure function. Leader election and the
+skip-when-unchanged tick run on the postgres_engine scratch database (with
+QuickBooks CDC served by an httpx MockTransport) and are skipped unless
+TEST_POSTGRES_URL is set.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.services import quickbooks_sync_service as sync_module
+from app.services.qb_client import QuickBooksClient
+from app.services.quickbooks_service import QuickBooksService
+from app.services.scheduler_service import SchedulerService, plan_next_run
+from app.utils.leader_election import AdvisoryLockLeader
+
+WEDNESDAY_11AM_EDT = datetime(2026, 10, 14, 15, 0, tzinfo=timezone.utc)
+SATURDAY_2AM_EDT = datetime(2026, 10, 17, 6, 0, tzinfo=timezone.utc)
+
+
+class NoJitter(random.Random):
+    def uniform(self, a, b):
+        return 0.0
+
+
+def test_busy_business_hours_sync_often_and_quiet_nights_rarely():
+    busy = plan_next_run(WEDNESDAY_11AM_EDT, recent_changes=120, webhook_events_last_hour=80, quiet_runs=0, rng=NoJitter())
+    idle = plan_next_run(WEDNESDAY_11AM_EDT, recent_changes=0, webhook_events_last_hour=0, quiet_runs=0, rng=NoJitter())
+    some = plan_next_run(WEDNESDAY_11AM_EDT, recent_changes=25, webhook_events_last_hour=25, quiet_runs=0, rng=NoJitter())
+    night = plan_next_run(SATURDAY_2AM_EDT, recent_changes=0, webhook_events_last_hour=0, quiet_runs=0, rng=NoJitter())
+
+    assert busy["interval_minutes"] == settings.QB_SCHEDULER_MIN_INTERVAL_MINUTES
+    assert idle["interval_minutes"] == settings.QB_SCHEDULER_BASE_INTERVAL_MINUTES
+    assert some["interval_minutes"] == settings.QB_SCHEDULER_BASE_INTERVAL_MINUTES / 2
+    assert (night["business_hours"], night["interval_minutes"]) == (False, settings.QB_SCHEDULER_MAX_INTERVAL_MINUTES)
+    assert "off hours" in night["reason"]
+
+
+def test_quiet_runs_back_off_up_to_max_with_bounded_jitter():
+    intervals = [
+        plan_next_run(WEDNESDAY_11AM_EDT, 0, 0, quiet_runs, rng=NoJitter())["interval_minutes"]
+        for quiet_runs in range(5)
+    ]
+    assert intervals == [60, 120, 240, 360, 360]
+
+    rng = random.Random(7)
+    for _ in range(50):
+        plan = plan_next_run(WEDNESDAY_11AM_EDT, 0, 0, 0, rng=rng)
+        delay = (plan["next_run_at"] - WEDNESDAY_11AM_EDT).total_seconds()
+        assert abs(delay - 3600) <= settings.QB_SCHEDULER_JITTER * 3600
+        assert plan["jitter_seconds"] == pytest.approx(delay - 3600, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_only_one_instance_leads(postgres_engine):
+    first = AdvisoryLockLeader("scheduler-test", engine=postgres_engine)
+    second = AdvisoryLockLeader("scheduler-test", engine=postgres_engine)
+
+    assert await first.acquire() is True
+    assert await second.acquire() is False
+    assert await first.acquire() is True  # Still held
+
+    await first.release()
+    assert await second.acquire() is True
+    assert first.is_leader is False
+    await second.release()
+
+
+@pytest.mark.asyncio
+async def test_tick_skips_sync_when_nothing_changed(postgres_engine, monkeypatch):
+    requests = []
+
+    async def stub(request):
+        requests.append(request.url.path.rsplit("/", 1)[-1])
+        return httpx.Response(200, json={"CDCResponse": [{"QueryResponse": [{"startPosition": 1, "maxResults": 0}]}]})
+
+    def service(db):
+        qb = QuickBooksService(db=db)
+        qb.realm_id = "9130"
+        qb.access_token = "access"
+        qb.refresh_token = "refresh"
+        qb.token_expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        qb.api = QuickBooksClient("9130", "https://qb.stub", transport=httpx.MockTransport(stub))
+        return qb
+
+    async def must_not_sync():
+        raise AssertionError("sync should have been skipped")
+
+    monkeypatch.setattr(sync_module, "get_quickbooks_service", service)
+    factory = async_sessionmaker(postgres_engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        await db.execute(text("UPDATE sync_status SET last_sync_at = now() - interval '1 hour'"))
+        await db.commit()
+
+    scheduler = SchedulerService(session_factory=factory)
+    scheduler.leader = AdvisoryLockLeader("scheduler-test", engine=postgres_engine)
+    monkeypatch.setattr(scheduler, "_run_scheduled_sync", must_not_sync)
+    await scheduler._tick()
+
+    assert requests == ["cdc"]
+    assert scheduler.last_tick["outcome"] == "skipped"
+    assert scheduler.quiet_runs == 1
+    assert scheduler.next_plan["signals"]["quiet_runs"] == 1
+    async with factory() as db:
+        assert (await db.execute(text(
+            "SELECT bool_and(last_sync_at > now() - interval '1 minute') FROM sync_status"
+            " WHERE entity_type IN ('customers', 'invoices', 'payments')"
+        ))).scalar() is True
+
+    # A webhook since the watermark forces a sync without probing
+    async with factory() as db:
+        await db.execute(text("""
+            INSERT INTO webhook_events (event_id, realm_id, event_type, entity_type, entity_ids, payload)
+            VALUES ('e1', '9130', 'Invoice.Update', 'invoice', '["1"]', '{}')
+        """))
+        await db.commit()
+
+    async def sync():
+        return {"total_records": 3}
+
+    monkeypatch.setattr(scheduler, "_run_scheduled_sync", sync)
+    await scheduler._tick()
+
+    assert requests == ["cdc"]
+    assert (scheduler.last_tick["outcome"], scheduler.last_tick["records_synced"]) == ("synced", 3)
+    assert "1 webhook events" in scheduler.last_tick["reason"]
+    assert scheduler.quiet_runs == 0
+    await scheduler.leader.release()